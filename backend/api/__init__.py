@@ -1,4 +1 @@
-# API modules
-from . import projects, devices, tests, ai, websocket
-
-__all__ = ["projects", "devices", "tests", "ai", "websocket"]
+# API modules (imported individually; main.py loads the heavy ones on first use)
@@ -0,0 +1,165 @@
+"""Admin API - Runtime internals for diagnosing a slow or overloaded backend"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional
+import asyncio
+import time
+
+from services.diagnostics import sampling_profiler
+from services.diagnostics.logs import get_log_pipeline
+from services.diagnostics.loop_watchdog import get_loop_watchdog
+from services.diagnostics.tracing import get_tracer
+from services.mobile import appium_cassette
+from services.mobile.adb_scheduler import get_adb_scheduler
+from services.mobile.session_registry import get_session_registry
+from utils.bounded_store import get_store_stats
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# Longest on-demand profile (the request stays open while it runs)
+MAX_PROFILE_SECONDS = 300
+
+class LogLevelRequest(BaseModel):
+    level: str  # DEBUG, INFO, WARNING, ERROR
+    subsystem: Optional[str] = None  # playback, touch, appium, appium_events, mobile_monitor; None = default
+
+class RecordCassetteRequest(BaseModel):
+    name: str
+    note: Optional[str] = None  # What is being recorded (flow, device, ...)
+
+@router.get("/adb-scheduler")
+async def get_adb_scheduler_stats():
+    """Per-device adb slots in use, queued commands and queue wait per lane"""
+    return get_adb_scheduler().get_stats()
+
+@router.get("/sessions")
+async def get_session_registry_stats():
+    """Live Appium sessions by device, reaper counters and dimension cache sizes"""
+    return get_session_registry().get_stats()
+
+@router.get("/stores")
+async def get_bounded_stores():
+    """Entries, evictions, spill to disk and estimated memory per bounded store (recordings, results, monitors, drivers)"""
+    return await asyncio.to_thread(get_store_stats)  # Sizing walks every stored object
+
+@router.get("/cassettes")
+async def get_cassettes():
+    """Recorded Appium cassettes and whether one is recording/replaying"""
+    return {"status": appium_cassette.get_status(), "cassettes": appium_cassette.list_cassettes()}
+
+@router.post("/cassettes/record")
+async def record_cassette(request: RecordCassetteRequest):
+    """Record all Appium traffic until /cassettes/stop"""
+    try:
+        path = appium_cassette.start_recording(request.name, {"note": request.note})
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "recording", "path": str(path)}
+
+@router.post("/cassettes/{name}/replay")
+async def replay_cassette(name: str, speed: float = 0.0):
+    """Answer Appium requests from a cassette (speed 1.0 = recorded latency, 0 = instant)"""
+    try:
+        summary = appium_cassette.start_replay(name, speed)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Cassette not found: {name}")
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "replaying", **summary}
+
+@router.post("/cassettes/stop")
+async def stop_cassette():
+    """Stop recording (and save) or replaying"""
+    saved = appium_cassette.stop_recording()
+    if saved:
+        return {"status": "saved", **saved}
+    replayed = appium_cassette.stop_replay()
+    if replayed:
+        return {"status": "stopped", **replayed}
+    return {"status": "idle"}
+
+@router.get("/loop-watchdog")
+async def get_loop_watchdog_stats(top: int = 20):
+    """Event-loop lag percentiles and the call sites that blocked the loop, by total stall time"""
+    return get_loop_watchdog().get_stats(top)
+
+@router.post("/loop-watchdog/reset")
+async def reset_loop_watchdog():
+    """Forget recorded stalls and lag samples"""
+    get_loop_watchdog().reset()
+    return {"status": "reset"}
+
+@router.get("/logging")
+async def get_logging_status():
+    """Log levels per subsystem, and records suppressed by the rate limit or dropped from the queue"""
+    return get_log_pipeline().get_stats()
+
+@router.put("/logging/level")
+async def set_log_level(request: LogLevelRequest):
+    """Change a subsystem's log level (or the default) until restart"""
+    try:
+        get_log_pipeline().set_level(request.subsystem, request.level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_log_pipeline().get_stats()
+
+@router.get("/traces")
+async def list_traces(limit: int = 50):
+    """Recent traces (newest first) and tracer/exporter counters"""
+    tracer = get_tracer()
+    return {"stats": tracer.get_stats(), "traces": tracer.list_traces(limit)}
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """All spans of a trace, as recorded"""
+    spans = get_tracer().get_trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+def _collapsed_response(collapsed: str, filename: str) -> PlainTextResponse:
+    return PlainTextResponse(collapsed, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.get("/profiler")
+async def get_profiler_status():
+    """Last on-demand profile and the continuous profiler, if running"""
+    return sampling_profiler.get_status()
+
+@router.get("/profile")
+async def profile(seconds: float = 10, mode: str = "wall", interval_ms: float = 10):
+    """Sample every thread for `seconds`; returns collapsed stacks for flamegraph.pl / speedscope"""
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}")
+    try:
+        profiler = await sampling_profiler.run_profile(seconds, mode, interval_ms / 1000)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _collapsed_response(profiler.collapsed(), f"gravityqa-{mode}-{int(profiler.started_at)}.collapsed")
+
+@router.post("/profile/continuous")
+async def start_continuous_profile(mode: str = "cpu", window: int = 300, interval_ms: float = 10):
+    """Profile continuously, keeping the last `window` seconds"""
+    try:
+        profiler = sampling_profiler.start_continuous(mode, window, interval_ms / 1000)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profiler.get_stats()
+
+@router.get("/profile/continuous")
+async def get_continuous_profile(seconds: Optional[int] = None):
+    """Collapsed stacks of the last `seconds` (default: the whole window)"""
+    profiler = sampling_profiler.get_continuous()
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Continuous profiling is not running")
+    return _collapsed_response(profiler.collapsed(seconds), f"gravityqa-{profiler.mode}-continuous-{int(time.time())}.collapsed")
+
+@router.delete("/profile/continuous")
+async def stop_continuous_profile():
+    """Stop continuous profiling"""
+    stats = sampling_profiler.stop_continuous()
+    return {"status": "stopped", **stats} if stats else {"status": "idle"}
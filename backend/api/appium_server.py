@@ -1,78 +1,89 @@
 """Appium Server Management API"""
 from fastapi import APIRouter, HTTPException
-import subprocess
 import httpx
-import asyncio
 
-router = APIRouter(prefix="/api/appium", tags=["appium"])
+from config import settings
+from services.mobile.appium_fleet import get_appium_fleet
 
-appium_process = None
+router = APIRouter(prefix="/api/appium", tags=["appium"])
 
 @router.post("/start")
 async def start_appium():
     """Start Appium server"""
-    global appium_process
-    
+    fleet = get_appium_fleet()
+
     # Check if already running
+    if await fleet.probe(fleet.default_node):
+        return {"status": "already_running", "message": "Appium is already running"}
+
+    # Start Appium and wait until /status answers
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:4723/status", timeout=2)
-            if response.status_code == 200:
-                return {"status": "already_running", "message": "Appium is already running"}
-    except:
-        pass
-    
-    # Start Appium
-    try:
-        appium_process = subprocess.Popen(
-            ["appium", "--allow-cors"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # Wait for it to start
-        await asyncio.sleep(3)
-        
-        # Verify it started
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get("http://localhost:4723/status", timeout=2)
-                if response.status_code == 200:
-                    return {"status": "started", "message": "Appium started successfully"}
-        except:
-            raise HTTPException(status_code=500, detail="Appium failed to start")
-            
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="Appium not installed. Run: npm install -g appium")
+        await fleet.ensure_default()
+        return {"status": "started", "message": "Appium started successfully"}
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start Appium: {str(e)}")
 
 @router.post("/stop")
 async def stop_appium():
-    """Stop Appium server"""
-    global appium_process
-    
-    if appium_process:
-        appium_process.terminate()
-        appium_process = None
-        return {"status": "stopped", "message": "Appium stopped"}
-    
-    # Try to kill via pkill if process object not available
-    try:
-        subprocess.run(["pkill", "-f", "appium"], check=False)
-        return {"status": "stopped", "message": "Appium stopped"}
-    except:
-        return {"status": "not_running", "message": "Appium was not running"}
+    """Stop the Appium servers GravityQA started"""
+    stopped = await get_appium_fleet().stop_all()
+
+    if stopped:
+        return {"status": "stopped", "message": f"Stopped {stopped} Appium server(s)"}
+    return {"status": "not_running", "message": "No Appium server started by GravityQA is running"}
 
 @router.get("/status")
 async def get_appium_status():
     """Check if Appium is running"""
+    url = f"http://{settings.APPIUM_HOST}:{settings.APPIUM_PORT}"
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.get("http://localhost:4723/status", timeout=2)
+            response = await client.get(f"{url}/status", timeout=2)
             if response.status_code == 200:
-                return {"status": "running", "url": "http://localhost:4723"}
+                return {"status": "running", "url": url, "nodes": len(get_appium_fleet().nodes)}
     except:
         pass
-    
+
+    if any(node.status == "ready" for node in get_appium_fleet().nodes.values()):
+        return {"status": "running", "url": None, "nodes": len(get_appium_fleet().nodes)}
     return {"status": "stopped"}
+
+@router.get("/fleet")
+async def get_fleet_status():
+    """Per-device Appium servers, their ports, health and routed sessions"""
+    return get_appium_fleet().get_status()
+
+@router.post("/fleet/devices/{device_id}/start")
+async def start_device_node(device_id: str):
+    """Start (or reuse) the Appium server for a device"""
+    try:
+        node = await get_appium_fleet().ensure_node(device_id)
+        return node.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start Appium for {device_id}: {str(e)}")
+
+@router.post("/fleet/nodes/{port}/restart")
+async def restart_node(port: int):
+    """Restart one Appium server (its sessions are lost)"""
+    try:
+        node = await get_appium_fleet().restart_node(port)
+        return node.to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No Appium node on port {port}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to restart Appium on port {port}: {str(e)}")
+
+@router.post("/fleet/nodes/{port}/stop")
+async def stop_node(port: int):
+    """Stop one Appium server"""
+    if port not in get_appium_fleet().nodes:
+        raise HTTPException(status_code=404, detail=f"No Appium node on port {port}")
+    await get_appium_fleet().stop_node(port)
+    return {"status": "stopped", "port": port}
+
+@router.get("/fleet/nodes/{port}/logs")
+async def get_node_logs(port: int):
+    """Last lines of an Appium server's output"""
+    return {"port": port, "logs": get_appium_fleet().get_logs(port)}
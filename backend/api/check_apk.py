@@ -1,18 +1,24 @@
 """Quick APK/IPA Check Endpoint - Check if app exists without installing"""
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from sqlalchemy.orm import Session
+from typing import Optional
 from database import get_db
 from models.device import Device
-import subprocess
-import tempfile
+from services.apk.upload_store import get_upload_store
+from services.mobile.adb_scheduler import LANE_INTERACTIVE, get_adb_scheduler
+from services.diagnostics.logs import get_logger
+import asyncio
 import os
 
+logger = get_logger("apk")
+
 router = APIRouter(prefix="/api/check-apk", tags=["check-apk"])
 
 @router.post("/{device_id}")
 async def check_app_on_device(
     device_id: str,
-    apk: UploadFile = File(...),  # Called 'apk' for backwards compatibility
+    apk: Optional[UploadFile] = File(None),  # Called 'apk' for backwards compatibility
+    sha256: Optional[str] = Form(None),  # Known build hash - the file can be omitted
     db: Session = Depends(get_db)
 ):
     """Check if APK/IPA is already installed on device - PLATFORM-AWARE"""
@@ -26,20 +32,19 @@ async def check_app_on_device(
     platform = device.platform
     is_ios = platform == "ios"
     
-    # Save temporarily
-    temp_dir = tempfile.gettempdir()
-    app_path = os.path.join(temp_dir, apk.filename)
-    
-    with open(app_path, "wb") as f:
-        content = await apk.read()
-        f.write(content)
-    
+    # Stream the upload into the shared store (or reuse the stored build)
+    try:
+        upload = await get_upload_store().receive(apk, sha256)
+    except (LookupError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    app_path = upload["path"]
+    filename = upload["filename"]
     
     try:
-        print(f"[CHECK] Received file: {apk.filename}, Content-Type: {apk.content_type}, Platform: {platform}")
+        logger.info("[CHECK] Received file: %s (%s, reused=%s), Platform: %s", filename, upload['sha256'][:12], upload['reused'], platform)
         
         # Platform-aware validation
-        file_extension = os.path.splitext(apk.filename)[1].lower()
+        file_extension = os.path.splitext(filename)[1].lower()
         
         if is_ios:
             # iOS IPA validation
@@ -49,10 +54,11 @@ async def check_app_on_device(
                     detail=f"File must be an IPA (.ipa extension) for iOS devices, got {file_extension}"
                 )
             
-            # For iOS, we can't easily check if already installed or extract bundle ID
-            # Just return basic info from filename
-            app_name = os.path.splitext(apk.filename)[0]
-            bundle_id = "unknown.bundle.id"  # Would need plist parsing
+            # For iOS, we can't easily check if already installed
+            # Bundle id and name come from the IPA's Info.plist (cached by content hash)
+            ipa_info = await asyncio.to_thread(APKAnalyzer().extract_ipa_info, app_path, sha256=upload["sha256"])
+            app_name = ipa_info.get("app_name") or os.path.splitext(filename)[0]
+            bundle_id = ipa_info.get("package_name") or "unknown.bundle.id"
             
             print(f"[CHECK] IPA file validated for iOS device")
             
@@ -67,10 +73,11 @@ async def check_app_on_device(
             return {
                 "package_name": bundle_id,
                 "app_name": app_name,
-                "version": "1.0",  # Default
+                "version": ipa_info.get("version_name") or "1.0",
                 "already_installed": False,  # Can't easily check on iOS
                 "activity": "",  # iOS doesn't have activities
-                "apk_path": app_path
+                "apk_path": app_path,
+                "sha256": upload["sha256"]
             }
         
         else:
@@ -84,7 +91,7 @@ async def check_app_on_device(
             # Extract package name
             analyzer = APKAnalyzer()
             print(f"[CHECK] Analyzing APK at {app_path}...")
-            apk_info = analyzer.extract_package_info(app_path)
+            apk_info = await asyncio.to_thread(analyzer.extract_package_info, app_path, sha256=upload["sha256"])
             
             if not apk_info.get("package_name"):
                 raise HTTPException(
@@ -97,14 +104,11 @@ async def check_app_on_device(
             print(f"[CHECK] Looking for {package_name} on device...")
             
             # Check if exists on device
-            check_result = subprocess.run(
-                ['adb', '-s', device_id, 'shell', 'pm', 'list', 'packages', package_name],
-                capture_output=True,
-                text=True,
-                timeout=5
+            returncode, stdout, _ = await get_adb_scheduler().shell(
+                device_id, f"pm list packages {package_name}", lane=LANE_INTERACTIVE, timeout=5
             )
             
-            already_installed = check_result.returncode == 0 and package_name in check_result.stdout
+            already_installed = returncode == 0 and f"package:{package_name}" in stdout.split()
             
             # Get REAL activity from the device or APK
             activity = apk_info.get("main_activity", ".MainActivity")
@@ -113,16 +117,13 @@ async def check_app_on_device(
             if already_installed:
                 try:
                     print(f"[CHECK] Getting real launcher activity from device...")
-                    resolve_result = subprocess.run(
-                        ['adb', '-s', device_id, 'shell', 'cmd', 'package', 'resolve-activity', '--brief', package_name],
-                        capture_output=True,
-                        text=True,
-                        timeout=5
+                    returncode, stdout, _ = await get_adb_scheduler().shell(
+                        device_id, f"cmd package resolve-activity --brief {package_name}", lane=LANE_INTERACTIVE, timeout=5
                     )
                     
-                    if resolve_result.returncode == 0:
+                    if returncode == 0:
                         # Output is like: "com.vura.app/.vura_app.MainActivity"
-                        output = resolve_result.stdout.strip().split('\n')[-1]  # Last line
+                        output = stdout.strip().split('\n')[-1]  # Last line
                         if '/' in output:
                             real_activity = output.split('/')[-1]  # Get activity part
                             print(f"[CHECK] ✅ Real launcher activity: {real_activity}")
@@ -140,17 +141,18 @@ async def check_app_on_device(
             app_config_store.set_app(
                 package_name=package_name,
                 activity=activity,
-                app_name=apk_info["app_name"] or apk.filename
+                app_name=apk_info["app_name"] or filename
             )
             print(f"[CHECK] ✅ Saved to global store for code generation")
             
             return {
                 "package_name": package_name,
-                "app_name": apk_info["app_name"] or apk.filename,
+                "app_name": apk_info["app_name"] or filename,
                 "version": apk_info["version_name"],
                 "already_installed": already_installed,
                 "activity": activity,
-                "apk_path": app_path
+                "apk_path": app_path,
+                "sha256": upload["sha256"]
             }
         
     except HTTPException:
@@ -161,3 +163,5 @@ async def check_app_on_device(
         error_details = traceback.format_exc()
         print(f"[CHECK] ❌ Error details:\n{error_details}")
         raise HTTPException(status_code=500, detail=f"App analysis failed: {str(e)}")
+    finally:
+        get_upload_store().release(app_path)
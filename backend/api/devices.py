@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from models.device import Device
 from services.mobile.device_bridge import DeviceBridge
+from services.apk.upload_store import get_upload_store
+from services.mobile.bulk_installer import get_bulk_installer
+from services.mobile.adb_scheduler import LANE_INTERACTIVE, get_adb_scheduler
+from services.diagnostics.logs import get_logger
 from datetime import datetime
+import asyncio
 import os
-import tempfile
+
+logger = get_logger("devices")
 
 router = APIRouter()
 device_bridge = DeviceBridge()
@@ -63,13 +69,13 @@ async def get_devices(db: Session = Depends(get_db)):
 @router.post("/{device_id}/install-apk")
 async def install_app_file(
     device_id: str,
-    apk: UploadFile = File(...),  # Parameter name is 'apk' for backwards compatibility
+    apk: Optional[UploadFile] = File(None),  # Parameter name is 'apk' for backwards compatibility
+    sha256: Optional[str] = Form(None),  # Known build hash - the file can be omitted
     db: Session = Depends(get_db)
 ):
     """Upload APK/IPA file and install - SMART: detects platform and handles both Android and iOS"""
     from services.apk.apk_analyzer import APKAnalyzer
     from api.realtime import broadcast_installation_progress
-    import subprocess
     
     # GET DEVICE PLATFORM
     device = db.query(Device).filter(Device.device_id == device_id).first()
@@ -80,7 +86,13 @@ async def install_app_file(
     is_ios = platform == "ios"
     
     # Validate file extension based on platform
-    file_extension = os.path.splitext(apk.filename)[1].lower()
+    filename = apk.filename if apk else None
+    if not filename:
+        stored_path = get_upload_store().find(sha256)
+        if not stored_path:
+            raise HTTPException(status_code=400, detail="Upload a file or send the sha256 of a stored build")
+        filename = os.path.basename(stored_path)
+    file_extension = os.path.splitext(filename)[1].lower()
     
     if is_ios and file_extension != '.ipa':
         raise HTTPException(
@@ -93,23 +105,22 @@ async def install_app_file(
             detail=f"Invalid file type. Android devices require .apk files, got {file_extension}"
         )
     
-    # Save uploaded file temporarily
-    temp_dir = tempfile.gettempdir()
-    app_path = os.path.join(temp_dir, apk.filename)
-    
-    with open(app_path, "wb") as f:
-        content = await apk.read()
-        f.write(content)
+    # Stream the upload into the shared store (or reuse the stored build)
+    try:
+        upload = await get_upload_store().receive(apk, sha256)
+    except (LookupError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    app_path = upload["path"]
     
     try:
         if is_ios:
             # iOS IPA HANDLING
             await broadcast_installation_progress(device_id, 20, "Analyzing IPA...")
             
-            # For iOS, we can't easily extract package info from IPA
-            # Use filename as app name for now
-            app_name = os.path.splitext(apk.filename)[0]
-            bundle_id = "unknown"  # Would need plist parsing for real bundle ID
+            # Bundle id and name come from the IPA's Info.plist (cached by content hash)
+            ipa_info = await asyncio.to_thread(APKAnalyzer().extract_ipa_info, app_path, sha256=upload["sha256"])
+            app_name = ipa_info.get("app_name") or os.path.splitext(filename)[0]
+            bundle_id = ipa_info.get("package_name") or "unknown"
             
             print(f"[INFO] Installing IPA on iOS device: {device.name}")
             
@@ -127,10 +138,12 @@ async def install_app_file(
                 "message": f"✅ App installed: {app_name}",
                 "package_name": bundle_id,
                 "app_name": app_name,
-                "version": "1.0",  # Default
+                "version": ipa_info.get("version_name") or "1.0",
                 "activity": "",  # iOS doesn't have activities
                 "apk_path": app_path,
-                "file_size": len(content),
+                "file_size": upload["size"],
+                "sha256": upload["sha256"],
+                "upload_reused": upload["reused"],
                 "already_installed": False
             }
         
@@ -140,24 +153,20 @@ async def install_app_file(
             
             # Extract real package info using analyzer
             analyzer = APKAnalyzer()
-            apk_info = analyzer.extract_package_info(app_path)
+            apk_info = await asyncio.to_thread(analyzer.extract_package_info, app_path, sha256=upload["sha256"])
             package_name = apk_info["package_name"]
             
             print(f"[DEBUG] Checking if {package_name} already installed...")
             
-            # CHECK IF APP ALREADY EXISTS ON DEVICE!
+            # CHECK IF THIS BUILD (OR NEWER) IS ALREADY ON THE DEVICE!
             already_installed = False
             try:
-                check_result = subprocess.run(
-                    ['adb', '-s', device_id, 'shell', 'pm', 'list', 'packages', package_name],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
+                installer = get_bulk_installer()
+                state = await installer.get_installed_state(device_id, package_name)
                 
-                if check_result.returncode == 0 and package_name in check_result.stdout:
+                if installer.decide(state, apk_info) == "skip":
                     already_installed = True
-                    print(f"[INFO] ✅ App already installed! Skipping installation...")
+                    logger.info("[Devices] ✅ App already installed (versionCode %s)! Skipping installation...", state['version_code'])
                     await broadcast_installation_progress(device_id, 50, f"✅ App already on device - using existing installation")
             except Exception as e:
                 print(f"[WARN] Could not check existing app: {e}")
@@ -171,17 +180,14 @@ async def install_app_file(
             # Get launchable activity (works for both existing and new installs)
             activity = ".MainActivity"  # default
             try:
-                dump_result = subprocess.run(
-                    ['adb', '-s', device_id, 'shell', 'dumpsys', 'package', package_name],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
+                returncode, stdout, _ = await get_adb_scheduler().shell(
+                    device_id, f"dumpsys package {package_name}", lane=LANE_INTERACTIVE, timeout=5
                 )
                 
-                if dump_result.returncode == 0:
+                if returncode == 0:
                     # Find MAIN intent activity
                     import re
-                    match = re.search(r'(\S+/\.)(\w+Activity)\s+filter', dump_result.stdout)
+                    match = re.search(r'(\S+/\.)(\w+Activity)\s+filter', stdout)
                     if match:
                         activity = f".{match.group(2)}"
                         print(f"[DEBUG] Detected launchable activity: {activity}")
@@ -194,13 +200,15 @@ async def install_app_file(
             
             return {
                 "success": True,
-                "message": f"✅ App ready: {apk_info['app_name'] or apk.filename}",
+                "message": f"✅ App ready: {apk_info['app_name'] or filename}",
                 "package_name": package_name,
-                "app_name": apk_info["app_name"] or apk.filename,
+                "app_name": apk_info["app_name"] or filename,
                 "version": apk_info["version_name"],
                 "activity": activity,
                 "apk_path": app_path,
-                "file_size": len(content),
+                "file_size": upload["size"],
+                "sha256": upload["sha256"],
+                "upload_reused": upload["reused"],
                 "already_installed": already_installed
             }
         
@@ -210,6 +218,69 @@ async def install_app_file(
         # Broadcast error
         await broadcast_installation_progress(device_id, 0, f"Failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed: {str(e)}")
+    finally:
+        get_upload_store().release(app_path)
+
+@router.post("/bulk-install")
+async def bulk_install(
+    device_ids: str = Form(...),  # Comma-separated device ids
+    apk: Optional[UploadFile] = File(None),
+    sha256: Optional[str] = Form(None),  # Known build hash - the file can be omitted
+    force: bool = Form(False),  # Reinstall even if up to date / replace a differently signed app
+    db: Session = Depends(get_db)
+):
+    """Install one build on several devices in parallel, skipping devices that are up to date"""
+    from services.apk.apk_analyzer import APKAnalyzer
+    from api.realtime import broadcast_device_event, broadcast_installation_progress
+    
+    ids = [d.strip() for d in device_ids.split(",") if d.strip()]
+    if not ids:
+        raise HTTPException(status_code=400, detail="No devices given")
+    
+    devices = {d.device_id: d for d in db.query(Device).filter(Device.device_id.in_(ids)).all()}
+    missing = [d for d in ids if d not in devices]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Devices not found: {', '.join(missing)}")
+    
+    try:
+        upload = await get_upload_store().receive(apk, sha256)
+    except (LookupError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        # One build targets one platform
+        build_platform = "ios" if upload["path"].endswith(".ipa") else "android"
+        wrong_platform = [d for d in ids if devices[d].platform != build_platform]
+        if wrong_platform:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Build is for {build_platform}, but these devices are not: {', '.join(wrong_platform)}"
+            )
+    
+        analyzer = APKAnalyzer()
+        if build_platform == "ios":
+            build_info = await asyncio.to_thread(analyzer.extract_ipa_info, upload["path"], sha256=upload["sha256"])
+        else:
+            build_info = await asyncio.to_thread(analyzer.extract_package_info, upload["path"], sha256=upload["sha256"])
+            if not build_info.get("package_name"):
+                raise HTTPException(status_code=500, detail="Could not extract package name from APK")
+    
+        report = await get_bulk_installer().install(
+            upload["path"],
+            upload["size"],
+            build_info,
+            ids,
+            platforms={d: devices[d].platform for d in ids},
+            force=force,
+            progress_callback=broadcast_installation_progress
+        )
+        report["sha256"] = upload["sha256"]
+        report["upload_reused"] = upload["reused"]
+    
+        await broadcast_device_event("bulk_install_complete", report)
+        return report
+    finally:
+        get_upload_store().release(upload["path"])
 
 @router.post("/{device_id}/install")
 async def install_app(
@@ -2,14 +2,13 @@
 from fastapi import APIRouter, HTTPException
 from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
+from services.diagnostics.tracing import span
 from services.mobile.appium_service import get_appium_service
+from services.mobile.selector_compiler import HIERARCHY_TTL
 
 router = APIRouter(prefix="/api/inspector", tags=["inspector"])
 appium_service = get_appium_service()  # Shared singleton instance
 
-# Global session storage (temporary - should use proper session management)
-_active_sessions = {}
-
 def parse_bounds(bounds_str: str) -> Dict[str, int]:
     """Parse bounds string like '[100,200][300,400]' to dict"""
     try:
@@ -247,13 +246,13 @@ def generate_xpath(elem: ET.Element) -> str:
     return "//*"
 
 @router.get("/page-source")
-async def get_page_source():
-    """Get UI hierarchy from active Appium session"""
+async def get_page_source(device_id: Optional[str] = None):
+    """Get UI hierarchy from the device's Appium session"""
     try:
-        if not appium_service.active_sessions:
+        session_id = await appium_service.registry.resolve(device_id)
+        if not session_id:
             raise HTTPException(status_code=400, detail="No active Appium session. Please launch app first.")
         
-        session_id = list(appium_service.active_sessions.keys())[-1]
         print(f"[Inspector] Getting page source for session: {session_id}")
         
         page_source = appium_service.get_page_source(session_id)
@@ -264,7 +263,8 @@ async def get_page_source():
         print(f"[Inspector] Got page source ({len(page_source)} chars)")
         
         try:
-            root = ET.fromstring(page_source)
+            with span("xml parse", "xml", chars=len(page_source)):
+                root = ET.fromstring(page_source)
             print(f"[Inspector] ✅ XML parsed successfully")
         except Exception as e:
             print(f"[Inspector] ❌ XML parse error: {e}")
@@ -285,7 +285,7 @@ async def get_page_source():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/element-at-position")
-async def get_element_at_position(x: int, y: int):
+async def get_element_at_position(x: int, y: int, device_id: Optional[str] = None):
     """
     Find element at screenshot pixel coordinates
     
@@ -298,7 +298,8 @@ async def get_element_at_position(x: int, y: int):
     try:
         print(f"\n[Inspector] 🎯 Element at SCREENSHOT coords ({x},{y})")
         
-        if not appium_service.active_sessions:
+        session_id = await appium_service.registry.resolve(device_id)
+        if not session_id:
             print(f"[Inspector] ❌ No active sessions!")
             return {
                 "found": False,
@@ -306,9 +307,6 @@ async def get_element_at_position(x: int, y: int):
                 "reason": "No active Appium session"
             }
         
-        # Get the MOST RECENT session
-        session_ids = list(appium_service.active_sessions.keys())
-        session_id = session_ids[-1]
         print(f"[Inspector] Session: {session_id}")
         
         # Get dimensions
@@ -337,8 +335,8 @@ async def get_element_at_position(x: int, y: int):
         
         print(f"[Inspector] 🔄 Transform: ({x},{y}) → ({device_x},{device_y})")
         
-        # Get page source
-        page_source = appium_service.get_page_source(session_id)
+        # Get page source (reused while the screen hasn't been touched)
+        page_source = appium_service.get_page_source(session_id, max_age=HIERARCHY_TTL)
         
         if not page_source or len(page_source) < 100:
             print(f"[Inspector] ❌ Page source invalid: {len(page_source) if page_source else 0} chars")
@@ -353,7 +351,8 @@ async def get_element_at_position(x: int, y: int):
         print(f"[Inspector] ✅ Page source: {len(page_source)} chars")
         
         # Parse XML
-        root = ET.fromstring(page_source)
+        with span("xml parse", "xml", chars=len(page_source)):
+            root = ET.fromstring(page_source)
         total_nodes = len(list(root.iter()))
         print(f"[Inspector] 📄 Parsed XML: {total_nodes} nodes")
         
@@ -397,12 +396,12 @@ async def execute_tap(request: dict):
         
         print(f"[Inspector] Execute tap requested for element: {element.get('class', 'unknown')}")
         
-        # Get active session
-        if not appium_service.active_sessions:
+        # Get the device's session (newest one if the request doesn't name a device)
+        session_id = await appium_service.registry.resolve(request.get('device_id'))
+        if not session_id:
             print("[Inspector] ❌ No active sessions!")
             raise HTTPException(status_code=400, detail="No active Appium session")
         
-        session_id = list(appium_service.active_sessions.keys())[-1]
         print(f"[Inspector] Using session: {session_id}")
         
         # Calculate center of element bounds
@@ -4,16 +4,65 @@ from typing import Dict
 from appium.webdriver.common.appiumby import AppiumBy
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import base64
 from datetime import datetime
 import os
 
+from services.mobile.selector_compiler import (
+    STRATEGY_ACCESSIBILITY_ID,
+    STRATEGY_ID,
+    STRATEGY_UIAUTOMATOR,
+    STRATEGY_XPATH,
+    compile_selector,
+    get_hierarchy_cache,
+)
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("actions")
+
 router = APIRouter(prefix="/api/actions", tags=["actions"])
 
 # Import driver manager (assumes you have this)
 from utils.appium_driver import get_driver
 
+APPIUM_BY = {
+    STRATEGY_ID: AppiumBy.ID,
+    STRATEGY_ACCESSIBILITY_ID: AppiumBy.ACCESSIBILITY_ID,
+    STRATEGY_UIAUTOMATOR: AppiumBy.ANDROID_UIAUTOMATOR,
+    STRATEGY_XPATH: AppiumBy.XPATH,
+}
+
+
+def compile_locator(selector: Dict) -> Dict:
+    """
+    Compile a recorded selector into the cheapest Appium locator
+    
+    Returns the compiled selector with a (by, value) "locator"; unknown
+    strategies keep the old behaviour of treating the value as XPath.
+    """
+    strategy = selector.get('strategy', 'xpath')
+    value = selector.get('value')
+    compiled = dict(compile_selector(strategy, value))
+    
+    if compiled['strategy'] not in APPIUM_BY:
+        compiled = {'strategy': STRATEGY_XPATH, 'value': value, 'xpath': value}
+    
+    compiled['locator'] = (APPIUM_BY[compiled['strategy']], compiled['value'])
+    return compiled
+
+
+def find_compiled(driver, compiled: Dict):
+    """Find an element with the compiled locator, falling back to the original XPath"""
+    try:
+        return driver.find_element(*compiled['locator'])
+    except NoSuchElementException:
+        if compiled['strategy'] == STRATEGY_XPATH or not compiled.get('xpath'):
+            raise
+        logger.warning("[Selector] ⚠️ %s lookup missed, retrying XPath", compiled['strategy'])
+        return driver.find_element(AppiumBy.XPATH, compiled['xpath'])
+
+
 @router.post("/type-text")
 async def type_text(request: Dict):
     """
@@ -45,13 +94,9 @@ async def type_text(request: Dict):
             raise HTTPException(status_code=500, detail="Driver not initialized")
         
         # Find element
-        strategy = selector.get('strategy', 'xpath')
-        value = selector.get('value')
-        
-        if strategy == 'id':
-            elem = driver.find_element(AppiumBy.ID, value)
-        else:
-            elem = driver.find_element(AppiumBy.XPATH, value)
+        elem = find_compiled(driver, compile_locator(selector))
+        if getattr(driver, 'session_id', None):
+            get_hierarchy_cache().invalidate(driver.session_id)
         
         # Clear if needed
         if clear_before:
@@ -104,29 +149,23 @@ async def wait_for_element(request: Dict):
         if not driver:
             raise HTTPException(status_code=500, detail="Driver not initialized")
         
-        # Create locator
-        strategy = selector.get('strategy', 'xpath')
-        value = selector.get('value')
-        
-        if strategy == 'id':
-            locator = (AppiumBy.ID, value)
-        else:
-            locator = (AppiumBy.XPATH, value)
+        compiled = compile_locator(selector)
         
-        # Wait
+        # Wait on the device; a cached hierarchy may predate a tap made outside this backend
         wait = WebDriverWait(driver, timeout_sec)
         
         if wait_type == 'visible':
-            element = wait.until(EC.visibility_of_element_located(locator))
+            element = wait.until(EC.visibility_of_element_located(compiled['locator']))
             print(f"[WaitFor] ✓ Element visible")
         else:  # clickable
-            element = wait.until(EC.element_to_be_clickable(locator))
+            element = wait.until(EC.element_to_be_clickable(compiled['locator']))
             print(f"[WaitFor] ✓ Element clickable")
         
         return {
             "success": True,
             "found": True,
-            "message": f"Element is {wait_type}"
+            "message": f"Element is {wait_type}",
+            "source": compiled['strategy']
         }
     
     except TimeoutException:
@@ -169,15 +208,10 @@ async def assert_element(request: Dict):
         if not driver:
             raise HTTPException(status_code=500, detail="Driver not initialized")
         
-        # Create locator
-        strategy = selector.get('strategy', 'xpath')
-        value = selector.get('value')
-        
-        if strategy == 'id':
-            locator = (AppiumBy.ID, value)
-        else:
-            locator = (AppiumBy.XPATH, value)
+        compiled = compile_locator(selector)
+        locator = compiled['locator']
         
+        # Never passed from a cached hierarchy: it may predate the last action on the device
         wait = WebDriverWait(driver, timeout_sec)
         
         if assert_type == 'visible':
@@ -5,6 +5,7 @@ from typing import List
 from database import get_db
 from models.flow import Flow
 from pydantic import BaseModel
+from services.playback.selector_cache import get_selector_cache
 
 router = APIRouter(prefix="/api/flows", tags=["flows"])
 
@@ -36,13 +37,14 @@ async def create_flow(flow: FlowCreate, db: Session = Depends(get_db)):
     
     if not activity_to_save:
         try:
-            from services.mobile.appium_service import AppiumService
-            appium_service = AppiumService()
+            from services.mobile.appium_service import get_appium_service
+            registry = get_appium_service().registry
             
-            if appium_service.active_sessions:
-                session_id = list(appium_service.active_sessions.keys())[-1]
-                session_caps = appium_service.active_sessions[session_id]
-                activity_to_save = session_caps.get('appium:appActivity')
+            # The session the flow was recorded in (on the flow's device)
+            session_id = await registry.resolve(flow.device_id)
+            if session_id:
+                session_caps = registry.get(session_id).capabilities
+                activity_to_save = session_caps.get('appium:appActivity') or session_caps.get('appActivity')
                 print(f"[FlowSave] Auto-fetched activity from session: {activity_to_save}")
             else:
                 print(f"[FlowSave] ⚠️ No active session, activity will be NULL")
@@ -97,6 +99,8 @@ async def update_flow(flow_id: int, flow: FlowUpdate, db: Session = Depends(get_
         db_flow.description = flow.description
     if flow.steps:
         db_flow.steps = flow.steps
+        # Re-recorded steps invalidate what playback learned about their selectors
+        get_selector_cache().forget_flow(str(flow_id))
     
     db.commit()
     db.refresh(db_flow)
@@ -112,5 +116,6 @@ async def delete_flow(flow_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_flow)
     db.commit()
+    get_selector_cache().forget_flow(str(flow_id))
     
     return {"message": "Flow deleted successfully"}
@@ -3,8 +3,15 @@ from sqlalchemy.orm import Session
 from database import get_db
 from pydantic import BaseModel
 from services.mobile.appium_service import get_appium_service
+from services.mobile.package_inventory import get_package_inventory
+from services.mobile.adb_scheduler import LANE_INTERACTIVE, get_adb_scheduler
+from services.mobile.session_profiles import profile_for_project
+from services.diagnostics.logs import get_logger
+import asyncio
 import base64
 
+logger = get_logger("inspector")
+
 router = APIRouter(prefix="/api/inspector", tags=["inspector"])
 appium_service = get_appium_service()
 
@@ -13,6 +20,8 @@ class StartSessionRequest(BaseModel):
     platform: str
     app_package: str = None
     app_activity: str = None
+    project_id: int = None  # Use the project's session profile
+    profile: str = None  # Or name one explicitly ("fast", "faithful")
 
 class TapElementRequest(BaseModel):
     xpath: str
@@ -24,28 +33,40 @@ class SendKeysRequest(BaseModel):
 class TapCoordinateRequest(BaseModel):
     x: int
     y: int
+    device_id: str = None  # Session on this device (newest session if omitted)
+
+async def _resolve_session(device_id: str = None) -> str:
+    """The device's session, or the newest one if no device is given (400 if none)"""
+    session_id = await appium_service.registry.resolve(device_id)
+    if not session_id:
+        logger.warning("[Inspector] ❌ No active session%s", ' on ' + device_id if device_id else '')
+        raise HTTPException(status_code=400, detail=f"No active session{' on ' + device_id if device_id else ''}")
+    return session_id
 
 @router.post("/start-session")
-async def start_session(request: StartSessionRequest):
+async def start_session(request: StartSessionRequest, db: Session = Depends(get_db)):
     """Start Appium session for device"""
     try:
-        print(f"[StartSession] Creating session with:")
-        print(f"  Device: {request.device_id}")
-        print(f"  Platform: {request.platform}")  
-        print(f"  Package: {request.app_package}")
-        print(f"  Activity: {request.app_activity}")
+        profile = profile_for_project(db, request.project_id, request.profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        logger.info("[StartSession] Creating session: device=%s platform=%s package=%s activity=%s profile=%s",
+                    request.device_id, request.platform, request.app_package, request.app_activity, profile.name)
         
         # Use new signature: device_id, platform, app_package, app_activity
         session_id = await appium_service.create_session(
             device_id=request.device_id,
             platform=request.platform,
             app_package=request.app_package,
-            app_activity=request.app_activity
+            app_activity=request.app_activity,
+            profile=profile
         )
         
         if session_id:
             print(f"[StartSession] ✅ Session created: {session_id}")
-            return {"session_id": session_id, "message": "✅ Session started successfully"}
+            return {"session_id": session_id, "profile": profile.name, "message": "✅ Session started successfully"}
         else:
             print("[StartSession] ❌ Session creation returned None")
             raise HTTPException(status_code=500, detail="Failed to create session")
@@ -57,19 +78,11 @@ async def start_session(request: StartSessionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/screenshot")
-async def get_screenshot():
-    """Capture screenshot from active session"""
+async def get_screenshot(device_id: str = None):
+    """Capture screenshot from the device's session"""
     try:
-        print(f"[DEBUG] Active sessions: {appium_service.active_sessions}")
-        
-        # Get the LATEST active session (newest one)
-        if not appium_service.active_sessions:
-            print("[ERROR] No active sessions found")
-            raise HTTPException(status_code=400, detail="No active session")
-        
-        # Use LAST session (newest) instead of first (oldest)
-        session_id = list(appium_service.active_sessions.keys())[-1]
-        print(f"[DEBUG] Using LATEST session_id: {session_id}")
+        session_id = await _resolve_session(device_id)
+        logger.debug("[Inspector] Using session_id: %s", session_id)
         
         screenshot_base64 = await appium_service.get_screenshot(session_id)
         print(f"[DEBUG] Screenshot captured, length: {len(screenshot_base64) if screenshot_base64 else 0}")
@@ -82,14 +95,11 @@ async def get_screenshot():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/page-source")
-async def get_page_source():
+async def get_page_source(device_id: str = None):
     """Get XML page source"""
     try:
-        if not appium_service.active_sessions:
-            raise HTTPException(status_code=400, detail="No active session")
-        
-        session_id = list(appium_service.active_sessions.keys())[0]
-        page_source = await appium_service.get_page_source(session_id)
+        session_id = await _resolve_session(device_id)
+        page_source = appium_service.get_page_source(session_id)
         return {"page_source": page_source}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -108,12 +118,7 @@ async def tap_element(request: TapElementRequest):
 async def tap_coordinate(request: TapCoordinateRequest):
     """Tap at screen coordinates"""
     try:
-        if not appium_service.active_sessions:
-            print("[TAP] ❌ No active sessions!")
-            raise HTTPException(status_code=400, detail="No active session")
-        
-        # Use LATEST session (same fix as screenshot)
-        session_id = list(appium_service.active_sessions.keys())[-1]
+        session_id = await _resolve_session(request.device_id)
         print(f"[TAP] Executing tap at ({request.x}, {request.y}) on session {session_id}")
         
         result = await appium_service.tap_at_coordinate(session_id, request.x, request.y)
@@ -138,16 +143,13 @@ class SwipeRequest(BaseModel):
     end_x: int
     end_y: int
     duration: int = 500
+    device_id: str = None  # Session on this device (newest session if omitted)
 
 @router.post("/swipe")
 async def swipe(request: SwipeRequest):
     """Execute swipe gesture"""
     try:
-        if not appium_service.active_sessions:
-            print("[SWIPE] ❌ No active sessions!")
-            raise HTTPException(status_code=400, detail="No active session")
-        
-        session_id = list(appium_service.active_sessions.keys())[-1]
+        session_id = await _resolve_session(request.device_id)
         print(f"[SWIPE] Executing swipe from ({request.start_x},{request.start_y}) to ({request.end_x},{request.end_y})")
         
         result = await appium_service.swipe(
@@ -219,11 +221,7 @@ async def start_mobile_monitoring(request: StartMonitoringRequest):
     try:
         from api.realtime import broadcast_mobile_action
         
-        # Get LATEST active session
-        if not appium_service.active_sessions:
-            raise HTTPException(status_code=400, detail="No active Appium session")
-            
-        session_id = list(appium_service.active_sessions.keys())[-1]
+        session_id = await _resolve_session(request.device_id)
         print(f"[SimpleMobileMonitor] Starting for session: {session_id}")
         
         def on_mobile_event(action: dict):
@@ -260,9 +258,8 @@ async def stop_mobile_monitoring(request: StartMonitoringRequest):
 
 # APK Upload and Install for Flow Testing
 from fastapi import UploadFile, File
-import tempfile
+from services.apk.upload_store import get_upload_store
 import os
-import subprocess
 
 @router.post("/upload-apk/")
 async def upload_apk(file: UploadFile = File(...)):
@@ -270,24 +267,20 @@ async def upload_apk(file: UploadFile = File(...)):
     try:
         print(f"[APK Upload] Receiving APK: {file.filename}")
         
-        # Save to temp directory
-        temp_dir = tempfile.gettempdir()
-        apk_path = os.path.join(temp_dir, file.filename)
-        
-        with open(apk_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Stream into the shared upload store (kept once per build hash)
+        upload = await get_upload_store().save_upload(file)
+        apk_path = upload["path"]
         
         print(f"[APK Upload] Saved to: {apk_path}")
         
-        # Extract package info using androguard (Python library)
+        # Extract package info from the binary manifest (cached by content hash)
         try:
-            from androguard.core.apk import APK
+            from services.apk.apk_analyzer import analyzer
             
-            apk = APK(apk_path)
-            package_name = apk.get_package()
-            app_name = apk.get_app_name() or file.filename.replace('.apk', '')
-            version = apk.get_androidversion_name() or "Unknown"
+            apk_info = await asyncio.to_thread(analyzer.read_manifest_info, apk_path, sha256=upload["sha256"])
+            package_name = apk_info["package_name"]
+            app_name = apk_info["app_name"] or file.filename.replace('.apk', '')
+            version = apk_info["version_name"] or "Unknown"
             
             if not package_name:
                 raise Exception("Could not extract package name from APK")
@@ -298,12 +291,15 @@ async def upload_apk(file: UploadFile = File(...)):
                 "package_name": package_name,
                 "app_name": app_name,
                 "version": version,
-                "apk_path": apk_path
+                "apk_path": apk_path,
+                "sha256": upload["sha256"]
             }
             
         except Exception as e:
             print(f"[APK Upload] ❌ Failed to analyze: {e}")
             raise HTTPException(status_code=500, detail=f"APK analysis failed: {str(e)}")
+        finally:
+            get_upload_store().release(apk_path)
             
     except Exception as e:
         print(f"[APK Upload] ❌ Upload failed: {e}")
@@ -320,18 +316,17 @@ async def install_apk(request: InstallApkRequest):
     try:
         print(f"[APK Install] Installing {request.package_name} on {request.device_id}")
         
-        # Find APK in temp directory
-        temp_dir = tempfile.gettempdir()
-        apk_files = [f for f in os.listdir(temp_dir) if f.endswith('.apk')]
+        # Find APK in the upload store
+        store_dir = get_upload_store().root
+        apk_files = [f for f in os.listdir(store_dir) if f.endswith('.apk')]
         
         apk_path = None
         for apk_file in apk_files:
-            full_path = os.path.join(temp_dir, apk_file)
-            # Check if this APK matches the package using androguard
+            full_path = os.path.join(store_dir, apk_file)
+            # Check if this APK matches the package (manifest lookups are cached)
             try:
-                from androguard.core.apk import APK
-                apk = APK(full_path)
-                if apk.get_package() == request.package_name:
+                from services.apk.apk_analyzer import analyzer
+                if (await asyncio.to_thread(analyzer.read_manifest_info, full_path))["package_name"] == request.package_name:
                     apk_path = full_path
                     break
             except:
@@ -342,20 +337,16 @@ async def install_apk(request: InstallApkRequest):
         
         print(f"[APK Install] Found APK: {apk_path}")
         
-        # Install using adb
-        install_result = subprocess.run(
-            ['adb', '-s', request.device_id, 'install', '-r', apk_path],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        # Install using adb (leased, so a concurrent upload can't prune it mid-install)
+        with get_upload_store().lease(apk_path):
+            success, error_msg = await get_adb_scheduler().install(request.device_id, apk_path, lane=LANE_INTERACTIVE, timeout=60)
         
-        if install_result.returncode != 0:
-            error_msg = install_result.stderr or install_result.stdout
+        if not success:
             print(f"[APK Install] ❌ Installation failed: {error_msg}")
             raise Exception(f"Installation failed: {error_msg}")
         
         print(f"[APK Install] ✅ Installation successful!")
+        get_package_inventory().invalidate(request.device_id)
         
         return {
             "message": "APK installed successfully",
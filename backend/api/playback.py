@@ -1,19 +1,30 @@
 """Playback API - Execute saved flows with live progress updates"""
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from models.flow import Flow
-from services.mobile.appium_service import AppiumService
+from services.diagnostics.tracing import get_tracer, span, to_chrome_trace
+from services.mobile.appium_service import get_appium_service
+from services.mobile.session_pool import get_session_pool
+from services.mobile.session_profiles import profile_for_project
 from services.playback.playback_engine import get_playback_engine
+from services.diagnostics.logs import get_logger
 from pydantic import BaseModel
+from typing import Optional
 import json
+import time
+
+logger = get_logger("playback")
 
 router = APIRouter(prefix="/api/playback", tags=["playback"])
-appium_service = AppiumService()
+appium_service = get_appium_service()
 
 class PlaybackRequest(BaseModel):
     flow_id: int
     device_id: str
+    project_id: Optional[int] = None  # Use the project's session profile
+    profile: Optional[str] = None  # Or name one explicitly ("fast", "faithful")
 
 class StopPlaybackRequest(BaseModel):
     flow_id: int
@@ -31,80 +42,43 @@ async def start_playback(request: PlaybackRequest, db: Session = Depends(get_db)
     print(f"[Playback API] Device: {request.device_id}")
     
     try:
-        # ALWAYS restart app fresh for consistent playback 🚀
-        print(f"[Playback API] 🔄 Preparing fresh app launch...")
-        
-        import asyncio
-        import subprocess
-        
-        # 1. Close existing session if any
-        if appium_service.active_sessions:
-            print("[Playback API] 🛑 Closing existing sessions...")
-            for session_id in list(appium_service.active_sessions.keys()):
-                try:
-                    await appium_service.close_session(session_id)
-                    print(f"[Playback API] ✅ Session closed: {session_id}")
-                except Exception as e:
-                    print(f"[Playback API] ⚠️ Error closing session: {e}")
-            
-            # Wait for session cleanup
-            print("[Playback API] ⏱️ Waiting 2s for session cleanup...")
-            await asyncio.sleep(2)
-        
-        # 2. Force stop and clear app data using adb
-        print(f"[Playback API] 🧹 Force stopping app: {flow.app_package}")
+        profile = profile_for_project(db, request.project_id, request.profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    started_at = time.time()
+    pool = get_session_pool()
+    pooled = None
+    discard = False
+    
+    try:
+        # 1. Lease the device's warm session (created now only if there isn't one)
+        logger.info("[Playback API] 🔥 Getting warm session for %s...", request.device_id)
         try:
-            # Force stop app
-            result = subprocess.run(
-                ['adb', '-s', request.device_id, 'shell', 'am', 'force-stop', flow.app_package],
-                capture_output=True,
-                timeout=5
-            )
-            print(f"[Playback API] Force stop result: {result.returncode}")
-            
-            # Small wait
-            await asyncio.sleep(1)
-            
-            # Clear app data
-            print(f"[Playback API] 🗑️ Clearing app data...")
-            result = subprocess.run(
-                ['adb', '-s', request.device_id, 'shell', 'pm', 'clear', flow.app_package],
-                capture_output=True,
-                timeout=10
-            )
-            print(f"[Playback API] ✅ App cleared! Result: {result.returncode}")
-            
-            # Wait after clearing
-            await asyncio.sleep(2)
-            
+            with span("session acquire", "session", device=request.device_id, profile=profile.name):
+                pooled = await pool.acquire(request.device_id, profile)
         except Exception as e:
-            print(f"[Playback API] ⚠️ Could not clear app: {e}")
-        
-        # 3. Launch app fresh
-        print("[Playback API] 🚀 Launching app fresh...")
-        session_id = await appium_service.create_session(
-            device_id=request.device_id,
-            platform="Android",
-            app_package=flow.app_package,
-            app_activity=flow.app_activity if hasattr(flow, 'app_activity') else ".MainActivity"
-        )
-        
-        if not session_id:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to launch app"
-            )
+            raise HTTPException(status_code=500, detail=f"Failed to get an Appium session: {str(e)}")
+        session_id = pooled.session_id
+        session_ready = time.time() - started_at
         
-        print(f"[Playback API] ✅ App launched! Session: {session_id}")
-        
-        # 4. Wait 10 seconds for app to fully stabilize
-        print("[Playback API] ⏱️ Waiting 10 seconds for app to stabilize...")
-        await asyncio.sleep(10)
-        print("[Playback API] ✅ App ready! Starting playback...")
+        # 2. Restart the app fresh inside that session (terminate, clear data, launch) 🚀
+        logger.info("[Playback API] 🔄 Resetting app %s in session %s...", flow.app_package, session_id)
+        try:
+            with span("app reset", "session", device=request.device_id, app=flow.app_package):
+                reset_timings = await pool.reset_app(
+                    session_id, request.device_id, flow.app_package,
+                    app_activity=flow.app_activity, clear_data=True
+                )
+        except Exception as e:
+            discard = not await appium_service.is_session_alive(session_id)
+            raise HTTPException(status_code=500, detail=f"Failed to launch app: {str(e)}")
         
+        logger.info("[Playback API] ✅ App ready after %.1fs! Starting playback...", time.time() - started_at)
         
         # Parse flow steps (stored as JSON string)
         flow_data = {
+            "id": flow.id,
             "name": flow.name,
             "steps": json.loads(flow.steps) if isinstance(flow.steps, str) else flow.steps
         }
@@ -119,7 +93,8 @@ async def start_playback(request: PlaybackRequest, db: Session = Depends(get_db)
         engine = get_playback_engine(appium_service, broadcast_callback)
         
         # Execute flow
-        results = await engine.execute_flow(flow_data, session_id)
+        results = await engine.execute_flow(flow_data, session_id, started_at=started_at)
+        results["startup"] = {"session": session_ready, "reset": reset_timings, "profile": profile.name}
         
         print(f"[Playback API] ✅ Playback completed")
         print(f"[Playback API] Success rate: {results['successful_steps']}/{results['total_steps']}")
@@ -133,14 +108,34 @@ async def start_playback(request: PlaybackRequest, db: Session = Depends(get_db)
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Playback failed: {str(e)}")
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"[Playback API] ❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Playback failed: {str(e)}")
+    finally:
+        if pooled:
+            pool.release(pooled, discard=discard)
+
+@router.post("/warm/{device_id}")
+async def warm_session(device_id: str, project_id: Optional[int] = None, profile: Optional[str] = None,
+                       db: Session = Depends(get_db)):
+    """Start creating the device's playback session in the background"""
+    try:
+        session_profile = profile_for_project(db, project_id, profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_session_pool().warm(device_id, session_profile)
+    return {"status": "warming", "device_id": device_id}
+
+@router.get("/pool")
+async def get_pool_status():
+    """Warm sessions per device and pool hit counters"""
+    return get_session_pool().get_stats()
+
+@router.get("/traces/{trace_id}")
+async def download_trace(trace_id: str):
+    """A playback's trace (results["trace"]) in Chrome trace format, for Perfetto / chrome://tracing"""
+    spans = get_tracer().get_trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found (only recent traces are kept)")
+    return JSONResponse(to_chrome_trace(spans),
+                        headers={"Content-Disposition": f'attachment; filename="trace-{trace_id}.json"'})
 
 @router.post("/stop")
 async def stop_playback(request: StopPlaybackRequest):
@@ -2,11 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
-from models.project import Project, App
-from schemas.project import ProjectCreate, ProjectResponse, AppCreate, AppResponse
+from models.project import Project, App, ProjectSessionProfile
+from schemas.project import ProjectCreate, ProjectResponse, AppCreate, AppResponse, SessionProfileUpdate, SessionProfileResponse
+from services.mobile.session_profiles import SessionProfile, list_profiles, profile_for_project
 
 router = APIRouter()
 
+@router.get("/session-profiles")
+async def get_session_profiles():
+    """Available Appium session profiles"""
+    return list_profiles()
+
 @router.get("/", response_model=List[ProjectResponse])
 async def get_projects(db: Session = Depends(get_db)):
     """Get all projects"""
@@ -56,3 +62,35 @@ async def add_app_to_project(
     db.commit()
     db.refresh(db_app)
     return db_app
+
+@router.get("/{project_id}/session-profile", response_model=SessionProfileResponse)
+async def get_session_profile(project_id: int, db: Session = Depends(get_db)):
+    """Session profile used by the project's inspector, playback and test sessions"""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return {"project_id": project_id, **profile_for_project(db, project_id).to_dict()}
+
+@router.put("/{project_id}/session-profile", response_model=SessionProfileResponse)
+async def set_session_profile(
+    project_id: int,
+    update: SessionProfileUpdate,
+    db: Session = Depends(get_db)
+):
+    """Choose the project's session profile, optionally overriding capabilities/settings"""
+    project = db.query(Project).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    try:
+        profile = SessionProfile(update.profile, update.capabilities, update.settings)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    stored = project.session_profile or ProjectSessionProfile(project_id=project_id)
+    stored.profile = update.profile
+    stored.capabilities = update.capabilities
+    stored.settings = update.settings
+    db.add(stored)
+    db.commit()
+    return {"project_id": project_id, **profile.to_dict()}
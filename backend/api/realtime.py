@@ -4,10 +4,13 @@ from typing import List
 import asyncio
 import json
 
+from services.diagnostics.metrics import WEBSOCKET_CLIENTS, WEBSOCKET_MESSAGES, WEBSOCKET_PENDING_SENDS
+
 router = APIRouter()
 
 # Active WebSocket connections
 active_connections: List[WebSocket] = []
+WEBSOCKET_CLIENTS.labels("realtime").set_function(lambda: len(active_connections))
 
 @router.websocket("/ws/realtime")
 async def websocket_endpoint(websocket: WebSocket):
@@ -29,13 +32,18 @@ async def broadcast_device_event(event_type: str, data: dict):
         "data": data
     })
     
+    pending = WEBSOCKET_PENDING_SENDS.labels("realtime")
     for connection in active_connections:
+        pending.inc()
         try:
             await connection.send_text(message)
+            WEBSOCKET_MESSAGES.labels("realtime").inc()
         except:
             # Remove dead connections
             if connection in active_connections:
                 active_connections.remove(connection)
+        finally:
+            pending.dec()
 
 async def broadcast_installation_progress(device_id: str, progress: int, message: str):
     """Broadcast APK installation progress"""
@@ -45,6 +53,15 @@ async def broadcast_installation_progress(device_id: str, progress: int, message
         "message": message
     })
 
+async def _send_text(connection: WebSocket, message: str):
+    pending = WEBSOCKET_PENDING_SENDS.labels("realtime")
+    pending.inc()
+    try:
+        await connection.send_text(message)
+        WEBSOCKET_MESSAGES.labels("realtime").inc()
+    finally:
+        pending.dec()
+
 def broadcast_mobile_action(device_id: str, action: dict):
     """Broadcast mobile touch action - synchronous wrapper for async broadcast"""
     # This is called from a thread, so we need to handle async carefully
@@ -60,6 +77,6 @@ def broadcast_mobile_action(device_id: str, action: dict):
     for connection in active_connections:
         try:
             # Use asyncio to send in thread-safe manner
-            asyncio.create_task(connection.send_text(message))
+            asyncio.create_task(_send_text(connection, message))
         except Exception as e:
             print(f"[WebSocket] Failed to broadcast mobile action: {e}")
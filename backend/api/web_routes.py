@@ -5,7 +5,7 @@ Selenium WebDriver integration endpoints
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 import logging
 
 # Import will be added to main.py
@@ -57,6 +57,14 @@ class ScreenshotRequest(BaseModel):
     filepath: Optional[str] = None
 
 
+class BatchPlaybackRequest(BaseModel):
+    tests: List[dict]  # [{id, name, actions, start_url?}]
+    workers: int = 4  # Clamped to WEB_PLAYBACK_MAX_WORKERS
+    browser: str = 'chrome'
+    headless: bool = True
+    settings: Optional[dict] = None
+
+
 # API Endpoints
 @router.post("/launch")
 async def launch_browser(request: LaunchBrowserRequest):
@@ -302,3 +310,43 @@ async def get_session_info(session_id: str):
     
     except Exception as e:
         raise HTTPException(status_code=404, detail="Session not found")
+
+
+@router.post("/playback/batch")
+async def run_batch_playback(request: BatchPlaybackRequest):
+    """
+    Run a batch of recorded web tests across N browser sessions concurrently
+    
+    Returns:
+        Combined report with per-test wall time, shard layout and speedup
+    """
+    try:
+        from services.web.parallel_playback import get_parallel_playback
+        
+        if not request.tests:
+            raise HTTPException(status_code=400, detail="No tests provided")
+        
+        return await get_parallel_playback().run_batch(
+            request.tests,
+            workers=request.workers,
+            browser=request.browser,
+            headless=request.headless,
+            settings=request.settings
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[API] Batch playback failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/playback/batch/{batch_id}")
+async def get_batch_playback(batch_id: str):
+    """Get a finished batch playback report"""
+    from services.web.parallel_playback import get_parallel_playback
+    
+    report = get_parallel_playback().get_batch(batch_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return report
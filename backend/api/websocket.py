@@ -3,6 +3,8 @@ from typing import Dict, Set
 import json
 import asyncio
 
+from services.diagnostics.metrics import WEBSOCKET_CLIENTS, WEBSOCKET_MESSAGES, WEBSOCKET_PENDING_SENDS
+
 router = APIRouter()
 
 class ConnectionManager:
@@ -22,17 +24,25 @@ class ConnectionManager:
     async def broadcast(self, channel: str, message: dict):
         if channel in self.active_connections:
             disconnected = set()
+            pending = WEBSOCKET_PENDING_SENDS.labels("ws")
             for connection in self.active_connections[channel]:
+                pending.inc()
                 try:
                     await connection.send_json(message)
+                    WEBSOCKET_MESSAGES.labels("ws").inc()
                 except:
                     disconnected.add(connection)
+                finally:
+                    pending.dec()
             
             # Remove disconnected clients
             for conn in disconnected:
                 self.active_connections[channel].discard(conn)
 
 manager = ConnectionManager()
+WEBSOCKET_CLIENTS.labels("ws").set_function(
+    lambda: sum(len(connections) for connections in manager.active_connections.values())
+)
 
 @router.websocket("/test-run/{test_run_id}")
 async def websocket_test_run(websocket: WebSocket, test_run_id: int):
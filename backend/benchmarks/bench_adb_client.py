@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: adb command latency, socket client vs `adb` subprocess
+
+Times the same device commands through AdbClient (adb server protocol over
+a local socket, warm per-device state) and through a forked `adb` process,
+plus push/pull over a reused sync connection.
+
+Run from backend/ against the built-in fake server (no device needed):
+    python -m benchmarks.bench_adb_client --samples 50
+
+Or against a real adb server and device:
+    python -m benchmarks.bench_adb_client --port 5037 --serial emulator-5554
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.fake_adb_server import start_fake_adb_server
+from services.mobile.adb_client import AdbClient
+
+COMMANDS = ["echo ready", "getprop ro.build.version.sdk"]
+
+
+async def _timed(fn, samples: int) -> list:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def _subprocess_shell(adb_path: str, port: int, serial: str, command: str):
+    process = await asyncio.create_subprocess_exec(
+        adb_path, "-P", str(port), "-s", serial, "shell", command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    await process.communicate()
+
+
+async def run(port: int, serial: str, samples: int, adb_path: str = None) -> dict:
+    client = AdbClient(port=port)
+    results = {}
+
+    # Warm transport id and feature cache, as a long-running backend would have
+    await client.shell(serial, "true")
+
+    for command in COMMANDS:
+        results[f"client shell '{command}'"] = await _timed(lambda: client.shell(serial, command), samples)
+        if adb_path:
+            results[f"subprocess shell '{command}'"] = await _timed(
+                lambda: _subprocess_shell(adb_path, port, serial, command), samples
+            )
+
+    results["client concurrent x10 shell"] = await _timed(
+        lambda: asyncio.gather(*[client.shell(serial, COMMANDS[0]) for _ in range(10)]), max(1, samples // 5)
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local_path = os.path.join(tmp, "payload.bin")
+        with open(local_path, "wb") as f:
+            f.write(os.urandom(256 * 1024))
+        remote_path = "/data/local/tmp/gravityqa_bench.bin"
+        results["client push 256KB (warm sync)"] = await _timed(
+            lambda: client.push(serial, local_path, remote_path), max(1, samples // 5)
+        )
+        results["client pull 256KB (warm sync)"] = await _timed(
+            lambda: client.pull(serial, remote_path, os.path.join(tmp, "pulled.bin")), max(1, samples // 5)
+        )
+        await client.shell(serial, f"rm -f {remote_path}")
+
+    client.forget(serial)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, help='Existing adb server port (default: start a fake server)')
+    parser.add_argument('--serial', default='emulator-5554', help='Device serial')
+    parser.add_argument('--samples', type=int, default=30, help='Repetitions per command')
+    parser.add_argument('--latency', type=float, default=2.0, help='Fake server device latency (ms)')
+    parser.add_argument('--adb', default=shutil.which('adb'), help='adb binary for the subprocess baseline')
+    args = parser.parse_args()
+
+    async def bench():
+        server = None
+        port = args.port
+        if port is None:
+            server, _ = await start_fake_adb_server(0, [args.serial], args.latency)
+            port = server.sockets[0].getsockname()[1]
+            print(f"Fake adb server on port {port} ({args.latency}ms device latency)")
+        if not args.adb:
+            print("adb binary not found - subprocess baseline skipped")
+        try:
+            return await run(port, args.serial, args.samples, args.adb)
+        finally:
+            if server:
+                server.close()
+
+    results = asyncio.run(bench())
+    print(f"{'operation':<44} {'median ms':>10} {'p95 ms':>10} {'n':>6}")
+    for name, timings in results.items():
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<44} {statistics.median(timings):>10.3f} {p95:>10.3f} {len(timings):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Micro-benchmark: Android element lookup latency per strategy
+
+Derives recorded-style XPaths from the current screen and times each lookup
+as XPath on the device, as the compiled strategy (resource-id, accessibility
+id or UiSelector) on the device, and evaluated locally against a cached
+hierarchy.
+
+Run from backend/ against a live UiAutomator2 session:
+    python -m benchmarks.bench_selector_lookup --session <id> --samples 5
+
+Without --session only the local costs are measured on a synthetic hierarchy.
+"""
+
+import argparse
+import statistics
+import time
+import xml.etree.ElementTree as ET
+
+from services.mobile.selector_compiler import (
+    STRATEGY_XPATH,
+    compile_xpath,
+    find_local,
+    parse_xpath,
+)
+
+
+def synthetic_hierarchy(nodes: int) -> str:
+    """A flat-ish UiAutomator2 page source with the given number of leaf nodes"""
+    rows = []
+    for i in range(nodes):
+        rows.append(
+            f'<android.widget.TextView index="{i % 10}" text="Item {i}" '
+            f'resource-id="com.example:id/item_{i}" content-desc="" class="android.widget.TextView" '
+            f'clickable="true" enabled="true" displayed="true" bounds="[0,{i * 10}][1080,{i * 10 + 10}]"/>'
+        )
+    body = "".join(
+        f'<android.widget.LinearLayout index="{g}" class="android.widget.LinearLayout">{"".join(rows[g::10])}</android.widget.LinearLayout>'
+        for g in range(10)
+    )
+    return f'<hierarchy rotation="0"><android.widget.FrameLayout index="0">{body}</android.widget.FrameLayout></hierarchy>'
+
+
+def recorded_xpaths(source: str, limit: int) -> list:
+    """XPaths the inspector and recorder would generate for elements on screen"""
+    root = ET.fromstring(source)
+    xpaths = []
+    for node in root.iter():
+        if node is root:
+            continue
+        resource_id = node.get("resource-id")
+        text = node.get("text")
+        desc = node.get("content-desc")
+        if resource_id:
+            xpaths.append(f"//{node.tag}[@resource-id='{resource_id}']")
+            xpaths.append(f"//*[@resource-id='{resource_id}']")
+        if text and "'" not in text:
+            xpaths.append(f"//*[@text='{text}']")
+        if desc and "'" not in desc:
+            xpaths.append(f"//*[@content-desc='{desc}']")
+        if len(xpaths) >= limit:
+            break
+    return xpaths[:limit]
+
+
+class AppiumLookup:
+    """Minimal W3C find-element client for timing"""
+
+    def __init__(self, url: str, session_id: str):
+        import requests
+        self.base = f"{url.rstrip('/')}/session/{session_id}"
+        self.http = requests.Session()
+
+    def page_source(self) -> str:
+        return self.http.get(f"{self.base}/source", timeout=30).json()["value"]
+
+    def find(self, using: str, value: str) -> float:
+        start = time.perf_counter()
+        self.http.post(f"{self.base}/elements", json={"using": using, "value": value}, timeout=30)
+        return (time.perf_counter() - start) * 1000
+
+
+def _timed(fn, samples: int) -> list:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(source: str, xpaths: list, samples: int, device: AppiumLookup = None) -> dict:
+    """Collect per-strategy timings (ms) for every XPath"""
+    results = {}
+    root = ET.fromstring(source)
+
+    def add(name, timings):
+        results.setdefault(name, []).extend(timings)
+
+    add("parse hierarchy", _timed(lambda: ET.fromstring(source), samples))
+
+    for xpath in xpaths:
+        parse_xpath.cache_clear()
+        compile_xpath.cache_clear()
+        add("compile", _timed(lambda: compile_xpath(xpath), 1))
+        compiled = compile_xpath(xpath)
+
+        if parse_xpath(xpath) is not None:
+            add("local (cached hierarchy)", _timed(lambda: find_local(root, xpath), samples))
+
+        if device:
+            add("device xpath", [device.find("xpath", xpath) for _ in range(samples)])
+            if compiled["strategy"] != STRATEGY_XPATH:
+                add(f"device {compiled['strategy']}", [
+                    device.find(compiled["strategy"], compiled["value"]) for _ in range(samples)
+                ])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:4723', help='Appium server URL')
+    parser.add_argument('--session', help='Existing UiAutomator2 session id (enables device timings)')
+    parser.add_argument('--selectors', type=int, default=20, help='Number of XPaths derived from the screen')
+    parser.add_argument('--samples', type=int, default=5, help='Repetitions per lookup')
+    parser.add_argument('--nodes', type=int, default=300, help='Synthetic hierarchy size without --session')
+    args = parser.parse_args()
+
+    device = None
+    if args.session:
+        device = AppiumLookup(args.url, args.session)
+        source = device.page_source()
+    else:
+        source = synthetic_hierarchy(args.nodes)
+
+    xpaths = recorded_xpaths(source, args.selectors)
+    compiled = [compile_xpath(x)["strategy"] for x in xpaths]
+    print(f"{len(xpaths)} XPaths: " + ", ".join(f"{s}={compiled.count(s)}" for s in sorted(set(compiled))))
+
+    results = run(source, xpaths, args.samples, device)
+    print(f"{'strategy':<28} {'median ms':>10} {'p95 ms':>10} {'n':>6}")
+    for name, timings in results.items():
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<28} {statistics.median(timings):>10.3f} {p95:>10.3f} {len(timings):>6}")
+
+
+if __name__ == '__main__':
+    main()
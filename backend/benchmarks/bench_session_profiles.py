@@ -0,0 +1,128 @@
+"""
+Benchmark: per-step latency under each Appium session profile
+
+Creates one session per profile on the same device and times the requests
+a playback step makes (find element, tap, page source), plus session
+creation itself. The app is relaunched before each profile so both start
+from the same screen.
+
+Needs a running Appium server and a connected device; run from backend/:
+    python -m benchmarks.bench_session_profiles --device emulator-5554 \
+        --package com.android.settings --activity .Settings --steps 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from config import settings
+from services.mobile.session_profiles import PROFILES, SessionProfile, mark_device_initialized
+
+# Something present on nearly every screen
+DEFAULT_XPATH = "//*[@clickable='true']"
+
+
+async def _timed(fn, samples: int) -> list:
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run_profile(client: httpx.AsyncClient, url: str, profile: SessionProfile, device_id: str,
+                      package: str, activity: str, xpath: str, steps: int) -> dict:
+    capabilities = {
+        "platformName": "Android",
+        "appium:deviceName": device_id,
+        "appium:udid": device_id,
+        "appium:automationName": "UiAutomator2",
+        "appium:appPackage": package,
+        "appium:appActivity": activity,
+        **profile.capabilities_for(device_id),
+    }
+
+    start = time.perf_counter()
+    response = await client.post(f"{url}/session", json={"capabilities": {"alwaysMatch": capabilities}}, timeout=120)
+    response.raise_for_status()
+    session_id = response.json()["value"]["sessionId"]
+    await client.post(f"{url}/session/{session_id}/appium/settings", json={"settings": profile.settings})
+    results = {"create session": [(time.perf_counter() - start) * 1000]}
+    mark_device_initialized(device_id)
+
+    session = f"{url}/session/{session_id}"
+    try:
+        async def find():
+            response = await client.post(f"{session}/element", json={"using": "xpath", "value": xpath})
+            return response.json()["value"]
+
+        element = await find()
+        element_id = element.get("element-6066-11e4-a52e-4f735466cecf") or element.get("ELEMENT")
+        window = (await client.get(f"{session}/window/rect")).json()["value"]
+        x, y = window["width"] // 2, window["height"] // 2
+
+        async def tap():
+            # Tap blank-ish space via W3C actions (no navigation) so every step sees the same screen
+            await client.post(f"{session}/actions", json={"actions": [{
+                "type": "pointer", "id": "finger", "parameters": {"pointerType": "touch"},
+                "actions": [
+                    {"type": "pointerMove", "duration": 0, "x": x, "y": y},
+                    {"type": "pointerDown", "button": 0},
+                    {"type": "pointerUp", "button": 0},
+                ],
+            }]})
+
+        results["find element (xpath)"] = await _timed(find, steps)
+        results["get attribute"] = await _timed(
+            lambda: client.get(f"{session}/element/{element_id}/attribute/clickable"), steps
+        )
+        results["tap (actions)"] = await _timed(tap, steps)
+        results["page source"] = await _timed(lambda: client.get(f"{session}/source"), steps)
+        results["step (tap + find)"] = await _timed(lambda: _step(tap, find), steps)
+    finally:
+        await client.delete(session)
+    return results
+
+
+async def _step(tap, find):
+    await tap()
+    await find()
+
+
+async def run(url: str, device_id: str, package: str, activity: str, xpath: str, steps: int, profiles: list) -> dict:
+    results = {}
+    async with httpx.AsyncClient(timeout=60) as client:
+        for name in profiles:
+            print(f"Profile '{name}'...")
+            results[name] = await run_profile(
+                client, url, SessionProfile(name), device_id, package, activity, xpath, steps
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default=f"http://{settings.APPIUM_HOST}:{settings.APPIUM_PORT}", help='Appium server URL')
+    parser.add_argument('--device', required=True, help='Device serial')
+    parser.add_argument('--package', default='com.android.settings', help='App to launch')
+    parser.add_argument('--activity', default='.Settings', help='Activity to launch')
+    parser.add_argument('--xpath', default=DEFAULT_XPATH, help='Element to look up each step')
+    parser.add_argument('--steps', type=int, default=20, help='Repetitions per operation')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.url, args.device, args.package, args.activity, args.xpath, args.steps, args.profiles))
+    print(f"{'profile':<10} {'operation':<24} {'median ms':>10} {'p95 ms':>10} {'n':>6}")
+    for profile, operations in results.items():
+        for name, timings in operations.items():
+            timings = sorted(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{profile:<10} {name:<24} {statistics.median(timings):>10.1f} {p95:>10.1f} {len(timings):>6}")
+
+
+if __name__ == '__main__':
+    main()
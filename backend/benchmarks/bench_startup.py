@@ -0,0 +1,122 @@
+"""
+Benchmark: backend cold start, with an import-time profile
+
+Each sample is a fresh interpreter that imports main, runs the app's
+startup (lifespan) and answers /health through the ASGI app. These phases
+are timed separately:
+- import:       `import main` (every router and service it pulls in)
+- startup:      the lifespan hook (create_all, watchdog; discovery is backgrounded)
+- first /health
+- first lazy request: the first request under a lazily loaded prefix, which
+  imports that subsystem
+
+`python -X importtime` then shows which modules the import time goes to.
+The run fails (exit 1) when the median import + startup is over --target-ms.
+
+Run from backend/:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --samples 10 --target-ms 800 --top 30
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Median import + startup the backend should stay under (ms)
+DEFAULT_TARGET_MS = 1500
+
+# A cheap endpoint behind a lazily loaded router
+LAZY_PATH = "/api/playback/pool"
+
+# Runs in the child interpreter; prints one JSON line of phase timings (ms)
+_PROBE = f"""
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def probe():
+    import httpx
+    timings = {{"import": (imported - started) * 1000}}
+    async with main.app.router.lifespan_context(main.app):
+        timings["startup"] = (time.perf_counter() - imported) * 1000
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            for name, path in (("first /health", "/health"), ("first lazy request", {LAZY_PATH!r})):
+                start = time.perf_counter()
+                response = await client.get(path)
+                timings[name] = (time.perf_counter() - start) * 1000
+                if response.status_code != 200:
+                    raise SystemExit(f"{{path}} returned {{response.status_code}}")
+    return timings
+
+print(json.dumps(asyncio.run(probe())))
+"""
+
+
+def _env() -> Dict[str, str]:
+    # Throwaway database, and nothing written to the user's trace/log files
+    return {**os.environ, "DATABASE_URL": "sqlite://", "TRACE_EXPORT": "none", "LOG_TO_FILE": "false",
+            "LOOP_WATCHDOG_ENABLED": "false"}
+
+
+def measure(samples: int) -> Dict[str, List[float]]:
+    """Phase timings (ms) over `samples` fresh interpreters"""
+    results: Dict[str, List[float]] = {}
+    for _ in range(samples):
+        completed = subprocess.run([sys.executable, "-c", _PROBE], cwd=BACKEND_DIR, env=_env(),
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Startup probe failed:\n{completed.stderr[-2000:]}")
+        timings = json.loads(completed.stdout.strip().splitlines()[-1])
+        timings["import + startup"] = timings["import"] + timings["startup"]
+        for name, value in timings.items():
+            results.setdefault(name, []).append(value)
+    return results
+
+
+def import_profile(top: int) -> List[tuple]:
+    """(cumulative ms, self ms, module) of the slowest imports under `import main`"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                               env=_env(), capture_output=True, text=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, module))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--samples', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS, help='Median import + startup budget')
+    parser.add_argument('--top', type=int, default=20, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    results = measure(args.samples)
+    print(f"{'phase':<22} {'median ms':>10} {'min ms':>10} {'max ms':>10}")
+    for name, values in results.items():
+        print(f"{name:<22} {statistics.median(values):>10.1f} {min(values):>10.1f} {max(values):>10.1f}")
+
+    print(f"\n{'cumulative ms':>13} {'self ms':>9}  module (python -X importtime)")
+    for cumulative, own, module in import_profile(args.top):
+        print(f"{cumulative:>13.1f} {own:>9.1f}  {module}")
+
+    total = statistics.median(results["import + startup"])
+    if total > args.target_ms:
+        print(f"\n[Bench] ❌ Import + startup {total:.0f}ms is over the {args.target_ms:.0f}ms target")
+        sys.exit(1)
+    print(f"\n[Bench] ✅ Import + startup {total:.0f}ms (target {args.target_ms:.0f}ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Micro-benchmark: per-action recording cost in WebRecorder
+
+Simulates a WebDriver where every command is an HTTP round-trip with a fixed
+latency and compares the previous attribute-by-attribute call pattern with the
+single execute_script payload used by WebRecorder.record_action.
+
+Run from backend/:
+    python -m benchmarks.bench_web_recorder --rtt-ms 3 --actions 200
+"""
+
+import argparse
+import time
+
+from services.web.web_recorder import WebRecorder
+
+
+class FakeDriver:
+    """Counts WebDriver commands and sleeps rtt per command"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.commands = 0
+
+    def roundtrip(self):
+        self.commands += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def execute_script(self, script, *args):
+        self.roundtrip()
+        return {
+            'candidates': {
+                'id': None,
+                'name': 'email',
+                'css': 'input.form-control.email',
+                'xpath': '//*[@id=\'login\']/div[2]/input[1]'
+            },
+            'counts': {'css': 1, 'name': 1, 'xpath': 1},
+            'info': {
+                'tag': 'input', 'text': '', 'id': None, 'name': 'email',
+                'class': 'form-control email', 'type': 'email', 'value': '',
+                'href': None, 'visible': True, 'enabled': True, 'selected': False
+            }
+        }
+
+
+class FakeElement:
+    """WebElement stand-in; every property/method is one round-trip"""
+
+    def __init__(self, driver: FakeDriver):
+        self.parent = driver
+
+    @property
+    def tag_name(self):
+        self.parent.roundtrip()
+        return 'input'
+
+    @property
+    def text(self):
+        self.parent.roundtrip()
+        return ''
+
+    def get_attribute(self, name):
+        self.parent.roundtrip()
+        return {'name': 'email', 'class': 'form-control email', 'type': 'email'}.get(name)
+
+    def is_displayed(self):
+        self.parent.roundtrip()
+        return True
+
+    def is_enabled(self):
+        self.parent.roundtrip()
+        return True
+
+    def is_selected(self):
+        self.parent.roundtrip()
+        return False
+
+
+def legacy_record(element: FakeElement):
+    """The call sequence WebRecorder issued per recorded action before batching"""
+    # generate_selectors
+    element.get_attribute('id')
+    element.get_attribute('name')
+    # _generate_css_selector
+    element.tag_name
+    element.get_attribute('id')
+    element.get_attribute('class')
+    # _generate_xpath_selector
+    element.parent.execute_script('getXPath', element)
+    # get_element_info
+    element.tag_name
+    element.text
+    for attr in ('id', 'name', 'class', 'type', 'value', 'href'):
+        element.get_attribute(attr)
+    element.is_displayed()
+    element.is_enabled()
+    if element.tag_name.lower() in ['option', 'input']:
+        element.is_selected()
+
+
+def run(rtt_ms: float, actions: int) -> dict:
+    """Measure both paths and return per-action cost and round-trips"""
+    results = {}
+
+    driver = FakeDriver(rtt_ms / 1000.0)
+    element = FakeElement(driver)
+    start = time.perf_counter()
+    for _ in range(actions):
+        legacy_record(element)
+    elapsed = time.perf_counter() - start
+    results['legacy'] = {
+        'ms_per_action': elapsed * 1000 / actions,
+        'round_trips_per_action': driver.commands / actions
+    }
+
+    driver = FakeDriver(rtt_ms / 1000.0)
+    element = FakeElement(driver)
+    recorder = WebRecorder()
+    recording_id = recorder.start_recording('bench')
+    start = time.perf_counter()
+    for _ in range(actions):
+        recorder.record_action(recording_id, 'input', element=element, value='x')
+    elapsed = time.perf_counter() - start
+    results['batched'] = {
+        'ms_per_action': elapsed * 1000 / actions,
+        'round_trips_per_action': driver.commands / actions
+    }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rtt-ms', type=float, default=3.0, help='Simulated WebDriver round-trip latency')
+    parser.add_argument('--actions', type=int, default=200, help='Recorded actions per path')
+    args = parser.parse_args()
+
+    results = run(args.rtt_ms, args.actions)
+    print(f"{'path':<10} {'ms/action':>10} {'round-trips':>12}")
+    for path, data in results.items():
+        print(f"{path:<10} {data['ms_per_action']:>10.2f} {data['round_trips_per_action']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
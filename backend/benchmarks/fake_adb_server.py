@@ -0,0 +1,292 @@
+"""
+Fake adb server for exercising the adb client without devices
+
+Speaks enough of the adb server protocol for AdbClient and for the real
+`adb` binary (pointed at it with -P / ANDROID_ADB_SERVER_PORT): host
+queries, transport switches, shell v1/v2, exec (including streamed
+`cmd package install -S`), and sync STAT/SEND/RECV on an in-memory
+filesystem. Each device service can add a simulated device latency.
+
+Run from backend/:
+    python -m benchmarks.fake_adb_server --port 5038 --devices emulator-5554,emulator-5556
+"""
+
+import argparse
+import asyncio
+import shlex
+import struct
+import time
+from typing import Dict, Optional
+
+from services.mobile.adb_client import SHELL_EXIT, SHELL_STDERR, SHELL_STDOUT, SYNC_DATA_MAX
+
+FEATURES = "shell_v2,cmd,stat_v2,ls_v2,fixed_push_mkdir,apex,abb,abb_exec"
+
+DEFAULT_PACKAGES = ["com.example.app", "com.example.shop", "org.sample.notes"]
+
+
+class FakeDevice:
+    def __init__(self, serial: str, transport_id: int):
+        self.serial = serial
+        self.transport_id = transport_id
+        self.files: Dict[str, bytes] = {}
+        self.packages = {name: 1 for name in DEFAULT_PACKAGES}
+        self.properties = {
+            "ro.product.model": "Fake Pixel",
+            "ro.product.manufacturer": "GravityQA",
+            "ro.build.version.release": "14",
+            "ro.build.version.sdk": "34",
+        }
+
+    def run(self, command: str) -> tuple:
+        """(returncode, stdout, stderr) for a small set of shell commands"""
+        outputs, errors = [], []
+        returncode = 0
+        for part in command.split(";"):
+            try:
+                argv = shlex.split(part)
+            except ValueError:
+                argv = part.split()
+            if not argv:
+                continue
+            if argv[0] == "echo":
+                outputs.append(" ".join(argv[1:]).replace("$?", str(returncode)) + "\n")
+            elif argv[0] == "getprop":
+                outputs.append(self.properties.get(argv[1], "") + "\n" if len(argv) > 1 else "")
+            elif argv[:3] == ["pm", "list", "packages"]:
+                outputs.append("".join(f"package:{p} versionCode:{v}\n" for p, v in sorted(self.packages.items())))
+            elif argv[:2] in (["am", "force-stop"], ["pm", "clear"]):
+                outputs.append("Success\n" if argv[1] == "clear" else "")
+            elif argv[0] == "wm" and argv[1:2] == ["size"]:
+                outputs.append("Physical size: 1080x2400\n")
+            elif argv[0] in ("true", "rm"):
+                returncode = 0
+            elif argv[0] == "false":
+                returncode = 1
+            else:
+                returncode = 127
+                errors.append(f"/system/bin/sh: {argv[0]}: inaccessible or not found\n")
+        return returncode, "".join(outputs), "".join(errors)
+
+
+class FakeAdbServer:
+    def __init__(self, serials, latency_ms: float = 0.0):
+        self.devices = {serial: FakeDevice(serial, i + 1) for i, serial in enumerate(serials)}
+        self.latency = latency_ms / 1000
+        self.requests = 0
+
+    async def _device_delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def _okay(writer, payload: Optional[bytes] = None):
+        writer.write(b"OKAY")
+        if payload is not None:
+            writer.write(b"%04x" % len(payload) + payload)
+
+    @staticmethod
+    def _fail(writer, message: str):
+        data = message.encode()
+        writer.write(b"FAIL" + b"%04x" % len(data) + data)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        device = None
+        try:
+            while True:
+                try:
+                    length = int(await reader.readexactly(4), 16)
+                except asyncio.IncompleteReadError:
+                    return
+                service = (await reader.readexactly(length)).decode()
+                self.requests += 1
+
+                if device is None:
+                    device = await self._host_service(service, writer)
+                    await writer.drain()
+                    if device is False:
+                        return
+                    continue
+
+                await self._device_service(device, service, reader, writer)
+                return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    def _find(self, selector: str) -> Optional[FakeDevice]:
+        if selector in ("any", "usb", "local") or selector.startswith("any"):
+            return next(iter(self.devices.values()), None)
+        if selector.startswith("serial:"):
+            selector = selector[len("serial:"):]
+        return self.devices.get(selector)
+
+    async def _host_service(self, service: str, writer):
+        """Handle a host request; returns the selected device, None to keep reading, False to close"""
+        if service == "host:version":
+            self._okay(writer, b"0029")
+            return False
+        if service in ("host:devices", "host:devices-l"):
+            lines = []
+            for serial in self.devices:
+                extra = " product:fake model:Fake_Pixel device:fake transport_id:%d" % self.devices[serial].transport_id
+                lines.append(f"{serial}\tdevice{extra if service.endswith('-l') else ''}")
+            self._okay(writer, ("\n".join(lines) + "\n").encode())
+            return False
+        if service.startswith("host-serial:") and service.endswith(":features"):
+            serial = service[len("host-serial:"):-len(":features")]
+            if serial not in self.devices:
+                self._fail(writer, f"device '{serial}' not found")
+            else:
+                self._okay(writer, FEATURES.encode())
+            return False
+        if service in ("host:features", "host:host-features"):
+            self._okay(writer, FEATURES.encode())
+            return False
+        if service.startswith("host:tport:"):
+            device = self._find(service[len("host:tport:"):])
+            if not device:
+                self._fail(writer, "device not found")
+                return False
+            writer.write(b"OKAY" + struct.pack("<Q", device.transport_id))
+            return device
+        if service.startswith("host:transport-id:"):
+            transport_id = int(service[len("host:transport-id:"):])
+            device = next((d for d in self.devices.values() if d.transport_id == transport_id), None)
+            if not device:
+                self._fail(writer, f"no device with transport id '{transport_id}'")
+                return False
+            self._okay(writer)
+            return device
+        if service.startswith("host:transport"):
+            selector = service.split(":", 2)[2] if service.startswith("host:transport:") else "any"
+            device = self._find(selector)
+            if not device:
+                self._fail(writer, f"device '{selector}' not found")
+                return False
+            self._okay(writer)
+            return device
+        if service == "host:kill":
+            self._okay(writer)
+            return False
+        self._fail(writer, f"unknown host service '{service}'")
+        return False
+
+    async def _device_service(self, device: FakeDevice, service: str, reader, writer):
+        if service.startswith("shell,"):
+            header, command = service.split(":", 1)
+            await self._device_delay()
+            self._okay(writer)
+            returncode, stdout, stderr = device.run(command)
+            if "v2" in header.split(","):
+                for packet_id, data in ((SHELL_STDOUT, stdout.encode()), (SHELL_STDERR, stderr.encode())):
+                    if data:
+                        writer.write(bytes([packet_id]) + struct.pack("<I", len(data)) + data)
+                writer.write(bytes([SHELL_EXIT]) + struct.pack("<I", 1) + bytes([returncode & 0xff]))
+            else:
+                writer.write((stdout + stderr).encode())
+            await writer.drain()
+        elif service.startswith("shell:"):
+            await self._device_delay()
+            self._okay(writer)
+            _, stdout, stderr = device.run(service[len("shell:"):])
+            writer.write((stdout + stderr).replace("\n", "\r\n").encode())
+            await writer.drain()
+        elif service.startswith("exec:"):
+            await self._exec(device, service[len("exec:"):], reader, writer)
+        elif service == "sync:":
+            self._okay(writer)
+            await writer.drain()
+            await self._sync(device, reader, writer)
+        else:
+            self._fail(writer, f"unknown service '{service}'")
+            await writer.drain()
+
+    async def _exec(self, device: FakeDevice, command: str, reader, writer):
+        await self._device_delay()
+        self._okay(writer)
+        argv = command.split()
+        if argv[:3] == ["cmd", "package", "install"] and "-S" in argv:
+            remaining = int(argv[argv.index("-S") + 1])
+            while remaining:
+                chunk = await reader.read(min(remaining, SYNC_DATA_MAX))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            device.packages[f"com.installed.app{len(device.packages)}"] = 1
+            writer.write(b"Success\n")
+        else:
+            _, stdout, stderr = device.run(command)
+            writer.write((stdout + stderr).encode())
+        await writer.drain()
+
+    async def _sync(self, device: FakeDevice, reader, writer):
+        while True:
+            try:
+                header = await reader.readexactly(8)
+            except asyncio.IncompleteReadError:
+                return
+            command, length = header[:4], struct.unpack("<I", header[4:])[0]
+            if command == b"QUIT":
+                return
+            path = (await reader.readexactly(length)).decode()
+            await self._device_delay()
+
+            if command == b"STAT":
+                data = device.files.get(path)
+                mode = 0o100644 if data is not None else 0
+                writer.write(b"STAT" + struct.pack("<III", mode, len(data or b""), int(time.time()) if data else 0))
+            elif command == b"SEND":
+                remote_path = path.rsplit(",", 1)[0]
+                body = bytearray()
+                while True:
+                    chunk_header = await reader.readexactly(8)
+                    chunk_command, chunk_length = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+                    if chunk_command == b"DONE":
+                        break
+                    body += await reader.readexactly(chunk_length)
+                device.files[remote_path] = bytes(body)
+                writer.write(b"OKAY" + struct.pack("<I", 0))
+            elif command == b"RECV":
+                data = device.files.get(path)
+                if data is None:
+                    message = b"No such file or directory"
+                    writer.write(b"FAIL" + struct.pack("<I", len(message)) + message)
+                else:
+                    for offset in range(0, len(data), SYNC_DATA_MAX):
+                        chunk = data[offset:offset + SYNC_DATA_MAX]
+                        writer.write(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                    writer.write(b"DONE" + struct.pack("<I", 0))
+            else:
+                message = f"unknown sync command {command!r}".encode()
+                writer.write(b"FAIL" + struct.pack("<I", len(message)) + message)
+            await writer.drain()
+
+
+async def start_fake_adb_server(port: int, serials, latency_ms: float = 0.0):
+    """Start the fake server; returns (server, FakeAdbServer)"""
+    fake = FakeAdbServer(serials, latency_ms)
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", port)
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=5038, help='Port to listen on (real adb uses 5037)')
+    parser.add_argument('--devices', default='emulator-5554', help='Comma-separated fake serials')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated device latency per service (ms)')
+    args = parser.parse_args()
+
+    async def serve():
+        server, _ = await start_fake_adb_server(args.port, args.devices.split(","), args.latency)
+        print(f"Fake adb server on 127.0.0.1:{args.port} with {args.devices}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
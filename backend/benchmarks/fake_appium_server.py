@@ -0,0 +1,606 @@
+"""
+Fake Appium server for load and latency testing without phones
+
+Serves the W3C/Appium endpoints the backend uses (session lifecycle,
+/source, /screenshot, /element(s), element click/value/attribute/rect,
+/actions, /window/rect, back, current_activity/current_package, settings
+and the `mobile:` app extensions) for any number of virtual devices in
+one process. Each device has synthetic screens: a generated UiAutomator2
+style hierarchy and a matching PNG; tapping a clickable element moves to
+the next screen, so hierarchies change the way a real app's do.
+
+Latency is drawn per request from a distribution, per endpoint if wanted:
+    fixed:20  uniform:10,60  normal:40,10  lognormal:3.5,0.6   (ms)
+Failures are injected per endpoint as error (500), timeout (hang, then
+500) or session_lost (404, session gone):
+    --fail source:error=0.02 --fail "*:session_lost=0.001"
+
+Run from backend/:
+    python -m benchmarks.fake_appium_server --port 4725 --devices 200 \
+        --latency default=lognormal:3.0,0.5 --latency source=normal:80,20
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import math
+import random
+import re
+import struct
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional
+import xml.etree.ElementTree as ET
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from services.mobile.selector_compiler import find_local
+
+W3C_ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+DEFAULT_PACKAGE = "com.example.app"
+DEFAULT_ACTIVITY = ".MainActivity"
+
+WIDGETS = ["android.widget.TextView", "android.widget.Button", "android.widget.ImageView", "android.widget.EditText"]
+
+# Request paths → endpoint names used for --latency / --fail
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"^/session/[^/]+/source$"), "source"),
+    (re.compile(r"^/session/[^/]+/screenshot$"), "screenshot"),
+    (re.compile(r"^/session/[^/]+/elements?$"), "element"),
+    (re.compile(r"^/session/[^/]+/element/[^/]+/"), "element_action"),
+    (re.compile(r"^/session/[^/]+/actions$"), "actions"),
+    (re.compile(r"^/session/[^/]+/appium/device/"), "device"),
+    (re.compile(r"^/session/[^/]+/execute/"), "execute"),
+    (re.compile(r"^/session$"), "session"),
+]
+
+
+class LatencyModel:
+    """Per-request delay in ms from a named distribution"""
+
+    def __init__(self, spec: str = "fixed:0", rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        samplers = {
+            "fixed": lambda: self.params[0] if self.params else 0.0,
+            "uniform": lambda: self.rng.uniform(self.params[0], self.params[1]),
+            "normal": lambda: self.rng.gauss(self.params[0], self.params[1]),
+            "lognormal": lambda: self.rng.lognormvariate(self.params[0], self.params[1]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution '{kind}' (fixed, uniform, normal, lognormal)")
+        self._sample = samplers[kind]
+
+    def sample(self) -> float:
+        return max(0.0, self._sample())
+
+
+class FailurePlan:
+    """Injected failure rates: {endpoint or "*": {kind: probability}}"""
+
+    KINDS = ("error", "timeout", "session_lost")
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None, timeout: float = 30.0,
+                 rng: Optional[random.Random] = None):
+        self.rates = rates or {}
+        self.timeout = timeout
+        self.rng = rng or random.Random()
+        self.injected = {kind: 0 for kind in self.KINDS}
+
+    @classmethod
+    def parse(cls, specs: List[str], **kwargs) -> "FailurePlan":
+        rates = {}
+        for spec in specs:
+            target, _, rate = spec.partition("=")
+            endpoint, _, kind = target.partition(":")
+            if kind not in cls.KINDS:
+                raise ValueError(f"Unknown failure kind '{kind}' ({', '.join(cls.KINDS)})")
+            rates.setdefault(endpoint, {})[kind] = float(rate)
+        return cls(rates, **kwargs)
+
+    def pick(self, endpoint: str) -> Optional[str]:
+        for rates in (self.rates.get(endpoint), self.rates.get("*")):
+            for kind, rate in (rates or {}).items():
+                if self.rng.random() < rate:
+                    self.injected[kind] += 1
+                    return kind
+        return None
+
+
+# {(width, height, screen, noise): base64 PNG}
+_screenshots: Dict[tuple, str] = {}
+
+
+def _png(width: int, height: int, color: tuple, noise: float, seed: str) -> bytes:
+    """RGB PNG: a solid screen with `noise` of its rows random (so size resembles a real capture)"""
+    rng = random.Random(seed)
+    solid = b"\x00" + bytes(color) * width
+    noisy_rows = int(height * noise)
+    rows = []
+    for y in range(height):
+        if y < noisy_rows:
+            rows.append(b"\x00" + rng.randbytes(width * 3))
+        else:
+            rows.append(solid)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"".join(rows), 1)) + chunk(b"IEND", b""))
+
+
+class VirtualDevice:
+    """A fake phone: a few synthetic screens of the app under test"""
+
+    def __init__(self, udid: str, width: int = 1080, height: int = 2400, screens: int = 5,
+                 nodes: int = 60, screenshot_noise: float = 0.1, seed: int = 0):
+        self.udid = udid
+        self.width = width
+        self.height = height
+        self.screens = screens
+        self.nodes = nodes
+        self.screenshot_noise = screenshot_noise
+        self.seed = seed
+        self.package = DEFAULT_PACKAGE
+        self.activity = DEFAULT_ACTIVITY
+        self.screen = 0
+        self.generation = 0  # Bumped on every screen change; older element ids go stale
+        self.running = True
+        self.session_id: Optional[str] = None
+        self._sources: Dict[int, str] = {}
+        self._roots: Dict[int, ET.Element] = {}
+
+    def source(self) -> str:
+        if self.screen not in self._sources:
+            self._sources[self.screen] = self._build_source(self.screen)
+            self._roots[self.screen] = ET.fromstring(self._sources[self.screen])
+        return self._sources[self.screen]
+
+    def root(self) -> ET.Element:
+        self.source()
+        return self._roots[self.screen]
+
+    def _build_source(self, screen: int) -> str:
+        rng = random.Random(f"{self.seed}:{screen}")
+        hierarchy = ET.Element("hierarchy", rotation="0", width=str(self.width), height=str(self.height))
+        frame = ET.SubElement(hierarchy, "android.widget.FrameLayout", {
+            "package": self.package, "class": "android.widget.FrameLayout", "resource-id": "",
+            "bounds": f"[0,0][{self.width},{self.height}]", "clickable": "false", "enabled": "true",
+        })
+        row_height = max(1, self.height // max(1, self.nodes))
+        parent = frame
+        for i in range(self.nodes):
+            widget = rng.choice(WIDGETS)
+            if i % 10 == 0:
+                # Layout-only containers, as in real apps
+                parent = ET.SubElement(frame, "android.widget.LinearLayout", {
+                    "package": self.package, "class": "android.widget.LinearLayout", "resource-id": "",
+                    "bounds": f"[0,{i * row_height}][{self.width},{min(self.height, (i + 10) * row_height)}]",
+                    "clickable": "false", "enabled": "true",
+                })
+            clickable = widget in ("android.widget.Button", "android.widget.EditText") or rng.random() < 0.2
+            ET.SubElement(parent, widget, {
+                "index": str(i),
+                "package": self.package,
+                "class": widget,
+                "resource-id": f"{self.package}:id/s{screen}_item{i}",
+                "text": f"Item {i}" if widget != "android.widget.ImageView" else "",
+                "content-desc": f"item {i} on screen {screen}" if rng.random() < 0.5 else "",
+                "clickable": "true" if clickable else "false",
+                "enabled": "true",
+                "focusable": "true" if clickable else "false",
+                "bounds": f"[0,{i * row_height}][{self.width},{(i + 1) * row_height}]",
+            })
+        return ET.tostring(hierarchy, encoding="unicode")
+
+    def screenshot(self) -> str:
+        # Shared by all devices with the same resolution: hundreds of devices x ~1MB each adds up
+        key = (self.width, self.height, self.screen, self.screenshot_noise)
+        if key not in _screenshots:
+            rng = random.Random(f"{self.screen}:color")
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            png = _png(self.width, self.height, color, self.screenshot_noise, f"{self.screen}:noise")
+            _screenshots[key] = base64.b64encode(png).decode()
+        return _screenshots[key]
+
+    def navigate(self, step: int = 1):
+        self.screen = (self.screen + step) % self.screens
+        self.generation += 1
+
+    def element_at(self, x: int, y: int) -> Optional[ET.Element]:
+        hit = None
+        for node in self.root().iter():
+            bounds = node.get("bounds")
+            if not bounds:
+                continue
+            x1, y1, x2, y2 = map(int, re.findall(r"-?\d+", bounds))
+            if x1 <= x < x2 and y1 <= y < y2:
+                hit = node  # Deepest match wins (document order)
+        return hit
+
+    def tap(self, x: int, y: int):
+        node = self.element_at(x, y)
+        if node is not None and node.get("clickable") == "true":
+            self.navigate()
+
+    def reset_app(self):
+        self.screen = 0
+        self.generation += 1
+
+
+class WebDriverError(Exception):
+    def __init__(self, status: int, error: str, message: str):
+        self.status = status
+        self.error = error
+        self.message = message
+
+
+class FakeAppium:
+    """Virtual devices, sessions, latency and failure injection behind one server"""
+
+    def __init__(self, devices: List[VirtualDevice], latency: Optional[Dict[str, LatencyModel]] = None,
+                 failures: Optional[FailurePlan] = None):
+        self.devices = {device.udid: device for device in devices}
+        self.latency = latency or {}
+        self.failures = failures or FailurePlan()
+        self.sessions: Dict[str, VirtualDevice] = {}
+        self.settings: Dict[str, Dict] = {}
+        self.requests = 0
+        self.started_at = time.time()
+
+    def device_for_new_session(self, capabilities: Dict) -> VirtualDevice:
+        udid = capabilities.get("appium:udid") or capabilities.get("appium:deviceName")
+        if udid in self.devices:
+            return self.devices[udid]
+        # Unknown/unspecified device: first one without a session
+        for device in self.devices.values():
+            if device.session_id is None:
+                return device
+        raise WebDriverError(500, "session not created", "No free virtual device")
+
+    def create_session(self, capabilities: Dict) -> Dict:
+        device = self.device_for_new_session(capabilities)
+        if device.session_id:
+            # Like UiAutomator2: a new session on a device ends the old one
+            self.sessions.pop(device.session_id, None)
+        session_id = str(uuid.uuid4())
+        device.session_id = session_id
+        self.sessions[session_id] = device
+        if capabilities.get("appium:appPackage"):
+            device.package = capabilities["appium:appPackage"]
+            device._sources.clear()
+            device._roots.clear()
+        device.reset_app()
+        returned = {**capabilities, "platformName": "Android", "udid": device.udid, "deviceName": device.udid}
+        self.settings[session_id] = {}
+        return {"sessionId": session_id, "capabilities": returned}
+
+    def end_session(self, session_id: str):
+        device = self.sessions.pop(session_id, None)
+        self.settings.pop(session_id, None)
+        if device and device.session_id == session_id:
+            device.session_id = None
+
+    def device(self, session_id: str) -> VirtualDevice:
+        device = self.sessions.get(session_id)
+        if device is None:
+            raise WebDriverError(404, "invalid session id", f"A session is either terminated or not started ({session_id})")
+        return device
+
+    def element_id(self, device: VirtualDevice, node: ET.Element) -> str:
+        index = list(device.root().iter()).index(node)
+        return f"{device.generation}-{index}"
+
+    def element(self, device: VirtualDevice, element_id: str) -> ET.Element:
+        generation, _, index = element_id.partition("-")
+        if generation != str(device.generation):
+            raise WebDriverError(404, "stale element reference", f"Element {element_id} is no longer attached to the DOM")
+        return list(device.root().iter())[int(index)]
+
+    def find(self, device: VirtualDevice, using: str, value: str) -> List[ET.Element]:
+        root = device.root()
+        if using == "id":
+            full = value if ":id/" in value else f"{device.package}:id/{value}"
+            return [node for node in root.iter() if node.get("resource-id") == full]
+        if using == "accessibility id":
+            return [node for node in root.iter() if node.get("content-desc") == value]
+        if using == "class name":
+            return [node for node in root.iter() if node.tag == value]
+        if using == "-android uiautomator":
+            conditions = re.findall(r"\.(\w+)\(\"((?:[^\"\\]|\\.)*)\"\)", value)
+            attributes = {"resourceId": "resource-id", "text": "text", "description": "content-desc", "className": "class"}
+            return [node for node in root.iter() if node is not root and all(
+                node.get(attributes.get(method, method)) == text for method, text in conditions
+            )]
+        if using == "xpath":
+            found = find_local(root, value)
+            if found is None:
+                # Outside the simple subset: ElementTree's XPath handles paths/positions
+                path = "." + value if value.startswith("/") else value
+                try:
+                    found = root.findall(path)
+                except SyntaxError:
+                    raise WebDriverError(400, "invalid selector", f"Unsupported XPath: {value}")
+            return found
+        raise WebDriverError(400, "invalid argument", f"Unsupported locator strategy: {using}")
+
+    def endpoint(self, path: str) -> str:
+        for pattern, name in _ENDPOINT_PATTERNS:
+            if pattern.match(path):
+                return name
+        return "other"
+
+    async def simulate(self, path: str):
+        """Apply latency and maybe inject a failure for a request"""
+        self.requests += 1
+        endpoint = self.endpoint(path)
+        model = self.latency.get(endpoint) or self.latency.get("default")
+        if model:
+            await asyncio.sleep(model.sample() / 1000)
+
+        failure = self.failures.pick(endpoint)
+        if failure == "error":
+            raise WebDriverError(500, "unknown error", f"Injected failure on {endpoint}")
+        if failure == "timeout":
+            await asyncio.sleep(self.failures.timeout)
+            raise WebDriverError(500, "timeout", f"Injected timeout on {endpoint}")
+        if failure == "session_lost":
+            match = re.match(r"^/session/([^/]+)", path)
+            if match:
+                self.end_session(match.group(1))
+                raise WebDriverError(404, "invalid session id", "Injected session loss")
+
+    def get_stats(self) -> Dict:
+        return {
+            "devices": len(self.devices),
+            "sessions": len(self.sessions),
+            "requests": self.requests,
+            "uptime": time.time() - self.started_at,
+            "injected_failures": dict(self.failures.injected),
+        }
+
+
+def _value(value=None) -> Dict:
+    return {"value": value}
+
+
+def create_app(fake: FakeAppium) -> FastAPI:
+    app = FastAPI(title="Fake Appium")
+
+    @app.exception_handler(WebDriverError)
+    async def webdriver_error(request: Request, error: WebDriverError):
+        return JSONResponse(status_code=error.status, content=_value({"error": error.error, "message": error.message}))
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        if request.url.path not in ("/status", "/fake/stats"):
+            try:
+                await fake.simulate(request.url.path)
+            except WebDriverError as error:
+                return await webdriver_error(request, error)
+        return await call_next(request)
+
+    @app.get("/status")
+    async def status():
+        return _value({"ready": True, "message": "Fake Appium is ready", "build": {"version": "2.0.0-fake"}})
+
+    @app.get("/fake/stats")
+    async def stats():
+        return fake.get_stats()
+
+    @app.post("/session")
+    async def new_session(body: Dict):
+        capabilities = dict(body.get("capabilities", {}).get("alwaysMatch", {}))
+        for extra in body.get("capabilities", {}).get("firstMatch", [{}])[:1]:
+            capabilities.update(extra)
+        return _value(fake.create_session(capabilities))
+
+    @app.get("/sessions")
+    @app.get("/appium/sessions")
+    async def list_sessions():
+        return _value([
+            {"id": session_id, "capabilities": {"udid": device.udid, "deviceName": device.udid}}
+            for session_id, device in fake.sessions.items()
+        ])
+
+    @app.get("/session/{session_id}")
+    async def get_session(session_id: str):
+        device = fake.device(session_id)
+        return _value({"udid": device.udid, "deviceName": device.udid, "platformName": "Android"})
+
+    @app.delete("/session/{session_id}")
+    async def delete_session(session_id: str):
+        fake.device(session_id)
+        fake.end_session(session_id)
+        return _value()
+
+    @app.get("/session/{session_id}/source")
+    async def source(session_id: str):
+        return _value(fake.device(session_id).source())
+
+    @app.get("/session/{session_id}/screenshot")
+    async def screenshot(session_id: str):
+        return _value(fake.device(session_id).screenshot())
+
+    @app.get("/session/{session_id}/window/rect")
+    async def window_rect(session_id: str):
+        device = fake.device(session_id)
+        return _value({"x": 0, "y": 0, "width": device.width, "height": device.height})
+
+    @app.post("/session/{session_id}/element")
+    async def find_element(session_id: str, body: Dict):
+        device = fake.device(session_id)
+        found = fake.find(device, body.get("using"), body.get("value"))
+        if not found:
+            raise WebDriverError(404, "no such element", "An element could not be located on the page using the given search parameters.")
+        element_id = fake.element_id(device, found[0])
+        return _value({W3C_ELEMENT_KEY: element_id, "ELEMENT": element_id})
+
+    @app.post("/session/{session_id}/elements")
+    async def find_elements(session_id: str, body: Dict):
+        device = fake.device(session_id)
+        ids = [fake.element_id(device, node) for node in fake.find(device, body.get("using"), body.get("value"))]
+        return _value([{W3C_ELEMENT_KEY: element_id, "ELEMENT": element_id} for element_id in ids])
+
+    @app.post("/session/{session_id}/element/{element_id}/click")
+    async def click(session_id: str, element_id: str):
+        device = fake.device(session_id)
+        node = fake.element(device, element_id)
+        if node.get("clickable") == "true":
+            device.navigate()
+        return _value()
+
+    @app.post("/session/{session_id}/element/{element_id}/value")
+    async def send_keys(session_id: str, element_id: str, body: Dict):
+        device = fake.device(session_id)
+        fake.element(device, element_id).set("text", body.get("text") or "".join(body.get("value", [])))
+        return _value()
+
+    @app.get("/session/{session_id}/element/{element_id}/attribute/{name}")
+    async def attribute(session_id: str, element_id: str, name: str):
+        return _value(fake.element(fake.device(session_id), element_id).get(name))
+
+    @app.get("/session/{session_id}/element/{element_id}/rect")
+    async def element_rect(session_id: str, element_id: str):
+        node = fake.element(fake.device(session_id), element_id)
+        x1, y1, x2, y2 = map(int, re.findall(r"-?\d+", node.get("bounds", "[0,0][0,0]")))
+        return _value({"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1})
+
+    @app.post("/session/{session_id}/actions")
+    async def actions(session_id: str, body: Dict):
+        device = fake.device(session_id)
+        for source in body.get("actions", []):
+            x = y = None
+            down = None
+            for action in source.get("actions", []):
+                if action.get("type") == "pointerMove":
+                    x, y = action.get("x", x), action.get("y", y)
+                elif action.get("type") == "pointerDown":
+                    down = (x, y)
+                elif action.get("type") == "pointerUp" and down and None not in down:
+                    if math.dist(down, (x, y)) < 20:
+                        device.tap(int(x), int(y))
+                    else:
+                        device.navigate()  # Treat a swipe as scrolling to new content
+        return _value()
+
+    @app.delete("/session/{session_id}/actions")
+    async def release_actions(session_id: str):
+        fake.device(session_id)
+        return _value()
+
+    @app.post("/session/{session_id}/back")
+    async def back(session_id: str):
+        fake.device(session_id).navigate(-1)
+        return _value()
+
+    @app.get("/session/{session_id}/appium/device/current_activity")
+    async def current_activity(session_id: str):
+        device = fake.device(session_id)
+        return _value(device.activity if device.running else ".Launcher")
+
+    @app.get("/session/{session_id}/appium/device/current_package")
+    async def current_package(session_id: str):
+        device = fake.device(session_id)
+        return _value(device.package if device.running else "com.android.launcher3")
+
+    @app.get("/session/{session_id}/appium/device/info")
+    async def device_info(session_id: str):
+        device = fake.device(session_id)
+        return _value({"udid": device.udid, "realDisplaySize": f"{device.width}x{device.height}", "apiVersion": "34"})
+
+    @app.get("/session/{session_id}/appium/settings")
+    async def get_settings(session_id: str):
+        fake.device(session_id)
+        return _value(fake.settings.get(session_id, {}))
+
+    @app.post("/session/{session_id}/appium/settings")
+    async def update_settings(session_id: str, body: Dict):
+        fake.device(session_id)
+        fake.settings.setdefault(session_id, {}).update(body.get("settings", {}))
+        return _value()
+
+    @app.post("/session/{session_id}/execute/sync")
+    async def execute(session_id: str, body: Dict):
+        device = fake.device(session_id)
+        script = body.get("script", "")
+        args = (body.get("args") or [{}])[0]
+        if script == "mobile: terminateApp":
+            device.running = False
+            return _value(True)
+        if script == "mobile: clearApp":
+            device.reset_app()
+            return _value()
+        if script in ("mobile: activateApp", "mobile: startActivity"):
+            device.package = args.get("appId") or args.get("intent", device.package).split("/")[0]
+            device.running = True
+            device.reset_app()
+            return _value()
+        if script == "mobile: shell":
+            return _value("")
+        raise WebDriverError(404, "unknown method", f"Unsupported script: {script}")
+
+    return app
+
+
+def build_fake(devices: int = 10, latency_specs: Optional[List[str]] = None, fail_specs: Optional[List[str]] = None,
+               screens: int = 5, nodes: int = 60, screenshot_noise: float = 0.1, seed: int = 0,
+               fail_timeout: float = 30.0) -> FakeAppium:
+    """A FakeAppium with `devices` virtual devices named fake-0001, fake-0002, ..."""
+    rng = random.Random(seed)
+    latency = {}
+    for spec in latency_specs or []:
+        endpoint, _, model = spec.rpartition("=")
+        latency[endpoint or "default"] = LatencyModel(model, rng)
+    virtual = [
+        VirtualDevice(f"fake-{i:04d}", screens=screens, nodes=nodes, screenshot_noise=screenshot_noise, seed=seed + i)
+        for i in itertools.islice(itertools.count(1), devices)
+    ]
+    return FakeAppium(virtual, latency, FailurePlan.parse(fail_specs or [], timeout=fail_timeout, rng=rng))
+
+
+async def start_fake_appium_server(port: int, fake: FakeAppium, host: str = "127.0.0.1"):
+    """Serve `fake` in the running loop; returns (server, task). Stop with server.should_exit = True"""
+    server = uvicorn.Server(uvicorn.Config(create_app(fake), host=host, port=port, log_level="warning"))
+    task = asyncio.ensure_future(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4725)
+    parser.add_argument('--devices', type=int, default=10, help='Virtual devices (fake-0001 ...)')
+    parser.add_argument('--screens', type=int, default=5, help='Screens per device')
+    parser.add_argument('--nodes', type=int, default=60, help='Widgets per screen')
+    parser.add_argument('--screenshot-noise', type=float, default=0.1, help='Fraction of incompressible screenshot rows')
+    parser.add_argument('--latency', action='append', default=[], metavar='[ENDPOINT=]DIST:PARAMS',
+                        help='Latency model, e.g. default=lognormal:3,0.5 or source=normal:80,20 (repeatable)')
+    parser.add_argument('--fail', action='append', default=[], metavar='ENDPOINT:KIND=RATE',
+                        help='Failure injection, e.g. source:error=0.02 or *:session_lost=0.001 (repeatable)')
+    parser.add_argument('--fail-timeout', type=float, default=30.0, help='How long injected timeouts hang (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = build_fake(args.devices, args.latency, args.fail, args.screens, args.nodes,
+                      args.screenshot_noise, args.seed, args.fail_timeout)
+    print(f"Fake Appium on http://{args.host}:{args.port} with {args.devices} devices")
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
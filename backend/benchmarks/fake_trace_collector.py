@@ -0,0 +1,93 @@
+"""
+Fake trace collector for trying span export without a tracing backend
+
+Accepts the batches the tracer POSTs with TRACE_EXPORT=http
+({"spans": [...]}, any path), appends every span to a JSONL file and prints
+a line per finished trace (root span name, duration, span count, errors,
+and the slowest kinds of child span).
+
+Run from backend/, then start the backend with
+TRACE_EXPORT=http TRACE_COLLECTOR_URL=http://127.0.0.1:4318/v1/spans:
+    python -m benchmarks.fake_trace_collector --port 4318 --out /tmp/spans.jsonl
+"""
+
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+
+class TraceCollector:
+    def __init__(self, out_path: str):
+        self.out_path = out_path
+        self.spans: Dict[str, List[Dict]] = defaultdict(list)
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def add(self, spans: List[Dict]):
+        with self._lock:
+            with open(self.out_path, "a") as f:
+                f.write("".join(json.dumps(span) + "\n" for span in spans))
+            self.received += len(spans)
+            finished = []
+            for span in spans:
+                self.spans[span["trace_id"]].append(span)
+                if span["parent_id"] is None:
+                    finished.append(span["trace_id"])
+            for trace_id in finished:
+                print(self.summary(trace_id, self.spans.pop(trace_id)))
+
+    @staticmethod
+    def summary(trace_id: str, spans: List[Dict]) -> str:
+        root = next(span for span in spans if span["parent_id"] is None)
+        by_kind: Dict[str, float] = defaultdict(float)
+        for span in spans:
+            if span is not root:
+                by_kind[span["kind"]] += span["duration"] or 0
+        top = sorted(by_kind.items(), key=lambda item: item[1], reverse=True)[:4]
+        errors = sum(1 for span in spans if span["status"] == "error")
+        kinds = ", ".join(f"{kind} {seconds * 1000:.0f}ms" for kind, seconds in top)
+        return (f"{trace_id[:16]} {root['name']:<40} {root['duration'] * 1000:8.1f}ms "
+                f"{len(spans):5d} spans {errors:3d} errors  [{kinds}]")
+
+
+def make_handler(collector: TraceCollector):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                collector.add(json.loads(body)["spans"])
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_response(400)
+                self.end_headers()
+                self.wfile.write(str(e).encode())
+                return
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass  # One line per trace is plenty
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=4318, help='Port to listen on')
+    parser.add_argument('--out', default='spans.jsonl', help='JSONL file spans are appended to')
+    args = parser.parse_args()
+
+    collector = TraceCollector(args.out)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(collector))
+    print(f"Fake trace collector on 127.0.0.1:{args.port}, writing {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{collector.received} spans received")
+
+
+if __name__ == '__main__':
+    main()
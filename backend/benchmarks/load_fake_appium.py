@@ -0,0 +1,140 @@
+"""
+Load test: drive AppiumService against many virtual devices at once
+
+Starts the fake Appium server in a subprocess (or uses one already running)
+and has every virtual device run what the inspector and playback do per
+step, all devices concurrently:
+
+    screenshot → page source → find element → click → tap → current package
+
+Reports per-operation latency percentiles, errors and overall request rate,
+so scaling limits in the backend (event loop, thread pool, connection
+handling) show up without phones.
+
+Run from backend/:
+    python -m benchmarks.load_fake_appium --devices 50 --iterations 20 \
+        --latency default=lognormal:3.0,0.5 --latency source=normal:80,20
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from config import settings
+from services.mobile.appium_fleet import get_appium_fleet
+from services.mobile.appium_service import AppiumService, get_appium_service
+
+# Present on every synthetic screen (see fake_appium_server.VirtualDevice)
+CLICKABLE_XPATH = "//android.widget.Button[@clickable='true']"
+
+
+async def _wait_ready(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(f"{url}/status", timeout=1)).status_code == 200:
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Fake Appium at {url} not ready after {timeout}s")
+
+
+async def _timed(timings: dict, errors: dict, name: str, call):
+    start = time.perf_counter()
+    try:
+        result = await call
+        if result is None or result is False:
+            errors[name] += 1
+        return result
+    except Exception:
+        errors[name] += 1
+        return None
+    finally:
+        timings[name].append((time.perf_counter() - start) * 1000)
+
+
+async def device_scenario(service: AppiumService, device_id: str, iterations: int, timings: dict, errors: dict):
+    session_id = await _timed(timings, errors, "create session", service.create_session(
+        device_id=device_id, platform="Android", app_package=None, app_activity=None
+    ))
+    if not session_id:
+        return
+
+    for _ in range(iterations):
+        await _timed(timings, errors, "screenshot", service.get_screenshot(session_id))
+        # get_page_source is synchronous, as the inspector calls it; keep it off the loop
+        await _timed(timings, errors, "page source", asyncio.to_thread(service.get_page_source, session_id, 1))
+        element_id = await _timed(timings, errors, "find element", service.find_element(session_id, "xpath", CLICKABLE_XPATH))
+        if element_id:
+            await _timed(timings, errors, "click", service.click_element(session_id, element_id))
+        await _timed(timings, errors, "tap", service.tap_at_coordinate(session_id, 540, 1200))
+        await _timed(timings, errors, "current package", service.get_current_package(session_id))
+
+    await _timed(timings, errors, "delete session", service.delete_session(session_id))
+
+
+async def run(url: str, devices: int, iterations: int) -> tuple:
+    # Route everything to the fake server instead of starting per-device Appium nodes
+    settings.APPIUM_FLEET_ENABLED = False
+    port = int(url.rsplit(":", 1)[1])
+    get_appium_fleet().default_node.port = port
+
+    service = get_appium_service()
+    timings, errors = defaultdict(list), defaultdict(int)
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        device_scenario(service, f"fake-{i:04d}", iterations, timings, errors) for i in range(1, devices + 1)
+    ])
+    return timings, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', help='Use a fake Appium that is already running (default: start one)')
+    parser.add_argument('--port', type=int, default=4799, help='Port for the fake Appium this script starts')
+    parser.add_argument('--devices', type=int, default=20, help='Virtual devices driven concurrently')
+    parser.add_argument('--iterations', type=int, default=10, help='Steps per device')
+    parser.add_argument('--latency', action='append', default=[], help='Passed to the fake server')
+    parser.add_argument('--fail', action='append', default=[], help='Passed to the fake server')
+    args = parser.parse_args()
+
+    async def bench():
+        url = args.url
+        process = None
+        if url is None:
+            url = f"http://{settings.APPIUM_HOST}:{args.port}"
+            command = [sys.executable, "-m", "benchmarks.fake_appium_server",
+                       "--host", settings.APPIUM_HOST, "--port", str(args.port), "--devices", str(args.devices)]
+            for spec in args.latency:
+                command += ["--latency", spec]
+            for spec in args.fail:
+                command += ["--fail", spec]
+            process = await asyncio.create_subprocess_exec(*command)
+        try:
+            await _wait_ready(url)
+            return await run(url, args.devices, args.iterations)
+        finally:
+            if process and process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+    timings, errors, elapsed = asyncio.run(bench())
+    total = sum(len(values) for values in timings.values())
+    print(f"\n{args.devices} devices x {args.iterations} steps: {total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s)")
+    print(f"{'operation':<18} {'median ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'n':>7} {'errors':>7}")
+    for name, values in timings.items():
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        print(f"{name:<18} {statistics.median(values):>10.1f} {p95:>10.1f} {p99:>10.1f} {len(values):>7} {errors[name]:>7}")
+
+
+if __name__ == '__main__':
+    main()
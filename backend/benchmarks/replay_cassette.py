@@ -0,0 +1,171 @@
+"""
+Benchmark: profile backend hot paths offline from a recorded Appium cassette
+
+Replays a cassette (see services/mobile/appium_cassette.py) request by
+request through the same httpx client path AppiumService uses, and runs
+the inspector's processing on what comes back:
+
+- screenshots: decode + size (as get_screenshot does)
+- page sources: XML parse, then for every tap the session made (or a grid
+  if it made none) the screenshot → device transform, element-at-position
+  lookup, XPath generation and selector compilation
+
+Everything is deterministic, so runs can be compared across commits.
+
+Run from backend/ (cassette name from /api/admin/cassettes, or a path):
+    python -m benchmarks.replay_cassette my-session --repeat 5
+    python -m benchmarks.replay_cassette my-session --profile
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import statistics
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from pathlib import Path
+
+from api.element_inspector import find_element_at_position
+from services.mobile import appium_cassette
+from services.mobile.appium_cassette import Cassette, appium_client
+from services.mobile.selector_compiler import compile_xpath
+
+# Replayed against this base URL; only paths are matched
+REPLAY_URL = "http://replay.invalid"
+
+GRID = (5, 10)
+
+
+def _taps(cassette: Cassette) -> list:
+    """Device coordinates of every tap in the recording"""
+    points = []
+    for interaction in cassette.interactions:
+        if not interaction["path"].endswith("/actions"):
+            continue
+        try:
+            body = json.loads(cassette.body(interaction["request"]))
+        except ValueError:
+            continue
+        for source in body.get("actions", []):
+            for action in source.get("actions", []):
+                if action.get("type") == "pointerMove" and "x" in action:
+                    points.append((int(action["x"]), int(action["y"])))
+                    break
+    return points
+
+
+def _screenshot_size(screenshot_b64: str) -> tuple:
+    from PIL import Image
+    image = Image.open(io.BytesIO(base64.b64decode(screenshot_b64)))
+    return image.width, image.height
+
+
+async def replay_once(cassette: Cassette, taps: list, timings: dict) -> dict:
+    player = appium_cassette.CassettePlayer(cassette, speed=0.0)
+    device = {"width": 1080, "height": 2400}
+    screenshot = None
+    counts = defaultdict(int)
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[name].append((time.perf_counter() - start) * 1000)
+        return result
+
+    appium_cassette._player = player
+    try:
+        async with appium_client() as client:
+            for interaction in cassette.interactions:
+                start = time.perf_counter()
+                response = await client.request(
+                    interaction["method"], REPLAY_URL + interaction["path"],
+                    content=cassette.body(interaction["request"]) or None
+                )
+                timings["replay request"].append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    continue
+                path = interaction["path"]
+
+                if path.endswith("/window/rect"):
+                    rect = response.json().get("value", {})
+                    device = {"width": rect.get("width", 1080), "height": rect.get("height", 2400)}
+
+                elif path.endswith("/screenshot"):
+                    value = timed("json decode", response.json).get("value")
+                    if value:
+                        screenshot = timed("screenshot size", _screenshot_size, value)
+                        counts["screenshots"] += 1
+
+                elif path.endswith("/source"):
+                    xml = timed("json decode", response.json).get("value")
+                    if not xml:
+                        continue
+                    root = timed("xml parse", ET.fromstring, xml)
+                    counts["sources"] += 1
+                    points = taps or [
+                        (device["width"] * (i + 0.5) / GRID[0], device["height"] * (j + 0.5) / GRID[1])
+                        for i in range(GRID[0]) for j in range(GRID[1])
+                    ]
+                    shot_w, shot_h = screenshot or (device["width"], device["height"])
+                    for x, y in points:
+                        # Inspector clicks arrive in screenshot pixels and are scaled back to the device
+                        sx, sy = x * shot_w / device["width"], y * shot_h / device["height"]
+                        dx = max(0, min(device["width"] - 1, round(sx * device["width"] / shot_w)))
+                        dy = max(0, min(device["height"] - 1, round(sy * device["height"] / shot_h)))
+                        element = timed("element at position", find_element_at_position, root, dx, dy)
+                        counts["lookups"] += 1
+                        if element and element.get("xpath"):
+                            # Uncached, so every replay measures the compile itself
+                            timed("compile selector", compile_xpath.__wrapped__, element["xpath"])
+    finally:
+        appium_cassette._player = None
+    return {**counts, "served": player.served, "missed": player.missed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('cassette', help='Cassette name (in the data dir) or path to a .zip')
+    parser.add_argument('--repeat', type=int, default=3, help='Full replays to time')
+    parser.add_argument('--profile', action='store_true', help='Print a cProfile of one replay')
+    args = parser.parse_args()
+
+    path = Path(args.cassette)
+    cassette = Cassette.load(path if path.suffix == ".zip" and path.exists() else appium_cassette.cassette_path(args.cassette))
+    summary = cassette.summary()
+    print(f"{summary['interactions']} interactions, {summary['blobs']} blobs ({summary['blob_bytes'] / 1e6:.1f} MB)")
+    taps = _taps(cassette)
+
+    timings = defaultdict(list)
+    totals = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        # The inspector logs every lookup; keep the cost, drop the output
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts = asyncio.run(replay_once(cassette, taps, timings))
+        totals.append((time.perf_counter() - start) * 1000)
+    print(f"replay: {counts}  total median {statistics.median(totals):.1f} ms over {args.repeat} runs")
+
+    print(f"{'stage':<22} {'median ms':>10} {'p95 ms':>10} {'sum ms/run':>11} {'n/run':>7}")
+    for name, values in timings.items():
+        ordered = sorted(values)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(f"{name:<22} {statistics.median(ordered):>10.3f} {p95:>10.3f} "
+              f"{sum(values) / args.repeat:>11.1f} {len(values) // args.repeat:>7}")
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(replay_once(cassette, taps, defaultdict(list)))
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == '__main__':
+    main()
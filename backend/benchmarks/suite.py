@@ -0,0 +1,480 @@
+"""
+Benchmark suite: playback, inspector and recording hot paths
+
+Runs every benchmark against local stand-ins (the fake Appium server,
+synthetic hierarchies and getevent streams, in-memory SQLite, fake
+WebSocket clients), so it needs no device and gives comparable numbers
+from run to run:
+
+- playback.step_overhead      PlaybackEngine.execute_flow per step, pacing sleeps skipped
+- inspector.element_at_position    api/element_inspector.find_element_at_position
+- element_inspector.*         ElementInspector XML parse and selector generation
+- touch_monitor.parse         TouchMonitor._parse_event_line over a getevent stream
+- ws.broadcast[N]             ConnectionManager / realtime broadcast to N clients
+- flows.list[N]               list_flows query + serialization with N flows
+- startup.*                   import main, lifespan startup and first requests (fresh interpreters)
+
+Unless --verbose, the benchmarked code's output goes to a line-buffered
+/dev/null: every line still costs the write it would cost on a terminal or
+pipe, so logging overhead is part of the numbers.
+
+Results are saved as JSON per commit (DATA_DIR/benchmarks/<commit>.json)
+and can be compared against another commit's results; any benchmark whose
+median got slower than --threshold is reported and the exit code is 1.
+
+Run from backend/:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only inspector --only touch_monitor
+    python -m benchmarks.suite --compare HEAD~1 --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from services.diagnostics.logs import configure_logging, get_log_pipeline
+
+RESULTS_DIR = settings.DATA_DIR / "benchmarks"
+
+# Relative median slowdown reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+FAKE_APPIUM_PORT = 4798
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark; it returns {case: [sample ms, ...]}"""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def _timed(fn, samples: int, per: int = 1) -> List[float]:
+    """ms per call of fn (fn does `per` units of work)"""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000 / per)
+    return timings
+
+
+def _summary(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "n": len(ordered),
+    }
+
+
+def _hierarchy(nodes: int) -> str:
+    from benchmarks.fake_appium_server import VirtualDevice
+    return VirtualDevice("bench", nodes=nodes).source()
+
+
+def _grid(width: int = 1080, height: int = 2400, columns: int = 5, rows: int = 10) -> List[tuple]:
+    return [(int(width * (i + 0.5) / columns), int(height * (j + 0.5) / rows))
+            for i in range(columns) for j in range(rows)]
+
+
+# ---- playback ----
+
+class _NoSleepAsyncio:
+    """asyncio for the playback engine with the pacing sleeps skipped"""
+
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+    @staticmethod
+    async def sleep(delay, result=None):
+        await asyncio.sleep(0)
+        return result
+
+
+def _bench_flow(steps: int) -> Dict:
+    flow = []
+    for i in range(steps):
+        kind = i % 3
+        if kind == 0:
+            flow.append({"action": "tap", "targetType": "element",
+                         "selector": {"strategy": "text", "value": f"Item {i % 20}"},
+                         "selectors": [{"type": "id", "value": f"com.example.app:id/s0_item{i % 20}"}],
+                         "fallback": {"x": 540, "y": 120 + 40 * (i % 20)}})
+        elif kind == 1:
+            flow.append({"action": "tap", "x": 540, "y": 1200})
+        else:
+            flow.append({"action": "swipe", "start_x": 540, "start_y": 1800, "end_x": 540, "end_y": 600, "duration": 300})
+    # No id: nothing is learned into the persistent selector cache
+    return {"name": "benchmark flow", "steps": flow}
+
+
+@benchmark("playback")
+async def bench_playback(samples: int) -> Dict[str, List[float]]:
+    from benchmarks.fake_appium_server import build_fake, start_fake_appium_server
+    from services.mobile.appium_fleet import get_appium_fleet
+    from services.mobile.appium_service import get_appium_service
+    from services.playback import playback_engine
+    from services.playback.playback_engine import PlaybackEngine
+
+    settings.APPIUM_FLEET_ENABLED = False
+    get_appium_fleet().default_node.port = FAKE_APPIUM_PORT
+    server, task = await start_fake_appium_server(FAKE_APPIUM_PORT, build_fake(devices=1))
+    service = get_appium_service()
+    session_id = await service.create_session(device_id="fake-0001", platform="Android",
+                                              app_package=None, app_activity=None)
+    if not session_id:
+        raise RuntimeError("Could not create a session on the fake Appium server")
+
+    flow = _bench_flow(30)
+    engine = PlaybackEngine(service, broadcast_callback=lambda data: None)
+    timings = []
+    playback_engine.asyncio = _NoSleepAsyncio()
+    try:
+        for _ in range(samples):
+            start = time.perf_counter()
+            await engine.execute_flow(flow, session_id)
+            timings.append((time.perf_counter() - start) * 1000 / len(flow["steps"]))
+    finally:
+        playback_engine.asyncio = asyncio
+        await service.delete_session(session_id)
+        server.should_exit = True
+        await task
+    return {"playback.step_overhead": timings}
+
+
+# ---- inspector ----
+
+@benchmark("inspector")
+def bench_inspector(samples: int) -> Dict[str, List[float]]:
+    from api.element_inspector import find_element_at_position
+
+    results = {}
+    points = _grid()
+    for nodes in (60, 300):
+        root = ET.fromstring(_hierarchy(nodes))
+        results[f"inspector.element_at_position[{nodes} nodes]"] = _timed(
+            lambda: [find_element_at_position(root, x, y) for x, y in points], samples, per=len(points)
+        )
+    return results
+
+
+class _SourceDriver:
+    """Just enough of a WebDriver for ElementInspector"""
+
+    session_id = None
+
+    def __init__(self, page_source: str):
+        self.page_source = page_source
+
+
+@benchmark("element_inspector")
+def bench_element_inspector(samples: int) -> Dict[str, List[float]]:
+    from services.mobile.element_inspector import ElementInspector
+
+    results = {}
+    for nodes in (60, 300):
+        source = _hierarchy(nodes)
+        inspector = ElementInspector(_SourceDriver(source), "android")
+        elements = inspector._parse_android_hierarchy(source)
+        results[f"element_inspector.xml_parse[{nodes} nodes]"] = _timed(
+            lambda: inspector._parse_android_hierarchy(source), samples
+        )
+        results[f"element_inspector.selectors[{nodes} nodes]"] = _timed(
+            lambda: [inspector._generate_android_selectors(element) for element in elements],
+            samples, per=len(elements)
+        )
+        results[f"element_inspector.get_element_at_position[{nodes} nodes]"] = _timed(
+            lambda: inspector.get_element_at_position(540, 1200), samples
+        )
+    return results
+
+
+# ---- recording ----
+
+def _getevent_lines(touches: int) -> List[str]:
+    lines = []
+    t = 1000.0
+    for i in range(touches):
+        x, y = 100 + (i * 37) % 900, 200 + (i * 53) % 2000
+        # Every fourth touch is a swipe
+        end_y = y - 600 if i % 4 == 3 and y > 800 else y
+        lines += [
+            f"[{t:14.6f}] EV_ABS       ABS_MT_TRACKING_ID   {i:08x}",
+            f"[{t:14.6f}] EV_ABS       ABS_MT_POSITION_X    {x:08x}",
+            f"[{t:14.6f}] EV_ABS       ABS_MT_POSITION_Y    {y:08x}",
+            f"[{t:14.6f}] EV_KEY       BTN_TOUCH            DOWN",
+            f"[{t:14.6f}] EV_SYN       SYN_REPORT           00000000",
+            f"[{t + 0.05:14.6f}] EV_ABS       ABS_MT_POSITION_Y    {end_y:08x}",
+            f"[{t + 0.05:14.6f}] EV_ABS       ABS_MT_PRESSURE      00000041",
+            f"[{t + 0.05:14.6f}] EV_SYN       SYN_REPORT           00000000",
+            f"[{t + 0.1:14.6f}] EV_ABS       ABS_MT_TRACKING_ID   ffffffff",
+            f"[{t + 0.1:14.6f}] EV_KEY       BTN_TOUCH            UP",
+            f"[{t + 0.1:14.6f}] EV_SYN       SYN_REPORT           00000000",
+        ]
+        t += 1
+    return lines
+
+
+@benchmark("touch_monitor")
+def bench_touch_monitor(samples: int) -> Dict[str, List[float]]:
+    from services.mobile.touch_monitor import TouchMonitor
+
+    lines = _getevent_lines(1000)
+    actions = []
+    monitor = TouchMonitor("bench", actions.append)
+
+    def parse():
+        for line in lines:
+            monitor._parse_event_line(line)
+
+    timings = _timed(parse, samples, per=len(lines) / 1000)
+    if not actions:
+        raise RuntimeError("TouchMonitor detected no actions in the synthetic stream")
+
+    # The same with the per-call-site log rate limit off: every touch logged
+    limiter = get_log_pipeline().limiter
+    rate, limiter.rate = limiter.rate, 0
+    try:
+        unlimited = _timed(parse, samples, per=len(lines) / 1000)
+    finally:
+        limiter.rate = rate
+    return {"touch_monitor.parse[per 1k lines]": timings, "touch_monitor.parse[per 1k lines, unlimited logs]": unlimited}
+
+
+class _FakeWebSocket:
+    """Serializes like Starlette's WebSocket and drops the bytes"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_json(self, data):
+        self.sent += len(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, text):
+        self.sent += len(text)
+
+
+@benchmark("ws")
+async def bench_ws(samples: int) -> Dict[str, List[float]]:
+    from api import realtime
+    from api.websocket import ConnectionManager
+
+    message = {
+        "type": "playback_progress", "current_step": 3, "total_steps": 30,
+        "step_data": _bench_flow(3)["steps"][0],
+    }
+    results = {}
+    for clients in (10, 100, 1000):
+        manager = ConnectionManager()
+        manager.active_connections["bench"] = {_FakeWebSocket() for _ in range(clients)}
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            await manager.broadcast("bench", message)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"ws.broadcast[{clients} clients]"] = timings
+
+        saved = list(realtime.active_connections)
+        realtime.active_connections[:] = [_FakeWebSocket() for _ in range(clients)]
+        timings = []
+        try:
+            for _ in range(samples):
+                start = time.perf_counter()
+                await realtime.broadcast_device_event("device_connected", message)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            realtime.active_connections[:] = saved
+        results[f"ws.realtime_broadcast[{clients} clients]"] = timings
+    return results
+
+
+# ---- flows ----
+
+@benchmark("flows")
+async def bench_flows(samples: int) -> Dict[str, List[float]]:
+    from fastapi.encoders import jsonable_encoder
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from api.flows import list_flows
+    from database import Base
+    from models.flow import Flow
+
+    steps = _bench_flow(15)["steps"]
+    results = {}
+    for count in (1000, 10000):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[Flow.__table__])
+        db = sessionmaker(bind=engine)()
+        db.bulk_save_objects([
+            Flow(name=f"Flow {i}", device_id="fake-0001", device_platform="Android",
+                 app_package="com.example.app", steps=steps, flow_metadata={"recorded_with": "bench"})
+            for i in range(count)
+        ])
+        db.commit()
+
+        timings = []
+        for _ in range(max(1, samples // (count // 1000))):
+            db.expire_all()
+            start = time.perf_counter()
+            # What the endpoint returns plus the response encoding FastAPI does
+            json.dumps(jsonable_encoder(await list_flows(db=db)))
+            timings.append((time.perf_counter() - start) * 1000)
+        results[f"flows.list[{count} flows]"] = timings
+        db.close()
+        engine.dispose()
+    return results
+
+
+# ---- startup ----
+
+@benchmark("startup")
+def bench_startup(samples: int) -> Dict[str, List[float]]:
+    from benchmarks.bench_startup import measure
+
+    # Each sample is a new interpreter; a few are enough
+    return {f"startup.{phase}": values for phase, values in measure(max(3, samples // 4)).items()}
+
+
+# ---- results ----
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_commit() -> str:
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    if _git("status", "--porcelain", "--untracked-files=no"):
+        commit += "-dirty"
+    return commit
+
+
+def results_path(ref: str) -> Path:
+    """Saved results for a commit-ish, or a path to a results file"""
+    path = Path(ref)
+    if path.suffix == ".json" and path.exists():
+        return path
+    commit = _git("rev-parse", "--short", ref) or ref
+    return RESULTS_DIR / f"{commit}.json"
+
+
+def run(names: List[str], samples: int, verbose: bool = False) -> Dict:
+    results = {}
+    for name in names:
+        print(f"[Bench] ⏱️ {name}")
+        try:
+            with contextlib.ExitStack() as stack:
+                if not verbose:
+                    devnull = stack.enter_context(open(os.devnull, "w", buffering=1))
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                # Stopped (queue drained) before the output is restored
+                stack.callback(configure_logging().stop)
+                outcome = BENCHMARKS[name](samples)
+                if asyncio.iscoroutine(outcome):
+                    outcome = asyncio.run(outcome)
+        except Exception as e:
+            print(f"[Bench] ❌ {name} failed: {e}")
+            continue
+        for case, values in outcome.items():
+            results[case] = {"unit": "ms", **_summary(values)}
+    return results
+
+
+def save(results: Dict, commit: str) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{commit}.json"
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": commit,
+                "created_at": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}",
+                "cpus": os.cpu_count(),
+            },
+            "results": results,
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def compare(baseline: Dict, results: Dict, threshold: float) -> List[str]:
+    """Print both runs side by side; returns the regressed benchmarks"""
+    regressions = []
+    print(f"\n{'benchmark':<52} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for case, now in results.items():
+        base = baseline.get(case)
+        if not base:
+            print(f"{case:<52} {'-':>10} {now['median']:>10.4f} {'new':>8}")
+            continue
+        change = (now["median"] - base["median"]) / base["median"] if base["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(case)
+            flag = " ⚠️"
+        print(f"{case:<52} {base['median']:>10.4f} {now['median']:>10.4f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--only', action='append', default=[], help=f"Benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--samples', type=int, default=20, help='Samples per benchmark case')
+    parser.add_argument('--compare', metavar='REF', help='Commit (or results .json) to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Median slowdown counted as a regression')
+    parser.add_argument('--no-save', action='store_true', help="Don't store this run's results")
+    parser.add_argument('--verbose', action='store_true', help="Show the benchmarked code's logs")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.only or name in args.only]
+    if not names:
+        parser.error(f"No such benchmark; choose from {', '.join(BENCHMARKS)}")
+
+    results = run(names, args.samples, args.verbose)
+    print(f"\n{'benchmark':<52} {'median ms':>10} {'p95 ms':>10} {'n':>5}")
+    for case, summary in results.items():
+        print(f"{case:<52} {summary['median']:>10.4f} {summary['p95']:>10.4f} {summary['n']:>5}")
+
+    commit = current_commit()
+    if not args.no_save:
+        print(f"\n[Bench] 💾 Saved to {save(results, commit)}")
+
+    if args.compare:
+        path = results_path(args.compare)
+        if not path.exists():
+            print(f"[Bench] ❌ No saved results for {args.compare} ({path})")
+            sys.exit(2)
+        with open(path) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {baseline['meta']['commit']} ({baseline['meta']['created_at']})")
+        regressions = compare(baseline["results"], results, args.threshold)
+        if regressions:
+            print(f"\n[Bench] ⚠️ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n[Bench] ✅ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     # Appium
     APPIUM_HOST: str = "localhost"
     APPIUM_PORT: int = 4723
+    APPIUM_FLEET_ENABLED: bool = True  # One Appium server per device (ports after APPIUM_PORT)
+    APPIUM_DEVICES_PER_NODE: int = 1
     
     # Playwright
     PLAYWRIGHT_PORT: int = 9323
@@ -33,6 +35,23 @@ class Settings(BaseSettings):
     # WebSocket
     WS_MESSAGE_QUEUE_SIZE: int = 100
     
+    # Web playback
+    WEB_PLAYBACK_MAX_WORKERS: int = 8  # Browser sessions a batch playback may open at once
+    
+    # Startup
+    LAZY_ROUTERS: bool = True  # Import AI/Appium/web routers on first use instead of at startup
+    
+    # Diagnostics
+    LOOP_WATCHDOG_ENABLED: bool = True
+    LOOP_STALL_THRESHOLD_MS: int = 100  # Event loop blocked this long is logged with its call site
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORT: str = "none"  # none (in-memory only), file (DATA_DIR/traces/spans.jsonl, rotated) or http (TRACE_COLLECTOR_URL)
+    TRACE_COLLECTOR_URL: str = ""
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # Per subsystem, e.g. "touch=WARNING,appium=DEBUG"
+    LOG_EVENT_RATE: float = 5.0  # Records per second per call site below WARNING (0 = unlimited)
+    LOG_TO_FILE: bool = True  # DATA_DIR/logs/backend.jsonl
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,13 +1,34 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from services.diagnostics.metrics import DB_QUERY_SECONDS
+from services.diagnostics.tracing import record_span
 
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False}
 )
 
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _observe_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    words = statement.split(None, 1)
+    kind = words[0].upper() if words else ""
+    DB_QUERY_SECONDS.labels(kind).observe(time.perf_counter() - started)
+    record_span(f"db {kind}", "db", started, statement=statement[:200])
+
+@event.listens_for(engine, "handle_error")
+def _drop_query_timer(context):
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
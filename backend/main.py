@@ -1,18 +1,50 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
-from api import projects, tests, devices, ai, websocket, inspector, realtime, flows, playback, appium_server, installed_apps, check_apk, element_inspector, codegen, code_editor, web_automation, web_routes, enhanced_actions
+# Only what the UI needs right away; the heavy subsystems are in LAZY_ROUTERS below
+from api import projects, devices, websocket, realtime, flows, installed_apps, check_apk, admin
 from database import engine, Base
+from config import settings
+from services.diagnostics.logs import configure_logging, get_log_pipeline, get_logger
+from services.diagnostics.loop_watchdog import get_loop_watchdog
+from services.diagnostics.metrics import get_metrics_registry
+from services.diagnostics.tracing import span
+from utils.lazy_routers import LazyRouterMiddleware, LazyRouters
+
+configure_logging()
+logger = get_logger("startup")
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables (every model, including those of routers not loaded yet)
+    import models  # noqa: F401
+    await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+    if settings.LOOP_WATCHDOG_ENABLED:
+        get_loop_watchdog().start()
+    # Find sessions left open on the Appium servers in the background, not on the first request
+    discovery = asyncio.ensure_future(_discover_sessions())
+    yield
+    discovery.cancel()
+    get_loop_watchdog().stop()
+    get_log_pipeline().stop()
+
+async def _discover_sessions():
+    from services.mobile.session_registry import get_session_registry
+    try:
+        await get_session_registry().discover()
+    except Exception as e:
+        logger.warning("[Startup] ⚠️ Session discovery failed: %s", e)
 
 app = FastAPI(
     title="GravityQA API",
     description="AI-Native Test Automation Platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -24,26 +56,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Not worth a trace each (scraped/polled constantly)
+UNTRACED_PATHS = {"/metrics", "/health"}
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per API request; its id is returned in X-Trace-Id"""
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with span(f"{request.method} {request.url.path}", "http", root=True,
+              method=request.method, path=request.url.path) as request_span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            request_span.rename(f"{request.method} {route.path}")
+        request_span.set(status_code=response.status_code)
+        if request_span.trace_id:
+            response.headers["X-Trace-Id"] = request_span.trace_id
+        return response
+
 # Include routers
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
-app.include_router(tests.router, prefix="/api/tests", tags=["tests"])
 app.include_router(devices.router, prefix="/api/devices", tags=["devices"])
-app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
-app.include_router(inspector.router)
-app.include_router(element_inspector.router)  # Element Inspector
-app.include_router(codegen.router)  # Code Generator
-app.include_router(code_editor.router)  # Code Editor
 app.include_router(realtime.router)
 app.include_router(flows.router)
-app.include_router(playback.router)
-app.include_router(appium_server.router)
 app.include_router(installed_apps.router)
 app.include_router(check_apk.router)
-app.include_router(web_automation.router)  # Web Automation (Playwright)
-app.include_router(web_routes.router)  # Web Automation (Selenium)
-app.include_router(enhanced_actions.router)  # Enhanced Actions (Type, Wait, Assert)
+app.include_router(admin.router)  # Admin / diagnostics
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
 
+# Imported on the first request under their prefix (AI, Appium, Selenium/Playwright)
+LAZY_ROUTERS = LazyRouters(app)
+LAZY_ROUTERS.add("/api/tests", "api.tests", prefix="/api/tests", tags=["tests"])
+LAZY_ROUTERS.add("/api/ai", "api.ai", prefix="/api/ai", tags=["ai"])
+LAZY_ROUTERS.add("/api/inspector", "api.inspector")
+LAZY_ROUTERS.add("/api/inspector", "api.element_inspector")  # Element Inspector
+LAZY_ROUTERS.add("/api/codegen", "api.codegen")  # Code Generator
+LAZY_ROUTERS.add("/api/code", "api.code_editor")  # Code Editor
+LAZY_ROUTERS.add("/api/playback", "api.playback")
+LAZY_ROUTERS.add("/api/appium", "api.appium_server")
+LAZY_ROUTERS.add("/api/web", "api.web_automation")  # Web Automation (Playwright)
+LAZY_ROUTERS.add("/api/web", "api.web_routes")  # Web Automation (Selenium)
+LAZY_ROUTERS.add("/api/actions", "api.enhanced_actions")  # Enhanced Actions (Type, Wait, Assert)
+if settings.LAZY_ROUTERS:
+    app.add_middleware(LazyRouterMiddleware, routers=LAZY_ROUTERS)
+else:
+    LAZY_ROUTERS.load_all()
+
 @app.get("/")
 async def root():
     return {
@@ -56,6 +115,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of every metric in the process"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -16,6 +16,7 @@ class Project(Base):
     apps = relationship("App", back_populates="project", cascade="all, delete-orphan")
     test_suites = relationship("TestSuite", back_populates="project", cascade="all, delete-orphan")
     test_runs = relationship("TestRun", back_populates="project", cascade="all, delete-orphan")
+    session_profile = relationship("ProjectSessionProfile", back_populates="project", uselist=False, cascade="all, delete-orphan")
 
 class App(Base):
     __tablename__ = "apps"
@@ -31,3 +32,17 @@ class App(Base):
     
     # Relationships
     project = relationship("Project", back_populates="apps")
+
+class ProjectSessionProfile(Base):
+    """Appium session profile used for a project's sessions (see services/mobile/session_profiles.py)"""
+    __tablename__ = "project_session_profiles"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, unique=True)
+    profile = Column(String, nullable=False)  # fast, faithful
+    capabilities = Column(JSON, nullable=True)  # Extra/overridden session capabilities
+    settings = Column(JSON, nullable=True)  # Extra/overridden driver settings
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    project = relationship("Project", back_populates="session_profile")
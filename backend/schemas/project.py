@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 class ProjectCreate(BaseModel):
@@ -35,3 +35,15 @@ class AppResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class SessionProfileUpdate(BaseModel):
+    profile: str
+    capabilities: Optional[Dict[str, Any]] = None
+    settings: Optional[Dict[str, Any]] = None
+
+class SessionProfileResponse(BaseModel):
+    project_id: int
+    name: str
+    description: str
+    capabilities: Dict[str, Any]
+    settings: Dict[str, Any]
@@ -1,6 +1,9 @@
 from typing import Dict, Optional
 from config import settings
+from services.diagnostics.metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+from services.diagnostics.tracing import record_span
 import os
+import time
 
 class LLMClient:
     """Client for LLM APIs (OpenAI, Anthropic)"""
@@ -15,6 +18,22 @@ class LLMClient:
         elif self.provider == "anthropic":
             self.api_key = settings.ANTHROPIC_API_KEY
     
+    def _observe(self, kind: str, started: float, model: str, response=None):
+        """Record call latency and, when the response reports usage, tokens"""
+        outcome = "ok" if response is not None else "error"
+        LLM_REQUEST_SECONDS.labels(self.provider, kind, outcome).observe(time.perf_counter() - started)
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            record_span(f"llm {kind}", "llm", started, provider=self.provider, model=model, outcome=outcome)
+            return
+        # OpenAI: prompt/completion_tokens, Anthropic: input/output_tokens
+        input_tokens = getattr(usage, "prompt_tokens", None) or getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "completion_tokens", None) or getattr(usage, "output_tokens", 0) or 0
+        LLM_TOKENS.labels(self.provider, model, "input").inc(input_tokens)
+        LLM_TOKENS.labels(self.provider, model, "output").inc(output_tokens)
+        record_span(f"llm {kind}", "llm", started, provider=self.provider, model=model, outcome=outcome,
+                    input_tokens=input_tokens, output_tokens=output_tokens)
+    
     async def chat_completion(
         self,
         messages: list,
@@ -32,6 +51,7 @@ class LLMClient:
     
     async def _openai_completion(self, messages, temperature, max_tokens) -> Optional[str]:
         """OpenAI API completion"""
+        started = time.perf_counter()
         try:
             from openai import AsyncOpenAI
             
@@ -43,15 +63,18 @@ class LLMClient:
                 temperature=temperature,
                 max_tokens=max_tokens
             )
+            self._observe("chat", started, self.model, response)
             
             return response.choices[0].message.content
         
         except Exception as e:
+            self._observe("chat", started, self.model)
             print(f"OpenAI API error: {e}")
             return None
     
     async def _anthropic_completion(self, messages, temperature, max_tokens) -> Optional[str]:
         """Anthropic API completion"""
+        started = time.perf_counter()
         try:
             from anthropic import AsyncAnthropic
             
@@ -74,10 +97,12 @@ class LLMClient:
                 temperature=temperature,
                 max_tokens=max_tokens
             )
+            self._observe("chat", started, self.model, response)
             
             return response.content[0].text
         
         except Exception as e:
+            self._observe("chat", started, self.model)
             print(f"Anthropic API error: {e}")
             return None
     
@@ -90,6 +115,7 @@ class LLMClient:
         """Get vision completion from LLM"""
         
         if self.provider == "openai":
+            started = time.perf_counter()
             try:
                 from openai import AsyncOpenAI
                 
@@ -114,14 +140,17 @@ class LLMClient:
                     temperature=temperature,
                     max_tokens=2000
                 )
+                self._observe("vision", started, "gpt-4-vision-preview", response)
                 
                 return response.choices[0].message.content
             
             except Exception as e:
+                self._observe("vision", started, "gpt-4-vision-preview")
                 print(f"Vision API error: {e}")
                 return None
         
         elif self.provider == "anthropic":
+            started = time.perf_counter()
             try:
                 from anthropic import AsyncAnthropic
                 
@@ -150,10 +179,12 @@ class LLMClient:
                         }
                     ]
                 )
+                self._observe("vision", started, "claude-3-5-sonnet-20241022", response)
                 
                 return response.content[0].text
             
             except Exception as e:
+                self._observe("vision", started, "claude-3-5-sonnet-20241022")
                 print(f"Vision API error: {e}")
                 return None
         
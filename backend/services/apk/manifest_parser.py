@@ -0,0 +1,515 @@
+"""
+Manifest Parser - Read app metadata straight from APK/IPA archives
+
+Reads only the entries we need from the zip (AndroidManifest.xml and
+resources.arsc for APKs, Payload/*.app/Info.plist for IPAs) without
+extracting the archive or shelling out to aapt.
+
+Android manifests are stored as binary XML (AXML); this module implements the
+small subset of the AXML and resource table formats needed for package name,
+version, application label and launcher activity.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import plistlib
+import re
+import struct
+import zipfile
+
+
+# Chunk types (frameworks/base/libs/androidfw/include/androidfw/ResourceTypes.h)
+RES_STRING_POOL_TYPE = 0x0001
+RES_TABLE_TYPE = 0x0002
+RES_XML_TYPE = 0x0003
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+RES_TABLE_PACKAGE_TYPE = 0x0200
+RES_TABLE_TYPE_TYPE = 0x0201
+
+UTF8_FLAG = 0x100
+
+# Res_value data types
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+NO_ENTRY = 0xFFFFFFFF
+
+# android: attribute resource ids, used when attribute names are stripped
+ANDROID_ATTRIBUTE_IDS = {
+    0x01010001: "label",
+    0x01010003: "name",
+    0x0101020C: "minSdkVersion",
+    0x01010270: "targetSdkVersion",
+    0x0101021B: "versionCode",
+    0x0101021C: "versionName",
+    0x01010202: "targetActivity",
+}
+
+
+class ManifestParseError(Exception):
+    """Raised when an archive doesn't contain a readable manifest"""
+
+
+def _read_string_pool(data: bytes, offset: int) -> List[str]:
+    """Decode a ResStringPool chunk starting at offset"""
+    _, header_size, _ = struct.unpack_from("<HHI", data, offset)
+    string_count, _, flags, strings_start, _ = struct.unpack_from("<IIIII", data, offset + 8)
+    is_utf8 = bool(flags & UTF8_FLAG)
+    offsets = struct.unpack_from(f"<{string_count}I", data, offset + header_size)
+    base = offset + strings_start
+    strings = []
+
+    for string_offset in offsets:
+        pos = base + string_offset
+        if is_utf8:
+            # utf16 length then utf8 byte length, each 1 or 2 bytes
+            if data[pos] & 0x80:
+                pos += 2
+            else:
+                pos += 1
+            length = data[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[pos + 1]
+                pos += 2
+            else:
+                pos += 1
+            strings.append(data[pos:pos + length].decode("utf-8", errors="replace"))
+        else:
+            length = struct.unpack_from("<H", data, pos)[0]
+            pos += 2
+            if length & 0x8000:
+                length = ((length & 0x7FFF) << 16) | struct.unpack_from("<H", data, pos)[0]
+                pos += 2
+            strings.append(data[pos:pos + length * 2].decode("utf-16-le", errors="replace"))
+
+    return strings
+
+
+def parse_axml(data: bytes) -> List[Tuple[int, str, Dict[str, object]]]:
+    """
+    Parse binary XML into a flat list of (depth, tag, attributes)
+
+    Attribute values are str for strings, int for integers/booleans and
+    "@0x7f..." for resource references. Raises ManifestParseError for
+    anything that isn't well-formed AXML, truncated documents included.
+    """
+    try:
+        return _parse_axml(data)
+    except (struct.error, IndexError) as e:
+        raise ManifestParseError(f"Truncated or corrupt binary XML: {e}") from e
+
+
+def _parse_axml(data: bytes) -> List[Tuple[int, str, Dict[str, object]]]:
+    chunk_type, header_size, total_size = struct.unpack_from("<HHI", data, 0)
+    if chunk_type != RES_XML_TYPE:
+        raise ManifestParseError("Not a binary XML document")
+    if total_size > len(data):
+        raise ManifestParseError(f"Truncated binary XML: {len(data)} of {total_size} bytes")
+
+    strings: List[str] = []
+    resource_ids: List[int] = []
+    elements = []
+    depth = 0
+    offset = header_size
+
+    while offset + 8 <= total_size:
+        chunk_type, chunk_header_size, chunk_size = struct.unpack_from("<HHI", data, offset)
+        if chunk_size < 8:
+            break
+
+        if chunk_type == RES_STRING_POOL_TYPE:
+            strings = _read_string_pool(data, offset)
+
+        elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+            count = (chunk_size - chunk_header_size) // 4
+            resource_ids = list(struct.unpack_from(f"<{count}I", data, offset + chunk_header_size))
+
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+            ext = offset + chunk_header_size
+            _, name_index, attribute_start, attribute_size, attribute_count = struct.unpack_from("<IIHHH", data, ext)
+            attributes = {}
+
+            for i in range(attribute_count):
+                pos = ext + attribute_start + i * attribute_size
+                _, attr_name, raw_value, _, _, data_type, value = struct.unpack_from("<IIIHBBI", data, pos)
+
+                name = strings[attr_name] if attr_name < len(strings) else ""
+                if attr_name < len(resource_ids) and resource_ids[attr_name] in ANDROID_ATTRIBUTE_IDS:
+                    # Obfuscated manifests strip names; the resource id is authoritative
+                    name = ANDROID_ATTRIBUTE_IDS[resource_ids[attr_name]]
+
+                if data_type == TYPE_STRING:
+                    attributes[name] = strings[value] if value < len(strings) else ""
+                elif raw_value != NO_ENTRY and raw_value < len(strings):
+                    attributes[name] = strings[raw_value]
+                elif data_type == TYPE_REFERENCE:
+                    attributes[name] = f"@0x{value:08x}"
+                elif data_type == TYPE_INT_BOOLEAN:
+                    attributes[name] = int(value != 0)
+                elif data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+                    attributes[name] = value
+                else:
+                    attributes[name] = value
+
+            elements.append((depth, strings[name_index] if name_index < len(strings) else "", attributes))
+            depth += 1
+
+        elif chunk_type == RES_XML_END_ELEMENT_TYPE:
+            depth -= 1
+
+        offset += chunk_size
+
+    return elements
+
+
+def resolve_resource_string(arsc: bytes, resource_id: int, _depth: int = 0) -> Optional[str]:
+    """
+    Look up a string resource in resources.arsc
+
+    Prefers the default (locale-less) configuration and follows one level of
+    references. Returns None if the id isn't a string.
+    """
+    if _depth > 2:
+        return None
+
+    package_id = resource_id >> 24
+    type_id = (resource_id >> 16) & 0xFF
+    entry_index = resource_id & 0xFFFF
+
+    chunk_type, header_size, total_size = struct.unpack_from("<HHI", arsc, 0)
+    if chunk_type != RES_TABLE_TYPE:
+        return None
+
+    global_strings: List[str] = []
+    offset = header_size
+    candidates = []
+
+    while offset + 8 <= min(total_size, len(arsc)):
+        chunk_type, chunk_header_size, chunk_size = struct.unpack_from("<HHI", arsc, offset)
+        if chunk_size < 8:
+            break
+
+        if chunk_type == RES_STRING_POOL_TYPE:
+            global_strings = _read_string_pool(arsc, offset)
+
+        elif chunk_type == RES_TABLE_PACKAGE_TYPE:
+            if struct.unpack_from("<I", arsc, offset + 8)[0] == package_id:
+                candidates.extend(_package_values(arsc, offset, chunk_header_size, chunk_size, type_id, entry_index))
+
+        offset += chunk_size
+
+    # Default configuration first
+    candidates.sort(key=lambda c: not c[0])
+    for _, data_type, value in candidates:
+        if data_type == TYPE_STRING and value < len(global_strings):
+            return global_strings[value]
+        if data_type == TYPE_REFERENCE:
+            resolved = resolve_resource_string(arsc, value, _depth + 1)
+            if resolved:
+                return resolved
+
+    return None
+
+
+def _package_values(arsc: bytes, package_offset: int, header_size: int, size: int, type_id: int, entry_index: int):
+    """Collect (is_default_config, data_type, data) for one entry across all type chunks"""
+    values = []
+    offset = package_offset + header_size
+    end = package_offset + size
+
+    while offset + 8 <= end:
+        chunk_type, chunk_header_size, chunk_size = struct.unpack_from("<HHI", arsc, offset)
+        if chunk_size < 8:
+            break
+
+        if chunk_type == RES_TABLE_TYPE_TYPE and arsc[offset + 8] == type_id:
+            value = _type_chunk_value(arsc, offset, chunk_header_size, entry_index)
+            if value:
+                values.append(value)
+
+        offset += chunk_size
+
+    return values
+
+
+def _type_chunk_value(arsc: bytes, offset: int, header_size: int, entry_index: int):
+    flags = arsc[offset + 9]
+    entry_count, entries_start = struct.unpack_from("<II", arsc, offset + 12)
+    config_offset = offset + 20
+    is_default = arsc[config_offset + 8:config_offset + 12] == b"\x00\x00\x00\x00"
+    index_base = offset + header_size
+
+    if flags & 0x01:
+        # Sparse: sorted (entry index u16, offset/4 u16) pairs
+        entry_offset = None
+        for i in range(entry_count):
+            idx, off = struct.unpack_from("<HH", arsc, index_base + i * 4)
+            if idx == entry_index:
+                entry_offset = off * 4
+                break
+        if entry_offset is None:
+            return None
+    elif entry_index >= entry_count:
+        return None
+    elif flags & 0x02:
+        # 16-bit offsets (offset/4), 0xFFFF means no entry
+        off = struct.unpack_from("<H", arsc, index_base + entry_index * 2)[0]
+        if off == 0xFFFF:
+            return None
+        entry_offset = off * 4
+    else:
+        entry_offset = struct.unpack_from("<I", arsc, index_base + entry_index * 4)[0]
+        if entry_offset == NO_ENTRY:
+            return None
+
+    pos = offset + entries_start + entry_offset
+    entry_size, entry_flags = struct.unpack_from("<HH", arsc, pos)
+
+    if entry_flags & 0x0008:
+        # Compact entry: data type in the high byte of flags, data follows the key
+        return is_default, entry_flags >> 8, struct.unpack_from("<I", arsc, pos + 4)[0]
+    if entry_flags & 0x0001:
+        # Complex (bag) entries are never plain strings
+        return None
+
+    _, _, data_type, data = struct.unpack_from("<HBBI", arsc, pos + entry_size)
+    return is_default, data_type, data
+
+
+def _full_class_name(package: str, name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    if name.startswith("."):
+        return package + name
+    if "." not in name:
+        return f"{package}.{name}"
+    return name
+
+
+def parse_apk(apk_path: str) -> Dict[str, Optional[str]]:
+    """
+    Extract package name, app name, version and launcher activity from an APK
+
+    Returns:
+        dict with keys: package_name, app_name, version_code, version_name,
+        main_activity, min_sdk_version, target_sdk_version, signature_hash
+    """
+    try:
+        archive = zipfile.ZipFile(apk_path)
+    except zipfile.BadZipFile as e:
+        raise ManifestParseError(f"APK is not a zip archive: {e}") from e
+
+    with archive:
+        try:
+            manifest = archive.read("AndroidManifest.xml")
+        except KeyError:
+            raise ManifestParseError("APK has no AndroidManifest.xml")
+
+        elements = parse_axml(manifest)
+        if not elements or elements[0][1] != "manifest":
+            raise ManifestParseError("Unexpected manifest root element")
+
+        root = elements[0][2]
+        package = root.get("package")
+        info = {
+            "package_name": package,
+            "app_name": None,
+            "version_code": str(root["versionCode"]) if root.get("versionCode") is not None else None,
+            "version_name": str(root["versionName"]) if root.get("versionName") is not None else None,
+            "main_activity": None,
+            "min_sdk_version": None,
+            "target_sdk_version": None,
+        }
+
+        label = None
+        current_activity = None
+        activity_depth = None
+        has_main = has_launcher = False
+
+        for depth, tag, attrs in elements:
+            if activity_depth is not None and depth <= activity_depth:
+                current_activity = activity_depth = None
+
+            if tag == "uses-sdk":
+                if attrs.get("minSdkVersion") is not None:
+                    info["min_sdk_version"] = str(attrs["minSdkVersion"])
+                if attrs.get("targetSdkVersion") is not None:
+                    info["target_sdk_version"] = str(attrs["targetSdkVersion"])
+            elif tag == "application":
+                label = attrs.get("label")
+            elif tag in ("activity", "activity-alias"):
+                current_activity, activity_depth = attrs.get("name"), depth
+                has_main = has_launcher = False
+            elif tag == "intent-filter":
+                has_main = has_launcher = False
+            elif tag == "action" and current_activity and attrs.get("name") == "android.intent.action.MAIN":
+                has_main = True
+            elif tag == "category" and current_activity and attrs.get("name") == "android.intent.category.LAUNCHER":
+                has_launcher = True
+
+            if has_main and has_launcher and current_activity and not info["main_activity"]:
+                info["main_activity"] = _full_class_name(package, current_activity)
+
+        if isinstance(label, str) and label.startswith("@0x"):
+            try:
+                label = resolve_resource_string(archive.read("resources.arsc"), int(label[1:], 16))
+            except (KeyError, struct.error, IndexError):
+                label = None
+        info["app_name"] = label if isinstance(label, str) else None
+
+        if info["version_name"] and info["version_name"].startswith("@0x"):
+            try:
+                info["version_name"] = resolve_resource_string(archive.read("resources.arsc"), int(info["version_name"][1:], 16))
+            except (KeyError, struct.error, IndexError):
+                info["version_name"] = None
+
+    if not info["package_name"]:
+        raise ManifestParseError("Manifest has no package name")
+    info["signature_hash"] = apk_signature_hash(apk_path)
+    return info
+
+
+# APK Signature Scheme v2/v3 block ids (newest first)
+APK_SIG_BLOCK_MAGIC = b"APK Sig Block 42"
+APK_SIGNATURE_SCHEME_IDS = (0xF05368C0, 0x7109871A)
+_V1_SIGNATURE_RE = re.compile(r"^META-INF/[^/]+\.(RSA|DSA|EC)$", re.IGNORECASE)
+
+
+def _der_tlv(data: bytes, pos: int) -> Tuple[int, int, int]:
+    """Read a DER TLV header; returns (tag, content_start, content_end)"""
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], "big")
+        pos += count
+    return tag, pos, pos + length
+
+
+def _pkcs7_first_certificate(data: bytes) -> Optional[bytes]:
+    """First certificate (DER) from a v1 PKCS#7 SignedData blob"""
+    _, start, _ = _der_tlv(data, 0)            # ContentInfo SEQUENCE
+    _, _, oid_end = _der_tlv(data, start)      # contentType OID
+    _, start, _ = _der_tlv(data, oid_end)      # [0] EXPLICIT
+    _, pos, end = _der_tlv(data, start)        # SignedData SEQUENCE
+
+    while pos < end:
+        tag, content_start, content_end = _der_tlv(data, pos)
+        if tag == 0xA0:                        # [0] IMPLICIT certificates
+            _, _, cert_end = _der_tlv(data, content_start)
+            return data[content_start:cert_end]
+        pos = content_end
+    return None
+
+
+def _signing_block_certificate(f) -> Optional[bytes]:
+    """First signer's certificate from the APK Signing Block (v3, then v2)"""
+    f.seek(0, 2)
+    file_size = f.tell()
+    tail_size = min(file_size, 65557)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+
+    eocd = tail.rfind(b"PK\x05\x06")
+    if eocd < 0:
+        return None
+    cd_offset = struct.unpack_from("<I", tail, eocd + 16)[0]
+    if cd_offset < 32:
+        return None
+
+    f.seek(cd_offset - 24)
+    block_size, magic = struct.unpack("<Q16s", f.read(24))
+    if magic != APK_SIG_BLOCK_MAGIC or block_size < 24 or block_size + 8 > cd_offset:
+        return None
+
+    f.seek(cd_offset - block_size - 8)
+    block = f.read(block_size - 16)
+    pairs = {}
+    pos = 8
+    while pos + 12 <= len(block):
+        pair_len, pair_id = struct.unpack_from("<QI", block, pos)
+        pairs[pair_id] = block[pos + 12:pos + 8 + pair_len]
+        pos += 8 + pair_len
+
+    for scheme_id in APK_SIGNATURE_SCHEME_IDS:
+        value = pairs.get(scheme_id)
+        if not value:
+            continue
+        # signers → signer → signed data → (digests, certificates) → first certificate
+        pos = 4                                   # signers sequence length
+        pos += 4                                  # first signer length
+        pos += 4                                  # signed data length
+        digests_len = struct.unpack_from("<I", value, pos)[0]
+        pos += 4 + digests_len
+        pos += 4                                  # certificates sequence length
+        cert_len = struct.unpack_from("<I", value, pos)[0]
+        return value[pos + 4:pos + 4 + cert_len]
+
+    return None
+
+
+def java_signature_hash(certificate: bytes) -> str:
+    """
+    Hash a certificate the way Android prints it in dumpsys package
+
+    android.content.pm.Signature.hashCode() is Arrays.hashCode(byte[]) over
+    the DER certificate, shown as Integer.toHexString.
+    """
+    h = 1
+    for byte in certificate:
+        h = (31 * h + (byte - 256 if byte > 127 else byte)) & 0xFFFFFFFF
+    return format(h, "x")
+
+
+def apk_signature_hash(apk_path: str) -> Optional[str]:
+    """Signing certificate hash of an APK, comparable with dumpsys signatures"""
+    try:
+        with open(apk_path, "rb") as f:
+            certificate = _signing_block_certificate(f)
+        if certificate is None:
+            with zipfile.ZipFile(apk_path) as archive:
+                name = next((n for n in archive.namelist() if _V1_SIGNATURE_RE.match(n)), None)
+                if name:
+                    certificate = _pkcs7_first_certificate(archive.read(name))
+    except (OSError, struct.error, IndexError, zipfile.BadZipFile):
+        return None
+    return java_signature_hash(certificate) if certificate else None
+
+
+_INFO_PLIST_RE = re.compile(r"^Payload/[^/]+\.app/Info\.plist$")
+
+
+def parse_ipa(ipa_path: str) -> Dict[str, Optional[str]]:
+    """
+    Extract bundle id, display name and version from an IPA
+
+    Returns:
+        dict with keys: package_name (bundle id), app_name, version_code,
+        version_name, main_activity (always None), min_os_version
+    """
+    try:
+        with zipfile.ZipFile(ipa_path) as archive:
+            plist_name = next((n for n in archive.namelist() if _INFO_PLIST_RE.match(n)), None)
+            if not plist_name:
+                raise ManifestParseError("IPA has no Payload/*.app/Info.plist")
+            plist = plistlib.loads(archive.read(plist_name))
+    except (zipfile.BadZipFile, plistlib.InvalidFileException) as e:
+        raise ManifestParseError(f"Unreadable IPA: {e}") from e
+
+    bundle_id = plist.get("CFBundleIdentifier") if isinstance(plist, dict) else None
+    if not bundle_id:
+        raise ManifestParseError("Info.plist has no CFBundleIdentifier")
+
+    return {
+        "package_name": bundle_id,
+        "app_name": plist.get("CFBundleDisplayName") or plist.get("CFBundleName"),
+        "version_code": plist.get("CFBundleVersion"),
+        "version_name": plist.get("CFBundleShortVersionString"),
+        "main_activity": None,
+        "min_os_version": plist.get("MinimumOSVersion"),
+    }
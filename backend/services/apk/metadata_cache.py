@@ -0,0 +1,144 @@
+"""App Metadata Cache - Parsed APK/IPA metadata keyed by file content hash"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from config import settings
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("apk")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Parsed builds remembered (and files whose hash is remembered); least recently used go first.
+# This also bounds the JSON file, which is rewritten whole on every put.
+MAX_ENTRIES = 2000
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AppMetadataCache:
+    """
+    Persistent "parser:sha256" → metadata map
+
+    The same build is usually checked and then installed, often several
+    times. Looking it up by content hash makes every repeat a dictionary hit;
+    a (size, mtime) fast-path per path skips re-hashing unchanged files.
+    Keys are namespaced by parser ("apk", "manifest", "ipa"), since each
+    one produces different fields for the same file. At most max_entries
+    of each are kept, least recently used out first.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()  # LRU first
+        self._stat_hashes: "OrderedDict[str, tuple]" = OrderedDict()  # {file_path: (size, mtime_ns, sha256)}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Snapshots are written in the order they were taken
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                # Entries from before namespacing have bare hash keys; they are re-parsed
+                self.entries = OrderedDict((key, value) for key, value in json.load(f).items() if ":" in key)
+        except FileNotFoundError:
+            self.entries = OrderedDict()
+        except Exception as e:
+            logger.warning("[MetadataCache] ⚠️ Could not load %s: %s", self.path, e)
+            self.entries = OrderedDict()
+        self._trim(self.entries)
+
+    def _trim(self, entries: OrderedDict):
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _save(self):
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.entries)
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(self.path), prefix=".metadata-",
+                                                 suffix=".tmp", delete=False) as f:
+                    tmp_path = f.name
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logger.warning("[MetadataCache] ⚠️ Could not save %s: %s", self.path, e)
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def content_hash(self, file_path: str) -> str:
+        """Content hash of a file, re-hashing only if size or mtime changed"""
+        stat = os.stat(file_path)
+        with self._lock:
+            known = self._stat_hashes.get(file_path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+
+        sha256 = hash_file(file_path)
+        self._remember(file_path, stat, sha256)
+        return sha256
+
+    def _remember(self, file_path: str, stat: os.stat_result, sha256: str):
+        with self._lock:
+            self._stat_hashes[file_path] = (stat.st_size, stat.st_mtime_ns, sha256)
+            self._stat_hashes.move_to_end(file_path)
+            self._trim(self._stat_hashes)
+
+    def remember_hash(self, file_path: str, sha256: str):
+        """Record a hash computed elsewhere (e.g. while the file was uploaded)"""
+        self._remember(file_path, os.stat(file_path), sha256)
+
+    def get(self, namespace: str, sha256: str) -> Optional[dict]:
+        key = f"{namespace}:{sha256}"
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+        return dict(entry) if entry else None
+
+    def put(self, namespace: str, sha256: str, metadata: dict):
+        key = f"{namespace}:{sha256}"
+        with self._lock:
+            self.entries[key] = dict(metadata)
+            self.entries.move_to_end(key)
+            self._trim(self.entries)
+        self._save()
+
+    def get_or_parse(self, namespace: str, file_path: str, parser: Callable[[str], dict], sha256: str = None) -> dict:
+        """Return cached metadata for the file's content (from this parser), parsing it on a miss"""
+        sha256 = sha256 or self.content_hash(file_path)
+        cached = self.get(namespace, sha256)
+        if cached:
+            logger.debug("[MetadataCache] ✅ Hit for %s (%s, %s)", os.path.basename(file_path), namespace, sha256[:12])
+            return cached
+
+        metadata = parser(file_path)
+        if metadata.get("package_name"):
+            self.put(namespace, sha256, metadata)
+        return metadata
+
+
+_metadata_cache: Optional[AppMetadataCache] = None
+
+
+def get_metadata_cache() -> AppMetadataCache:
+    """Get the process-wide app metadata cache"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        _metadata_cache = AppMetadataCache(str(settings.DATA_DIR / "app_metadata_cache.json"))
+    return _metadata_cache
@@ -0,0 +1,209 @@
+"""Upload Store - Content-addressed storage for uploaded APK/IPA builds"""
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import settings
+from services.apk.metadata_cache import get_metadata_cache
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("apk")
+
+# Bytes read from the upload per iteration; memory use is bounded by this
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Oldest builds are pruned once the store grows past this size
+MAX_STORE_BYTES = 5 * 1024 * 1024 * 1024
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _touch(path: str):
+    """Mark a build as recently used (atime only, so the mtime-based hash fast-path stays valid)"""
+    os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+
+
+class UploadStore:
+    """
+    Keeps each uploaded build once on disk, named by its SHA-256
+
+    Uploads are streamed to a partial file in fixed-size chunks while being
+    hashed, then renamed to <sha256><ext>. Uploading the same build again
+    (or for another device) reuses the stored copy.
+
+    Builds being analyzed or installed are leased; prune() never deletes a
+    leased build. save_upload() and receive() return with the build leased,
+    and the caller hands it back with release(path).
+    """
+
+    def __init__(self, root: str, max_bytes: int = MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._leases: Dict[str, int] = {}  # {path: holders}
+        self._lease_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def acquire(self, path: str):
+        """Lease a stored build so prune() leaves it alone; raises FileNotFoundError if it is gone"""
+        with self._lease_lock:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            self._leases[path] = self._leases.get(path, 0) + 1
+
+    def release(self, path: str):
+        with self._lease_lock:
+            holders = self._leases.get(path, 0) - 1
+            if holders > 0:
+                self._leases[path] = holders
+            else:
+                self._leases.pop(path, None)
+
+    @contextmanager
+    def lease(self, path: str):
+        """Hold a build for the duration of a block (an install streaming it, say)"""
+        self.acquire(path)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def find(self, sha256: str) -> Optional[str]:
+        """Path of a stored build with this hash, if we have it"""
+        sha256 = (sha256 or "").lower()
+        if not _SHA256_RE.match(sha256):
+            return None
+        for path in glob.glob(os.path.join(self.root, f"{sha256}.*")):
+            if not path.endswith(".partial"):
+                _touch(path)
+                return path
+        return None
+
+    async def save_upload(self, upload, expected_sha256: Optional[str] = None) -> dict:
+        """
+        Stream an UploadFile to the store, hashing as bytes arrive
+
+        The stored build is leased; release(path) it when done.
+
+        Returns:
+            {path, sha256, size, reused}
+        """
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        partial_path = os.path.join(self.root, f"{uuid.uuid4().hex}.partial")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(partial_path, "wb") as f:
+                while True:
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            os.remove(partial_path)
+            raise ValueError(f"Upload hash mismatch: expected {expected_sha256}, got {sha256}")
+
+        final_path = os.path.join(self.root, f"{sha256}{extension}")
+        with self._lease_lock:
+            reused = os.path.exists(final_path)
+            if reused:
+                os.remove(partial_path)
+                _touch(final_path)
+            else:
+                os.replace(partial_path, final_path)
+            self._leases[final_path] = self._leases.get(final_path, 0) + 1
+
+        # The analyzer can skip hashing the file again
+        get_metadata_cache().remember_hash(final_path, sha256)
+
+        logger.info("[UploadStore] %s %s → %s (%s bytes)", '♻️ Reused' if reused else '✅ Stored', upload.filename, sha256[:12], size)
+        if not reused:
+            await asyncio.to_thread(self.prune)
+
+        return {"path": final_path, "sha256": sha256, "size": size, "reused": reused}
+
+    async def receive(self, upload=None, sha256: Optional[str] = None) -> dict:
+        """
+        Resolve an install/check request to a stored build
+
+        If the client sends the hash of a build we already have, the upload
+        body (if any) is ignored. Raises LookupError if neither a known hash
+        nor a file was provided. The build is leased; release(path) it when done.
+
+        Returns:
+            {path, sha256, size, reused, filename}
+        """
+        stored_path = self.find(sha256) if sha256 else None
+        if stored_path:
+            try:
+                self.acquire(stored_path)
+            except FileNotFoundError:
+                stored_path = None  # Pruned since find()
+        if stored_path:
+            logger.info("[UploadStore] ⚡ Already have build %s, skipping upload", sha256[:12])
+            get_metadata_cache().remember_hash(stored_path, sha256.lower())
+            return {
+                "path": stored_path,
+                "sha256": sha256.lower(),
+                "size": os.path.getsize(stored_path),
+                "reused": True,
+                "filename": upload.filename if upload and upload.filename else os.path.basename(stored_path)
+            }
+
+        if upload is None:
+            raise LookupError("No file uploaded and no stored build matches the given sha256")
+
+        saved = await self.save_upload(upload, sha256)
+        saved["filename"] = upload.filename
+        return saved
+
+    def prune(self):
+        """Delete least recently used builds, other than leased ones, until the store fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith(".partial") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_atime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            with self._lease_lock:
+                if self._leases.get(path):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("[UploadStore] ⚠️ Could not prune %s: %s", path, e)
+                    continue
+            total -= size
+            logger.info("[UploadStore] 🗑️ Pruned %s", os.path.basename(path))
+
+
+_upload_store: Optional[UploadStore] = None
+
+
+def get_upload_store() -> UploadStore:
+    """Get the shared upload store"""
+    global _upload_store
+    if _upload_store is None:
+        _upload_store = UploadStore(str(settings.DATA_DIR / "uploads"))
+    return _upload_store
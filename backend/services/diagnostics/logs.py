@@ -0,0 +1,236 @@
+"""
+Logs - Structured, queued logging with per-subsystem levels
+
+The recording monitors, playback and the Appium service used to print
+several lines per step, touch event and poll. Each print is a synchronous
+write to stdout from inside a hot loop or monitor thread. These subsystems
+now log through get_logger("<subsystem>"):
+
+- Levels are per subsystem (LOG_LEVEL, overridden by LOG_LEVELS such as
+  "touch=WARNING,appium=DEBUG", or at runtime via /api/admin/logging), and a
+  disabled level costs one isEnabledFor() check. Call sites pass
+  %-style arguments, so nothing is formatted for dropped records.
+- Records below WARNING are rate-limited per call site (LOG_EVENT_RATE per
+  second, bursting to the same). A site that is over its rate is skipped
+  and counted, and the next record it emits says how many were suppressed.
+  Warnings and errors always pass.
+- Accepted records go onto a queue. A listener thread writes them to the
+  console (the message alone, so it reads like the old prints) and to
+  DATA_DIR/logs/backend.jsonl as one JSON object per line. The object has
+  the time, level, subsystem, thread, trace id and any `extra` fields.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from config import settings
+from services.diagnostics.tracing import current_trace_id
+
+ROOT = "gravityqa"
+
+# Records waiting for the listener; beyond this they are dropped (and counted)
+QUEUE_SIZE = 10000
+
+LOG_DIR = settings.DATA_DIR / "logs"
+LOG_FILE_BYTES = 20 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# LogRecord attributes; anything else on a record came from `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "trace_id"}
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger for a subsystem ("playback", "touch", "appium", ...); starts the pipeline if needed"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT}.{subsystem}")
+
+
+class EventRateLimiter(logging.Filter):
+    """Token bucket per call site for records below WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._sites: Dict[tuple, list] = {}  # {(path, line): [tokens, last refill, suppressed]}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id()
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [self.rate, now, 0]
+            site[0] = min(self.rate, site[0] + (now - site[1]) * self.rate)
+            site[1] = now
+            if site[0] < 1:
+                site[2] += 1
+                self.suppressed += 1
+                return False
+            site[0] -= 1
+            skipped, site[2] = site[2], 0
+        if skipped:
+            record.msg = f"{record.msg} (+{skipped} similar suppressed)"
+            record.suppressed = skipped
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at the time, like print()"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "subsystem": record.name[len(ROOT) + 1:] if record.name.startswith(ROOT + ".") else record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    """"touch=WARNING,appium=debug" -> {"touch": 30, "appium": 10}"""
+    levels = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        subsystem, _, level = part.partition("=")
+        levels[subsystem.strip()] = _level(level)
+    return levels
+
+
+def _level(name) -> int:
+    level = logging.getLevelName(str(name).strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return level
+
+
+class LogPipeline:
+    """The gravityqa logger tree, its queue and the listener that drains it"""
+
+    def __init__(self, level: str = "INFO", levels: str = "", event_rate: float = 5.0, to_file: bool = True):
+        self.root = logging.getLogger(ROOT)
+        self.level = _level(level)
+        self.levels = _parse_levels(levels)
+        self.limiter = EventRateLimiter(event_rate)
+        self.handler = _DroppingQueueHandler(queue.Queue(QUEUE_SIZE))
+        self.handler.addFilter(self.limiter)
+        self.to_file = to_file
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def start(self):
+        if self.listener is not None:
+            return
+        console = _ConsoleHandler()
+        console.setFormatter(logging.Formatter("%(message)s"))
+        handlers = [console]
+        if self.to_file:
+            LOG_DIR.mkdir(parents=True, exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                LOG_DIR / "backend.jsonl", maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+            file_handler.setFormatter(JsonFormatter())
+            handlers.append(file_handler)
+
+        self.root.setLevel(self.level)
+        self.root.propagate = False
+        self.root.addHandler(self.handler)
+        for subsystem, level in self.levels.items():
+            logging.getLogger(f"{ROOT}.{subsystem}").setLevel(level)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, *handlers)
+        self.listener.start()
+
+    def stop(self):
+        """Flush what is queued and stop the listener"""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.listener = None
+        self.root.removeHandler(self.handler)
+
+    def set_level(self, subsystem: Optional[str], level: str):
+        """Change a subsystem's level (or the default, with subsystem=None) while running"""
+        value = _level(level)
+        if subsystem:
+            self.levels[subsystem] = value
+            logging.getLogger(f"{ROOT}.{subsystem}").setLevel(value)
+        else:
+            self.level = value
+            self.root.setLevel(value)
+
+    def get_stats(self) -> Dict:
+        return {
+            "running": self.listener is not None,
+            "level": logging.getLevelName(self.level),
+            "levels": {subsystem: logging.getLevelName(level) for subsystem, level in self.levels.items()},
+            "event_rate": self.limiter.rate,
+            "suppressed": self.limiter.suppressed,
+            "dropped": self.handler.dropped,
+            "queued": self.handler.queue.qsize(),
+        }
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def get_log_pipeline() -> LogPipeline:
+    """Get the process-wide log pipeline"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(settings.LOG_LEVEL, settings.LOG_LEVELS, settings.LOG_EVENT_RATE, settings.LOG_TO_FILE)
+        atexit.register(_pipeline.stop)  # Write out what is still queued
+    return _pipeline
+
+
+def configure_logging() -> LogPipeline:
+    """Start the pipeline (idempotent)"""
+    pipeline = get_log_pipeline()
+    if pipeline.listener is None:
+        pipeline.start()
+    return pipeline
@@ -0,0 +1,242 @@
+"""
+Loop Watchdog - Measure event-loop lag and catch the calls that block it
+
+Handlers are async but plenty of what they call is not (subprocess.run,
+requests, time.sleep, synchronous SQLAlchemy and Selenium). While one of
+those runs on the event loop every other request, WebSocket and background
+task waits, and the UI freezes.
+
+A heartbeat task on the loop wakes every HEARTBEAT_INTERVAL and records how
+late it woke (the loop lag). A watchdog thread checks the heartbeat; when
+it is more than the threshold overdue, the loop is stuck in some call and
+the thread samples the loop thread's stack until the heartbeat resumes.
+Each stall is attributed to its call site (the innermost backend frame and
+the call it was blocked in) and aggregated with counts and stall time.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("watchdog")
+
+HEARTBEAT_INTERVAL = 0.05
+
+# Lag samples kept for percentiles (~1 minute)
+LAG_SAMPLES = 1200
+
+# Distinct call sites kept; the ones with the least stall time are dropped first
+MAX_SITES = 200
+
+RECENT_STALLS = 50
+
+# Frames of our own code, as opposed to the stdlib and site-packages
+BACKEND_DIR = str(Path(__file__).resolve().parents[2])
+
+
+def _is_backend_frame(filename: str) -> bool:
+    return filename.startswith(BACKEND_DIR) and "site-packages" not in filename
+
+
+def _relative(filename: str) -> str:
+    if filename.startswith(BACKEND_DIR):
+        return filename[len(BACKEND_DIR):].lstrip("/\\")
+    return filename
+
+
+class CallSite:
+    def __init__(self, key: str, stack: List[str]):
+        self.key = key
+        self.stack = stack
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen = 0.0
+
+    def add(self, stall_ms: float, stack: List[str]):
+        self.count += 1
+        self.total_ms += stall_ms
+        self.max_ms = max(self.max_ms, stall_ms)
+        self.last_seen = time.time()
+        self.stack = stack
+
+    def to_dict(self) -> Dict:
+        return {
+            "site": self.key,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else 0,
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class LoopWatchdog:
+    """Heartbeat on the event loop plus a thread that samples it when it stalls"""
+
+    def __init__(self, threshold_ms: float = 100):
+        self.threshold = threshold_ms / 1000
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        self._beat = time.monotonic()  # Last time the heartbeat ran
+        self.lags: deque = deque(maxlen=LAG_SAMPLES)  # seconds
+        self.max_lag = 0.0
+        self.sites: Dict[str, CallSite] = {}
+        self.recent: deque = deque(maxlen=RECENT_STALLS)
+        self.stalls = 0
+        self.stall_time = 0.0
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Start watching the running loop (call from the loop)"""
+        if self._running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._running = True
+        self._beat = time.monotonic()
+        self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("[LoopWatchdog] 🐶 Watching the event loop (stall threshold %.0fms)", self.threshold * 1000)
+
+    def stop(self):
+        self._running = False
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heartbeat(self):
+        while self._running:
+            expected = time.monotonic() + HEARTBEAT_INTERVAL
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self._beat = now
+
+    # ---- watchdog thread ----
+
+    def _watch(self):
+        poll = max(0.005, self.threshold / 4)
+        while self._running:
+            time.sleep(poll)
+            beat = self._beat
+            overdue = time.monotonic() - beat - HEARTBEAT_INTERVAL
+            if overdue < self.threshold:
+                continue
+
+            # Stuck: sample the loop thread until the heartbeat runs again
+            samples: List[tuple] = []
+            while self._running and self._beat == beat:
+                sample = self._sample()
+                if sample:
+                    samples.append(sample)
+                time.sleep(poll)
+            if samples and self._beat != beat:
+                self._record(self._beat - beat - HEARTBEAT_INTERVAL, samples)
+
+    def _sample(self) -> Optional[tuple]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        # Drop the loop machinery below the callback that is running
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index].filename.endswith(("asyncio/events.py", "asyncio\\events.py")):
+                stack = traceback.StackSummary.from_list(stack[index + 1:]) or stack
+                break
+        return self.call_site(stack), [
+            f"{_relative(entry.filename)}:{entry.lineno} in {entry.name}" for entry in stack[-12:]
+        ]
+
+    @staticmethod
+    def call_site(stack: traceback.StackSummary) -> str:
+        """'<innermost backend frame> → <call it is blocked in>'"""
+        innermost = stack[-1]
+        blocked_in = f"{Path(innermost.filename).name}:{innermost.lineno} in {innermost.name}"
+        for entry in reversed(stack):
+            if _is_backend_frame(entry.filename):
+                ours = f"{_relative(entry.filename)}:{entry.lineno} in {entry.name}"
+                return ours if entry is innermost else f"{ours} → {blocked_in}"
+        return blocked_in
+
+    def _record(self, stall: float, samples: List[tuple]):
+        # The site the loop was seen in most often during this stall
+        key = Counter(site for site, _ in samples).most_common(1)[0][0]
+        stack = next(stack for site, stack in reversed(samples) if site == key)
+        stall_ms = stall * 1000
+        with self._lock:
+            site = self.sites.get(key)
+            if site is None:
+                if len(self.sites) >= MAX_SITES:
+                    least = min(self.sites.values(), key=lambda s: s.total_ms)
+                    del self.sites[least.key]
+                site = self.sites[key] = CallSite(key, stack)
+            site.add(stall_ms, stack)
+            self.stalls += 1
+            self.stall_time += stall
+            self.recent.append({"at": time.time(), "stall_ms": round(stall_ms, 1), "site": key})
+        logger.warning("[LoopWatchdog] ⚠️ Event loop blocked for %.0fms at %s", stall_ms, key)
+
+    # ---- reporting ----
+
+    def reset(self):
+        with self._lock:
+            self.sites.clear()
+            self.recent.clear()
+            self.lags.clear()
+            self.max_lag = 0.0
+            self.stalls = 0
+            self.stall_time = 0.0
+
+    def get_stats(self, top: int = 20) -> Dict:
+        lags = sorted(self.lags)
+
+        def percentile(p: float) -> float:
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 2) if lags else 0.0
+
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda s: s.total_ms, reverse=True)[:top]
+            return {
+                "running": self._running,
+                "threshold_ms": self.threshold * 1000,
+                "lag_ms": {
+                    "current": round(self.lags[-1] * 1000, 2) if self.lags else 0.0,
+                    "p50": percentile(0.5),
+                    "p99": percentile(0.99),
+                    "max": round(self.max_lag * 1000, 2),
+                    "samples": len(lags),
+                },
+                "stalls": self.stalls,
+                "stall_time_ms": round(self.stall_time * 1000, 1),
+                "sites": [site.to_dict() for site in sites],
+                "recent": list(self.recent),
+            }
+
+
+_loop_watchdog: Optional[LoopWatchdog] = None
+
+
+def get_loop_watchdog() -> LoopWatchdog:
+    """Get the shared loop watchdog"""
+    global _loop_watchdog
+    if _loop_watchdog is None:
+        _loop_watchdog = LoopWatchdog(settings.LOOP_STALL_THRESHOLD_MS)
+    return _loop_watchdog
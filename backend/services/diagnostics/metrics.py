@@ -0,0 +1,340 @@
+"""
+Metrics - Prometheus-style counters, gauges and histograms
+
+Cheap enough to leave on in hot paths: every thread updates its own shard
+of each metric (a plain list reached through threading.local), so there is
+no lock on inc()/observe() and no lost updates between the event loop,
+the thread pool and monitor threads. Shards are summed only when /metrics
+is scraped.
+
+Metrics are declared once at the bottom of this module, so everything the
+backend reports is listed in one place:
+
+    APPIUM_COMMAND_SECONDS.labels(command="POST element", device=udid).observe(0.042)
+    with PLAYBACK_STEP_SECONDS.labels(action="tap", outcome="ok").time(): ...
+
+Gauges that mirror existing state (queue depth, connected clients) use
+set_function(), evaluated at scrape time.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers a local adb call up to a slow LLM request
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Label combinations per metric; further ones are folded into "other" (device ids, paths...)
+MAX_CHILDREN = 1000
+
+OVERFLOW_LABEL = "other"
+
+
+class _Shards:
+    """Per-thread float cells, summed on read"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._all: List[List[float]] = []
+        self._lock = threading.Lock()  # Only taken when a thread gets its first shard, and on read
+
+    def cells(self) -> List[float]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0.0] * self.size
+            with self._lock:
+                self._all.append(cells)
+            self._local.cells = cells
+            return cells
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._all)
+        return [math.fsum(shard[i] for shard in shards) for i in range(self.size)]
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1):
+        self._shards.cells()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._base = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._base = value - self._shards.totals()[0]
+
+    def inc(self, amount: float = 1):
+        self._shards.cells()[0] += amount
+
+    def dec(self, amount: float = 1):
+        self._shards.cells()[0] -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Report function() at scrape time instead of a stored value"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception:
+                return math.nan
+        return self._base + self._shards.totals()[0]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One cell per bucket, then +Inf, sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float):
+        cells = self._shards.cells()
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def value(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts incl. +Inf, sum, count)"""
+        totals = self._shards.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs.get(name, "") for name in self.labelnames)
+        child = self._children.get(values)  # Hot path: label values already strings
+        if child is not None:
+            return child
+        key = tuple("" if value is None else str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                if len(self._children) >= MAX_CHILDREN:
+                    key = (OVERFLOW_LABEL,) * len(self.labelnames)
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        with self._lock:
+            self._children.pop(tuple(str(value) for value in values), None)
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.children():
+                if isinstance(metric, Histogram):
+                    cumulative, total, count = child.value()
+                    for bound, bucket_count in zip(metric.buckets + (math.inf,), cumulative):
+                        labels = _format_labels(metric.labelnames, values, f'le="{_format_value(bound)}"')
+                        lines.append(f"{metric.name}_bucket{labels} {_format_value(bucket_count)}")
+                    labels = _format_labels(metric.labelnames, values)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{labels} {_format_value(count)}")
+                else:
+                    labels = _format_labels(metric.labelnames, values)
+                    lines.append(f"{metric.name}{labels} {_format_value(child.value())}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
+
+
+_registry = get_metrics_registry()
+
+# ---- Appium / WebDriver ----
+APPIUM_COMMAND_SECONDS = _registry.histogram(
+    "gravityqa_appium_command_seconds", "WebDriver command latency", ("command", "device"))
+APPIUM_COMMAND_ERRORS = _registry.counter(
+    "gravityqa_appium_command_errors_total", "WebDriver commands that failed or returned an error status", ("command", "device"))
+SCREENSHOTS = _registry.counter(
+    "gravityqa_screenshots_total", "Screenshots taken", ("device",))
+SCREENSHOT_BYTES = _registry.counter(
+    "gravityqa_screenshot_bytes_total", "Decoded screenshot bytes", ("device",))
+SCREENSHOT_FPS = _registry.gauge(
+    "gravityqa_screenshot_fps", "Recent screenshot rate (smoothed)", ("device",))
+
+# ---- adb ----
+ADB_COMMAND_SECONDS = _registry.histogram(
+    "gravityqa_adb_command_seconds", "adb command latency, queue wait excluded", ("command", "lane"))
+ADB_QUEUE_WAIT_SECONDS = _registry.histogram(
+    "gravityqa_adb_queue_wait_seconds", "Time adb commands waited for a device slot", ("lane",))
+ADB_QUEUE_DEPTH = _registry.gauge(
+    "gravityqa_adb_queue_depth", "adb commands waiting for a device slot", ("device",))
+
+# ---- playback ----
+PLAYBACK_STEP_SECONDS = _registry.histogram(
+    "gravityqa_playback_step_seconds", "Playback step execution time", ("action", "outcome"))
+PLAYBACK_SETTLE_SECONDS = _registry.histogram(
+    "gravityqa_playback_settle_seconds", "Time playback waits between steps", ("reason",))
+
+# ---- LLM ----
+LLM_REQUEST_SECONDS = _registry.histogram(
+    "gravityqa_llm_request_seconds", "LLM API call latency", ("provider", "kind", "outcome"))
+LLM_TOKENS = _registry.counter(
+    "gravityqa_llm_tokens_total", "LLM tokens used", ("provider", "model", "direction"))
+
+# ---- WebSockets ----
+WEBSOCKET_CLIENTS = _registry.gauge(
+    "gravityqa_websocket_clients", "Connected WebSocket clients", ("endpoint",))
+WEBSOCKET_PENDING_SENDS = _registry.gauge(
+    "gravityqa_websocket_pending_sends", "WebSocket messages being sent to clients", ("endpoint",))
+WEBSOCKET_MESSAGES = _registry.counter(
+    "gravityqa_websocket_messages_total", "WebSocket messages sent to clients", ("endpoint",))
+
+# ---- database ----
+DB_QUERY_SECONDS = _registry.histogram(
+    "gravityqa_db_query_seconds", "SQL statement execution time", ("statement",))
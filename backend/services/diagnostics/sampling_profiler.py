@@ -0,0 +1,273 @@
+"""
+Sampling Profiler - See where the live backend spends its time
+
+A background thread wakes every `interval` and reads the current stack of
+every other thread (sys._current_frames), so the event loop, the thread
+pool and monitor threads (TouchMonitor, device trackers) are all covered
+without instrumenting anything. Nothing runs in the profiled threads; the
+cost is one stack walk per thread per sample.
+
+Modes:
+- wall: every sample counts, whether the thread was running or waiting
+- cpu:  each sample is weighted by the CPU time the thread used since the
+        previous sample (microseconds), so idle and blocked threads vanish
+
+Output is the collapsed-stack format flamegraph.pl, speedscope and
+inferno read: one "thread;outer;...;inner weight" line per distinct stack.
+
+A profile either runs for a fixed number of seconds, or continuously into a
+ring buffer of per-second buckets from which the last N seconds can be
+taken at any time.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Optional
+
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("profiler")
+
+MODES = ("wall", "cpu")
+
+DEFAULT_INTERVAL = 0.01
+
+# Deepest stack recorded (outermost frames are dropped beyond this)
+MAX_DEPTH = 128
+
+# Frame labels cached by code object; the cache starts over past this
+MAX_LABELS = 50000
+
+BACKEND_DIR = str(Path(__file__).resolve().parents[2])
+
+
+def _has_thread_cpu_clock() -> bool:
+    return hasattr(time, "pthread_getcpuclockid")
+
+
+class SamplingProfiler:
+    """Samples every thread's stack into collapsed-stack counts"""
+
+    def __init__(self, mode: str = "wall", interval: float = DEFAULT_INTERVAL, ring_seconds: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiler mode: {mode} (use {' or '.join(MODES)})")
+        if mode == "cpu" and not _has_thread_cpu_clock():
+            raise ValueError("CPU mode needs per-thread CPU clocks, which this platform doesn't have")
+        self.mode = mode
+        self.interval = max(0.001, interval)
+        self.ring_seconds = ring_seconds
+
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._labels: Dict[object, str] = {}  # {code object: frame label}
+        self._thread_names: Dict[int, str] = {}
+        self._cpu_clocks: Dict[int, int] = {}  # {thread ident: clock id}
+        self._cpu_last: Dict[int, float] = {}
+
+        self.counts: Counter = Counter()  # Fixed-length profile
+        self.buckets: deque = deque(maxlen=ring_seconds or 1)  # Continuous: (second, Counter)
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.overhead = 0.0  # Seconds spent sampling
+
+    # ---- lifecycle ----
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.stopped_at = time.time()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    # ---- sampling ----
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        next_refresh = 0.0
+        next_tick = time.perf_counter()
+        while self._running:
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()  # Fell behind; don't burst to catch up
+
+            started = time.perf_counter()
+            if started >= next_refresh:
+                self._refresh_threads()
+                next_refresh = started + 1.0
+            self._sample(own_ident)
+            self.overhead += time.perf_counter() - started
+
+    def _refresh_threads(self):
+        self._thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        if self.mode == "cpu":
+            for ident in self._thread_names:
+                if ident not in self._cpu_clocks:
+                    try:
+                        self._cpu_clocks[ident] = time.pthread_getcpuclockid(ident)
+                    except (OSError, OverflowError):
+                        pass
+            for ident in list(self._cpu_clocks):
+                if ident not in self._thread_names:
+                    del self._cpu_clocks[ident]
+                    self._cpu_last.pop(ident, None)
+
+    def _cpu_weight(self, ident: int) -> int:
+        clock = self._cpu_clocks.get(ident)
+        if clock is None:
+            return 0
+        try:
+            now = time.clock_gettime(clock)
+        except OSError:
+            return 0
+        last = self._cpu_last.get(ident)
+        self._cpu_last[ident] = now
+        return int((now - last) * 1_000_000) if last is not None else 0
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            if len(self._labels) >= MAX_LABELS:
+                self._labels.clear()
+            filename = code.co_filename
+            if filename.startswith(BACKEND_DIR):
+                filename = filename[len(BACKEND_DIR):].lstrip("/\\")
+            else:
+                filename = Path(filename).name
+            label = self._labels[code] = f"{code.co_name} ({filename})".replace(";", ":")
+        return label
+
+    def _sample(self, own_ident: int):
+        sampled = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            weight = self._cpu_weight(ident) if self.mode == "cpu" else 1
+            if weight <= 0:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(self._thread_names.get(ident, f"thread-{ident}").replace(";", ":"))
+            stack.reverse()
+            sampled.append((";".join(stack), weight))
+        # Counters are only touched under the lock, so collapsed() never sees one change mid-merge
+        with self._lock:
+            counts = self._bucket()
+            for stack, weight in sampled:
+                counts[stack] += weight
+        self.samples += 1
+
+    def _bucket(self) -> Counter:
+        """Counter for the current second (the whole profile if fixed-length); call with _lock held"""
+        if not self.ring_seconds:
+            return self.counts
+        second = int(time.time())
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append((second, Counter()))
+        return self.buckets[-1][1]
+
+    # ---- output ----
+
+    def collapsed(self, seconds: Optional[int] = None) -> str:
+        """Collapsed stacks (the last `seconds` of a continuous profile)"""
+        if self.ring_seconds:
+            since = time.time() - (seconds or self.ring_seconds)
+            counts = Counter()
+            with self._lock:
+                for second, bucket in self.buckets:
+                    if second >= since:
+                        counts.update(bucket)
+        else:
+            with self._lock:
+                counts = Counter(self.counts)
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(counts.items()))
+
+    def get_stats(self) -> Dict:
+        elapsed = (self.stopped_at if not self._running and self.stopped_at else time.time()) - (self.started_at or time.time())
+        return {
+            "mode": self.mode,
+            "interval_ms": self.interval * 1000,
+            "running": self._running,
+            "continuous": bool(self.ring_seconds),
+            "ring_seconds": self.ring_seconds,
+            "samples": self.samples,
+            "elapsed": round(elapsed, 2),
+            # Share of one core the sampler itself used
+            "overhead": round(self.overhead / elapsed, 4) if elapsed > 0 else 0.0,
+        }
+
+
+# At most one fixed-length and one continuous profile at a time
+_profile: Optional[SamplingProfiler] = None
+_continuous: Optional[SamplingProfiler] = None
+
+
+async def run_profile(seconds: float, mode: str = "wall", interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Profile the whole process for `seconds` (waits without blocking the loop)"""
+    global _profile
+    if _profile is not None and _profile.running:
+        raise RuntimeError("A profile is already running")
+    profiler = SamplingProfiler(mode, interval)
+    _profile = profiler
+    logger.info("[Profiler] 🔬 Sampling all threads for %ss (%s, every %.0fms)", seconds, mode, profiler.interval * 1000)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    logger.info("[Profiler] ✅ %s samples, overhead %.1f%%", profiler.samples, profiler.get_stats()['overhead'] * 100)
+    return profiler
+
+
+def start_continuous(mode: str = "cpu", window: int = 300, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Keep profiling into a ring buffer of the last `window` seconds"""
+    global _continuous
+    if _continuous is not None and _continuous.running:
+        raise RuntimeError("Continuous profiling is already running")
+    _continuous = SamplingProfiler(mode, interval, ring_seconds=max(1, window))
+    _continuous.start()
+    logger.info("[Profiler] 🔁 Continuous %s profiling, keeping the last %ss", mode, window)
+    return _continuous
+
+
+def stop_continuous() -> Optional[Dict]:
+    global _continuous
+    profiler, _continuous = _continuous, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    return profiler.get_stats()
+
+
+def get_continuous() -> Optional[SamplingProfiler]:
+    return _continuous
+
+
+def get_status() -> Dict:
+    return {
+        "profile": _profile.get_stats() if _profile else None,
+        "continuous": _continuous.get_stats() if _continuous else None,
+        "cpu_mode_supported": _has_thread_cpu_clock(),
+    }
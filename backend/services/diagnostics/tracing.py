@@ -0,0 +1,334 @@
+"""
+Tracing - Spans from API request down to device command
+
+Every API request opens a root span (see the middleware in main.py); the
+code it runs opens child spans for WebDriver calls, adb commands, XML
+parsing, DB queries, LLM calls and sleeps, so a slow request shows where
+its time went.
+
+The current span lives in a contextvar, so it follows the request into
+asyncio tasks and asyncio.to_thread() on its own; plain threads (monitor
+threads) get it through propagate(). Long-lived threads (the touch monitor)
+start a trace per event instead of inheriting one that finished long ago.
+Outside any trace, span() is a no-op unless it is asked to start one
+(root=True), so instrumented helpers cost almost nothing when called from
+background loops.
+
+Finished spans are:
+- kept per trace in memory (the most recent MAX_TRACES traces), so a
+  playback's trace can be downloaded from its results
+- exported from a background thread when TRACE_EXPORT is set (the default
+  is none): appended to DATA_DIR/traces/spans.jsonl (TRACE_EXPORT=file,
+  rotated at TRACE_FILE_BYTES like the log file) or POSTed in batches to a
+  collector (TRACE_EXPORT=http, TRACE_COLLECTOR_URL;
+  benchmarks/fake_trace_collector.py is a stand-in)
+
+Downloads use the Chrome trace event format (Perfetto, chrome://tracing).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+
+# Not get_logger(): the log pipeline imports this module
+logger = logging.getLogger("gravityqa.tracing")
+
+# Traces kept in memory for download
+MAX_TRACES = 200
+
+# Spans kept per trace (a long playback can make thousands)
+MAX_SPANS_PER_TRACE = 20000
+
+EXPORT_BATCH = 256
+EXPORT_INTERVAL = 1.0
+
+TRACE_DIR = settings.DATA_DIR / "traces"
+TRACE_FILE_BYTES = 20 * 1024 * 1024
+TRACE_FILE_BACKUPS = 3
+
+_current: contextvars.ContextVar = contextvars.ContextVar("gravityqa_span", default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start", "_started", "duration", "status", "error", "thread")
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict):
+        self.trace_id = parent.trace_id if parent else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.thread = threading.current_thread().name
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def rename(self, name: str):
+        self.name = name
+
+    def fail(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            get_tracer().finish(self)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in outside a trace; accepts the same calls and records nothing"""
+
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def rename(self, name: str):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Keeps recent traces and hands finished spans to the exporter"""
+
+    def __init__(self, export: str = "none", collector_url: str = ""):
+        self.export = export
+        self.collector_url = collector_url
+        self.enabled = True
+        self._traces: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.SimpleQueue[Dict]" = queue.SimpleQueue()
+        self._exporter: Optional[threading.Thread] = None
+        self.stats = {"spans": 0, "exported": 0, "export_errors": 0, "dropped": 0}
+
+    # ---- spans ----
+
+    def start_span(self, name: str, kind: str = "internal", root: bool = False, **attributes):
+        """A child of the current span (a new trace if root=True); doesn't make it current"""
+        parent = _current.get()
+        if not self.enabled or (parent is None and not root):
+            return NOOP_SPAN
+        return Span(name, kind, parent, attributes)
+
+    def record(self, name: str, kind: str, started: float, **attributes):
+        """A span that already happened: from perf_counter() `started` until now"""
+        span = self.start_span(name, kind, **attributes)
+        if span is not NOOP_SPAN:
+            span.start -= time.perf_counter() - started
+            span._started = started
+            span.end()
+        return span
+
+    def finish(self, span: Span):
+        data = span.to_dict()
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > MAX_TRACES:
+                    self._traces.popitem(last=False)
+            if len(spans) < MAX_SPANS_PER_TRACE:
+                spans.append(data)
+            else:
+                self.stats["dropped"] += 1
+            self.stats["spans"] += 1
+            if self.export != "none":
+                self._queue.put(data)
+                self._start_exporter()
+
+    # ---- lookup ----
+
+    def get_trace(self, trace_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def list_traces(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            traces = list(self._traces.items())[-limit:]
+        summaries = []
+        for trace_id, spans in reversed(traces):
+            root = next((span for span in spans if span["parent_id"] is None), None)
+            summaries.append({
+                "trace_id": trace_id,
+                "name": root["name"] if root else None,
+                "start": root["start"] if root else min(span["start"] for span in spans),
+                "duration": root["duration"] if root else None,
+                "spans": len(spans),
+                "errors": sum(1 for span in spans if span["status"] == "error"),
+            })
+        return summaries
+
+    # ---- export ----
+
+    def _start_exporter(self):
+        if self._exporter is None or not self._exporter.is_alive():
+            self._exporter = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._exporter.start()
+
+    def _export_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                self.stats["exported"] += len(batch)
+            except Exception as e:
+                self.stats["export_errors"] += 1
+                logger.warning("[Tracing] ⚠️ Export failed (%s spans): %s", len(batch), e)
+
+    def _write(self, batch: List[Dict]):
+        if self.export == "http" and self.collector_url:
+            import httpx
+            httpx.post(self.collector_url, json={"spans": batch}, timeout=5).raise_for_status()
+        else:
+            TRACE_DIR.mkdir(parents=True, exist_ok=True)
+            path = TRACE_DIR / "spans.jsonl"
+            if path.exists() and path.stat().st_size >= TRACE_FILE_BYTES:
+                _rotate(path)
+            with open(path, "a") as f:
+                f.write("".join(json.dumps(span) + "\n" for span in batch))
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "export": self.export,
+            "traces_kept": len(self._traces),
+            "export_queue": self._queue.qsize(),
+        }
+
+
+def _rotate(path):
+    """spans.jsonl -> spans.jsonl.1 -> ... -> spans.jsonl.<TRACE_FILE_BACKUPS> (dropped)"""
+    for index in range(TRACE_FILE_BACKUPS - 1, 0, -1):
+        older = path.with_name(f"{path.name}.{index}")
+        if older.exists():
+            os.replace(older, path.with_name(f"{path.name}.{index + 1}"))
+    os.replace(path, path.with_name(f"{path.name}.1"))
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", root: bool = False, **attributes):
+    """Run a block in a child span of the current one (or a new trace with root=True)"""
+    current = get_tracer().start_span(name, kind, root=root, **attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end()
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def record_span(name: str, kind: str, started: float, **attributes):
+    return get_tracer().record(name, kind, started, **attributes)
+
+
+def propagate(fn: Callable) -> Callable:
+    """Wrap a thread target so it runs in the caller's trace context"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def to_chrome_trace(spans: List[Dict]) -> Dict:
+    """Chrome trace event format: one complete ("X") event per span, a row per thread"""
+    threads: Dict[str, int] = {}
+    events = []
+    for span in sorted(spans, key=lambda s: s["start"]):
+        tid = threads.setdefault(span["thread"], len(threads) + 1)
+        events.append({
+            "name": span["name"],
+            "cat": span["kind"],
+            "ph": "X",
+            "ts": span["start"] * 1_000_000,
+            "dur": (span["duration"] or 0) * 1_000_000,
+            "pid": 1,
+            "tid": tid,
+            "args": {**span["attributes"], "span_id": span["span_id"], "parent_id": span["parent_id"],
+                     "status": span["status"], **({"error": span["error"]} if span["error"] else {})},
+        })
+    events += [
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+        for name, tid in threads.items()
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(settings.TRACE_EXPORT, settings.TRACE_COLLECTOR_URL)
+        _tracer.enabled = settings.TRACING_ENABLED
+    return _tracer
@@ -0,0 +1,454 @@
+"""
+ADB Client - Talks to the local adb server over its socket protocol
+
+Every `adb -s <serial> shell ...` subprocess costs a fork/exec of the adb
+binary and a fresh handshake with the server. This client speaks the same
+wire protocol directly from the event loop:
+
+- host services: `host:version`, `host:devices-l`, `host-serial:<s>:features`
+- device services after a transport switch: `shell:`, `shell,v2,raw:`
+  (separate stdout/stderr and exit code), `exec:` (raw bytes both ways)
+- the sync protocol: STAT, SEND (push), RECV (pull)
+
+The adb server dedicates a socket to each device service, so per-device
+reuse means keeping what can be kept warm: the transport id (skips the
+serial lookup), the device feature set, and an open sync connection that
+serves many push/pull/stat requests.
+"""
+
+import asyncio
+import os
+import stat as stat_module
+import struct
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("adb")
+
+ADB_SERVER_HOST = "127.0.0.1"
+ADB_SERVER_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+
+DEFAULT_TIMEOUT = 30
+
+# Max payload of one sync DATA packet (fixed by the protocol)
+SYNC_DATA_MAX = 64 * 1024
+
+# shell v2 packet ids
+SHELL_STDIN = 0
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+SHELL_CLOSE_STDIN = 4
+
+_LEGACY_EXIT_MARKER = b":GQA_EXIT:"
+
+
+class AdbError(Exception):
+    """The adb server or device refused a request"""
+
+
+class AdbConnection:
+    """One socket to the adb server"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, request: str):
+        payload = request.encode()
+        self.writer.write(b"%04x" % len(payload) + payload)
+        await self.writer.drain()
+
+    async def read_status(self):
+        status = await self.reader.readexactly(4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(await self.read_string())
+        raise AdbError(f"Unexpected adb status {status!r}")
+
+    async def read_string(self) -> str:
+        length = int(await self.reader.readexactly(4), 16)
+        return (await self.reader.readexactly(length)).decode(errors="replace")
+
+    async def request(self, request: str):
+        """Send a request and wait for OKAY"""
+        await self.send(request)
+        await self.read_status()
+
+    async def read_all(self) -> bytes:
+        return await self.reader.read()
+
+    def close(self):
+        self.writer.close()
+
+
+class SyncConnection:
+    """A device connection in sync mode, reusable for many file operations"""
+
+    def __init__(self, connection: AdbConnection):
+        self.connection = connection
+        self.lock = asyncio.Lock()
+
+    def _write(self, command: bytes, value):
+        if isinstance(value, int):
+            self.connection.writer.write(command + struct.pack("<I", value))
+        else:
+            data = value if isinstance(value, bytes) else value.encode()
+            self.connection.writer.write(command + struct.pack("<I", len(data)) + data)
+
+    async def _read_header(self) -> Tuple[bytes, int]:
+        header = await self.connection.reader.readexactly(8)
+        return header[:4], struct.unpack("<I", header[4:])[0]
+
+    async def _raise_fail(self, length: int):
+        message = await self.connection.reader.readexactly(length)
+        raise AdbError(message.decode(errors="replace"))
+
+    async def stat(self, remote_path: str) -> Dict:
+        """{mode, size, mtime} of a device path (mode 0 if it doesn't exist)"""
+        self._write(b"STAT", remote_path)
+        await self.connection.writer.drain()
+        reply = await self.connection.reader.readexactly(16)
+        if reply[:4] != b"STAT":
+            raise AdbError(f"Unexpected sync reply {reply[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", reply[4:])
+        return {"mode": mode, "size": size, "mtime": mtime}
+
+    async def push(self, local_path: str, remote_path: str, mode: int = 0o644) -> int:
+        """Send a local file; returns bytes transferred"""
+        self._write(b"SEND", f"{remote_path},{stat_module.S_IFREG | mode}")
+        sent = 0
+        with open(local_path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                self._write(b"DATA", chunk)
+                sent += len(chunk)
+                await self.connection.writer.drain()
+        self._write(b"DONE", int(os.path.getmtime(local_path)))
+        await self.connection.writer.drain()
+
+        reply, length = await self._read_header()
+        if reply == b"FAIL":
+            await self._raise_fail(length)
+        if reply != b"OKAY":
+            raise AdbError(f"Unexpected sync reply {reply!r}")
+        return sent
+
+    async def pull(self, remote_path: str, local_path: str) -> int:
+        """Receive a device file; returns bytes transferred"""
+        self._write(b"RECV", remote_path)
+        await self.connection.writer.drain()
+        received = 0
+        tmp_path = f"{local_path}.partial"
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    reply, length = await self._read_header()
+                    if reply == b"DONE":
+                        break
+                    if reply == b"FAIL":
+                        await self._raise_fail(length)
+                    if reply != b"DATA":
+                        raise AdbError(f"Unexpected sync reply {reply!r}")
+                    chunk = await self.connection.reader.readexactly(length)
+                    await asyncio.to_thread(f.write, chunk)
+                    received += length
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return received
+
+    def close(self):
+        try:
+            self._write(b"QUIT", 0)
+        except Exception:
+            pass
+        self.connection.close()
+
+
+class AdbClient:
+    """Async adb server client with per-device warm state"""
+
+    def __init__(self, host: str = ADB_SERVER_HOST, port: int = ADB_SERVER_PORT, adb_path: str = "adb"):
+        self.host = host
+        self.port = port
+        self.adb_path = adb_path
+        self._transport_ids: Dict[str, int] = {}
+        self._features: Dict[str, set] = {}
+        self._sync: Dict[str, SyncConnection] = {}
+        self._server_started = False
+
+    # ---- connections ----
+
+    async def _connect(self) -> AdbConnection:
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except (ConnectionRefusedError, OSError):
+            if self._server_started or self.host != ADB_SERVER_HOST:
+                raise AdbError(f"adb server not reachable at {self.host}:{self.port}")
+            # Same as the adb binary: start the server on first use
+            await self._start_server()
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                raise AdbError(f"adb server not reachable at {self.host}:{self.port}: {e}")
+        return AdbConnection(reader, writer)
+
+    async def _start_server(self):
+        logger.info("[ADB] Starting adb server on port %s...", self.port)
+        self._server_started = True
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.adb_path, "-P", str(self.port), "start-server",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            await process.wait()
+        except FileNotFoundError:
+            raise AdbError(f"adb not found at '{self.adb_path}' and no adb server is running")
+
+    async def host_query(self, service: str) -> str:
+        """Run a host service that answers with one length-prefixed string"""
+        connection = await self._connect()
+        try:
+            await connection.request(service)
+            return await connection.read_string()
+        finally:
+            connection.close()
+
+    async def _transport(self, serial: str) -> AdbConnection:
+        """A connection switched to the device, ready for one device service"""
+        connection = await self._connect()
+        try:
+            transport_id = self._transport_ids.get(serial)
+            if transport_id is not None:
+                try:
+                    await connection.request(f"host:transport-id:{transport_id}")
+                    return connection
+                except AdbError:
+                    # Device reconnected under a new transport id
+                    self._transport_ids.pop(serial, None)
+                    connection.close()
+                    connection = await self._connect()
+
+            try:
+                await connection.request(f"host:tport:serial:{serial}")
+            except AdbError as e:
+                if "unknown host service" not in str(e):
+                    raise
+                # adb server older than 1.0.41: no transport ids
+                connection.close()
+                connection = await self._connect()
+                await connection.request(f"host:transport:{serial}")
+                return connection
+            self._transport_ids[serial] = struct.unpack("<Q", await connection.reader.readexactly(8))[0]
+            return connection
+        except Exception:
+            connection.close()
+            raise
+
+    async def _open_service(self, serial: str, service: str) -> AdbConnection:
+        connection = await self._transport(serial)
+        try:
+            await connection.request(service)
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    # ---- host services ----
+
+    async def version(self) -> int:
+        return int(await self.host_query("host:version"), 16)
+
+    async def devices(self) -> List[Dict]:
+        """[{serial, state, properties}] like `adb devices -l`"""
+        devices = []
+        for line in (await self.host_query("host:devices-l")).splitlines():
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            properties = dict(p.split(":", 1) for p in parts[2:] if ":" in p)
+            devices.append({"serial": parts[0], "state": parts[1], "properties": properties})
+        return devices
+
+    async def features(self, serial: str) -> set:
+        if serial not in self._features:
+            reply = await self.host_query(f"host-serial:{serial}:features")
+            self._features[serial] = set(filter(None, reply.split(",")))
+        return self._features[serial]
+
+    def known_serials(self) -> set:
+        """Devices we hold warm state for"""
+        return set(self._transport_ids) | set(self._features) | set(self._sync)
+
+    def forget(self, serial: str):
+        """Drop warm state for a device (after it disconnects)"""
+        self._transport_ids.pop(serial, None)
+        self._features.pop(serial, None)
+        sync = self._sync.pop(serial, None)
+        if sync:
+            sync.close()
+
+    # ---- device services ----
+
+    async def shell(self, serial: str, command: str, timeout: float = DEFAULT_TIMEOUT) -> Tuple[int, str, str]:
+        """
+        Run a shell command on the device
+
+        Returns:
+            (returncode, stdout, stderr), like subprocess.run
+        """
+        returncode, stdout, stderr = await asyncio.wait_for(self._shell(serial, command), timeout)
+        return returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+    async def _shell(self, serial: str, command: str) -> Tuple[int, bytes, bytes]:
+        if "shell_v2" not in await self.features(serial):
+            return await self._legacy_shell(serial, command)
+
+        connection = await self._open_service(serial, f"shell,v2,raw:{command}")
+        stdout, stderr, returncode = bytearray(), bytearray(), 0
+        try:
+            while True:
+                try:
+                    header = await connection.reader.readexactly(5)
+                except asyncio.IncompleteReadError:
+                    break
+                packet_id, length = header[0], struct.unpack("<I", header[1:])[0]
+                payload = await connection.reader.readexactly(length)
+                if packet_id == SHELL_STDOUT:
+                    stdout += payload
+                elif packet_id == SHELL_STDERR:
+                    stderr += payload
+                elif packet_id == SHELL_EXIT:
+                    returncode = payload[0]
+                    break
+        finally:
+            connection.close()
+        return returncode, bytes(stdout), bytes(stderr)
+
+    async def _legacy_shell(self, serial: str, command: str) -> Tuple[int, bytes, bytes]:
+        """Pre-Android 7 devices: one merged stream, exit code appended by the command"""
+        connection = await self._open_service(serial, f"shell:{command}; echo '{_LEGACY_EXIT_MARKER.decode()}'$?")
+        try:
+            output = (await connection.read_all()).replace(b"\r\n", b"\n")
+        finally:
+            connection.close()
+        head, marker, tail = output.rpartition(_LEGACY_EXIT_MARKER)
+        if not marker:
+            return 0, output, b""
+        try:
+            return int(tail.strip() or 0), head, b""
+        except ValueError:
+            return 0, output, b""
+
+    async def shell_lines(self, serial: str, command: str) -> AsyncIterator[str]:
+        """Stream a long-running command's output line by line (e.g. getevent, logcat)"""
+        connection = await self._open_service(serial, f"exec:{command}")
+        try:
+            while True:
+                line = await connection.reader.readline()
+                if not line:
+                    break
+                yield line.decode(errors="replace").rstrip("\r\n")
+        finally:
+            connection.close()
+
+    async def exec_out(self, serial: str, command: str, stdin_path: Optional[str] = None,
+                       timeout: float = DEFAULT_TIMEOUT) -> bytes:
+        """Raw `exec:` service; optionally stream a local file to the command's stdin"""
+        async def run():
+            connection = await self._open_service(serial, f"exec:{command}")
+            try:
+                if stdin_path:
+                    with open(stdin_path, "rb") as f:
+                        while True:
+                            chunk = await asyncio.to_thread(f.read, SYNC_DATA_MAX)
+                            if not chunk:
+                                break
+                            connection.writer.write(chunk)
+                            await connection.writer.drain()
+                return await connection.read_all()
+            finally:
+                connection.close()
+
+        return await asyncio.wait_for(run(), timeout)
+
+    async def install(self, serial: str, apk_path: str, replace: bool = True, allow_downgrade: bool = False,
+                      timeout: float = 300) -> Tuple[bool, str]:
+        """
+        Install an APK, streaming it into `cmd package install` when supported
+
+        allow_downgrade (-d) lets it replace an installed app with a higher versionCode.
+
+        Returns:
+            (success, output)
+        """
+        flags = ("-r " if replace else "") + ("-d " if allow_downgrade else "")
+        if "cmd" in await self.features(serial):
+            size = os.path.getsize(apk_path)
+            output = (await self.exec_out(
+                serial, f"cmd package install {flags}-S {size}", stdin_path=apk_path, timeout=timeout
+            )).decode(errors="replace").strip()
+        else:
+            remote_path = f"/data/local/tmp/{os.path.basename(apk_path)}"
+            await self.push(serial, apk_path, remote_path)
+            _, stdout, stderr = await self.shell(serial, f"pm install {flags}'{remote_path}'; rm -f '{remote_path}'", timeout)
+            output = (stdout + stderr).strip()
+        return "Success" in output, output
+
+    # ---- sync ----
+
+    async def _sync_connection(self, serial: str) -> SyncConnection:
+        sync = self._sync.get(serial)
+        if sync is None or sync.connection.writer.is_closing():
+            sync = SyncConnection(await self._open_service(serial, "sync:"))
+            self._sync[serial] = sync
+        return sync
+
+    async def _with_sync(self, serial: str, operation):
+        for attempt in range(2):
+            sync = await self._sync_connection(serial)
+            async with sync.lock:
+                try:
+                    return await operation(sync)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # Stale warm connection (device or server restarted) - retry once on a fresh one
+                    self._sync.pop(serial, None)
+                    sync.connection.close()
+                    if attempt:
+                        raise
+                except BaseException:
+                    # Protocol state is unknown after a failure or cancel; don't reuse it
+                    self._sync.pop(serial, None)
+                    sync.connection.close()
+                    raise
+
+    async def stat(self, serial: str, remote_path: str) -> Dict:
+        return await self._with_sync(serial, lambda sync: sync.stat(remote_path))
+
+    async def push(self, serial: str, local_path: str, remote_path: str, mode: int = 0o644) -> int:
+        started = time.time()
+        sent = await self._with_sync(serial, lambda sync: sync.push(local_path, remote_path, mode))
+        logger.debug("[ADB] ⬆️ %s → %s:%s (%s bytes, %.2fs)", os.path.basename(local_path), serial, remote_path, sent, time.time() - started)
+        return sent
+
+    async def pull(self, serial: str, remote_path: str, local_path: str) -> int:
+        return await self._with_sync(serial, lambda sync: sync.pull(remote_path, local_path))
+
+
+_adb_client: Optional[AdbClient] = None
+
+
+def get_adb_client() -> AdbClient:
+    """Get the shared adb client (warm state is per process)"""
+    global _adb_client
+    if _adb_client is None:
+        _adb_client = AdbClient()
+    return _adb_client
@@ -0,0 +1,284 @@
+"""
+ADB Scheduler - Per-device admission control for adb commands
+
+A single device degrades badly when the inspector, playback, installs and
+discovery all hit adb at once. Every command goes through the device's
+queue instead:
+
+- at most DEVICE_CONCURRENCY commands run per device; background work is
+  further capped so interactive requests always find a free slot
+- waiting commands are admitted by lane: interactive > playback > background
+- identical read-only queries already in flight are shared, not repeated
+- queue wait is recorded per lane, and exported as metrics with command
+  latency and queue depth
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from services.diagnostics.metrics import ADB_COMMAND_SECONDS, ADB_QUEUE_DEPTH, ADB_QUEUE_WAIT_SECONDS
+from services.diagnostics.tracing import record_span, span
+from services.mobile.adb_client import DEFAULT_TIMEOUT, get_adb_client
+from services.mobile.selector_compiler import get_hierarchy_cache
+
+LANE_INTERACTIVE = 0
+LANE_PLAYBACK = 1
+LANE_BACKGROUND = 2
+
+LANE_NAMES = {
+    LANE_INTERACTIVE: "interactive",
+    LANE_PLAYBACK: "playback",
+    LANE_BACKGROUND: "background",
+}
+
+# Concurrent adb commands per device
+DEVICE_CONCURRENCY = 4
+
+# Background commands never take more than this many of a device's slots
+BACKGROUND_CONCURRENCY = 2
+
+# Queue-wait samples kept per lane for percentiles
+WAIT_SAMPLES = 512
+
+# Shell commands that don't change device state; identical ones in flight are shared
+READ_ONLY_PREFIXES = (
+    "getprop", "dumpsys", "pm list", "pm path", "cmd package query-activities",
+    "cmd package resolve-activity", "wm size", "wm density", "settings get", "echo",
+)
+
+
+# Tools whose subcommand is part of the metric label (pm install, am start, ...)
+_SUBCOMMAND_TOOLS = ("pm", "am", "cmd", "wm", "settings", "dumpsys", "input")
+
+
+def command_label(command: str) -> str:
+    """Low-cardinality name of a shell command for metrics"""
+    words = command.split()
+    if not words:
+        return ""
+    if words[0] in _SUBCOMMAND_TOOLS and len(words) > 1:
+        return f"{words[0]} {words[1]}"
+    return words[0]
+
+
+def is_read_only(command: str) -> bool:
+    """A single read-only command (anything chained or redirected must say so explicitly)"""
+    command = command.strip()
+    return command.startswith(READ_ONLY_PREFIXES) and not any(c in command for c in ";&|>`$")
+
+
+class LaneStats:
+    """Counters and recent queue waits for one lane"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.deduplicated = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.max_wait = 0.0
+
+    def record_wait(self, wait: float):
+        self.waits.append(wait)
+        self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> Dict:
+        waits = sorted(self.waits)
+        percentile = lambda p: waits[min(len(waits) - 1, int(len(waits) * p))] * 1000 if waits else 0.0
+        return {
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "wait_p50_ms": round(percentile(0.5), 2),
+            "wait_p95_ms": round(percentile(0.95), 2),
+            "wait_max_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class DeviceQueue:
+    """Slots and waiters for one device"""
+
+    def __init__(self, concurrency: int, background_concurrency: int):
+        self.concurrency = concurrency
+        self.background_concurrency = background_concurrency
+        self.running = 0
+        self.running_background = 0
+        self.waiters = []  # heap of (lane, seq, future)
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {lane: LaneStats() for lane in LANE_NAMES}
+        self._seq = itertools.count()
+
+    def _can_start(self, lane: int) -> bool:
+        if self.running >= self.concurrency:
+            return False
+        return lane != LANE_BACKGROUND or self.running_background < self.background_concurrency
+
+    def _start(self, lane: int):
+        self.running += 1
+        if lane == LANE_BACKGROUND:
+            self.running_background += 1
+
+    async def acquire(self, lane: int):
+        # Don't jump ahead of waiters in the same or a higher-priority lane
+        if self._can_start(lane) and (not self.waiters or self.waiters[0][0] > lane):
+            self._start(lane)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (lane, next(self._seq), future))
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed to us just as we were cancelled; pass it on
+                self.release(lane)
+            raise
+
+    def release(self, lane: int):
+        self.running -= 1
+        if lane == LANE_BACKGROUND:
+            self.running_background -= 1
+        self._wake()
+
+    def _wake(self):
+        """Admit the best waiters that fit, skipping background ones over their cap"""
+        blocked = []
+        while self.waiters and self.running < self.concurrency:
+            lane, seq, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue
+            if not self._can_start(lane):
+                blocked.append((lane, seq, future))
+                continue
+            self._start(lane)
+            future.set_result(None)
+        for waiter in blocked:
+            heapq.heappush(self.waiters, waiter)
+
+    def snapshot(self) -> Dict:
+        queued = {name: 0 for name in LANE_NAMES.values()}
+        for lane, _, future in self.waiters:
+            if not future.done():
+                queued[LANE_NAMES[lane]] += 1
+        return {
+            "running": self.running,
+            "running_background": self.running_background,
+            "queued": queued,
+            "inflight_shared": len(self.inflight),
+            "lanes": {LANE_NAMES[lane]: stats.snapshot() for lane, stats in self.stats.items()},
+        }
+
+
+class AdbScheduler:
+    """Routes adb work for each device through its DeviceQueue"""
+
+    def __init__(self, concurrency: int = DEVICE_CONCURRENCY, background_concurrency: int = BACKGROUND_CONCURRENCY):
+        self.concurrency = concurrency
+        self.background_concurrency = background_concurrency
+        self._queues: Dict[str, DeviceQueue] = {}
+
+    def _queue(self, device_id: str) -> DeviceQueue:
+        if device_id not in self._queues:
+            queue = self._queues[device_id] = DeviceQueue(self.concurrency, self.background_concurrency)
+            ADB_QUEUE_DEPTH.labels(device_id).set_function(
+                lambda: sum(1 for _, _, future in queue.waiters if not future.done())
+            )
+        return self._queues[device_id]
+
+    @asynccontextmanager
+    async def slot(self, device_id: str, lane: int = LANE_BACKGROUND):
+        """Hold one of the device's adb slots (for installs, pushes, anything not a plain shell)"""
+        queue = self._queue(device_id)
+        queue.stats[lane].submitted += 1
+        queued_at = time.perf_counter()
+        await queue.acquire(lane)
+        waited = time.perf_counter() - queued_at
+        queue.stats[lane].record_wait(waited)
+        ADB_QUEUE_WAIT_SECONDS.labels(LANE_NAMES[lane]).observe(waited)
+        record_span("adb queue wait", "adb", queued_at, device=device_id, lane=LANE_NAMES[lane])
+        try:
+            yield
+        finally:
+            queue.release(lane)
+
+    async def shell(self, device_id: str, command: str, lane: int = LANE_BACKGROUND,
+                    read_only: Optional[bool] = None, timeout: float = DEFAULT_TIMEOUT) -> tuple:
+        """
+        Run a shell command on the device through its queue
+
+        Returns:
+            (returncode, stdout, stderr)
+        """
+        if read_only is None:
+            read_only = is_read_only(command)
+
+        async def run():
+            label = command_label(command)
+            with span(f"adb {label}", "adb", device=device_id, lane=LANE_NAMES[lane], command=command):
+                async with self.slot(device_id, lane):
+                    with ADB_COMMAND_SECONDS.labels(label, LANE_NAMES[lane]).time():
+                        return await get_adb_client().shell(device_id, command, timeout=timeout)
+
+        if not read_only:
+            try:
+                return await run()
+            finally:
+                # input/am/pm can change the screen under any cached hierarchy
+                get_hierarchy_cache().invalidate_device(device_id)
+
+        queue = self._queue(device_id)
+        shared = queue.inflight.get(command)
+        if shared is not None:
+            queue.stats[lane].submitted += 1
+            queue.stats[lane].deduplicated += 1
+            return await asyncio.shield(shared)
+
+        shared = asyncio.ensure_future(run())
+        queue.inflight[command] = shared
+        try:
+            return await asyncio.shield(shared)
+        finally:
+            if shared.done():
+                queue.inflight.pop(command, None)
+            else:
+                shared.add_done_callback(lambda _: queue.inflight.pop(command, None))
+
+    async def install(self, device_id: str, apk_path: str, lane: int = LANE_BACKGROUND, timeout: float = 300,
+                      allow_downgrade: bool = False) -> tuple:
+        """Install through the device's queue; returns (success, output)"""
+        with span("adb install", "adb", device=device_id, lane=LANE_NAMES[lane], apk=apk_path):
+            async with self.slot(device_id, lane):
+                with ADB_COMMAND_SECONDS.labels("install", LANE_NAMES[lane]).time():
+                    return await get_adb_client().install(device_id, apk_path, allow_downgrade=allow_downgrade,
+                                                          timeout=timeout)
+
+    def known_devices(self) -> set:
+        """Devices with a queue"""
+        return set(self._queues)
+
+    def forget(self, device_id: str):
+        """Drop a disconnected device's queue (only if idle)"""
+        queue = self._queues.get(device_id)
+        if queue and not queue.running and not queue.waiters:
+            del self._queues[device_id]
+            ADB_QUEUE_DEPTH.remove(device_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            "device_concurrency": self.concurrency,
+            "background_concurrency": self.background_concurrency,
+            "devices": {device_id: queue.snapshot() for device_id, queue in self._queues.items()},
+        }
+
+
+_adb_scheduler: Optional[AdbScheduler] = None
+
+
+def get_adb_scheduler() -> AdbScheduler:
+    """Get the shared adb scheduler"""
+    global _adb_scheduler
+    if _adb_scheduler is None:
+        _adb_scheduler = AdbScheduler()
+    return _adb_scheduler
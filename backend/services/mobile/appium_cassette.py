@@ -0,0 +1,410 @@
+"""
+Appium Cassette - Record and replay WebDriver traffic
+
+While recording, every request AppiumService (and the session registry)
+sends to Appium goes through a transport that stores the request and the
+response in a cassette. While replaying, the same transport answers from
+the cassette instead of the network, so a real inspector or playback
+session can be re-run offline, deterministically and without a device.
+
+A cassette is a zip file:
+
+    cassette.json        meta + one entry per request, in order
+    blobs/<sha256>       large bodies (screenshots, page sources), stored once
+
+Responses are matched by method, path and request body (except for new
+sessions, whose capabilities carry per-run ports); repeats of the
+same request get the recorded responses in order (the last one once they
+run out). Replay timing is the recorded per-request latency times `speed`
+(1.0 original, 0 instant).
+
+Every client made here also reports per-command latency to the metrics
+registry, recording or not.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import zipfile
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import settings
+from services.diagnostics.logs import get_logger
+from services.diagnostics.metrics import APPIUM_COMMAND_ERRORS, APPIUM_COMMAND_SECONDS
+from services.diagnostics.tracing import span
+
+logger = get_logger("cassette")
+
+CASSETTE_DIR = settings.DATA_DIR / "cassettes"
+
+# Bodies at least this large are stored once as blobs
+BLOB_MIN_SIZE = 1024
+
+# Hop-by-hop/encoding headers that no longer apply to a body we've already read
+_STRIP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def request_key(method: str, url: str, body: bytes) -> str:
+    """Host-independent identity of a request (servers and ports differ between runs)"""
+    path = urlsplit(str(url)).path
+    if path.endswith("/session"):
+        # New-session capabilities carry per-run ports (systemPort, wdaLocalPort)
+        body = b""
+    return f"{method} {path} {_digest(body)[:16] if body else '-'}"
+
+
+class Cassette:
+    """Recorded interactions plus their deduplicated bodies"""
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = meta or {}
+        self.interactions: List[Dict] = []
+        self.blobs: Dict[str, bytes] = {}
+        self._started = time.monotonic()
+
+    def _store(self, data: bytes) -> Optional[Dict]:
+        if not data:
+            return None
+        if len(data) < BLOB_MIN_SIZE:
+            return {"text": data.decode("utf-8", errors="surrogateescape")}
+        digest = _digest(data)
+        self.blobs.setdefault(digest, data)
+        return {"blob": digest}
+
+    def body(self, ref: Optional[Dict]) -> bytes:
+        if not ref:
+            return b""
+        if "blob" in ref:
+            return self.blobs[ref["blob"]]
+        return ref["text"].encode("utf-8", errors="surrogateescape")
+
+    def record(self, request: httpx.Request, status: int, headers: Dict, content: bytes, elapsed: float):
+        body = request.content
+        self.interactions.append({
+            "t": round(time.monotonic() - self._started, 4),
+            "method": request.method,
+            "path": urlsplit(str(request.url)).path,
+            "key": request_key(request.method, request.url, body),
+            "request": self._store(body),
+            "status": status,
+            "content_type": headers.get("content-type", "application/json"),
+            "response": self._store(content),
+            "elapsed": round(elapsed, 4),
+        })
+
+    def save(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("cassette.json", json.dumps({
+                "meta": self.meta,
+                "interactions": self.interactions,
+            }))
+            for digest, data in self.blobs.items():
+                archive.writestr(f"blobs/{digest}", data)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "Cassette":
+        with zipfile.ZipFile(path) as archive:
+            data = json.loads(archive.read("cassette.json"))
+            cassette = cls(data.get("meta"))
+            cassette.interactions = data.get("interactions", [])
+            for name in archive.namelist():
+                if name.startswith("blobs/"):
+                    cassette.blobs[name[len("blobs/"):]] = archive.read(name)
+        return cassette
+
+    def summary(self) -> Dict:
+        return {
+            "meta": self.meta,
+            "interactions": len(self.interactions),
+            "blobs": len(self.blobs),
+            "blob_bytes": sum(len(data) for data in self.blobs.values()),
+            "duration": self.interactions[-1]["t"] if self.interactions else 0,
+        }
+
+
+class CassettePlayer:
+    """Answers requests from a cassette"""
+
+    def __init__(self, cassette: Cassette, speed: float = 0.0):
+        self.cassette = cassette
+        self.speed = speed
+        self._queues: Dict[str, deque] = {}
+        self._last: Dict[str, Dict] = {}
+        for interaction in cassette.interactions:
+            self._queues.setdefault(interaction["key"], deque()).append(interaction)
+        self.served = 0
+        self.missed = 0
+
+    def match(self, request: httpx.Request) -> Dict:
+        key = request_key(request.method, request.url, request.content)
+        queue = self._queues.get(key)
+        if queue:
+            self._last[key] = queue.popleft()
+        interaction = self._last.get(key)
+        if interaction is None:
+            self.missed += 1
+            raise httpx.ConnectError(f"Not in cassette: {key}", request=request)
+        self.served += 1
+        return interaction
+
+    def response(self, request: httpx.Request, interaction: Dict) -> httpx.Response:
+        return httpx.Response(
+            interaction["status"],
+            headers={"content-type": interaction["content_type"]},
+            content=self.cassette.body(interaction["response"]),
+            request=request,
+        )
+
+    def delay(self, interaction: Dict) -> float:
+        return interaction["elapsed"] * self.speed
+
+
+class _RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        content = await response.aread()
+        await response.aclose()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _STRIP_HEADERS}
+        self.cassette.record(request, response.status_code, headers, content, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class _SyncRecordingTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+        self.inner = httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = self.inner.handle_request(request)
+        content = response.read()
+        response.close()
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _STRIP_HEADERS}
+        self.cassette.record(request, response.status_code, headers, content, time.perf_counter() - started)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def close(self):
+        self.inner.close()
+
+
+class _ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self.player.match(request)
+        delay = self.player.delay(interaction)
+        if delay:
+            await asyncio.sleep(delay)
+        return self.player.response(request, interaction)
+
+
+class _SyncReplayTransport(httpx.BaseTransport):
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        interaction = self.player.match(request)
+        delay = self.player.delay(interaction)
+        if delay:
+            time.sleep(delay)
+        return self.player.response(request, interaction)
+
+
+def command_name(method: str, path: str) -> str:
+    """Low-cardinality WebDriver command name: ids replaced, e.g. 'POST element/:id/click'"""
+    parts = path.strip("/").split("/")
+    if "session" not in parts:
+        return f"{method} {'/'.join(parts)}"
+    rest = parts[parts.index("session") + 1:]
+    if not rest:
+        return f"{method} session"
+    name = []
+    for index, part in enumerate(rest[1:]):
+        previous = rest[index]  # rest[0] is the session id
+        name.append(":id" if previous in ("element", "elements") and part != "active" else part)
+    return f"{method} {'/'.join(name) or 'session/:id'}"
+
+
+def _describe(request: httpx.Request):
+    """(command name, device id) of an Appium request"""
+    from services.mobile.session_registry import get_session_registry
+
+    path = urlsplit(str(request.url)).path
+    parts = path.strip("/").split("/")
+    device = ""
+    if "session" in parts and parts.index("session") + 1 < len(parts):
+        record = get_session_registry().get(parts[parts.index("session") + 1])
+        device = (record.device_id if record else None) or ""
+    return command_name(request.method, path), device
+
+
+def _observe(command: str, device: str, started: float, status: Optional[int], request_span):
+    APPIUM_COMMAND_SECONDS.labels(command, device).observe(time.perf_counter() - started)
+    if status is None or status >= 400:
+        APPIUM_COMMAND_ERRORS.labels(command, device).inc()
+    request_span.set(status_code=status)
+
+
+class _MetricsTransport(httpx.AsyncBaseTransport):
+    """Times and traces every Appium request (around recording/replay, so those are measured too)"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        command, device = _describe(request)
+        with span(f"webdriver {command}", "webdriver", device=device) as request_span:
+            started = time.perf_counter()
+            try:
+                response = await self.inner.handle_async_request(request)
+            except Exception:
+                _observe(command, device, started, None, request_span)
+                raise
+            _observe(command, device, started, response.status_code, request_span)
+            return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class _SyncMetricsTransport(httpx.BaseTransport):
+    def __init__(self, inner: httpx.BaseTransport):
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        command, device = _describe(request)
+        with span(f"webdriver {command}", "webdriver", device=device) as request_span:
+            started = time.perf_counter()
+            try:
+                response = self.inner.handle_request(request)
+            except Exception:
+                _observe(command, device, started, None, request_span)
+                raise
+            _observe(command, device, started, response.status_code, request_span)
+            return response
+
+    def close(self):
+        self.inner.close()
+
+
+# Active recording or replay (at most one of them)
+_recording: Optional[Cassette] = None
+_recording_path: Optional[Path] = None
+_player: Optional[CassettePlayer] = None
+_replay_name: Optional[str] = None
+
+
+def appium_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient for Appium requests (recorded or replayed when a cassette is active)"""
+    if _player is not None:
+        transport = _ReplayTransport(_player)
+    elif _recording is not None:
+        transport = _RecordingTransport(_recording)
+    else:
+        transport = httpx.AsyncHTTPTransport()
+    return httpx.AsyncClient(transport=_MetricsTransport(transport), **kwargs)
+
+
+def appium_sync_client(**kwargs) -> httpx.Client:
+    """Blocking counterpart of appium_client()"""
+    if _player is not None:
+        transport = _SyncReplayTransport(_player)
+    elif _recording is not None:
+        transport = _SyncRecordingTransport(_recording)
+    else:
+        transport = httpx.HTTPTransport()
+    return httpx.Client(transport=_SyncMetricsTransport(transport), **kwargs)
+
+
+def is_replaying() -> bool:
+    return _player is not None
+
+
+def cassette_path(name: str) -> Path:
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        raise ValueError(f"Invalid cassette name: {name!r}")
+    return CASSETTE_DIR / (name if name.endswith(".zip") else f"{name}.zip")
+
+
+def start_recording(name: str, meta: Optional[Dict] = None) -> Path:
+    global _recording, _recording_path
+    if _recording is not None or _player is not None:
+        raise RuntimeError("A cassette is already recording or replaying")
+    _recording_path = cassette_path(name)
+    _recording = Cassette({**(meta or {}), "name": name, "recorded_at": datetime.now().isoformat()})
+    logger.info("[Cassette] 🔴 Recording Appium traffic to %s", _recording_path)
+    return _recording_path
+
+
+def stop_recording() -> Optional[Dict]:
+    """Stop recording and write the cassette; returns its summary"""
+    global _recording, _recording_path
+    cassette, path = _recording, _recording_path
+    _recording, _recording_path = None, None
+    if cassette is None:
+        return None
+    cassette.save(path)
+    logger.info("[Cassette] 💾 Saved %s interactions to %s", len(cassette.interactions), path)
+    return {"path": str(path), **cassette.summary()}
+
+
+def start_replay(name: str, speed: float = 0.0) -> Dict:
+    global _player, _replay_name
+    if _recording is not None or _player is not None:
+        raise RuntimeError("A cassette is already recording or replaying")
+    cassette = Cassette.load(cassette_path(name))
+    _player = CassettePlayer(cassette, speed)
+    _replay_name = name
+    logger.info("[Cassette] ▶️ Replaying %s (%s interactions, speed %s)", name, len(cassette.interactions), speed)
+    return cassette.summary()
+
+
+def stop_replay() -> Optional[Dict]:
+    global _player, _replay_name
+    player, _player, _replay_name = _player, None, None
+    if player is None:
+        return None
+    return {"served": player.served, "missed": player.missed}
+
+
+def get_status() -> Dict:
+    if _recording is not None:
+        return {"mode": "recording", "path": str(_recording_path), "interactions": len(_recording.interactions)}
+    if _player is not None:
+        return {"mode": "replaying", "name": _replay_name, "speed": _player.speed,
+                "served": _player.served, "missed": _player.missed}
+    return {"mode": "off"}
+
+
+def list_cassettes() -> List[Dict]:
+    if not CASSETTE_DIR.exists():
+        return []
+    return [
+        {"name": path.stem, "size": path.stat().st_size, "modified": path.stat().st_mtime}
+        for path in sorted(CASSETTE_DIR.glob("*.zip"))
+    ]
@@ -2,10 +2,15 @@
 import threading
 import requests
 import time
-from typing import Optional, Callable, Dict
+from typing import Optional, Callable
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
+from services.diagnostics.logs import get_logger
+from utils.bounded_store import BoundedStore
+
+logger = get_logger("appium_events")
+
 class AppiumEventMonitor:
     """Monitor mobile actions by polling Appium UI hierarchy - Threading version"""
     
@@ -26,18 +31,18 @@ class AppiumEventMonitor:
     def start(self):
         """Start monitoring"""
         if self.running:
-            print(f"[AppiumMonitor] Already running for session {self.session_id}")
+            logger.info("[AppiumMonitor] Already running for session %s", self.session_id)
             return
             
-        print(f"[AppiumMonitor] Starting for session {self.session_id}")
+        logger.info("[AppiumMonitor] Starting for session %s", self.session_id)
         self.running = True
         self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.thread.start()
-        print(f"[AppiumMonitor] Monitoring thread started!")
+        logger.debug("[AppiumMonitor] Monitoring thread started!")
         
     def stop(self):
         """Stop monitoring"""
-        print(f"[AppiumMonitor] Stopping for session {self.session_id}")
+        logger.info("[AppiumMonitor] Stopping for session %s", self.session_id)
         self.running = False
         
         if self.thread:
@@ -47,7 +52,7 @@ class AppiumEventMonitor:
         """Main monitoring loop - polls UI state"""
         poll_interval = 0.5  # 500ms polling
         
-        print(f"[AppiumMonitor] Monitoring active, polling every {poll_interval}s")
+        logger.info("[AppiumMonitor] Monitoring active, polling every %ss", poll_interval)
         
         consecutive_errors = 0
         max_errors = 10
@@ -66,14 +71,14 @@ class AppiumEventMonitor:
             except Exception as e:
                 consecutive_errors += 1
                 if consecutive_errors >= max_errors:
-                    print(f"[AppiumMonitor] Too many errors ({consecutive_errors}), stopping monitor")
+                    logger.error("[AppiumMonitor] Too many errors (%d), stopping monitor", consecutive_errors)
                     self.running = False
                     break
                     
                 # Silent fail for occasional errors
                 time.sleep(poll_interval)
                 
-        print(f"[AppiumMonitor] Monitoring stopped for session {self.session_id}")
+        logger.info("[AppiumMonitor] Monitoring stopped for session %s", self.session_id)
         
     def _check_ui_changes(self):
         """Check for UI changes that indicate user interaction"""
@@ -106,12 +111,12 @@ class AppiumEventMonitor:
             if self.last_ui_hash is not None:
                 # Activity changed = navigation/screen change
                 if current_activity and current_activity != self.last_activity:
-                    print(f"[AppiumMonitor] 📱 Activity changed: {self.last_activity} → {current_activity}")
+                    logger.info("[AppiumMonitor] 📱 Activity changed: %s → %s", self.last_activity, current_activity)
                     self._on_screen_change(current_activity)
                     
                 # UI changed = possible tap/swipe
                 elif current_hash != self.last_ui_hash and self.tap_cooldown <= 0:
-                    print(f"[AppiumMonitor] 📱 UI changed - inferring tap")
+                    logger.debug("[AppiumMonitor] 📱 UI changed - inferring tap")
                     self._infer_tap_from_change(page_source)
                     self.tap_cooldown = 1.2  # 1.2 second cooldown
             
@@ -175,13 +180,13 @@ class AppiumEventMonitor:
                 }
                 
                 desc = element['text'] or element['resource_id'] or element['class']
-                print(f"[AppiumMonitor] 👆 Inferred TAP at ({element['x']}, {element['y']}) - {desc[:30]}")
+                logger.info("[AppiumMonitor] 👆 Inferred TAP at (%d, %d) - %s", element['x'], element['y'], desc[:30])
                 
                 if self.callback:
                     try:
                         self.callback(action)
                     except Exception as e:
-                        print(f"[AppiumMonitor] Callback error: {e}")
+                        logger.error("[AppiumMonitor] Callback error: %s", e)
                         
         except Exception as e:
             # Silent fail - XML parsing can fail
@@ -200,25 +205,28 @@ class AppiumEventMonitor:
             try:
                 self.callback(action)
             except Exception as e:
-                print(f"[AppiumMonitor] Callback error: {e}")
+                logger.error("[AppiumMonitor] Callback error: %s", e)
 
 
-# Global monitor instances
-_active_monitors: Dict[str, AppiumEventMonitor] = {}
+# Global monitor instances; past the limit the least recently started one is stopped
+MAX_ACTIVE_MONITORS = 16
+_active_monitors = BoundedStore(
+    "appium_event_monitors", MAX_ACTIVE_MONITORS, on_evict=lambda session_id, monitor: monitor.stop()
+)  # {session_id: AppiumEventMonitor}
 
 def start_monitoring(session_id: str, appium_host: str, appium_port: int, callback: Callable) -> bool:
     """Start Appium event monitoring for a session"""
     global _active_monitors
     
     if session_id in _active_monitors:
-        print(f"[AppiumMonitor] Already monitoring session {session_id}")
+        logger.info("[AppiumMonitor] Already monitoring session %s", session_id)
         return True
         
     monitor = AppiumEventMonitor(session_id, appium_host, appium_port, callback)
     monitor.start()
     
     _active_monitors[session_id] = monitor
-    print(f"[AppiumMonitor] Monitor added to active monitors")
+    logger.debug("[AppiumMonitor] Monitor added to active monitors")
     return True
 
 def stop_monitoring(session_id: str):
@@ -228,6 +236,6 @@ def stop_monitoring(session_id: str):
     if session_id in _active_monitors:
         _active_monitors[session_id].stop()
         del _active_monitors[session_id]
-        print(f"[AppiumMonitor] Stopped monitoring session {session_id}")
+        logger.info("[AppiumMonitor] Stopped monitoring session %s", session_id)
     else:
-        print(f"[AppiumMonitor] No active monitor for session {session_id}")
+        logger.info("[AppiumMonitor] No active monitor for session %s", session_id)
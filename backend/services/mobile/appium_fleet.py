@@ -0,0 +1,381 @@
+"""
+Appium Fleet - One supervised Appium server per device (or per N devices)
+
+A single Appium node serializes every device behind one Node.js process and
+takes all sessions down with it when it dies. The fleet instead:
+
+- allocates a free server port and UiAutomator2 systemPort / WDA port per node
+- starts nodes on demand and waits on /status instead of sleeping
+- health-checks nodes and restarts crashed or hung ones (with backoff)
+- remembers which node owns each session so requests go to the right server
+
+The server on settings.APPIUM_PORT stays the default node for sessions
+created outside the fleet.
+"""
+
+import asyncio
+import socket
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import settings
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("appium_fleet")
+
+# Ports handed to fleet nodes; the default node keeps settings.APPIUM_PORT
+NODE_PORT_RANGE = range(settings.APPIUM_PORT + 1, settings.APPIUM_PORT + 200)
+
+# UiAutomator2 server port on the host (one per Android device) and WDA port (iOS)
+SYSTEM_PORT_RANGE = range(8200, 8300)
+WDA_PORT_RANGE = range(8100, 8200)
+
+READY_TIMEOUT = 60
+READY_POLL_INTERVAL = 0.2
+HEALTH_INTERVAL = 10
+HEALTH_TIMEOUT = 5
+
+# Consecutive failed probes before a live process is considered hung
+UNHEALTHY_AFTER = 3
+
+# Restart backoff: 1s, 2s, 4s ... capped
+MAX_RESTART_BACKOFF = 60
+
+LOG_LINES = 200
+
+
+def _port_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+class AppiumNode:
+    """One Appium server process and the devices routed to it"""
+
+    def __init__(self, port: int, external: bool = False):
+        self.port = port
+        self.external = external  # Not started by us (e.g. the default server)
+        self.devices: List[str] = []
+        self.system_ports: Dict[str, int] = {}
+        self.wda_ports: Dict[str, int] = {}
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.status = "stopped"  # stopped, starting, ready, unhealthy
+        self.started_at: Optional[float] = None
+        self.ready_time: Optional[float] = None
+        self.failed_probes = 0
+        self.restarts = 0
+        self.next_restart_at = 0.0
+        self.logs = deque(maxlen=LOG_LINES)
+        self._log_task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{settings.APPIUM_HOST}:{self.port}"
+
+    def to_dict(self) -> Dict:
+        return {
+            "port": self.port,
+            "url": self.url,
+            "status": self.status,
+            "external": self.external,
+            "pid": self.process.pid if self.process else None,
+            "devices": list(self.devices),
+            "system_ports": dict(self.system_ports),
+            "wda_ports": dict(self.wda_ports),
+            "restarts": self.restarts,
+            "uptime": time.time() - self.started_at if self.started_at and self.status == "ready" else 0,
+            "ready_time": self.ready_time,
+        }
+
+
+class AppiumFleet:
+    """Starts, routes to and supervises Appium nodes"""
+
+    def __init__(self, devices_per_node: int = 1, appium_path: str = "appium"):
+        self.devices_per_node = max(1, devices_per_node)
+        self.appium_path = appium_path
+        self.nodes: Dict[int, AppiumNode] = {}  # {port: node}
+        self.default_node = AppiumNode(settings.APPIUM_PORT, external=True)
+        self._device_nodes: Dict[str, AppiumNode] = {}
+        self._session_urls: Dict[str, str] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    # ---- routing ----
+
+    def register_session(self, session_id: str, url: str):
+        self._session_urls[session_id] = url
+
+    def forget_session(self, session_id: str):
+        self._session_urls.pop(session_id, None)
+
+    def session_url(self, session_id: Optional[str] = None) -> str:
+        """Base URL of the server that owns a session (default node if unknown)"""
+        if session_id and session_id in self._session_urls:
+            return self._session_urls[session_id]
+        return self.default_node.url
+
+    def node_for_device(self, device_id: str) -> Optional[AppiumNode]:
+        return self._device_nodes.get(device_id)
+
+    def capabilities_for(self, device_id: str) -> Dict:
+        """Per-device ports so parallel sessions don't fight over the same forwards"""
+        node = self._device_nodes.get(device_id)
+        if not node:
+            return {}
+        return {
+            "appium:udid": device_id,
+            "appium:systemPort": node.system_ports[device_id],
+            "appium:wdaLocalPort": node.wda_ports[device_id],
+        }
+
+    # ---- allocation ----
+
+    def _used_ports(self, attribute: str) -> set:
+        used = set()
+        for node in self.nodes.values():
+            used.update(getattr(node, attribute).values())
+        return used
+
+    def _allocate(self, port_range: range, used: set) -> int:
+        for port in port_range:
+            if port not in used and _port_free(port):
+                return port
+        raise RuntimeError(f"No free port in {port_range.start}-{port_range.stop - 1}")
+
+    def _assign(self, device_id: str) -> AppiumNode:
+        node = self._device_nodes.get(device_id)
+        if node:
+            return node
+
+        node = next((n for n in self.nodes.values()
+                     if len(n.devices) < self.devices_per_node and n.status != "unhealthy"), None)
+        if node is None:
+            node = AppiumNode(self._allocate(NODE_PORT_RANGE, set(self.nodes)))
+            self.nodes[node.port] = node
+
+        node.devices.append(device_id)
+        node.system_ports[device_id] = self._allocate(SYSTEM_PORT_RANGE, self._used_ports("system_ports"))
+        node.wda_ports[device_id] = self._allocate(WDA_PORT_RANGE, self._used_ports("wda_ports"))
+        self._device_nodes[device_id] = node
+        return node
+
+    def assigned_devices(self) -> set:
+        return set(self._device_nodes)
+
+    async def unassign(self, device_id: str):
+        """Release a disconnected device's ports, stopping its node once no devices are left on it"""
+        node = self._device_nodes.pop(device_id, None)
+        if node is None:
+            return
+        if device_id in node.devices:
+            node.devices.remove(device_id)
+        node.system_ports.pop(device_id, None)
+        node.wda_ports.pop(device_id, None)
+        logger.info("[AppiumFleet] 🔌 Released %s from port %s", device_id, node.port)
+        if not node.devices and self.nodes.get(node.port) is node:
+            await self.stop_node(node.port)
+
+    # ---- lifecycle ----
+
+    async def ensure_node(self, device_id: str) -> AppiumNode:
+        """The device's node, started and ready"""
+        node = self._assign(device_id)
+        await self._ensure_running(node)
+        self._start_health_loop()
+        return node
+
+    async def ensure_default(self) -> AppiumNode:
+        """Make sure something answers on the default port, starting Appium if not"""
+        await self._ensure_running(self.default_node)
+        return self.default_node
+
+    async def _ensure_running(self, node: AppiumNode):
+        lock = self._locks.setdefault(node.port, asyncio.Lock())
+        async with lock:
+            if await self.probe(node):
+                # Already serving (ours, or an Appium the user started on the default port)
+                node.status = "ready"
+                node.started_at = node.started_at or time.time()
+                return
+            await self._start(node)
+
+    async def _start(self, node: AppiumNode):
+        await self._terminate(node)
+        node.status = "starting"
+        node.failed_probes = 0
+        node.started_at = time.time()
+        logger.info("[AppiumFleet] 🚀 Starting Appium on port %s for %s", node.port, node.devices or 'default')
+
+        try:
+            node.process = await asyncio.create_subprocess_exec(
+                self.appium_path, "-p", str(node.port), "--allow-cors",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except FileNotFoundError:
+            node.status = "stopped"
+            raise RuntimeError("Appium not installed. Run: npm install -g appium")
+
+        node.external = False
+        # Drain output so a chatty server never blocks on a full pipe
+        node._log_task = asyncio.ensure_future(self._read_logs(node))
+
+        deadline = time.time() + READY_TIMEOUT
+        while time.time() < deadline:
+            if node.process.returncode is not None:
+                node.status = "stopped"
+                raise RuntimeError(f"Appium on port {node.port} exited: {' | '.join(list(node.logs)[-3:])}")
+            if await self.probe(node):
+                node.status = "ready"
+                node.ready_time = time.time() - node.started_at
+                logger.info("[AppiumFleet] ✅ Port %s ready in %.1fs", node.port, node.ready_time)
+                return
+            await asyncio.sleep(READY_POLL_INTERVAL)
+
+        node.status = "unhealthy"
+        raise RuntimeError(f"Appium on port {node.port} not ready after {READY_TIMEOUT}s")
+
+    async def _read_logs(self, node: AppiumNode):
+        process = node.process
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                node.logs.append(line.decode(errors="replace").rstrip())
+        except Exception:
+            pass
+
+    async def probe(self, node: AppiumNode) -> bool:
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(f"{node.url}/status", timeout=HEALTH_TIMEOUT)
+                return response.status_code == 200
+        except Exception:
+            return False
+
+    async def _terminate(self, node: AppiumNode):
+        process = node.process
+        node.process = None
+        if process and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 10)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        if node._log_task:
+            node._log_task.cancel()
+            node._log_task = None
+
+    async def restart_node(self, port: int) -> AppiumNode:
+        node = self.nodes.get(port) or (self.default_node if port == self.default_node.port else None)
+        if node is None:
+            raise KeyError(port)
+        self._drop_sessions(node)
+        async with self._locks.setdefault(node.port, asyncio.Lock()):
+            node.restarts += 1
+            await self._start(node)
+        return node
+
+    async def stop_node(self, port: int):
+        node = self.nodes.pop(port, None)
+        if node is None:
+            return
+        self._drop_sessions(node)
+        for device_id in node.devices:
+            self._device_nodes.pop(device_id, None)
+        await self._terminate(node)
+        node.status = "stopped"
+        logger.info("[AppiumFleet] 🛑 Stopped Appium on port %s", port)
+
+    async def stop_all(self) -> int:
+        """Stop every server we started (never touches Appium processes we don't own)"""
+        stopped = 0
+        for port in list(self.nodes):
+            await self.stop_node(port)
+            stopped += 1
+        if self.default_node.process:
+            self._drop_sessions(self.default_node)
+            await self._terminate(self.default_node)
+            self.default_node.status = "stopped"
+            stopped += 1
+        return stopped
+
+    def _drop_sessions(self, node: AppiumNode):
+        for session_id, url in list(self._session_urls.items()):
+            if url == node.url:
+                del self._session_urls[session_id]
+
+    # ---- supervision ----
+
+    def _start_health_loop(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def _health_loop(self):
+        while self.nodes:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            for node in list(self.nodes.values()):
+                try:
+                    await self._check(node)
+                except Exception as e:
+                    logger.warning("[AppiumFleet] ⚠️ Health check failed for port %s: %s", node.port, e)
+
+    async def _check(self, node: AppiumNode):
+        if node.status == "starting":
+            return
+
+        exited = node.process is not None and node.process.returncode is not None
+        if not exited:
+            if await self.probe(node):
+                node.failed_probes = 0
+                node.status = "ready"
+                return
+            node.failed_probes += 1
+            if node.failed_probes < UNHEALTHY_AFTER:
+                return
+
+        node.status = "unhealthy"
+        if time.time() < node.next_restart_at:
+            return
+
+        backoff = min(MAX_RESTART_BACKOFF, 2 ** min(node.restarts, 6))
+        node.next_restart_at = time.time() + backoff
+        logger.warning("[AppiumFleet] 🔁 Restarting port %s (%s)", node.port, 'exited' if exited else 'not responding')
+        try:
+            await self.restart_node(node.port)
+        except Exception as e:
+            logger.error("[AppiumFleet] ❌ Restart of port %s failed: %s", node.port, e)
+
+    def get_status(self) -> Dict:
+        return {
+            "devices_per_node": self.devices_per_node,
+            "default": self.default_node.to_dict(),
+            "nodes": [node.to_dict() for node in self.nodes.values()],
+            "sessions": dict(self._session_urls),
+        }
+
+    def get_logs(self, port: int) -> List[str]:
+        node = self.nodes.get(port) or (self.default_node if port == self.default_node.port else None)
+        return list(node.logs) if node else []
+
+
+_appium_fleet: Optional[AppiumFleet] = None
+
+
+def get_appium_fleet() -> AppiumFleet:
+    """Get the shared Appium fleet"""
+    global _appium_fleet
+    if _appium_fleet is None:
+        _appium_fleet = AppiumFleet(devices_per_node=settings.APPIUM_DEVICES_PER_NODE)
+    return _appium_fleet
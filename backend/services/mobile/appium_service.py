@@ -1,7 +1,16 @@
-import subprocess
+from collections import deque
 from typing import Dict, Optional
-import httpx
+import time
 from config import settings
+from services.diagnostics.logs import get_logger
+from services.diagnostics.metrics import SCREENSHOT_BYTES, SCREENSHOT_FPS, SCREENSHOTS
+from services.mobile.appium_cassette import appium_client, appium_sync_client, is_replaying
+from services.mobile.appium_fleet import get_appium_fleet
+from services.mobile.selector_compiler import STRATEGY_XPATH, compile_xpath, get_hierarchy_cache
+from services.mobile.session_profiles import SessionProfile, get_profile, mark_device_initialized
+from services.mobile.session_registry import get_session_registry
+
+logger = get_logger("appium")
 
 class AppiumService:
     """Manages Appium server and sessions"""
@@ -9,71 +18,39 @@ class AppiumService:
     def __init__(self):
         self.host = settings.APPIUM_HOST
         self.port = settings.APPIUM_PORT
-        self.server_process = None
-        self.active_sessions = {}
-        # Coordinate system tracking
-        self.screenshot_dimensions = {}  # {session_id: {width, height}}
-        self.device_dimensions = {}      # {session_id: {width, height}}
-        # Auto-discover existing sessions on init
-        self._discover_sessions()
+        # Sessions by device, shared by every caller (see session_registry.py)
+        self.registry = get_session_registry()
+        # Coordinate system tracking (bounded, dropped with the session)
+        self.screenshot_dimensions = self.registry.screenshot_dimensions  # {session_id: {width, height}}
+        self.device_dimensions = self.registry.device_dimensions          # {session_id: {width, height}}
+        # Recently fetched hierarchies, dropped whenever we act on the device
+        self.hierarchy_cache = get_hierarchy_cache()
+        # Recent screenshot times per device, for the fps gauge
+        self._screenshot_times: Dict[str, deque] = {}
     
-    def _discover_sessions(self):
-        """Discover and reconnect to existing Appium sessions"""
-        try:
-            import requests
-            response = requests.get(
-                f"http://{self.host}:{self.port}/sessions",
-                timeout=2
-            )
-            if response.status_code == 200:
-                data = response.json()
-                sessions = data.get("value", [])
-                
-                for session in sessions:
-                    session_id = session.get("id")
-                    capabilities = session.get("capabilities", {})
-                    
-                    if session_id:
-                        self.active_sessions[session_id] = capabilities
-                        print(f"[AppiumService] 🔄 Reconnected to existing session: {session_id}")
-                
-                if self.active_sessions:
-                    print(f"[AppiumService] ✅ Total active sessions: {len(self.active_sessions)}")
-                else:
-                    print("[AppiumService] ⚠️ No existing sessions found")
-                    
-        except Exception as e:
-            print(f"[AppiumService] Could not discover sessions: {e}")
+    @property
+    def active_sessions(self) -> Dict[str, Dict]:
+        """Snapshot of live sessions {session_id: capabilities}, oldest first"""
+        return self.registry.capabilities()
     
     async def start_server(self) -> bool:
-        """Start Appium server"""
+        """Start the default Appium server (returns as soon as /status answers)"""
         try:
-            # Check if already running
-            if await self.is_server_running():
-                return True
-            
-            # Start Appium
-            self.server_process = subprocess.Popen(
-                ["appium", "-p", str(self.port)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            # Wait for server to start
-            import time
-            time.sleep(3)
-            
-            return await self.is_server_running()
+            await get_appium_fleet().ensure_default()
+            return True
         
         except Exception as e:
-            print(f"Error starting Appium server: {e}")
+            logger.error("[AppiumService] Error starting Appium server: %s", e)
             return False
     
+    def session_url(self, session_id: Optional[str] = None) -> str:
+        """Base URL of the Appium server that owns a session"""
+        return get_appium_fleet().session_url(session_id)
+    
     async def is_server_running(self) -> bool:
         """Check if Appium server is running"""
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.get(
                     f"http://{self.host}:{self.port}/status",
                     timeout=2
@@ -82,158 +59,226 @@ class AppiumService:
         except:
             return False
     
-    async def create_session(self, device_id: str, platform: str, app_package: str, app_activity: str) -> Optional[str]:
-        """Create Appium session - FIXED for real device launch"""
+    async def create_session(
+        self,
+        device_id: str,
+        platform: str,
+        app_package: Optional[str],
+        app_activity: Optional[str],
+        extra_capabilities: Optional[Dict] = None,
+        profile: Optional[SessionProfile] = None
+    ) -> Optional[str]:
+        """Create Appium session - FIXED for real device launch (no app_package = don't launch an app)"""
+        profile = profile or get_profile()
         capabilities = {
             "platformName": platform.capitalize(),
             "appium:deviceName": device_id,
-            "appium:automationName": "UiAutomator2",
-            "appium:appPackage": app_package,
-            "appium:appActivity": app_activity
+            "appium:automationName": "UiAutomator2"
         }
+        if app_package:
+            capabilities["appium:appPackage"] = app_package
+            capabilities["appium:appActivity"] = app_activity
+        capabilities.update(profile.capabilities_for(device_id))
+        capabilities.update(extra_capabilities or {})
+
+        # Each device gets its own Appium server and forwarded ports
+        server_url = self.session_url()
+        if settings.APPIUM_FLEET_ENABLED and not is_replaying():
+            try:
+                node = await get_appium_fleet().ensure_node(device_id)
+                server_url = node.url
+                capabilities.update(get_appium_fleet().capabilities_for(device_id))
+            except Exception as e:
+                logger.warning("[AppiumService] ⚠️ No dedicated Appium for %s (%s), using %s", device_id, e, server_url)
 
-        print(f"[DEBUG] Creating session with capabilities: {capabilities}")
+        logger.debug("[AppiumService] Creating session with capabilities: %s", capabilities)
 
         try:
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session",
+                    f"{server_url}/session",
                     json={"capabilities": {"alwaysMatch": capabilities}},
                     timeout=60
                 )
 
-                print(f"[DEBUG] Session creation response status: {response.status_code}")
+                logger.debug("[AppiumService] Session creation response status: %s", response.status_code)
 
                 if response.status_code == 200:
                     data = response.json()
-                    print(f"[DEBUG] Response data: {data}")
+                    logger.debug("[AppiumService] Response data: %s", data)
 
                     session_id = data.get("value", {}).get("sessionId") or data.get("sessionId")
 
-                    print(f"[DEBUG] Extracted session_id: {session_id}")
+                    logger.debug("[AppiumService] Extracted session_id: %s", session_id)
 
                     if session_id:
-                        self.active_sessions[session_id] = capabilities
-                        print(f"[DEBUG] ✅ Session created! Active sessions: {list(self.active_sessions.keys())}")
+                        get_appium_fleet().register_session(session_id, server_url)
+                        self.registry.register(session_id, capabilities, device_id=device_id, profile=profile.name)
+                        mark_device_initialized(device_id)
+                        await self.update_settings(session_id, profile.settings)
+                        logger.info("[AppiumService] ✅ Session created! Active sessions: %s", list(self.active_sessions.keys()))
                         return session_id
                     else:
-                        print("[ERROR] Could not extract session_id from response")
+                        logger.error("[AppiumService] Could not extract session_id from response")
                         return None
                 else:
                     error_text = response.text
-                    print(f"[ERROR] Session creation failed: {error_text}")
+                    logger.error("[AppiumService] Session creation failed: %s", error_text)
                     return None
 
         except Exception as e:
-            print(f"[ERROR] Error creating session: {e}")
+            logger.error("[AppiumService] Error creating session: %s", e)
             import traceback
             traceback.print_exc()
             return None
     
     async def delete_session(self, session_id: str) -> bool:
         """Delete an Appium session"""
+        self.hierarchy_cache.invalidate(session_id)
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.delete(
-                    f"http://{self.host}:{self.port}/session/{session_id}",
+                    f"{self.session_url(session_id)}/session/{session_id}",
                     timeout=10
                 )
                 
-                if session_id in self.active_sessions:
-                    del self.active_sessions[session_id]
+                self.registry.remove(session_id)
                 
                 return response.status_code == 200
         
         except Exception as e:
-            print(f"Error deleting session: {e}")
+            logger.error("[AppiumService] Error deleting session: %s", e)
             return False
     
-    def get_page_source(self, session_id: str, retries=3) -> Optional[str]:
-        """Get page source (XML hierarchy) - SYNC version with retries and auto-cleanup"""
-        import requests
+    async def update_settings(self, session_id: str, settings: Dict) -> bool:
+        """Apply driver settings (waitForIdleTimeout, ignoreUnimportantViews, ...) to a live session"""
+        if not settings:
+            return True
+        self.hierarchy_cache.invalidate(session_id)
+        try:
+            async with appium_client() as client:
+                response = await client.post(
+                    f"{self.session_url(session_id)}/session/{session_id}/appium/settings",
+                    json={"settings": settings},
+                    timeout=10
+                )
+                if response.status_code == 200:
+                    return True
+                logger.warning("[AppiumService] ⚠️ Could not apply settings to %s: %s", session_id, response.text[:200])
+        except Exception as e:
+            logger.warning("[AppiumService] ⚠️ Could not apply settings to %s: %s", session_id, e)
+        return False
+    
+    async def is_session_alive(self, session_id: str) -> bool:
+        """Cheap liveness check (also resets the session's newCommandTimeout)"""
+        try:
+            async with appium_client() as client:
+                response = await client.get(
+                    f"{self.session_url(session_id)}/session/{session_id}/appium/device/current_package",
+                    timeout=5
+                )
+                return response.status_code == 200
+        except Exception:
+            return False
+    
+    async def get_current_package(self, session_id: str) -> Optional[str]:
+        """Package of the app in the foreground"""
+        try:
+            async with appium_client() as client:
+                response = await client.get(
+                    f"{self.session_url(session_id)}/session/{session_id}/appium/device/current_package",
+                    timeout=5
+                )
+                if response.status_code == 200:
+                    return response.json().get("value")
+        except Exception:
+            pass
+        return None
+    
+    async def execute_mobile(self, session_id: str, command: str, args: Optional[Dict] = None, timeout: float = 30) -> tuple:
+        """
+        Run a driver extension such as "mobile: activateApp"
+        
+        Returns:
+            (success, value or error message)
+        """
+        self.hierarchy_cache.invalidate(session_id)
+        try:
+            async with appium_client() as client:
+                response = await client.post(
+                    f"{self.session_url(session_id)}/session/{session_id}/execute/sync",
+                    json={"script": command, "args": [args or {}]},
+                    timeout=timeout
+                )
+                value = response.json().get("value")
+                if response.status_code == 200:
+                    return True, value
+                return False, value.get("message") if isinstance(value, dict) else response.text[:200]
+        except Exception as e:
+            return False, str(e)
+    
+    def get_page_source(self, session_id: str, retries=3, max_age: float = 0) -> Optional[str]:
+        """
+        Get page source (XML hierarchy) - SYNC version with retries and auto-cleanup
+        
+        max_age > 0 allows reusing a hierarchy fetched that many seconds ago,
+        as long as no tap/swipe/input went through this service since.
+        """
         import time
         
-        # STEP 0: Clean up dead sessions FIRST
-        self._cleanup_dead_sessions()
+        if max_age:
+            cached = self.hierarchy_cache.get_source(session_id, max_age)
+            if cached:
+                logger.debug("[AppiumService] ♻️ Reusing cached page source for session: %s", session_id)
+                return cached
         
         for attempt in range(retries):
             try:
-                print(f"[AppiumService] Getting page source (attempt {attempt + 1}/{retries}) for session: {session_id}")
+                logger.debug("[AppiumService] Getting page source (attempt %s/%s) for session: %s", attempt + 1, retries, session_id)
                 
-                response = requests.get(
-                    f"http://{self.host}:{self.port}/session/{session_id}/source",
-                    timeout=10
-                )
+                fetched_at = time.time()  # An action after this makes the result stale
+                with appium_sync_client() as client:
+                    response = client.get(
+                        f"{self.session_url(session_id)}/session/{session_id}/source",
+                        timeout=10
+                    )
                 
-                print(f"[AppiumService] Response status: {response.status_code}")
+                logger.debug("[AppiumService] Response status: %s", response.status_code)
                 
                 if response.status_code == 200:
                     xml = response.json().get("value")
                     
                     if xml and len(xml) > 100:
-                        print(f"[AppiumService] ✅ Got page source: {len(xml)} chars")
+                        logger.debug("[AppiumService] ✅ Got page source: %s chars", len(xml))
+                        self.hierarchy_cache.put(session_id, xml, fetched_at)
                         return xml
                     else:
-                        print(f"[AppiumService] ⚠️ XML too small or empty: {len(xml) if xml else 0} chars, retrying...")
+                        logger.warning("[AppiumService] ⚠️ XML too small or empty: %s chars, retrying...", len(xml) if xml else 0)
                         time.sleep(0.5)
                 elif response.status_code == 404:
                     # Session is dead - remove it and fail immediately
-                    print(f"[AppiumService] ❌ Session {session_id} is DEAD (404), removing from active sessions")
-                    if session_id in self.active_sessions:
-                        del self.active_sessions[session_id]
+                    logger.warning("[AppiumService] ❌ Session %s is DEAD (404), removing from active sessions", session_id)
+                    self.registry.remove(session_id)
                     return None  # Don't retry dead sessions
                 else:
-                    print(f"[AppiumService] ❌ Bad status {response.status_code}: {response.text[:200]}")
+                    logger.warning("[AppiumService] ❌ Bad status %s: %s", response.status_code, response.text[:200])
                     time.sleep(0.5)
                     
             except Exception as e:
-                print(f"[AppiumService] ❌ Exception on attempt {attempt + 1}: {e}")
+                logger.warning("[AppiumService] ❌ Exception on attempt %s: %s", attempt + 1, e)
                 import traceback
                 traceback.print_exc()
                 time.sleep(0.5)
         
-        print(f"[AppiumService] ❌ Failed to get page source after {retries} attempts")
+        logger.error("[AppiumService] ❌ Failed to get page source after %s attempts", retries)
         return None
     
-    def _cleanup_dead_sessions(self):
-        """Remove dead/invalid sessions from active_sessions dict"""
-        import requests
-        
-        dead_sessions = []
-        
-        for session_id in list(self.active_sessions.keys()):
-            try:
-                # Quick test - just check if session exists
-                response = requests.get(
-                    f"http://{self.host}:{self.port}/session/{session_id}",
-                    timeout=2
-                )
-                
-                if response.status_code == 404:
-                    print(f"[AppiumService] 🧹 Removing dead session: {session_id}")
-                    dead_sessions.append(session_id)
-                    
-            except Exception as e:
-                print(f"[AppiumService] 🧹 Session {session_id} unreachable, removing: {e}")
-                dead_sessions.append(session_id)
-        
-        # Remove dead sessions
-        for session_id in dead_sessions:
-            if session_id in self.active_sessions:
-                del self.active_sessions[session_id]
-        
-        if dead_sessions:
-            print(f"[AppiumService] ✅ Cleaned up {len(dead_sessions)} dead session(s)")
-            print(f"[AppiumService] Active sessions remaining: {list(self.active_sessions.keys())}")
-    
     async def get_screenshot(self, session_id: str) -> Optional[str]:
         """Get screenshot as base64 and cache dimensions"""
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.get(
-                    f"http://{self.host}:{self.port}/session/{session_id}/screenshot",
+                    f"{self.session_url(session_id)}/session/{session_id}/screenshot",
                     timeout=10
                 )
                 
@@ -242,6 +287,8 @@ class AppiumService:
                     
                     # Extract and cache screenshot dimensions
                     if screenshot_b64:
+                        # Approximate decoded size from the base64 length
+                        self._record_screenshot(session_id, len(screenshot_b64) * 3 // 4)
                         try:
                             from PIL import Image
                             import io
@@ -255,9 +302,9 @@ class AppiumService:
                                 'height': img.height
                             }
                             
-                            print(f"[Screenshot] 📸 Dimensions: {img.width}x{img.height}")
+                            logger.debug("[Screenshot] 📸 Dimensions: %sx%s", img.width, img.height)
                         except Exception as e:
-                            print(f"[Screenshot] ⚠️ Failed to extract dimensions: {e}")
+                            logger.warning("[Screenshot] ⚠️ Failed to extract dimensions: %s", e)
                     
                     return screenshot_b64
         except:
@@ -265,6 +312,23 @@ class AppiumService:
         
         return None
     
+    def _record_screenshot(self, session_id: str, size: int):
+        record = self.registry.get(session_id)
+        device = (record.device_id if record else None) or ""
+        SCREENSHOTS.labels(device).inc()
+        SCREENSHOT_BYTES.labels(device).inc(size)
+        times = self._screenshot_times.get(device)
+        if times is None:
+            times = self._screenshot_times[device] = deque(maxlen=120)
+            SCREENSHOT_FPS.labels(device).set_function(lambda: self._screenshot_rate(times))
+        times.append(time.monotonic())
+    
+    @staticmethod
+    def _screenshot_rate(times: deque, window: float = 5.0) -> float:
+        """Screenshots per second over the last `window` seconds"""
+        since = time.monotonic() - window
+        return sum(1 for t in times if t >= since) / window
+    
     async def get_device_dimensions(self, session_id: str) -> dict:
         """Get device window dimensions from Appium and cache them"""
         # Return cached if available
@@ -272,10 +336,9 @@ class AppiumService:
             return self.device_dimensions[session_id]
         
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.get(
-                    f"http://{self.host}:{self.port}/session/{session_id}/window/rect",
+                    f"{self.session_url(session_id)}/session/{session_id}/window/rect",
                     timeout=5
                 )
                 
@@ -286,10 +349,10 @@ class AppiumService:
                         'height': rect.get('height', 2400)
                     }
                     self.device_dimensions[session_id] = dims
-                    print(f"[Device] 📱 Window dimensions: {dims['width']}x{dims['height']}")
+                    logger.debug("[Device] 📱 Window dimensions: %sx%s", dims['width'], dims['height'])
                     return dims
         except Exception as e:
-            print(f"[Device] ⚠️ Failed to get dimensions: {e}")
+            logger.warning("[Device] ⚠️ Failed to get dimensions: %s", e)
         
         # Fallback to common Android resolution
         dims = {'width': 1080, 'height': 2400}
@@ -297,18 +360,22 @@ class AppiumService:
         return dims
     
     async def find_element(self, session_id: str, using: str, value: str) -> Optional[str]:
-        """Find an element"""
+        """Find an element (XPaths are rewritten to a cheaper strategy when possible)"""
+        if using == STRATEGY_XPATH:
+            compiled = compile_xpath(value)
+            using, value = compiled["strategy"], compiled["value"]
+        
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session/{session_id}/element",
+                    f"{self.session_url(session_id)}/session/{session_id}/element",
                     json={"using": using, "value": value},
                     timeout=10
                 )
                 
                 if response.status_code == 200:
-                    return response.json().get("value", {}).get("ELEMENT")
+                    element = response.json().get("value", {})
+                    return element.get("ELEMENT") or element.get("element-6066-11e4-a52e-4f735466cecf")
         except:
             pass
         
@@ -316,11 +383,11 @@ class AppiumService:
     
     async def click_element(self, session_id: str, element_id: str) -> bool:
         """Click an element"""
+        self.hierarchy_cache.invalidate(session_id)
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session/{session_id}/element/{element_id}/click",
+                    f"{self.session_url(session_id)}/session/{session_id}/element/{element_id}/click",
                     timeout=10
                 )
                 return response.status_code == 200
@@ -329,11 +396,11 @@ class AppiumService:
     
     async def send_keys(self, session_id: str, element_id: str, text: str) -> bool:
         """Send keys to an element"""
+        self.hierarchy_cache.invalidate(session_id)
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session/{session_id}/element/{element_id}/value",
+                    f"{self.session_url(session_id)}/session/{session_id}/element/{element_id}/value",
                     json={"text": text},
                     timeout=10
                 )
@@ -343,12 +410,13 @@ class AppiumService:
     
     async def tap_at_coordinate(self, session_id: str, x: int, y: int) -> bool:
         """Tap at screen coordinates using W3C Actions API"""
+        self.hierarchy_cache.invalidate(session_id)
         try:
-            print(f"[DEBUG] Tapping at ({x}, {y}) on session {session_id}")
+            logger.debug("[AppiumService] Tapping at (%s, %s) on session %s", x, y, session_id)
             
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session/{session_id}/actions",
+                    f"{self.session_url(session_id)}/session/{session_id}/actions",
                     json={
                         "actions": [
                             {
@@ -367,28 +435,29 @@ class AppiumService:
                     timeout=10
                 )
                 
-                print(f"[DEBUG] Tap response status: {response.status_code}")
+                logger.debug("[AppiumService] Tap response status: %s", response.status_code)
                 if response.status_code == 200:
-                    print(f"[DEBUG] ✅ Tap executed successfully at ({x}, {y})")
+                    logger.debug("[AppiumService] ✅ Tap executed successfully at (%s, %s)", x, y)
                     return True
                 else:
-                    print(f"[ERROR] Tap failed: {response.text}")
+                    logger.error("[AppiumService] Tap failed: %s", response.text)
                     return False
                     
         except Exception as e:
-            print(f"[ERROR] Tap coordinate error: {e}")
+            logger.error("[AppiumService] Tap coordinate error: %s", e)
             import traceback
             traceback.print_exc()
             return False
     
     async def swipe(self, session_id: str, start_x: int, start_y: int, end_x: int, end_y: int, duration: int = 500) -> bool:
         """Execute swipe gesture using W3C Actions API"""
+        self.hierarchy_cache.invalidate(session_id)
         try:
-            print(f"[DEBUG] Swiping from ({start_x},{start_y}) to ({end_x},{end_y}) on session {session_id}")
+            logger.debug("[AppiumService] Swiping from (%s,%s) to (%s,%s) on session %s", start_x, start_y, end_x, end_y, session_id)
             
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 response = await client.post(
-                    f"http://{self.host}:{self.port}/session/{session_id}/actions",
+                    f"{self.session_url(session_id)}/session/{session_id}/actions",
                     json={
                         "actions": [
                             {
@@ -408,16 +477,16 @@ class AppiumService:
                     timeout=15
                 )
                 
-                print(f"[DEBUG] Swipe response status: {response.status_code}")
+                logger.debug("[AppiumService] Swipe response status: %s", response.status_code)
                 if response.status_code == 200:
-                    print(f"[DEBUG] ✅ Swipe executed successfully!")
+                    logger.debug("[AppiumService] ✅ Swipe executed successfully!")
                     return True
                 else:
-                    print(f"[ERROR] Swipe failed: {response.text}")
+                    logger.error("[AppiumService] Swipe failed: %s", response.text)
                     return False
                     
         except Exception as e:
-            print(f"[ERROR] Swipe error: {e}")
+            logger.error("[AppiumService] Swipe error: %s", e)
             import traceback
             traceback.print_exc()
             return False
@@ -431,5 +500,5 @@ def get_appium_service():
     global _appium_service_instance
     if _appium_service_instance is None:
         _appium_service_instance = AppiumService()
-        print(f"[AppiumService] 🆕 Created new singleton instance")
+        logger.debug("[AppiumService] 🆕 Created new singleton instance")
     return _appium_service_instance
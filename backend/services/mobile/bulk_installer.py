@@ -0,0 +1,284 @@
+"""
+Bulk Installer - Install one build on many Android devices in parallel
+
+Each device's installed versionCode and signing certificate are checked
+concurrently; up-to-date devices are skipped and the rest are installed at the
+same time. APK transfers are throttled per adb host with an in-flight byte
+budget so a batch of large installs doesn't saturate one USB bus / adb server.
+"""
+
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from services.diagnostics.logs import get_logger
+from services.mobile.adb_scheduler import LANE_BACKGROUND, get_adb_scheduler
+from services.mobile.device_bridge import DeviceBridge
+from services.mobile.package_inventory import get_package_inventory
+
+logger = get_logger("install")
+
+# Max bytes of APK being pushed at once through one adb host
+DEFAULT_HOST_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+# Max concurrent installs overall
+MAX_PARALLEL_INSTALLS = 8
+
+DUMPSYS_TIMEOUT = 15
+INSTALL_TIMEOUT = 300
+
+ProgressCallback = Callable[[str, int, str], Awaitable[None]]
+
+
+class TransferLimiter:
+    """Async budget of in-flight bytes; a transfer larger than the budget runs alone"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        size = max(1, min(size, self.capacity))
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight + size <= self.capacity)
+            self.in_flight += size
+        return size
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+def adb_host(device_id: str) -> str:
+    """Which adb transport a device shares: its network host, or the local USB bus"""
+    match = re.match(r"^(.+):\d+$", device_id)
+    return match.group(1) if match else "usb"
+
+
+def parse_package_state(dumpsys_output: str) -> Dict:
+    """Installed versionCode and signature hashes from `dumpsys package <pkg>`"""
+    version = re.search(r"versionCode=(\d+)", dumpsys_output)
+    if not version:
+        return {"installed": False, "version_code": None, "signatures": []}
+
+    # Android 9+: "signatures:[a1b2c3d4]"; older: "PackageSignatures{9fe5a2b [a1b2c3d4]}"
+    signatures = re.search(r"signatures:\[([0-9a-f, ]*)\]", dumpsys_output)
+    if not signatures:
+        signatures = re.search(r"PackageSignatures\{[0-9a-f]+ \[([0-9a-f, ]*)\]\}", dumpsys_output)
+
+    return {
+        "installed": True,
+        "version_code": int(version.group(1)),
+        "signatures": [s.strip() for s in signatures.group(1).split(",") if s.strip()] if signatures else []
+    }
+
+
+class BulkInstaller:
+    """Version-aware parallel installer on top of the async adb client"""
+
+    def __init__(self, host_inflight_bytes: int = DEFAULT_HOST_INFLIGHT_BYTES, max_parallel: int = MAX_PARALLEL_INSTALLS):
+        self.device_bridge = DeviceBridge()
+        self.host_inflight_bytes = host_inflight_bytes
+        self.max_parallel = max_parallel
+        self._limiters: Dict[str, TransferLimiter] = {}
+
+    def _limiter(self, device_id: str) -> TransferLimiter:
+        host = adb_host(device_id)
+        if host not in self._limiters:
+            self._limiters[host] = TransferLimiter(self.host_inflight_bytes)
+        return self._limiters[host]
+
+    async def get_installed_state(self, device_id: str, package_name: str) -> Dict:
+        """{installed, version_code, signatures} for a package on a device"""
+        _, stdout, _ = await get_adb_scheduler().shell(
+            device_id, f"dumpsys package {package_name}", lane=LANE_BACKGROUND, timeout=DUMPSYS_TIMEOUT
+        )
+        # dumpsys prints every package when the name is unknown; only trust our own section
+        if f"Package [{package_name}]" not in stdout:
+            return {"installed": False, "version_code": None, "signatures": []}
+        return parse_package_state(stdout)
+
+    def decide(self, state: Dict, build_info: Dict, force: bool = False) -> str:
+        """
+        What to do on a device: "install", "skip" or "signature_mismatch"
+
+        A device is up to date when the installed versionCode is at least the
+        build's and the signing certificate matches (if both sides are known).
+        With force it is reinstalled anyway, downgrading it if it is newer.
+        """
+        if not state["installed"]:
+            return "install"
+
+        signature = build_info.get("signature_hash")
+        if signature and state["signatures"] and signature not in state["signatures"]:
+            return "signature_mismatch"
+
+        if force:
+            return "install"
+
+        build_version = build_info.get("version_code")
+        if build_version is not None and state["version_code"] is not None \
+                and state["version_code"] >= int(build_version):
+            return "skip"
+        return "install"
+
+    async def install(
+        self,
+        apk_path: str,
+        apk_size: int,
+        build_info: Dict,
+        device_ids: List[str],
+        platforms: Dict[str, str] = None,
+        force: bool = False,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict:
+        """
+        Check and install a build on several devices concurrently
+
+        Returns:
+            Report with per-device status (installed, skipped, failed,
+            signature_mismatch) and timings
+        """
+        platforms = platforms or {}
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        start = time.time()
+
+        async def progress(device_id: str, value: int, message: str):
+            if progress_callback:
+                try:
+                    await progress_callback(device_id, value, message)
+                except Exception as e:
+                    logger.warning("[BulkInstall] Progress broadcast failed: %s", e)
+
+        async def run_device(device_id: str) -> Dict:
+            async with semaphore:
+                return await self._install_device(
+                    device_id, platforms.get(device_id, "android"), apk_path, apk_size,
+                    build_info, force, progress
+                )
+
+        logger.info("[BulkInstall] 📦 %s (%s) → %s devices", build_info.get('package_name'), build_info.get('version_code'), len(device_ids))
+        results = await asyncio.gather(*[run_device(device_id) for device_id in device_ids])
+
+        report = {
+            "package_name": build_info.get("package_name"),
+            "version_code": build_info.get("version_code"),
+            "version_name": build_info.get("version_name"),
+            "signature_hash": build_info.get("signature_hash"),
+            "total_devices": len(device_ids),
+            "installed": sum(1 for r in results if r["status"] == "installed"),
+            "skipped": sum(1 for r in results if r["status"] == "skipped"),
+            "failed": sum(1 for r in results if r["status"] in ("failed", "signature_mismatch")),
+            "wall_time": time.time() - start,
+            "devices": results
+        }
+        logger.info("[BulkInstall] ✅ Done in %.1fs: %s installed, %s skipped, %s failed",
+                    report['wall_time'], report['installed'], report['skipped'], report['failed'])
+        return report
+
+    async def _install_device(
+        self,
+        device_id: str,
+        platform: str,
+        apk_path: str,
+        apk_size: int,
+        build_info: Dict,
+        force: bool,
+        progress
+    ) -> Dict:
+        result = {
+            "device_id": device_id,
+            "status": "failed",
+            "installed_version_code": None,
+            "check_time": 0.0,
+            "transfer_wait": 0.0,
+            "install_time": 0.0,
+            "message": ""
+        }
+
+        try:
+            if platform != "android":
+                # No version/signature check for iOS; install through the bridge
+                await progress(device_id, 50, "Installing on iOS device...")
+                started = time.time()
+                outcome = await self.device_bridge.install_app(device_id, apk_path, platform)
+                result["install_time"] = time.time() - started
+                result["status"] = "installed" if outcome.get("success") else "failed"
+                result["message"] = outcome.get("message", "")
+                await progress(device_id, 100 if outcome.get("success") else 0, result["message"])
+                return result
+
+            await progress(device_id, 10, "Checking installed version...")
+            started = time.time()
+            state = await self.get_installed_state(device_id, build_info["package_name"])
+            result["check_time"] = time.time() - started
+            result["installed_version_code"] = state["version_code"]
+
+            decision = self.decide(state, build_info, force)
+            # Forcing an older build over a newer one fails without adb's downgrade flag
+            build_version = build_info.get("version_code")
+            downgrade = force and state["version_code"] is not None and build_version is not None \
+                and state["version_code"] > int(build_version)
+
+            if decision == "skip":
+                result["status"] = "skipped"
+                result["message"] = f"Already up to date (versionCode {state['version_code']})"
+                await progress(device_id, 100, f"✅ {result['message']}")
+                return result
+
+            if decision == "signature_mismatch":
+                if not force:
+                    result["status"] = "signature_mismatch"
+                    result["message"] = "Installed app is signed with a different certificate (use force to replace it)"
+                    await progress(device_id, 0, f"Failed: {result['message']}")
+                    return result
+                await progress(device_id, 20, "Removing app signed with a different certificate...")
+                await get_adb_scheduler().shell(
+                    device_id, f"pm uninstall {build_info['package_name']}", lane=LANE_BACKGROUND, timeout=60
+                )
+                get_package_inventory().invalidate(device_id)
+
+            await progress(device_id, 30, "Waiting for adb bandwidth...")
+            limiter = self._limiter(device_id)
+            waited = time.time()
+            reserved = await limiter.acquire(apk_size)
+            result["transfer_wait"] = time.time() - waited
+
+            try:
+                await progress(device_id, 50, "Installing on device...")
+                started = time.time()
+                success, output = await get_adb_scheduler().install(
+                    device_id, apk_path, lane=LANE_BACKGROUND, timeout=INSTALL_TIMEOUT, allow_downgrade=downgrade
+                )
+                result["install_time"] = time.time() - started
+            finally:
+                await limiter.release(reserved)
+
+            if success:
+                get_package_inventory().invalidate(device_id)
+                result["status"] = "installed"
+                result["message"] = "App installed successfully"
+                await progress(device_id, 100, "Installation complete!")
+            else:
+                result["message"] = output or "Installation failed"
+                await progress(device_id, 0, f"Failed: {result['message']}")
+
+        except Exception as e:
+            result["message"] = str(e)
+            await progress(device_id, 0, f"Failed: {e}")
+
+        return result
+
+
+_bulk_installer: Optional[BulkInstaller] = None
+
+
+def get_bulk_installer() -> BulkInstaller:
+    """Get the shared bulk installer (limiters are per process)"""
+    global _bulk_installer
+    if _bulk_installer is None:
+        _bulk_installer = BulkInstaller()
+    return _bulk_installer
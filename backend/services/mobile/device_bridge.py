@@ -3,6 +3,15 @@ import asyncio
 from typing import List, Dict, Optional
 import re
 
+from services.mobile.adb_client import get_adb_client
+from services.mobile.appium_fleet import get_appium_fleet
+from services.mobile.adb_scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, get_adb_scheduler
+from services.mobile.package_inventory import get_package_inventory
+
+# Android serials in the last successful listing, shared by every DeviceBridge
+_android_serials: set = set()
+
+
 class DeviceBridge:
     """Bridge for communicating with Android (ADB) and iOS devices"""
     
@@ -27,30 +36,35 @@ class DeviceBridge:
     async def _get_android_devices(self) -> List[Dict]:
         """Get connected Android devices via ADB"""
         try:
-            result = subprocess.run(
-                [self.adb_path, "devices", "-l"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            
             devices = []
-            lines = result.stdout.strip().split('\n')[1:]  # Skip first line
+            client = get_adb_client()
+            adb_devices = await client.devices()
             
-            for line in lines:
-                if not line.strip() or 'offline' in line:
-                    continue
-                
-                parts = line.split()
-                if len(parts) < 2:
+            # Unplugged or offline: its transport id and sync connection are dead
+            connected = {d["serial"] for d in adb_devices if d["state"] != "offline"}
+            for serial in client.known_serials() - connected:
+                client.forget(serial)
+            scheduler = get_adb_scheduler()
+            for serial in scheduler.known_devices() - connected:
+                scheduler.forget(serial)
+            # The fleet also holds iOS devices, so only release serials adb used to list
+            for serial in _android_serials - connected:
+                await get_appium_fleet().unassign(serial)
+            _android_serials.clear()
+            _android_serials.update(connected)
+            
+            for adb_device in adb_devices:
+                if adb_device["state"] == "offline":
                     continue
                 
-                device_id = parts[0]
+                device_id = adb_device["serial"]
                 
-                # Get device details
-                model = await self._get_android_property(device_id, "ro.product.model")
-                manufacturer = await self._get_android_property(device_id, "ro.product.manufacturer")
-                version = await self._get_android_property(device_id, "ro.build.version.release")
+                # Get device details (concurrently, over the adb server socket)
+                model, manufacturer, version = await asyncio.gather(
+                    self._get_android_property(device_id, "ro.product.model"),
+                    self._get_android_property(device_id, "ro.product.manufacturer"),
+                    self._get_android_property(device_id, "ro.build.version.release")
+                )
                 
                 device_type = "emulator" if "emulator" in device_id else "real"
                 
@@ -73,13 +87,8 @@ class DeviceBridge:
     async def _get_android_property(self, device_id: str, prop: str) -> Optional[str]:
         """Get Android device property"""
         try:
-            result = subprocess.run(
-                [self.adb_path, "-s", device_id, "shell", "getprop", prop],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-            return result.stdout.strip()
+            _, stdout, _ = await get_adb_scheduler().shell(device_id, f"getprop {prop}", lane=LANE_BACKGROUND, timeout=3)
+            return stdout.strip()
         except:
             return None
     
@@ -218,17 +227,13 @@ class DeviceBridge:
         """Install an app on a device"""
         try:
             if platform == "android":
-                result = subprocess.run(
-                    [self.adb_path, "-s", device_id, "install", "-r", app_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
+                success, output = await get_adb_scheduler().install(device_id, app_path, lane=LANE_INTERACTIVE, timeout=60)
                 
-                if result.returncode == 0:
+                if success:
+                    get_package_inventory().invalidate(device_id)
                     return {"success": True, "message": "App installed successfully"}
                 else:
-                    return {"success": False, "message": result.stderr}
+                    return {"success": False, "message": output}
             
             elif platform == "ios":
                 # Detect if real device or simulator
@@ -297,15 +302,11 @@ class DeviceBridge:
         try:
             if platform == "android":
                 # Get main activity
-                result = subprocess.run(
-                    [self.adb_path, "-s", device_id, "shell", "monkey", 
-                     "-p", package_name, "-c", "android.intent.category.LAUNCHER", "1"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
+                returncode, _, _ = await get_adb_scheduler().shell(
+                    device_id, f"monkey -p {package_name} -c android.intent.category.LAUNCHER 1", lane=LANE_INTERACTIVE, timeout=10
                 )
                 
-                return {"success": result.returncode == 0}
+                return {"success": returncode == 0}
             
             elif platform == "ios":
                 result = subprocess.run(
@@ -324,14 +325,9 @@ class DeviceBridge:
         """Stop an app on a device"""
         try:
             if platform == "android":
-                result = subprocess.run(
-                    [self.adb_path, "-s", device_id, "shell", "am", "force-stop", package_name],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
+                returncode, _, _ = await get_adb_scheduler().shell(device_id, f"am force-stop {package_name}", lane=LANE_INTERACTIVE, timeout=5)
                 
-                return {"success": result.returncode == 0}
+                return {"success": returncode == 0}
             
             elif platform == "ios":
                 result = subprocess.run(
@@ -6,6 +6,10 @@ Works with Appium to find elements by coordinates and generate smart selectors
 from typing import Optional, Dict, List
 import xml.etree.ElementTree as ET
 import re
+import time
+
+from services.diagnostics.tracing import span
+from services.mobile.selector_compiler import compile_xpath, find_local, get_hierarchy_cache
 
 
 class ElementInspector:
@@ -24,6 +28,7 @@ class ElementInspector:
         """
         self.driver = driver
         self.platform = platform
+        self._root = None  # Last parsed Android hierarchy, for match counts
     
     def get_element_at_position(self, x: int, y: int) -> Optional[Dict]:
         """
@@ -39,8 +44,12 @@ class ElementInspector:
         try:
             print(f"[ElementInspector] Finding element at ({x}, {y}) on {self.platform}")
             
-            # Get UI hierarchy
+            # Get UI hierarchy (shared so follow-up lookups on this screen stay local)
+            fetched_at = time.time()
             page_source = self.driver.page_source
+            session_id = getattr(self.driver, "session_id", None)
+            if session_id and self.platform == "android":
+                get_hierarchy_cache().put(session_id, page_source, fetched_at)
             
             # Parse based on platform
             if self.platform == "android":
@@ -72,7 +81,9 @@ class ElementInspector:
         elements = []
         
         try:
-            root = ET.fromstring(source)
+            with span("xml parse", "xml", chars=len(source)):
+                root = ET.fromstring(source)
+            self._root = root
             
             def traverse(node, depth=0):
                 # Extract bounds from "[x1,y1][x2,y2]" format
@@ -197,12 +208,20 @@ class ElementInspector:
         # Priority 4: XPath (generated, less reliable)
         xpath = self._generate_android_xpath(element)
         if xpath:
-            selectors.append({
+            compiled = compile_xpath(xpath)
+            selector = {
                 "type": "xpath",
                 "value": xpath,
                 "priority": 4,
-                "description": "XPath selector"
-            })
+                "description": "XPath selector",
+                # Cheaper equivalent lookup used at playback time
+                "compiled": {"strategy": compiled["strategy"], "value": compiled["value"]}
+            }
+            # Counted on the hierarchy just fetched for this inspection, so never stale
+            matches = find_local(self._root, xpath) if self._root is not None else None
+            if matches is not None:
+                selector["matches"] = len(matches)
+            selectors.append(selector)
         
         # Priority 5: Coordinates (last resort)
         center_x = element["bounds"]["x"] + element["bounds"]["width"] // 2
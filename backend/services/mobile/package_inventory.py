@@ -0,0 +1,196 @@
+"""
+Package Inventory - Installed third-party apps per Android device
+
+All packages, versions and launcher activities are read with a single
+`adb shell` round-trip and parsed in one pass. Results are cached per device
+and dropped whenever we install or uninstall something on that device. Apps
+added, removed or updated outside GravityQA are caught by re-listing just the
+package names and versionCodes (cheap next to the full inventory) before a
+cached list is served.
+"""
+
+import asyncio
+import re
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from services.diagnostics.logs import get_logger
+from services.mobile.adb_scheduler import LANE_INTERACTIVE, get_adb_scheduler
+
+logger = get_logger("inventory")
+
+# A cached list is re-read after this even if the package listing still matches
+INVENTORY_TTL = 600.0
+
+# A cached list verified this recently is served without listing packages again
+VERIFY_INTERVAL = 5.0
+
+INVENTORY_TIMEOUT = 15
+
+_SECTION_LAUNCHERS = "===GRAVITYQA_LAUNCHERS==="
+_SECTION_VERSIONS = "===GRAVITYQA_VERSIONS==="
+
+# Third-party packages and versionCodes only, for checking a cached list
+PACKAGES_SCRIPT = "pm list packages -3 --show-versioncode 2>/dev/null || pm list packages -3"
+
+# One shell invocation: packages + versionCodes, launcher activities, versionNames
+INVENTORY_SCRIPT = (
+    f"{PACKAGES_SCRIPT}; "
+    f"echo {_SECTION_LAUNCHERS}; "
+    "cmd package query-activities --brief -a android.intent.action.MAIN "
+    "-c android.intent.category.LAUNCHER 2>/dev/null; "
+    f"echo {_SECTION_VERSIONS}; "
+    "dumpsys package packages 2>/dev/null | grep -E '^  Package \\[|versionName='"
+)
+
+_PACKAGE_LINE = re.compile(r"^package:(\S+?)(?:\s+versionCode:(\d+))?$")
+_COMPONENT_LINE = re.compile(r"^([\w.]+)/([\w.$]+)$")
+_DUMPSYS_PACKAGE = re.compile(r"^\s*Package \[([\w.]+)\]")
+_DUMPSYS_VERSION = re.compile(r"versionName=(\S+)")
+
+
+def parse_inventory(output: str) -> List[Dict]:
+    """Turn the output of INVENTORY_SCRIPT into the installed-apps list"""
+    packages: Dict[str, Dict] = {}
+    launchers: Dict[str, str] = {}
+    versions: Dict[str, str] = {}
+
+    section = "packages"
+    current_package = None
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if line == _SECTION_LAUNCHERS:
+            section = "launchers"
+            continue
+        if line == _SECTION_VERSIONS:
+            section = "versions"
+            continue
+
+        if section == "packages":
+            match = _PACKAGE_LINE.match(line)
+            if match:
+                packages[match.group(1)] = {"version_code": match.group(2)}
+
+        elif section == "launchers":
+            match = _COMPONENT_LINE.match(line)
+            if match:
+                # First launcher activity wins, like the home screen does
+                launchers.setdefault(match.group(1), match.group(2))
+
+        else:
+            match = _DUMPSYS_PACKAGE.match(raw_line)
+            if match:
+                current_package = match.group(1)
+                continue
+            match = _DUMPSYS_VERSION.search(line)
+            if match and current_package:
+                versions.setdefault(current_package, match.group(1))
+
+    apps = []
+    for package_name in sorted(packages):
+        activity = launchers.get(package_name, ".MainActivity")
+        # Same-package activities are reported as ".MainActivity"; keep them that way
+        if activity.startswith(package_name + "."):
+            activity = activity[len(package_name):]
+        apps.append({
+            "package_name": package_name,
+            "app_name": package_name.split('.')[-1],
+            "activity": activity,
+            "version": versions.get(package_name, "1.0"),
+            "version_code": packages[package_name]["version_code"],
+            "launchable": package_name in launchers
+        })
+    return apps
+
+
+def package_fingerprint(apps: List[Dict]) -> FrozenSet[Tuple[str, Optional[str]]]:
+    """What an install, uninstall or update changes: the (package, versionCode) pairs"""
+    return frozenset((app["package_name"], app["version_code"]) for app in apps)
+
+
+class PackageInventory:
+    """Per-device cache of installed third-party apps"""
+
+    def __init__(self, ttl: float = INVENTORY_TTL, verify_interval: float = VERIFY_INTERVAL):
+        self.ttl = ttl
+        self.verify_interval = verify_interval
+        self._cache: Dict[str, Dict] = {}  # {device_id: {apps, fetched_at, verified_at}}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def _query(self, device_id: str) -> List[Dict]:
+        _, stdout, stderr = await get_adb_scheduler().shell(
+            device_id, INVENTORY_SCRIPT, lane=LANE_INTERACTIVE, read_only=True, timeout=INVENTORY_TIMEOUT
+        )
+        if not stdout:
+            raise Exception(stderr.strip() or "Failed to list packages")
+        return parse_inventory(stdout)
+
+    async def _unchanged(self, device_id: str, entry: Dict) -> bool:
+        """Whether a cached list still matches the device's packages and versionCodes"""
+        if time.time() - entry["verified_at"] < self.verify_interval:
+            return True
+        try:
+            _, stdout, _ = await get_adb_scheduler().shell(
+                device_id, PACKAGES_SCRIPT, lane=LANE_INTERACTIVE, read_only=True, timeout=INVENTORY_TIMEOUT
+            )
+        except Exception as e:
+            logger.debug("[Inventory] Could not verify %s: %s", device_id, e)
+            return False
+        if not stdout or package_fingerprint(parse_inventory(stdout)) != package_fingerprint(entry["apps"]):
+            logger.info("[Inventory] 🔄 %s: packages changed outside GravityQA", device_id)
+            return False
+        entry["verified_at"] = time.time()
+        return True
+
+    async def get_apps(self, device_id: str, refresh: bool = False) -> Dict:
+        """
+        Installed apps on a device
+
+        Returns:
+            {apps, cached, age} - age is seconds since the device was queried
+        """
+        entry = self._cache.get(device_id)
+        if entry and not refresh and time.time() - entry["fetched_at"] < self.ttl \
+                and await self._unchanged(device_id, entry):
+            return {"apps": entry["apps"], "cached": True, "age": time.time() - entry["fetched_at"]}
+
+        # Concurrent callers for the same device share one adb query. Each one
+        # waits through a shield, so a caller that goes away (client disconnect)
+        # doesn't cancel the query for the others, and the result is cached by
+        # the query itself rather than by whichever caller started it.
+        future = self._inflight.get(device_id)
+        if future is None:
+            started = time.time()
+            future = asyncio.ensure_future(self._query(device_id))
+            self._inflight[device_id] = future
+            future.add_done_callback(lambda done: self._finished(device_id, done, started))
+        apps = await asyncio.shield(future)
+
+        return {"apps": apps, "cached": False, "age": 0.0}
+
+    def _finished(self, device_id: str, future: asyncio.Future, started: float):
+        if self._inflight.get(device_id) is future:
+            del self._inflight[device_id]
+        if future.cancelled() or future.exception() is not None:
+            return
+        apps = future.result()
+        self._cache[device_id] = {"apps": apps, "fetched_at": time.time(), "verified_at": time.time()}
+        logger.info("[Inventory] 📱 %s: %s apps in %.2fs", device_id, len(apps), time.time() - started)
+
+    def invalidate(self, device_id: Optional[str] = None):
+        """Forget a device's app list (all devices if None) after install/uninstall"""
+        if device_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(device_id, None)
+
+
+_package_inventory: Optional[PackageInventory] = None
+
+
+def get_package_inventory() -> PackageInventory:
+    """Get the shared package inventory"""
+    global _package_inventory
+    if _package_inventory is None:
+        _package_inventory = PackageInventory()
+    return _package_inventory
@@ -0,0 +1,301 @@
+"""
+Selector Compiler - Rewrite recorded XPaths into cheaper Appium strategies
+
+On UiAutomator2 every XPath lookup dumps the whole hierarchy on the device and
+evaluates the expression there. Most recorded XPaths are a single step with
+attribute predicates, e.g. //android.widget.Button[@resource-id='com.app:id/ok'],
+which can be answered by a resource-id, accessibility id or UiSelector lookup
+instead. Anything we can't rewrite exactly stays XPath.
+
+find_local() evaluates the same subset against a parsed hierarchy; the
+inspector uses it to count how many nodes a generated XPath matches on the
+screen it just fetched. The module also keeps a short-lived per-session
+hierarchy cache of page sources, dropped on every action.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from services.diagnostics.tracing import span
+from utils.bounded_store import BoundedStore
+
+
+# Appium "using" values (W3C find element)
+STRATEGY_ID = "id"
+STRATEGY_ACCESSIBILITY_ID = "accessibility id"
+STRATEGY_UIAUTOMATOR = "-android uiautomator"
+STRATEGY_XPATH = "xpath"
+
+# How long a fetched hierarchy is trusted when nothing was done on the device
+HIERARCHY_TTL = 2.0
+
+# Sessions/devices whose last action time is remembered
+MAX_TRACKED_ACTIONS = 256
+
+# XPath attribute → UiSelector methods for (equals, contains, starts-with)
+_STRING_ATTRIBUTES = {
+    "resource-id": ("resourceId", None, None),
+    "text": ("text", "textContains", "textStartsWith"),
+    "content-desc": ("description", "descriptionContains", "descriptionStartsWith"),
+    "class": ("className", None, None),
+    "package": ("packageName", None, None),
+}
+
+_BOOLEAN_ATTRIBUTES = {
+    "checkable": "checkable",
+    "checked": "checked",
+    "clickable": "clickable",
+    "enabled": "enabled",
+    "focusable": "focusable",
+    "focused": "focused",
+    "long-clickable": "longClickable",
+    "scrollable": "scrollable",
+    "selected": "selected",
+}
+
+_STEP_RE = re.compile(r"^//(\*|[A-Za-z_][\w.$]*)((?:\[[^\[\]]+\])*)$")
+_PREDICATE_RE = re.compile(r"\[([^\[\]]+)\]")
+_STRING = r"(?:'([^']*)'|\"([^\"]*)\")"
+_EQUALS_RE = re.compile(r"^@([\w-]+)\s*=\s*" + _STRING + r"$")
+_FUNCTION_RE = re.compile(r"^(contains|starts-with)\(\s*@([\w-]+)\s*,\s*" + _STRING + r"\s*\)$")
+
+
+@lru_cache(maxsize=1024)
+def parse_xpath(xpath: str) -> Optional[Tuple[str, Tuple[Tuple[str, str, str], ...]]]:
+    """
+    Parse a single-step XPath into (tag, ((attribute, op, value), ...))
+
+    Supports //tag or //* with predicates joined by "and" using =, contains()
+    and starts-with(). Returns None for anything else (axes, positions, "or",
+    nested paths), which must stay XPath.
+    """
+    match = _STEP_RE.match(xpath.strip())
+    if not match:
+        return None
+
+    tag, predicate_block = match.group(1), match.group(2)
+    conditions = []
+
+    for predicate in _PREDICATE_RE.findall(predicate_block):
+        for clause in re.split(r"\s+and\s+", predicate.strip()):
+            clause = clause.strip()
+            equals = _EQUALS_RE.match(clause)
+            if equals:
+                value = equals.group(2) if equals.group(2) is not None else equals.group(3)
+                conditions.append((equals.group(1), "=", value))
+                continue
+
+            function = _FUNCTION_RE.match(clause)
+            if function:
+                value = function.group(3) if function.group(3) is not None else function.group(4)
+                conditions.append((function.group(2), function.group(1), value))
+                continue
+
+            return None
+
+    return tag, tuple(conditions)
+
+
+def _java_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _to_ui_selector(tag: str, conditions: Tuple[Tuple[str, str, str], ...]) -> Optional[str]:
+    """Build an equivalent UiSelector chain, or None if a condition has no UiSelector form"""
+    parts = ["new UiSelector()"]
+
+    if tag != "*":
+        parts.append(f".className({_java_string(tag)})")
+
+    for attribute, op, value in conditions:
+        if attribute in _STRING_ATTRIBUTES:
+            method = _STRING_ATTRIBUTES[attribute][{"=": 0, "contains": 1, "starts-with": 2}[op]]
+            if not method:
+                return None
+            parts.append(f".{method}({_java_string(value)})")
+        elif attribute in _BOOLEAN_ATTRIBUTES and op == "=" and value in ("true", "false"):
+            parts.append(f".{_BOOLEAN_ATTRIBUTES[attribute]}({value})")
+        elif attribute == "index" and op == "=" and value.isdigit():
+            parts.append(f".index({value})")
+        else:
+            return None
+
+    return "".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_xpath(xpath: str) -> Dict[str, str]:
+    """
+    Rewrite an XPath into the cheapest equivalent lookup
+
+    Returns:
+        {"strategy", "value", "xpath"} where strategy is one of id,
+        accessibility id, -android uiautomator or xpath (not compilable)
+    """
+    compiled = {"strategy": STRATEGY_XPATH, "value": xpath, "xpath": xpath}
+
+    parsed = parse_xpath(xpath)
+    if not parsed or parsed == ("*", ()):
+        return compiled
+
+    tag, conditions = parsed
+
+    if tag == "*" and len(conditions) == 1 and conditions[0][1] == "=" and conditions[0][2]:
+        attribute, _, value = conditions[0]
+        if attribute == "resource-id":
+            return {**compiled, "strategy": STRATEGY_ID, "value": value}
+        if attribute == "content-desc":
+            return {**compiled, "strategy": STRATEGY_ACCESSIBILITY_ID, "value": value}
+
+    ui_selector = _to_ui_selector(tag, conditions)
+    if ui_selector:
+        return {**compiled, "strategy": STRATEGY_UIAUTOMATOR, "value": ui_selector}
+
+    return compiled
+
+
+def compile_selector(strategy: str, value: str) -> Dict[str, str]:
+    """Compile a recorded {strategy, value} selector into an Appium lookup"""
+    if strategy == "xpath":
+        return compile_xpath(value)
+    if strategy == "id":
+        return {"strategy": STRATEGY_ID, "value": value, "xpath": f"//*[@resource-id='{value}']"}
+    if strategy in ("accessibility", "accessibility id", "contentDesc"):
+        return {"strategy": STRATEGY_ACCESSIBILITY_ID, "value": value, "xpath": f"//*[@content-desc='{value}']"}
+    if strategy == "text":
+        return {
+            "strategy": STRATEGY_UIAUTOMATOR,
+            "value": f"new UiSelector().text({_java_string(value)})",
+            "xpath": f"//*[@text='{value}']"
+        }
+    return {"strategy": strategy, "value": value, "xpath": None}
+
+
+def _matches(node: ET.Element, tag: str, conditions: Tuple[Tuple[str, str, str], ...]) -> bool:
+    if tag != "*" and node.tag != tag:
+        return False
+    for attribute, op, value in conditions:
+        actual = node.get(attribute)
+        if actual is None:
+            return False
+        if op == "=" and actual != value:
+            return False
+        if op == "contains" and value not in actual:
+            return False
+        if op == "starts-with" and not actual.startswith(value):
+            return False
+    return True
+
+
+def find_local(root: ET.Element, xpath: str) -> Optional[List[ET.Element]]:
+    """
+    Evaluate an XPath against a parsed hierarchy
+
+    Returns matching nodes in document order, or None if the XPath is outside
+    the supported subset (the caller must then ask the device).
+    """
+    parsed = parse_xpath(xpath)
+    if parsed is None:
+        return None
+
+    tag, conditions = parsed
+    return [node for node in root.iter() if node is not root and _matches(node, tag, conditions)]
+
+
+class HierarchyCache:
+    """
+    Recently fetched UI hierarchies keyed by session (or device) id
+
+    Entries expire after a TTL and are dropped explicitly whenever an action
+    (tap, swipe, typing, adb input, a touch the monitor saw) may have changed
+    the screen. The time of that action is kept, so a fetch that was already
+    in flight when it happened is not cached and an entry is never served
+    once an action newer than it is known.
+    """
+
+    def __init__(self, ttl: float = HIERARCHY_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, str, ET.Element]] = {}
+        self._last_action = BoundedStore("hierarchy_last_action", MAX_TRACKED_ACTIONS)  # {key: time}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, source: str, fetched_at: Optional[float] = None) -> Optional[ET.Element]:
+        """
+        Store a freshly fetched page source; returns the parsed root
+
+        fetched_at is when the fetch was sent (default: now). Sources fetched
+        before the key's last action are parsed but not cached.
+        """
+        try:
+            with span("xml parse", "xml", chars=len(source)):
+                root = ET.fromstring(source)
+        except ET.ParseError:
+            return None
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            if fetched_at > self._last_action.get(key, 0.0):
+                self._entries[key] = (fetched_at, source, root)
+        return root
+
+    def _get(self, key: str, max_age: Optional[float]):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry and time.time() - entry[0] <= max_age
+                    and entry[0] > self._last_action.get(key, 0.0)):
+                return entry
+        return None
+
+    def get_source(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Cached page source if still fresh"""
+        entry = self._get(key, max_age)
+        return entry[1] if entry else None
+
+    def get_root(self, key: str, max_age: Optional[float] = None) -> Optional[ET.Element]:
+        """Cached parsed hierarchy if still fresh"""
+        entry = self._get(key, max_age)
+        return entry[2] if entry else None
+
+    def invalidate(self, key: Optional[str] = None):
+        """Forget one session's hierarchy (or all of them) after an action on its screen"""
+        now = time.time()
+        with self._lock:
+            if key is None:
+                for cached in self._entries:
+                    self._last_action[cached] = now
+                self._entries.clear()
+            else:
+                self._last_action[key] = now
+                self._entries.pop(key, None)
+
+    def invalidate_device(self, device_id: str):
+        """Forget the hierarchies of a device and every session on it (adb input, touches)"""
+        from services.mobile.session_registry import get_session_registry  # The registry imports this module
+
+        registry = get_session_registry()
+        self.invalidate(device_id)
+        for session_id in list(registry):
+            record = registry.get(session_id)
+            if record is not None and record.device_id == device_id:
+                self.invalidate(session_id)
+
+    def forget(self, key: str):
+        """Drop everything about a session that has ended"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._last_action.pop(key, None)
+
+
+_hierarchy_cache: Optional[HierarchyCache] = None
+
+
+def get_hierarchy_cache() -> HierarchyCache:
+    """Get the shared hierarchy cache"""
+    global _hierarchy_cache
+    if _hierarchy_cache is None:
+        _hierarchy_cache = HierarchyCache()
+    return _hierarchy_cache
@@ -0,0 +1,286 @@
+"""
+Session Pool - Warm UiAutomator2 sessions per device for fast playback start
+
+Creating a session installs/starts the UiAutomator2 server on the device and
+can take tens of seconds. The pool keeps one ready session per device (a
+device only runs one UiAutomator2 session at a time) and hands it to each
+playback. App state is reset in place through that session:
+
+    terminateApp → clearApp (pm clear fallback) → startActivity/activateApp
+
+and the run starts as soon as the app is in the foreground, instead of
+recreating the session and sleeping.
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from services.diagnostics.logs import get_logger
+from services.mobile.adb_scheduler import LANE_PLAYBACK, get_adb_scheduler
+from services.mobile.appium_service import get_appium_service
+from services.mobile.session_profiles import SessionProfile, get_profile
+
+logger = get_logger("session_pool")
+
+# Warm sessions must outlive Appium's default 60s idle timeout
+WARM_COMMAND_TIMEOUT = 3600
+
+# How often idle warm sessions are pinged and dead ones replaced
+KEEPALIVE_INTERVAL = 30
+
+APP_READY_TIMEOUT = 20
+APP_READY_POLL = 0.25
+
+# Pause after the app reaches the foreground so its first screen can render
+APP_SETTLE_TIME = 1.0
+
+WARM_CAPABILITIES = {
+    "appium:newCommandTimeout": WARM_COMMAND_TIMEOUT,
+    # Start fast: the app is launched per run, not at session creation
+    "appium:autoLaunch": False,
+}
+
+
+class PooledSession:
+    def __init__(self, device_id: str, session_id: str, profile: SessionProfile, adopted: bool = False):
+        self.device_id = device_id
+        self.session_id = session_id
+        self.profile = profile
+        self.adopted = adopted  # Created elsewhere (e.g. the inspector), not by the pool
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.leases = 0
+        self.in_use = False
+
+    def to_dict(self) -> Dict:
+        return {
+            "device_id": self.device_id,
+            "session_id": self.session_id,
+            "profile": self.profile.name,
+            "adopted": self.adopted,
+            "age": time.time() - self.created_at,
+            "idle": 0 if self.in_use else time.time() - self.last_used,
+            "leases": self.leases,
+            "in_use": self.in_use,
+        }
+
+
+class SessionPool:
+    """One warm, reusable Appium session per device"""
+
+    def __init__(self, appium_service=None):
+        self.appium_service = appium_service or get_appium_service()
+        self._sessions: Dict[str, PooledSession] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "adopted": 0, "created": 0, "replaced_dead": 0}
+
+    def _lock(self, device_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(device_id, asyncio.Lock())
+
+    def _find_existing(self, device_id: str, profile: SessionProfile) -> Optional[str]:
+        """A live session some other feature already opened on this device with the same profile"""
+        registry = self.appium_service.registry
+        session_id = registry.session_for_device(device_id)
+        if session_id and (registry.get(session_id).profile or profile.name) == profile.name:
+            return session_id
+        return None
+
+    async def _create(self, device_id: str, profile: SessionProfile) -> PooledSession:
+        started = time.time()
+        session_id = await self.appium_service.create_session(
+            device_id=device_id,
+            platform="Android",
+            app_package=None,
+            app_activity=None,
+            extra_capabilities=WARM_CAPABILITIES,
+            profile=profile
+        )
+        if not session_id:
+            raise RuntimeError(f"Could not create an Appium session on {device_id}")
+        self.stats["created"] += 1
+        logger.info("[SessionPool] 🔥 Warm %s session %s on %s in %.1fs", profile.name, session_id, device_id, time.time() - started)
+        return PooledSession(device_id, session_id, profile)
+
+    async def _ready_session(self, device_id: str, profile: SessionProfile) -> PooledSession:
+        """The device's pooled session, replacing it if it died (caller holds the lock)"""
+        pooled = self._sessions.get(device_id)
+        if pooled:
+            if pooled.profile.capabilities != profile.capabilities:
+                # Capabilities only apply at creation: start over with the new profile
+                logger.info("[SessionPool] 🔁 %s switching profile %s → %s", device_id, pooled.profile.name, profile.name)
+                del self._sessions[device_id]
+                await self.appium_service.delete_session(pooled.session_id)
+            elif await self.appium_service.is_session_alive(pooled.session_id):
+                if pooled.profile.settings != profile.settings:
+                    await self.appium_service.update_settings(pooled.session_id, profile.settings)
+                    pooled.profile = profile
+                self.stats["hits"] += 1
+                return pooled
+            else:
+                logger.warning("[SessionPool] 💀 Session %s on %s is gone, replacing", pooled.session_id, device_id)
+                self.appium_service.registry.remove(pooled.session_id)
+                self.stats["replaced_dead"] += 1
+
+        await self.appium_service.registry.discover()
+        existing = self._find_existing(device_id, profile)
+        if existing and await self.appium_service.is_session_alive(existing):
+            # Reuse instead of killing it: a new session on the device would end this one anyway
+            await self.appium_service.update_settings(existing, profile.settings)
+            pooled = PooledSession(device_id, existing, profile, adopted=True)
+            self.stats["adopted"] += 1
+            logger.info("[SessionPool] ♻️ Adopted session %s on %s", existing, device_id)
+        else:
+            pooled = await self._create(device_id, profile)
+
+        self._sessions[device_id] = pooled
+        return pooled
+
+    async def acquire(self, device_id: str, profile: Optional[SessionProfile] = None) -> PooledSession:
+        """Lease the device's session; playbacks on the same device wait their turn"""
+        profile = profile or get_profile()
+        await self._lock(device_id).acquire()
+        try:
+            pending = self._warming.pop(device_id, None)
+            if pending and not pending.done():
+                pending.cancel()
+            pooled = await self._ready_session(device_id, profile)
+        except BaseException:
+            self._lock(device_id).release()
+            raise
+        pooled.in_use = True
+        pooled.leases += 1
+        self._start_keepalive()
+        return pooled
+
+    def release(self, pooled: PooledSession, discard: bool = False):
+        """Give the session back (discard=True if it's known to be broken)"""
+        pooled.in_use = False
+        pooled.last_used = time.time()
+        if discard and self._sessions.get(pooled.device_id) is pooled:
+            del self._sessions[pooled.device_id]
+        lock = self._lock(pooled.device_id)
+        if lock.locked():
+            lock.release()
+
+    def warm(self, device_id: str, profile: Optional[SessionProfile] = None):
+        """Create the device's session in the background if there isn't one"""
+        if device_id in self._sessions or device_id in self._warming:
+            return
+        profile = profile or get_profile()
+
+        async def run():
+            try:
+                async with self._lock(device_id):
+                    await self._ready_session(device_id, profile)
+                self._start_keepalive()
+            except Exception as e:
+                logger.warning("[SessionPool] ⚠️ Could not warm %s: %s", device_id, e)
+            finally:
+                self._warming.pop(device_id, None)
+
+        self._warming[device_id] = asyncio.ensure_future(run())
+
+    async def reset_app(self, session_id: str, device_id: str, app_package: str,
+                        app_activity: Optional[str] = None, clear_data: bool = True) -> Dict:
+        """
+        Restart the app under test inside an existing session
+
+        Returns:
+            Timings in seconds: {terminate, clear, launch, app_ready, total}
+        """
+        timings = {}
+        started = time.time()
+
+        step = time.time()
+        await self.appium_service.execute_mobile(session_id, "mobile: terminateApp", {"appId": app_package})
+        timings["terminate"] = time.time() - step
+
+        if clear_data:
+            step = time.time()
+            cleared, message = await self.appium_service.execute_mobile(
+                session_id, "mobile: clearApp", {"appId": app_package}
+            )
+            if not cleared:
+                # Older UiAutomator2 drivers: clear over adb instead
+                logger.info("[SessionPool] clearApp unavailable (%s), using pm clear", message)
+                await get_adb_scheduler().shell(device_id, f"pm clear {app_package}", lane=LANE_PLAYBACK, timeout=15)
+            timings["clear"] = time.time() - step
+
+        step = time.time()
+        launched = False
+        if app_activity:
+            component = app_activity if "/" in app_activity else f"{app_package}/{app_activity}"
+            launched, _ = await self.appium_service.execute_mobile(
+                session_id, "mobile: startActivity", {"intent": component, "wait": True}
+            )
+        if not launched:
+            launched, message = await self.appium_service.execute_mobile(
+                session_id, "mobile: activateApp", {"appId": app_package}
+            )
+            if not launched:
+                raise RuntimeError(f"Could not launch {app_package}: {message}")
+        timings["launch"] = time.time() - step
+
+        step = time.time()
+        await self.wait_for_app(session_id, app_package)
+        timings["app_ready"] = time.time() - step
+
+        timings["total"] = time.time() - started
+        logger.info("[SessionPool] 🔄 Reset %s in %.1fs", app_package, timings['total'])
+        return timings
+
+    async def wait_for_app(self, session_id: str, app_package: str, timeout: float = APP_READY_TIMEOUT):
+        """Wait until the app is in the foreground, then let its first screen render"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if await self.appium_service.get_current_package(session_id) == app_package:
+                await asyncio.sleep(APP_SETTLE_TIME)
+                return
+            await asyncio.sleep(APP_READY_POLL)
+        logger.warning("[SessionPool] ⚠️ %s not in foreground after %ss, continuing", app_package, timeout)
+
+    def _start_keepalive(self):
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.ensure_future(self._keepalive_loop())
+
+    async def _keepalive_loop(self):
+        while self._sessions:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            for device_id, pooled in list(self._sessions.items()):
+                if pooled.in_use or self._lock(device_id).locked():
+                    continue
+                if not await self.appium_service.is_session_alive(pooled.session_id):
+                    # Dropped (device unplugged, Appium restarted, another session took over)
+                    logger.warning("[SessionPool] 💀 Warm session on %s died", device_id)
+                    self._sessions.pop(device_id, None)
+                    self.appium_service.registry.remove(pooled.session_id)
+                    self.stats["replaced_dead"] += 1
+                    self.warm(device_id, pooled.profile)
+
+    async def close(self, device_id: str):
+        """Delete the device's pooled session"""
+        async with self._lock(device_id):
+            pooled = self._sessions.pop(device_id, None)
+            if pooled:
+                await self.appium_service.delete_session(pooled.session_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "sessions": [pooled.to_dict() for pooled in self._sessions.values()],
+            "warming": list(self._warming),
+        }
+
+
+_session_pool: Optional[SessionPool] = None
+
+
+def get_session_pool() -> SessionPool:
+    """Get the shared session pool"""
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = SessionPool()
+    return _session_pool
@@ -0,0 +1,127 @@
+"""
+Session Profiles - Capability and driver-setting bundles for Appium sessions
+
+A bare UiAutomator2 session waits up to 10s for the UI to go idle before
+every action, runs with window animations on and re-checks/reinstalls its
+server APKs each time a session is created. A profile bundles the
+capabilities sent at session creation with the driver settings applied
+right after it, so every path that opens a session (inspector, playback,
+orchestrator) behaves the same for a project:
+
+- "faithful": the driver defaults, closest to what a real user sees
+- "fast": no idle waits, no animations, compressed hierarchy and no server
+  reinstall once the device has had a session
+
+Compressed hierarchies ("ignoreUnimportantViews") drop layout-only nodes,
+so XPaths recorded under one profile may not match under the other; record
+and play a project's flows with the same profile.
+"""
+
+from typing import Dict, Optional
+
+from models.project import ProjectSessionProfile
+
+PROFILE_FAST = "fast"
+PROFILE_FAITHFUL = "faithful"
+
+DEFAULT_PROFILE = PROFILE_FAITHFUL
+
+# Capabilities that are only safe once the UiAutomator2 server is on the device
+_WARM_DEVICE_CAPABILITIES = {
+    "appium:skipServerInstallation": True,
+    "appium:skipDeviceInitialization": True,
+}
+
+PROFILES = {
+    PROFILE_FAST: {
+        "description": "No idle waits or animations, compressed hierarchy, no server reinstall",
+        "capabilities": {
+            "appium:disableWindowAnimation": True,
+            "appium:ignoreHiddenApiPolicyError": True,
+        },
+        "warm_capabilities": _WARM_DEVICE_CAPABILITIES,
+        "settings": {
+            "waitForIdleTimeout": 0,
+            "waitForSelectorTimeout": 0,
+            "actionAcknowledgmentTimeout": 0,
+            "scrollAcknowledgmentTimeout": 0,
+            "ignoreUnimportantViews": True,
+        },
+    },
+    PROFILE_FAITHFUL: {
+        "description": "Driver defaults: waits for idle, animations on, full hierarchy",
+        "capabilities": {},
+        "warm_capabilities": {},
+        "settings": {
+            "waitForIdleTimeout": 10000,
+            "ignoreUnimportantViews": False,
+        },
+    },
+}
+
+# Devices that already had a session this run (server APKs installed and current)
+_initialized_devices = set()
+
+
+class SessionProfile:
+    """A named profile plus any per-project overrides"""
+
+    def __init__(self, name: str, capabilities: Optional[Dict] = None, settings: Optional[Dict] = None):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown session profile '{name}' (choose from {', '.join(PROFILES)})")
+        base = PROFILES[name]
+        self.name = name
+        self.description = base["description"]
+        self.capabilities = {**base["capabilities"], **(capabilities or {})}
+        self.settings = {**base["settings"], **(settings or {})}
+        self._warm_capabilities = base["warm_capabilities"]
+
+    def capabilities_for(self, device_id: str) -> Dict:
+        """Capabilities for a new session on this device"""
+        capabilities = dict(self.capabilities)
+        if device_id in _initialized_devices:
+            capabilities = {**self._warm_capabilities, **capabilities}
+        return capabilities
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "capabilities": dict(self.capabilities),
+            "settings": dict(self.settings),
+        }
+
+
+def mark_device_initialized(device_id: str):
+    """Record that a session was created on the device (its server is installed)"""
+    _initialized_devices.add(device_id)
+
+
+def forget_device(device_id: str):
+    """Require a full server check on the device's next session (e.g. after reinstalling Appium)"""
+    _initialized_devices.discard(device_id)
+
+
+def get_profile(name: Optional[str] = None) -> SessionProfile:
+    return SessionProfile(name or DEFAULT_PROFILE)
+
+
+def list_profiles() -> Dict:
+    return {name: SessionProfile(name).to_dict() for name in PROFILES}
+
+
+def profile_for_project(db, project_id: Optional[int], override: Optional[str] = None) -> SessionProfile:
+    """
+    The profile a project's sessions use
+
+    An explicit override wins (keeping the project's capability/setting
+    overrides only if it names the same profile); projects without a stored
+    profile get DEFAULT_PROFILE.
+    """
+    stored = None
+    if project_id is not None:
+        stored = db.query(ProjectSessionProfile).filter(ProjectSessionProfile.project_id == project_id).first()
+
+    if stored and (override is None or override == stored.profile):
+        return SessionProfile(stored.profile, stored.capabilities, stored.settings)
+    return SessionProfile(override or DEFAULT_PROFILE)
@@ -0,0 +1,254 @@
+"""
+Session Registry - The process-wide record of live Appium sessions
+
+Sessions used to live in each AppiumService instance's own dict, filled by
+a blocking /sessions request in its constructor, and handlers picked the
+first or last key. With several devices that meant acting on whichever
+session happened to be newest. The registry instead:
+
+- keys sessions by device, so handlers look up the session for the device
+  they were asked about (newest session overall only when none is given)
+- discovers sessions already running on the Appium servers once, async
+- reaps sessions that died (device unplugged, server restarted, timed out)
+  in the background instead of probing every session before each request
+- keeps per-session screenshot/window dimensions in bounded caches
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+from services.diagnostics.logs import get_logger
+from services.mobile.appium_cassette import appium_client
+from services.mobile.appium_fleet import get_appium_fleet
+from services.mobile.selector_compiler import get_hierarchy_cache
+from utils.bounded_store import BoundedStore
+
+logger = get_logger("sessions")
+
+# How often live sessions are checked
+REAP_INTERVAL = 30
+
+# Consecutive checks with the server unreachable before its sessions are dropped
+UNREACHABLE_AFTER = 2
+
+# Sessions whose dimensions are remembered
+DIMENSION_CACHE_SIZE = 64
+
+DISCOVERY_TIMEOUT = 2
+
+
+def device_of(capabilities: Dict) -> Optional[str]:
+    """Device a session runs on, from its (requested or returned) capabilities"""
+    for key in ("appium:udid", "udid", "deviceUDID", "appium:deviceName", "deviceName"):
+        if capabilities.get(key):
+            return capabilities[key]
+    return None
+
+
+class SessionRecord:
+    def __init__(self, session_id: str, device_id: Optional[str], capabilities: Dict,
+                 profile: Optional[str] = None, discovered: bool = False):
+        self.session_id = session_id
+        self.device_id = device_id
+        self.capabilities = capabilities
+        self.profile = profile  # Session profile name (unknown for discovered sessions)
+        self.discovered = discovered  # Found on a server, not created by this process
+        self.created_at = time.time()
+        self.failed_checks = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "device_id": self.device_id,
+            "profile": self.profile,
+            "discovered": self.discovered,
+            "age": time.time() - self.created_at,
+            "url": get_appium_fleet().session_url(self.session_id),
+        }
+
+
+class SessionRegistry:
+    """Live Appium sessions by id and by device"""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()  # oldest first
+        self._by_device: Dict[str, str] = {}  # {device_id: newest session_id}
+        self.screenshot_dimensions = BoundedStore("screenshot_dimensions", DIMENSION_CACHE_SIZE)  # {session_id: {width, height}}
+        self.device_dimensions = BoundedStore("device_dimensions", DIMENSION_CACHE_SIZE)          # {session_id: {width, height}}
+        self._discovery: Optional[asyncio.Future] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.stats = {"registered": 0, "discovered": 0, "reaped": 0}
+
+    # ---- bookkeeping ----
+
+    def register(self, session_id: str, capabilities: Dict, device_id: Optional[str] = None,
+                 profile: Optional[str] = None, discovered: bool = False) -> SessionRecord:
+        device_id = device_id or device_of(capabilities)
+        record = SessionRecord(session_id, device_id, capabilities, profile, discovered)
+        self._sessions.pop(session_id, None)
+        self._sessions[session_id] = record
+        if device_id:
+            self._by_device[device_id] = session_id
+        self.stats["discovered" if discovered else "registered"] += 1
+        self._start_reaper()
+        return record
+
+    def remove(self, session_id: str):
+        record = self._sessions.pop(session_id, None)
+        self.screenshot_dimensions.pop(session_id, None)
+        self.device_dimensions.pop(session_id, None)
+        get_hierarchy_cache().forget(session_id)
+        get_appium_fleet().forget_session(session_id)
+        if record and record.device_id and self._by_device.get(record.device_id) == session_id:
+            # Fall back to an older session on the same device, if any
+            del self._by_device[record.device_id]
+            for other in reversed(self._sessions.values()):
+                if other.device_id == record.device_id:
+                    self._by_device[record.device_id] = other.session_id
+                    break
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        return self._sessions.get(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def capabilities(self) -> Dict[str, Dict]:
+        """{session_id: capabilities}, oldest first (a snapshot)"""
+        return {session_id: record.capabilities for session_id, record in self._sessions.items()}
+
+    def session_for_device(self, device_id: str) -> Optional[str]:
+        return self._by_device.get(device_id)
+
+    def latest(self) -> Optional[str]:
+        return next(reversed(self._sessions), None) if self._sessions else None
+
+    async def resolve(self, device_id: Optional[str] = None) -> Optional[str]:
+        """
+        The session to act on: the device's, or the newest one if no device is given
+
+        Runs discovery the first time so sessions started before the backend are found.
+        """
+        await self.discover()
+        if device_id:
+            return self.session_for_device(device_id)
+        return self.latest()
+
+    # ---- discovery ----
+
+    async def discover(self):
+        """Find sessions already open on the Appium servers (once; concurrent callers share it)"""
+        if self._discovery is None:
+            self._discovery = asyncio.ensure_future(self._discover())
+        await asyncio.shield(self._discovery)
+
+    async def _list_sessions(self, client: httpx.AsyncClient, url: str) -> Optional[list]:
+        """Sessions a server reports, None if it has no session list (raises if unreachable)"""
+        # Appium 2 moved the session list under /appium
+        for path in ("/appium/sessions", "/sessions"):
+            response = await client.get(f"{url}{path}", timeout=DISCOVERY_TIMEOUT)
+            if response.status_code == 200:
+                return response.json().get("value", [])
+        return None
+
+    async def _discover(self):
+        fleet = get_appium_fleet()
+        urls = [fleet.default_node.url] + [node.url for node in fleet.nodes.values()]
+        async with appium_client() as client:
+            for url in urls:
+                try:
+                    sessions = await self._list_sessions(client, url)
+                except Exception:
+                    continue
+                for session in sessions or []:
+                    session_id = session.get("id")
+                    if session_id and session_id not in self._sessions:
+                        fleet.register_session(session_id, url)
+                        self.register(session_id, session.get("capabilities", {}), discovered=True)
+                        logger.info("[SessionRegistry] 🔄 Reconnected to existing session: %s", session_id)
+
+    # ---- reaping ----
+
+    def _start_reaper(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.ensure_future(self._reaper_loop())
+
+    async def _reaper_loop(self):
+        while self._sessions:
+            await asyncio.sleep(REAP_INTERVAL)
+            await self.reap()
+
+    async def reap(self) -> int:
+        """Drop sessions their server no longer lists; returns how many"""
+        fleet = get_appium_fleet()
+        by_url: Dict[str, list] = {}
+        for session_id in self._sessions:
+            by_url.setdefault(fleet.session_url(session_id), []).append(session_id)
+
+        dead = []
+        # One list request per server; per-session commands would reset newCommandTimeout
+        # and keep abandoned sessions alive forever
+        async with appium_client() as client:
+            for url, session_ids in by_url.items():
+                try:
+                    listed = await self._list_sessions(client, url)
+                except Exception:
+                    listed = False
+                if listed is None:
+                    continue  # Server can't list sessions; nothing to compare against
+                for session_id in session_ids:
+                    record = self._sessions.get(session_id)
+                    if record is None:
+                        continue
+                    if listed is False:
+                        record.failed_checks += 1
+                        if record.failed_checks >= UNREACHABLE_AFTER:
+                            dead.append(session_id)
+                    elif any(session.get("id") == session_id for session in listed):
+                        record.failed_checks = 0
+                    else:
+                        dead.append(session_id)
+
+        for session_id in dead:
+            if session_id in self._sessions:
+                logger.info("[SessionRegistry] 🧹 Removing dead session: %s", session_id)
+                self.remove(session_id)
+        self.stats["reaped"] += len(dead)
+        return len(dead)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "sessions": [record.to_dict() for record in self._sessions.values()],
+            "devices": dict(self._by_device),
+            "dimension_cache": {
+                "screenshot": len(self.screenshot_dimensions),
+                "device": len(self.device_dimensions),
+                "max_size": DIMENSION_CACHE_SIZE,
+            },
+        }
+
+
+_session_registry: Optional[SessionRegistry] = None
+
+
+def get_session_registry() -> SessionRegistry:
+    """Get the shared session registry"""
+    global _session_registry
+    if _session_registry is None:
+        _session_registry = SessionRegistry()
+    return _session_registry
@@ -4,6 +4,10 @@ import requests
 import time
 from typing import Callable, Dict, Optional
 
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("mobile_monitor")
+
 class SimpleMobileMonitor:
     """Dead simple monitor - just tracks activity/screen changes"""
     
@@ -19,42 +23,42 @@ class SimpleMobileMonitor:
     def start(self):
         if self.running:
             return
-        print(f"[SimpleMobileMonitor] Starting monitor for {self.session_id}")
+        logger.info("[SimpleMobileMonitor] Starting monitor for %s", self.session_id)
         self.running = True
         self.thread = threading.Thread(target=self._monitor, daemon=True)
         self.thread.start()
         
     def stop(self):
-        print(f"[SimpleMobileMonitor] Stopping monitor")
+        logger.info("[SimpleMobileMonitor] Stopping monitor")
         self.running = False
         if self.thread:
             self.thread.join(timeout=2)
             
     def _monitor(self):
         """Just check activity every second"""
-        print("[SimpleMobileMonitor] Monitoring started - detecting screen changes")
+        logger.info("[SimpleMobileMonitor] Monitoring started - detecting screen changes")
         
         count = 0
         while self.running:
             count += 1
             try:
-                print(f"[SimpleMobileMonitor] Poll #{count} - checking activity...")
+                logger.debug("[SimpleMobileMonitor] Poll #%d - checking activity...", count)
                 
                 # Just get current activity
                 url = f"http://{self.appium_host}:{self.appium_port}/session/{self.session_id}/appium/device/current_activity"
-                print(f"[SimpleMobileMonitor] Requesting: {url}")
+                logger.debug("[SimpleMobileMonitor] Requesting: %s", url)
                 
                 r = requests.get(url, timeout=2)
                 
-                print(f"[SimpleMobileMonitor] Response status: {r.status_code}")
+                logger.debug("[SimpleMobileMonitor] Response status: %d", r.status_code)
                 
                 if r.status_code == 200:
                     activity = r.json().get("value")
-                    print(f"[SimpleMobileMonitor] Current activity: {activity}")
+                    logger.debug("[SimpleMobileMonitor] Current activity: %s", activity)
                     
                     if self.last_activity and activity != self.last_activity:
                         # Screen changed - user did something!
-                        print(f"[SimpleMobileMonitor] 🎉🎉 SCREEN CHANGED: {self.last_activity} → {activity}")
+                        logger.info("[SimpleMobileMonitor] 🎉🎉 SCREEN CHANGED: %s → %s", self.last_activity, activity)
                         
                         if self.callback:
                             self.callback({
@@ -67,16 +71,14 @@ class SimpleMobileMonitor:
                     
                     self.last_activity = activity
                 else:
-                    print(f"[SimpleMobileMonitor] ERROR: Bad status {r.status_code}")
+                    logger.warning("[SimpleMobileMonitor] ERROR: Bad status %d", r.status_code)
                     
             except Exception as e:
-                print(f"[SimpleMobileMonitor] ERROR in loop: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("[SimpleMobileMonitor] ERROR in loop: %s", e)
                 
             time.sleep(1.0)  # Check every second
             
-        print("[SimpleMobileMonitor] Monitoring stopped")
+        logger.info("[SimpleMobileMonitor] Monitoring stopped")
 
 # Global
 _monitor: Optional[SimpleMobileMonitor] = None
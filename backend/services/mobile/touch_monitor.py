@@ -3,7 +3,14 @@ import subprocess
 import threading
 import re
 import time
-from typing import Optional, Callable, Dict
+from typing import Optional, Callable
+
+from services.diagnostics.logs import get_logger
+from services.diagnostics.tracing import span
+from services.mobile.selector_compiler import get_hierarchy_cache
+from utils.bounded_store import BoundedStore
+
+logger = get_logger("touch")
 
 class TouchMonitor:
     """Monitor touch events on Android device using ADB getevent"""
@@ -30,10 +37,10 @@ class TouchMonitor:
     def start(self):
         """Start monitoring touch events"""
         if self.running:
-            print(f"[TouchMonitor] Already running for {self.device_id}")
+            logger.info("[TouchMonitor] Already running for %s", self.device_id)
             return
             
-        print(f"[TouchMonitor] Starting for device {self.device_id}")
+        logger.info("[TouchMonitor] Starting for device %s", self.device_id)
         self._detect_screen_size()
         
         self.running = True
@@ -42,7 +49,7 @@ class TouchMonitor:
         
     def stop(self):
         """Stop monitoring"""
-        print(f"[TouchMonitor] Stopping for {self.device_id}")
+        logger.info("[TouchMonitor] Stopping for %s", self.device_id)
         self.running = False
         
         if self.process:
@@ -67,10 +74,10 @@ class TouchMonitor:
             if match:
                 self.screen_width = int(match.group(1))
                 self.screen_height = int(match.group(2))
-                print(f"[TouchMonitor] Screen size: {self.screen_width}x{self.screen_height}")
+                logger.info("[TouchMonitor] Screen size: %dx%d", self.screen_width, self.screen_height)
                 
         except Exception as e:
-            print(f"[TouchMonitor] Failed to detect screen size: {e}")
+            logger.warning("[TouchMonitor] Failed to detect screen size: %s", e)
             
     def _detect_touch_device(self) -> str:
         """Detect which /dev/input/eventX is the touchscreen"""
@@ -98,15 +105,15 @@ class TouchMonitor:
                     # Check if this is a touchscreen device
                     # Common names: fts, touchscreen, ft, synaptics, etc.
                     if any(name in line.lower() for name in ['fts', 'touchscreen', 'ft5', 'synaptics', 'touch']):
-                        print(f"[TouchMonitor] Found touchscreen device: {current_device}")
+                        logger.info("[TouchMonitor] Found touchscreen device: %s", current_device)
                         return current_device
                         
             # Fallback to event2 (common for touchscreens)
-            print(f"[TouchMonitor] Could not auto-detect, using fallback: /dev/input/event2")
+            logger.warning("[TouchMonitor] Could not auto-detect, using fallback: /dev/input/event2")
             return '/dev/input/event2'
             
         except Exception as e:
-            print(f"[TouchMonitor] Failed to detect touch device: {e}, using fallback")
+            logger.warning("[TouchMonitor] Failed to detect touch device: %s, using fallback", e)
             return '/dev/input/event2'
             
     def _monitor_loop(self):
@@ -123,7 +130,7 @@ class TouchMonitor:
                 text=True
             )
             
-            print(f"[TouchMonitor] Monitoring {touch_device} for {self.device_id}")
+            logger.info("[TouchMonitor] Monitoring %s for %s", touch_device, self.device_id)
             
             for line in self.process.stdout:
                 if not self.running:
@@ -132,9 +139,9 @@ class TouchMonitor:
                 self._parse_event_line(line.strip())
                 
         except Exception as e:
-            print(f"[TouchMonitor] Error in monitor loop: {e}")
+            logger.error("[TouchMonitor] Error in monitor loop: %s", e)
         finally:
-            print(f"[TouchMonitor] Monitoring stopped for {self.device_id}")
+            logger.info("[TouchMonitor] Monitoring stopped for %s", self.device_id)
             
     def _parse_event_line(self, line: str):
         """Parse single getevent line"""
@@ -179,7 +186,7 @@ class TouchMonitor:
         self.touch_start_y = self.current_y
         self.touch_start_time = time.time()
         
-        print(f"[TouchMonitor] Touch DOWN at ({self.current_x}, {self.current_y})")
+        logger.debug("[TouchMonitor] Touch DOWN at (%d, %d)", self.current_x, self.current_y)
         
     def _handle_touch_up(self):
         """Handle touch up event - determine if tap or swipe"""
@@ -190,8 +197,8 @@ class TouchMonitor:
         dy = self.current_y - self.touch_start_y
         distance = (dx**2 + dy**2) ** 0.5
         
-        print(f"[TouchMonitor] Touch UP at ({self.current_x}, {self.current_y})")
-        print(f"[TouchMonitor] Distance: {distance:.0f}, Duration: {duration:.2f}s")
+        logger.debug("[TouchMonitor] Touch UP at (%d, %d)", self.current_x, self.current_y)
+        logger.debug("[TouchMonitor] Distance: %.0f, Duration: %.2fs", distance, duration)
         
         # Determine action type
         if distance < 50 and duration < 0.5:
@@ -202,7 +209,7 @@ class TouchMonitor:
                 'y': self.current_y,
                 'source': 'mobile'
             }
-            print(f"[TouchMonitor] 👆 TAP detected at ({self.current_x}, {self.current_y})")
+            logger.info("[TouchMonitor] 👆 TAP detected at (%d, %d)", self.current_x, self.current_y)
             
         elif distance > 50:
             # SWIPE
@@ -215,7 +222,8 @@ class TouchMonitor:
                 'duration': duration,
                 'source': 'mobile'
             }
-            print(f"[TouchMonitor] 👉 SWIPE detected: ({self.touch_start_x},{self.touch_start_y}) → ({self.current_x},{self.current_y})")
+            logger.info("[TouchMonitor] 👉 SWIPE detected: (%d,%d) → (%d,%d)",
+                        self.touch_start_x, self.touch_start_y, self.current_x, self.current_y)
             
         else:
             # LONG PRESS or other
@@ -226,24 +234,31 @@ class TouchMonitor:
                 'duration': duration,
                 'source': 'mobile'
             }
-            print(f"[TouchMonitor] ⏱️ LONG PRESS detected at ({self.current_x}, {self.current_y})")
+            logger.info("[TouchMonitor] ⏱️ LONG PRESS detected at (%d, %d)", self.current_x, self.current_y)
             
+        get_hierarchy_cache().invalidate_device(self.device_id)  # The finger changed the screen
+        
         # Call callback with detected action
         if self.callback:
-            try:
-                self.callback(action)
-            except Exception as e:
-                print(f"[TouchMonitor] Callback error: {e}")
+            # A trace per touch; the request that started monitoring is long finished
+            with span(f"touch {action['type']}", "touch", root=True, device=self.device_id):
+                try:
+                    self.callback(action)
+                except Exception as e:
+                    logger.error("[TouchMonitor] Callback error: %s", e)
 
-# Global monitor instances
-_active_monitors: Dict[str, TouchMonitor] = {}
+# Global monitor instances; past the limit the least recently started one is stopped
+MAX_ACTIVE_MONITORS = 16
+_active_monitors = BoundedStore(
+    "touch_monitors", MAX_ACTIVE_MONITORS, on_evict=lambda device_id, monitor: monitor.stop()
+)  # {device_id: TouchMonitor}
 
 def start_monitoring(device_id: str, callback: Callable) -> bool:
     """Start touch event monitoring for a device"""
     global _active_monitors
     
     if device_id in _active_monitors:
-        print(f"[TouchMonitor] Already monitoring {device_id}")
+        logger.info("[TouchMonitor] Already monitoring %s", device_id)
         return True
         
     monitor = TouchMonitor(device_id, callback)
@@ -258,4 +273,4 @@ def stop_monitoring(device_id: str):
     if device_id in _active_monitors:
         _active_monitors[device_id].stop()
         del _active_monitors[device_id]
-        print(f"[TouchMonitor] Stopped monitoring {device_id}")
+        logger.info("[TouchMonitor] Stopped monitoring %s", device_id)
@@ -1,5 +1,6 @@
 from typing import Dict, List, Optional
-from services.mobile.appium_service import AppiumService
+from services.mobile.appium_service import AppiumService, get_appium_service
+from services.mobile.session_profiles import profile_for_project
 from services.ai.agent_orchestrator import AIAgent
 from api.websocket import get_ws_manager
 from database import SessionLocal
@@ -11,7 +12,7 @@ class TestOrchestrator:
     """Orchestrates test execution"""
     
     def __init__(self):
-        self.appium_service = AppiumService()
+        self.appium_service = get_appium_service()
         self.ai_agent = AIAgent()
         self.ws_manager = get_ws_manager()
         self.running_tests = {}
@@ -35,10 +36,8 @@ class TestOrchestrator:
             platform = test_config.get("platform", "android")
             
             capabilities = {
-                "platformName": platform.capitalize(),
-                "deviceName": device_id,
-                "automationName": "UiAutomator2" if platform == "android" else "XCUITest",
-                "newCommandTimeout": 300
+                "appium:automationName": "UiAutomator2" if platform == "android" else "XCUITest",
+                "appium:newCommandTimeout": 300
             }
             
             if app_id:
@@ -46,10 +45,18 @@ class TestOrchestrator:
                 from models.project import App
                 app = db.query(App).filter(App.id == app_id).first()
                 if app:
-                    capabilities["app"] = app.file_path
-            
-            # Create session
-            session_id = await self.appium_service.create_session(capabilities)
+                    capabilities["appium:app"] = app.file_path
+            
+            # Create session with the project's session profile
+            profile = profile_for_project(db, test_config.get("project_id"), test_config.get("profile"))
+            session_id = await self.appium_service.create_session(
+                device_id=device_id,
+                platform=platform,
+                app_package=None,
+                app_activity=None,
+                extra_capabilities=capabilities,
+                profile=profile
+            )
             
             if not session_id:
                 test_run.status = "failed"
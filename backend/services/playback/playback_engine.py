@@ -1,8 +1,26 @@
 """Test Playback Engine - Execute saved test flows automatically"""
 import asyncio
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.diagnostics.logs import get_logger
+from services.diagnostics.metrics import PLAYBACK_SETTLE_SECONDS, PLAYBACK_STEP_SECONDS
+from services.diagnostics.tracing import current_trace_id, span
+from services.mobile.appium_cassette import appium_client
+from services.mobile.selector_compiler import compile_selector
+from services.playback.selector_cache import get_selector_cache
+
+logger = get_logger("playback")
+
+# Inspector selector types → playback strategies ("coordinates" is handled by the fallback)
+INSPECTOR_SELECTOR_STRATEGIES = {
+    "id": "id",
+    "text": "text",
+    "contentDesc": "accessibility",
+    "xpath": "xpath"
+}
+
 class PlaybackEngine:
     """Executes recorded test flows step by step"""
     
@@ -12,19 +30,38 @@ class PlaybackEngine:
         self.is_playing = False
         self.current_step = 0
         self.total_steps = 0
+        self.selector_cache = get_selector_cache()
         
-    async def execute_flow(self, flow_data: Dict, session_id: str) -> Dict:
-        """Execute a complete test flow"""
+    async def execute_flow(self, flow_data: Dict, session_id: str, started_at: Optional[float] = None) -> Dict:
+        """
+        Execute a complete test flow
         
+        started_at is when the run was requested (time.time()); the delay until
+        the first step runs is reported as time_to_first_step.
+        
+        The run is traced (a trace of its own unless called inside one); the
+        results link to it for download.
+        """
+        flow_name = flow_data.get("name", "Unnamed Flow")
+        with span(f"playback {flow_name}", "playback", root=True,
+                  flow=flow_name, session_id=session_id) as playback_span:
+            results = await self._execute_flow(flow_data, session_id, started_at)
+            playback_span.set(status=results["status"], successful_steps=results["successful_steps"],
+                              failed_steps=results["failed_steps"])
+            return results
+    
+    async def _execute_flow(self, flow_data: Dict, session_id: str, started_at: Optional[float]) -> Dict:
         flow_name = flow_data.get("name", "Unnamed Flow")
         steps = flow_data.get("steps", [])
+        # Selector outcomes are only learned for flows with a stable id
+        flow_key = str(flow_data["id"]) if flow_data.get("id") is not None else None
         
         self.is_playing = True
         self.current_step = 0
         self.total_steps = len(steps)
         
-        print(f"[Playback] 🎬 Starting playback: {flow_name}")
-        print(f"[Playback] Total steps: {self.total_steps}")
+        logger.info("[Playback] 🎬 Starting playback: %s", flow_name)
+        logger.info("[Playback] Total steps: %s", self.total_steps)
         
         results = {
             "flow_name": flow_name,
@@ -33,9 +70,14 @@ class PlaybackEngine:
             "successful_steps": 0,
             "failed_steps": 0,
             "errors": [],
+            "selector_timings": [],
+            "time_to_first_step": None,
             "start_time": datetime.now().isoformat(),
             "status": "running"
         }
+        trace_id = current_trace_id()
+        if trace_id:
+            results["trace"] = {"trace_id": trace_id, "download": f"/api/playback/traces/{trace_id}"}
         
         # Broadcast start
         self._broadcast_update({
@@ -47,11 +89,14 @@ class PlaybackEngine:
         # Execute each step
         for i, step in enumerate(steps):
             if not self.is_playing:
-                print("[Playback] ⏸️ Playback stopped by user")
+                logger.info("[Playback] ⏸️ Playback stopped by user")
                 results["status"] = "stopped"
                 break
                 
             self.current_step = i + 1
+            if i == 0 and started_at is not None:
+                results["time_to_first_step"] = time.time() - started_at
+                logger.info("[Playback] ⏱️ Time to first step: %.2fs", results['time_to_first_step'])
             
             # Broadcast progress
             self._broadcast_update({
@@ -61,21 +106,36 @@ class PlaybackEngine:
                 "step_data": step
             })
             
-            print(f"[Playback] Step {self.current_step}/{self.total_steps}: {step.get('action')}")
+            logger.info("[Playback] Step %s/%s: %s", self.current_step, self.total_steps, step.get('action'))
             
             try:
                 # Execute step based on action type
-                success = await self._execute_step(step, session_id)
+                step_key = str(step.get("id") or f"{i}:{step.get('action')}")
+                step_started = time.perf_counter()
+                with span(f"step {self.current_step}: {step.get('action')}", "step",
+                          step=self.current_step, action=step.get("action")) as step_span:
+                    try:
+                        success = await self._execute_step(
+                            step, session_id, flow_key, step_key, results["selector_timings"]
+                        )
+                    except Exception:
+                        PLAYBACK_STEP_SECONDS.labels(step.get("action"), "error").observe(time.perf_counter() - step_started)
+                        raise
+                    step_span.set(success=bool(success))
+                PLAYBACK_STEP_SECONDS.labels(step.get("action"), "ok" if success else "failed").observe(
+                    time.perf_counter() - step_started
+                )
                 
                 if success:
                     results["successful_steps"] += 1
-                    print(f"[Playback] ✅ Step {self.current_step} completed")
+                    logger.info("[Playback] ✅ Step %s completed", self.current_step)
                     
                     # CRITICAL: Wait for screen to stabilize after tap/swipe
                     action_type = step.get('action')
                     if action_type in ['tap', 'swipe']:
-                        print(f"[Playback] ⏸️  Waiting 1.25s for screen stabilization...")
-                        await asyncio.sleep(1.25)  # Wait for screen changes/animations
+                        logger.debug("[Playback] ⏸️  Waiting 1.25s for screen stabilization...")
+                        await self._sleep(1.25, "stabilization")  # Wait for screen changes/animations
+                        PLAYBACK_SETTLE_SECONDS.labels("stabilization").observe(1.25)
                 else:
                     results["failed_steps"] += 1
                     results["errors"].append({
@@ -83,7 +143,7 @@ class PlaybackEngine:
                         "action": step.get("action"),
                         "error": "Execution returned False"
                     })
-                    print(f"[Playback] ❌ Step {self.current_step} failed")
+                    logger.warning("[Playback] ❌ Step %s failed", self.current_step)
                     
             except Exception as e:
                 results["failed_steps"] += 1
@@ -93,7 +153,7 @@ class PlaybackEngine:
                     "action": step.get("action"),
                     "error": error_msg
                 })
-                print(f"[Playback] ❌ Step {self.current_step} error: {error_msg}")
+                logger.error("[Playback] ❌ Step %s error: %s", self.current_step, error_msg)
                 
             results["executed_steps"] = self.current_step
             
@@ -107,12 +167,15 @@ class PlaybackEngine:
                     recorded_delay = (next_timestamp - current_timestamp) / 1000.0  # ms to seconds
                     # Use recorded delay, with min 1s and max 5s for safety
                     delay = max(1.0, min(recorded_delay, 5.0))
-                    print(f"[Playback] ⏱️  Using recorded delay: {delay:.1f}s")
+                    logger.debug("[Playback] ⏱️  Using recorded delay: %.1fs", delay)
                 else:
                     delay = 2.5  # Default
-                    print(f"[Playback] ⏱️  Using default delay: {delay}s")
+                    logger.debug("[Playback] ⏱️  Using default delay: %ss", delay)
                 
-                await asyncio.sleep(delay)
+                await self._sleep(delay, "pacing")
+                PLAYBACK_SETTLE_SECONDS.labels("recorded" if current_timestamp and next_timestamp else "default").observe(delay)
+        
+        await asyncio.to_thread(self.selector_cache.flush)
         
         # Final results
         results["end_time"] = datetime.now().isoformat()
@@ -126,39 +189,41 @@ class PlaybackEngine:
             "results": results
         })
         
-        print(f"[Playback] 🏁 Playback completed!")
-        print(f"[Playback] Success: {results['successful_steps']}/{self.total_steps}")
-        print(f"[Playback] Failed: {results['failed_steps']}/{self.total_steps}")
+        logger.info("[Playback] 🏁 Playback completed!")
+        logger.info("[Playback] Success: %s/%s", results['successful_steps'], self.total_steps)
+        logger.info("[Playback] Failed: %s/%s", results['failed_steps'], self.total_steps)
         
         return results
     
-    async def _execute_step(self, step: Dict, session_id: str) -> bool:
+    async def _execute_step(
+        self,
+        step: Dict,
+        session_id: str,
+        flow_key: Optional[str] = None,
+        step_key: str = "",
+        selector_timings: Optional[List[Dict]] = None
+    ) -> bool:
         """Execute a single step"""
         action = step.get("action")
         
         if action == "tap":
             # PHASE 1: TRY ELEMENT FIRST (Primary)
-            selector = step.get("selector")
+            candidates = self._selector_candidates(step)
             
-            if selector and step.get("targetType") == "element":
+            if candidates and step.get("targetType") == "element":
                 try:
-                    print(f"[Playback]   → Trying element: {selector['strategy']} = {selector['value']}")
-                    
-                    # Use find_element helper
-                    element_found = await self._find_and_click_element(
-                        session_id, 
-                        selector["strategy"], 
-                        selector["value"]
+                    element_found = await self._click_first_matching(
+                        session_id, flow_key, step_key, candidates, selector_timings
                     )
                     
                     if element_found:
-                        print(f"[Playback]   ✅ Element click successful!")
+                        logger.debug("[Playback]   ✅ Element click successful!")
                         return True
                     else:
-                        print(f"[Playback]   ⚠️ Element not found, trying fallback...")
+                        logger.info("[Playback]   ⚠️ Element not found, trying fallback...")
                         
                 except Exception as e:
-                    print(f"[Playback]   ⚠️ Element click failed: {e}, trying fallback...")
+                    logger.warning("[Playback]   ⚠️ Element click failed: %s, trying fallback...", e)
             
             # PHASE 2: FALLBACK TO COORDINATES
             fallback = step.get("fallback")
@@ -171,11 +236,11 @@ class PlaybackEngine:
                 y = step.get("y")
             
             if x is not None and y is not None:
-                print(f"[Playback]   → Fallback: Tapping at ({x}, {y})")
+                logger.debug("[Playback]   → Fallback: Tapping at (%s, %s)", x, y)
                 result = await self.appium_service.tap_at_coordinate(session_id, x, y)
                 return result if result is not None else True
             else:
-                print(f"[Playback]   ❌ No valid selector or coordinates!")
+                logger.warning("[Playback]   ❌ No valid selector or coordinates!")
                 return False
                 
         elif action == "swipe":
@@ -186,11 +251,11 @@ class PlaybackEngine:
             duration = step.get("duration", 500)
             
             if all(v is not None for v in [start_x, start_y, end_x, end_y]):
-                print(f"[Playback]   → Swiping from ({start_x},{start_y}) to ({end_x},{end_y})")
+                logger.debug("[Playback]   → Swiping from (%s,%s) to (%s,%s)", start_x, start_y, end_x, end_y)
                 result = await self.appium_service.swipe(session_id, start_x, start_y, end_x, end_y, duration)
                 return result if result is not None else True
             else:
-                print(f"[Playback]   ⚠️ Invalid swipe coordinates")
+                logger.warning("[Playback]   ⚠️ Invalid swipe coordinates")
                 return False
                 
         elif action == "text":
@@ -198,91 +263,157 @@ class PlaybackEngine:
             element_id = step.get("element_id")
             
             if text:
-                print(f"[Playback]   → Typing: {text}")
+                logger.debug("[Playback]   → Typing: %s", text)
                 # For now, just tap coordinates and assume text input works
                 # In future, can use element_id to find element and send keys
-                await asyncio.sleep(0.3)
+                await self._sleep(0.3, "text")
                 return True
             else:
                 return False
                 
         elif action == "wait":
             duration = step.get("duration", 1000) / 1000  # Convert ms to seconds
-            print(f"[Playback]   → Waiting {duration}s")
-            await asyncio.sleep(duration)
+            logger.debug("[Playback]   → Waiting %ss", duration)
+            await self._sleep(duration, "wait")
             return True
             
         else:
-            print(f"[Playback]   ⚠️ Unknown action: {action}")
+            logger.warning("[Playback]   ⚠️ Unknown action: %s", action)
             return False
     
+    async def _sleep(self, seconds: float, reason: str):
+        """asyncio.sleep, traced so waits show up next to the device calls"""
+        with span("sleep", "sleep", seconds=seconds, reason=reason):
+            await asyncio.sleep(seconds)
+    
+    def _selector_candidates(self, step: Dict) -> List[Dict]:
+        """Collect the step's primary selector plus any inspector alternatives"""
+        ordered = []
+        
+        selector = step.get("selector")
+        if selector and selector.get("strategy") and selector.get("value"):
+            ordered.append((selector["strategy"], selector["value"]))
+        
+        for alternative in step.get("selectors") or []:
+            strategy = INSPECTOR_SELECTOR_STRATEGIES.get(alternative.get("type"))
+            if strategy and alternative.get("value"):
+                ordered.append((strategy, alternative["value"]))
+        
+        candidates = []
+        seen = set()
+        for strategy, value in ordered:
+            if (strategy, value) in seen:
+                continue
+            seen.add((strategy, value))
+            candidates.append({"key": f"{strategy}={value}", "strategy": strategy, "value": value})
+        return candidates
+    
+    async def _click_first_matching(
+        self,
+        session_id: str,
+        flow_key: Optional[str],
+        step_key: str,
+        candidates: List[Dict],
+        selector_timings: Optional[List[Dict]] = None
+    ) -> bool:
+        """
+        Try selector candidates in the order learned by the selector cache
+        
+        The fastest selector that has worked for this step before is tried
+        first; every find attempt is timed and recorded back into the cache.
+        """
+        for candidate in self.selector_cache.order(flow_key, step_key, candidates):
+            logger.debug("[Playback]   → Trying element: %s = %s", candidate['strategy'], candidate['value'])
+            
+            start = time.time()
+            element_id = await self._find_element_id(session_id, candidate["strategy"], candidate["value"])
+            elapsed_ms = (time.time() - start) * 1000
+            
+            self.selector_cache.record(flow_key, step_key, candidate["key"], bool(element_id), elapsed_ms)
+            if selector_timings is not None:
+                selector_timings.append({
+                    "step": self.current_step,
+                    "selector": candidate["key"],
+                    "matched": bool(element_id),
+                    "ms": round(elapsed_ms, 1)
+                })
+            
+            if element_id:
+                return await self._click_element_id(session_id, element_id)
+        
+        return False
+    
     async def _find_and_click_element(self, session_id: str, strategy: str, value: str) -> bool:
         """Find element by selector and click it"""
+        element_id = await self._find_element_id(session_id, strategy, value)
+        if not element_id:
+            return False
+        return await self._click_element_id(session_id, element_id)
+    
+    async def _find_element_id(self, session_id: str, strategy: str, value: str) -> Optional[str]:
+        """Find element by selector, returning its Appium element id"""
         try:
-            import httpx
-            
-            # Map strategy to Appium locator
-            locator_map = {
-                "id": "id",  # resource-id
-                "accessibility": "accessibility id",
-                "text": "android uiautomator",  # Will use UiSelector
-                "xpath": "xpath"
-            }
+            # Map strategy to the cheapest Appium locator (XPaths become
+            # resource-id / accessibility id / UiSelector lookups when possible)
+            if strategy not in ("id", "accessibility", "text", "xpath"):
+                logger.error("[Playback] ❌ Unknown selector strategy: %s", strategy)
+                return None
             
-            using = locator_map.get(strategy)
-            if not using:
-                print(f"[Playback] ❌ Unknown selector strategy: {strategy}")
-                return False
+            compiled = compile_selector(strategy, value)
+            using, selector_value = compiled["strategy"], compiled["value"]
             
-            # For text strategy, wrap in UiSelector
-            if strategy == "text":
-                selector_value = f'new UiSelector().text("{value}")'
-            else:
-                selector_value = value
-            
-            async with httpx.AsyncClient() as client:
+            async with appium_client() as client:
                 # Find element
                 find_response = await client.post(
-                    f"http://{self.appium_service.host}:{self.appium_service.port}/session/{session_id}/element",
+                    f"{self.appium_service.session_url(session_id)}/session/{session_id}/element",
                     json={"using": using, "value": selector_value},
                     timeout=10
                 )
                 
                 if find_response.status_code != 200:
-                    print(f"[Playback] ❌ Element not found: {find_response.text}")
-                    return False
+                    logger.debug("[Playback] ❌ Element not found: %s", find_response.text)
+                    return None
                 
                 element_data = find_response.json()
                 element_id = element_data.get("value", {}).get("ELEMENT") or element_data.get("value", {}).get("element-6066-11e4-a52e-4f735466cecf")
                 
                 if not element_id:
-                    print(f"[Playback] ❌ Could not extract element ID")
-                    return False
-                
-                print(f"[Playback] ✅ Element found: {element_id}")
+                    logger.warning("[Playback] ❌ Could not extract element ID")
+                    return None
                 
-                # Click element
+                logger.debug("[Playback] ✅ Element found: %s", element_id)
+                return element_id
+                    
+        except Exception as e:
+            logger.warning("[Playback] ❌ Element lookup error: %s", e)
+            return None
+    
+    async def _click_element_id(self, session_id: str, element_id: str) -> bool:
+        """Click a previously found element"""
+        try:
+            async with appium_client() as client:
                 click_response = await client.post(
-                    f"http://{self.appium_service.host}:{self.appium_service.port}/session/{session_id}/element/{element_id}/click",
+                    f"{self.appium_service.session_url(session_id)}/session/{session_id}/element/{element_id}/click",
                     timeout=10
                 )
+                self.appium_service.hierarchy_cache.invalidate(session_id)
                 
                 if click_response.status_code == 200:
-                    print(f"[Playback] ✅ Element clicked successfully")
+                    logger.debug("[Playback] ✅ Element clicked successfully")
                     return True
                 else:
-                    print(f"[Playback] ❌ Click failed: {click_response.text}")
+                    logger.warning("[Playback] ❌ Click failed: %s", click_response.text)
                     return False
                     
         except Exception as e:
-            print(f"[Playback] ❌ Element interaction error: {e}")
+            logger.warning("[Playback] ❌ Element interaction error: %s", e)
             import traceback
             traceback.print_exc()
             return False
     
     def stop_playback(self):
         """Stop current playback"""
-        print("[Playback] 🛑 Stop requested")
+        logger.info("[Playback] 🛑 Stop requested")
         self.is_playing = False
         
     def _broadcast_update(self, data: Dict):
@@ -291,7 +422,7 @@ class PlaybackEngine:
             try:
                 self.broadcast(data)
             except Exception as e:
-                print(f"[Playback] Broadcast error: {e}")
+                logger.warning("[Playback] Broadcast error: %s", e)
 
 # Global playback engine instance
 _playback_engine: Optional[PlaybackEngine] = None
@@ -0,0 +1,147 @@
+"""Selector Resolution Cache - Learns which fallback selector works fastest per step"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config import settings
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("playback")
+
+# A candidate needs at least this smoothed success rate to be tried before unknown ones
+RELIABLE_SUCCESS_RATE = 0.5
+
+# Steps remembered; the least recently used go first (the file is rewritten whole on flush)
+MAX_STEPS = 20000
+
+
+class SelectorResolutionCache:
+    """
+    Persistent per-flow, per-step record of selector outcomes
+
+    For every candidate selector of a step we keep how often it matched, how
+    often it failed and how long it took. Playback asks for an ordering and
+    tries the fastest reliable selector first instead of the static order.
+    At most max_steps steps are kept, least recently used out first.
+    """
+
+    def __init__(self, path: str, max_steps: int = MAX_STEPS):
+        self.path = path
+        self.max_steps = max_steps
+        self.entries: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()  # LRU first
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        """Load cached outcomes from disk"""
+        try:
+            with open(self.path, "r") as f:
+                self.entries = OrderedDict(json.load(f))  # Saved in LRU order
+        except FileNotFoundError:
+            self.entries = OrderedDict()
+        except Exception as e:
+            logger.warning("[SelectorCache] ⚠️ Could not load %s: %s", self.path, e)
+            self.entries = OrderedDict()
+        self._trim()
+
+    def _trim(self):
+        while len(self.entries) > self.max_steps:
+            self.entries.popitem(last=False)
+            self._dirty = True
+
+    @staticmethod
+    def _entry_key(flow_key: str, step_key: str) -> str:
+        return f"{flow_key}::{step_key}"
+
+    def order(self, flow_key: Optional[str], step_key: str, candidates: List[dict]) -> List[dict]:
+        """
+        Order candidates (each with a unique 'key') for resolution
+
+        1. Reliable candidates that have matched before, fastest first
+        2. Candidates never tried, in their original (static) order
+        3. Unreliable candidates, most successful first
+        """
+        if not flow_key:
+            return list(candidates)
+
+        key = self._entry_key(flow_key, step_key)
+        with self._lock:
+            stats = dict(self.entries.get(key, {}))
+            if key in self.entries:
+                self.entries.move_to_end(key)
+
+        def rank(indexed):
+            index, candidate = indexed
+            entry = stats.get(candidate["key"])
+            if not entry:
+                return (1, 0.0, index)
+
+            hits, failures = entry["hits"], entry["failures"]
+            success_rate = (hits + 1) / (hits + failures + 2)
+            if hits and success_rate >= RELIABLE_SUCCESS_RATE:
+                return (0, entry["hit_ms"] / hits, index)
+            return (2, -success_rate, index)
+
+        return [candidate for _, candidate in sorted(enumerate(candidates), key=rank)]
+
+    def record(self, flow_key: Optional[str], step_key: str, candidate_key: str, matched: bool, elapsed_ms: float):
+        """Record the outcome of one resolution attempt"""
+        if not flow_key:
+            return
+
+        key = self._entry_key(flow_key, step_key)
+        with self._lock:
+            step = self.entries.setdefault(key, {})
+            self.entries.move_to_end(key)
+            entry = step.setdefault(candidate_key, {"hits": 0, "failures": 0, "hit_ms": 0.0, "last_ms": 0.0})
+            if matched:
+                entry["hits"] += 1
+                entry["hit_ms"] += elapsed_ms
+            else:
+                entry["failures"] += 1
+            entry["last_ms"] = elapsed_ms
+            self._dirty = True
+            self._trim()
+
+    def get_stats(self, flow_key: str, step_key: str) -> Dict[str, dict]:
+        """Get recorded outcomes for one step"""
+        with self._lock:
+            return dict(self.entries.get(self._entry_key(flow_key, step_key), {}))
+
+    def forget_flow(self, flow_key: str):
+        """Drop everything learned for a flow (e.g. after it was re-recorded)"""
+        prefix = f"{flow_key}::"
+        with self._lock:
+            for key in [k for k in self.entries if k.startswith(prefix)]:
+                del self.entries[key]
+            self._dirty = True
+
+    def flush(self):
+        """Write outcomes to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self.entries)
+            self._dirty = False
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning("[SelectorCache] ⚠️ Could not save %s: %s", self.path, e)
+
+
+_selector_cache: Optional[SelectorResolutionCache] = None
+
+
+def get_selector_cache() -> SelectorResolutionCache:
+    """Get the process-wide selector resolution cache"""
+    global _selector_cache
+    if _selector_cache is None:
+        _selector_cache = SelectorResolutionCache(str(settings.DATA_DIR / "selector_cache.json"))
+    return _selector_cache
@@ -0,0 +1,308 @@
+"""
+Phase 5: Parallel Web Playback
+Runs a batch of recorded web tests across a pool of browser sessions
+"""
+
+from typing import List, Optional
+import asyncio
+import hashlib
+import heapq
+import json
+import time
+import uuid
+import logging
+
+from config import settings as app_settings
+from services.web.web_playback import WebPlaybackEngine
+from utils.bounded_store import BoundedStore
+
+logger = logging.getLogger(__name__)
+
+
+# Rough per-action cost (seconds) used when a test has never been run before.
+# Includes the settle wait WebPlaybackEngine applies after each step.
+DEFAULT_ACTION_ESTIMATES = {
+    'navigate': 2.5,
+    'click': 1.0,
+    'input': 1.2,
+    'select': 1.0,
+    'scroll': 0.6,
+}
+DEFAULT_UNKNOWN_ACTION_ESTIMATE = 1.0
+
+# Tests whose last wall time is remembered for sharding
+MAX_DURATION_HISTORY = 5000
+
+# Browser sessions one batch may open
+MAX_WORKERS = app_settings.WEB_PLAYBACK_MAX_WORKERS
+
+# Batch reports kept in memory; older or idle ones are spilled to disk
+MAX_BATCHES_IN_MEMORY = 10
+BATCH_IDLE_SECONDS = 60 * 60
+
+
+class WebSessionPool:
+    """Fixed-size pool of Selenium browser sessions shared by playback workers"""
+
+    def __init__(self, selenium_manager, size: int, browser: str = 'chrome', headless: bool = True):
+        self.selenium_manager = selenium_manager
+        self.size = max(1, size)
+        self.browser = browser
+        self.headless = headless
+        self.session_ids: List[str] = []
+        self._available: Optional[asyncio.Queue] = None
+
+    async def start(self) -> List[str]:
+        """Launch all browser sessions concurrently"""
+        self._available = asyncio.Queue()
+
+        results = await asyncio.gather(
+            *[
+                asyncio.to_thread(
+                    self.selenium_manager.create_session,
+                    self.browser,
+                    None,
+                    self.headless
+                )
+                for _ in range(self.size)
+            ],
+            return_exceptions=True
+        )
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"[WebSessionPool] Session launch failed: {result}")
+                continue
+            self.session_ids.append(result)
+            self._available.put_nowait(result)
+
+        if not self.session_ids:
+            raise Exception("Could not launch any browser session for the pool")
+
+        logger.info(f"[WebSessionPool] ✅ {len(self.session_ids)}/{self.size} sessions ready")
+        return self.session_ids
+
+    async def acquire(self) -> str:
+        """Wait for a free session"""
+        return await self._available.get()
+
+    def release(self, session_id: str):
+        """Return a session to the pool"""
+        self._available.put_nowait(session_id)
+
+    async def close(self):
+        """Close every session owned by the pool"""
+        await asyncio.gather(
+            *[
+                asyncio.to_thread(self.selenium_manager.close_session, session_id)
+                for session_id in self.session_ids
+            ],
+            return_exceptions=True
+        )
+        self.session_ids = []
+
+
+class ParallelWebPlayback:
+    """Shards a batch of web tests across N sessions and runs the shards concurrently"""
+
+    def __init__(self, selenium_manager):
+        self.selenium_manager = selenium_manager
+        self.engine = WebPlaybackEngine(selenium_manager)
+        # Last observed wall time per test, used to improve sharding
+        self.duration_history = BoundedStore("web_test_durations", MAX_DURATION_HISTORY)  # {history key: seconds}
+        self.batch_results = BoundedStore(
+            "web_batch_results", MAX_BATCHES_IN_MEMORY, ttl=BATCH_IDLE_SECONDS, spill=True
+        )  # {batch_id: report}
+
+    @staticmethod
+    def history_key(test: dict) -> Optional[str]:
+        """
+        Duration history key: the test's id, start URL and steps, hashed
+
+        None for tests without a caller-supplied id; their positional ids
+        would collide with unrelated tests from other batches.
+        """
+        if test.get('id') is None or test.get('generated_id'):
+            return None
+        content = json.dumps(
+            [str(test['id']), test.get('start_url'), test.get('actions', [])], sort_keys=True, default=str
+        )
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def estimate_duration(self, test: dict) -> float:
+        """Estimate how long a test will take (seconds)"""
+        key = self.history_key(test)
+        duration = self.duration_history.get(key) if key is not None else None
+        if duration is not None:
+            return duration
+
+        return sum(
+            DEFAULT_ACTION_ESTIMATES.get(action.get('type'), DEFAULT_UNKNOWN_ACTION_ESTIMATE)
+            for action in test.get('actions', [])
+        )
+
+    def shard_tests(self, tests: List[dict], shard_count: int) -> List[List[dict]]:
+        """
+        Split tests into shards with balanced estimated duration
+
+        Uses longest-processing-time-first: tests sorted by estimate (longest
+        first) are each assigned to the currently lightest shard.
+        """
+        shard_count = max(1, min(shard_count, len(tests)))
+        shards: List[List[dict]] = [[] for _ in range(shard_count)]
+        heap = [(0.0, idx) for idx in range(shard_count)]
+
+        for test in sorted(tests, key=self.estimate_duration, reverse=True):
+            load, idx = heapq.heappop(heap)
+            shards[idx].append(test)
+            heapq.heappush(heap, (load + self.estimate_duration(test), idx))
+
+        return shards
+
+    async def run_batch(
+        self,
+        tests: List[dict],
+        workers: int = 4,
+        browser: str = 'chrome',
+        headless: bool = True,
+        settings: dict = None
+    ) -> dict:
+        """
+        Execute a batch of recorded web tests across a session pool
+
+        Args:
+            tests: List of {id, name, actions, start_url?}
+            workers: Number of concurrent browser sessions (at most MAX_WORKERS)
+            browser: Browser type for the pool
+            headless: Run pool browsers headless
+            settings: Execution settings passed to WebPlaybackEngine
+
+        Returns:
+            Combined report with per-test wall time and shard layout
+        """
+        batch_id = str(uuid.uuid4())
+
+        for idx, test in enumerate(tests):
+            if test.get('id') is None:
+                # Positional ids are not stable across batches, so they don't feed the selector cache
+                test['id'] = str(idx + 1)
+                test['generated_id'] = True
+
+        shards = self.shard_tests(tests, max(1, min(workers, MAX_WORKERS)))
+        logger.info(f"[ParallelPlayback] Batch {batch_id}: {len(tests)} tests in {len(shards)} shards")
+
+        pool = WebSessionPool(self.selenium_manager, len(shards), browser, headless)
+        batch_start = time.time()
+
+        try:
+            await pool.start()
+            shard_reports = await asyncio.gather(
+                *[
+                    self._run_shard(pool, shard_idx, shard, settings)
+                    for shard_idx, shard in enumerate(shards)
+                ]
+            )
+        finally:
+            await pool.close()
+
+        wall_time = time.time() - batch_start
+        test_results = [result for shard in shard_reports for result in shard['tests']]
+        serial_time = sum(result['wall_time'] for result in test_results)
+
+        report = {
+            'batch_id': batch_id,
+            'total_tests': len(tests),
+            'workers': len(shards),
+            'passed': sum(1 for r in test_results if r['overall_status'] == 'pass'),
+            'partial': sum(1 for r in test_results if r['overall_status'] == 'partial'),
+            'failed': sum(1 for r in test_results if r['overall_status'] == 'fail'),
+            'wall_time': wall_time,
+            'serial_time': serial_time,
+            'speedup': serial_time / wall_time if wall_time > 0 else None,
+            'shards': [
+                {
+                    'shard': shard['shard'],
+                    'estimated_time': shard['estimated_time'],
+                    'wall_time': shard['wall_time'],
+                    'test_ids': [r['test_id'] for r in shard['tests']]
+                }
+                for shard in shard_reports
+            ],
+            'tests': test_results
+        }
+        report['overall_status'] = 'pass' if report['passed'] == len(tests) else 'fail'
+
+        self.batch_results[batch_id] = report
+        logger.info(
+            f"[ParallelPlayback] Batch complete in {wall_time:.1f}s "
+            f"(serial {serial_time:.1f}s, {len(shards)} workers)"
+        )
+        return report
+
+    async def _run_shard(self, pool: WebSessionPool, shard_idx: int, shard: List[dict], settings: dict) -> dict:
+        """Run one shard's tests sequentially on a single pooled session"""
+        session_id = await pool.acquire()
+        shard_start = time.time()
+        results = []
+
+        try:
+            for test in shard:
+                results.append(await self._run_test(session_id, shard_idx, test, settings))
+        finally:
+            pool.release(session_id)
+
+        return {
+            'shard': shard_idx,
+            'estimated_time': sum(self.estimate_duration(t) for t in shard),
+            'wall_time': time.time() - shard_start,
+            'tests': results
+        }
+
+    async def _run_test(self, session_id: str, shard_idx: int, test: dict, settings: dict) -> dict:
+        """Run a single test and wrap its result with timing metadata"""
+        test_id = str(test['id'])
+        actions = list(test.get('actions', []))
+
+        # Tests recorded without an explicit navigate step start from their URL
+        start_url = test.get('start_url')
+        if start_url and (not actions or actions[0].get('type') != 'navigate'):
+            actions.insert(0, {'type': 'navigate', 'url': start_url})
+
+        start = time.time()
+        try:
+            result = await self.engine.execute_test(
+                session_id, actions, settings, None if test.get('generated_id') else test_id
+            )
+        except Exception as e:
+            logger.error(f"[ParallelPlayback] Test {test_id} crashed: {e}")
+            result = {'overall_status': 'fail', 'error': str(e), 'step_results': []}
+        wall_time = time.time() - start
+
+        key = self.history_key(test)
+        if key is not None:
+            self.duration_history[key] = wall_time
+
+        return {
+            'test_id': test_id,
+            'name': test.get('name'),
+            'shard': shard_idx,
+            'session_id': session_id,
+            'wall_time': wall_time,
+            **result
+        }
+
+    def get_batch(self, batch_id: str) -> Optional[dict]:
+        """Get a finished batch report"""
+        return self.batch_results.get(batch_id)
+
+
+_parallel_playback: Optional[ParallelWebPlayback] = None
+
+
+def get_parallel_playback() -> ParallelWebPlayback:
+    """Get or create the parallel playback singleton"""
+    global _parallel_playback
+    if _parallel_playback is None:
+        from services.web.selenium_manager import selenium_manager
+        _parallel_playback = ParallelWebPlayback(selenium_manager)
+    return _parallel_playback
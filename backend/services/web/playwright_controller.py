@@ -5,6 +5,15 @@ import asyncio
 import base64
 from datetime import datetime
 from services.web.typing_tracker import setup_typing_detection, get_last_typing
+from services.web.readiness import PlaywrightReadiness, resolve_step_policies, summarize_waits
+from utils.bounded_store import SpillList
+
+# Upper bounds (seconds) for condition-based waits during replay
+REPLAY_NAVIGATION_SETTLE = 1.0
+REPLAY_STEP_SETTLE = 0.8
+
+# Recorded actions kept in memory; older ones are spilled to disk until the recording is read
+MAX_RECORDED_ACTIONS_IN_MEMORY = 500
 
 class PlaywrightController:
     """Controls Playwright browser for web automation"""
@@ -14,7 +23,7 @@ class PlaywrightController:
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.is_recording = False
-        self.recorded_actions: List[Dict[str, Any]] = []
+        self.recorded_actions = SpillList("playwright_recorded_actions", MAX_RECORDED_ACTIONS_IN_MEMORY)
         self._playwright_context = None
         self.current_url: Optional[str] = None  # Track current URL for playback
         self._typing_task: Optional[asyncio.Task] = None  # Background typing monitor
@@ -350,7 +359,7 @@ class PlaywrightController:
     def start_recording(self) -> Dict[str, Any]:
         """Start recording actions"""
         self.is_recording = True
-        self.recorded_actions = []
+        self.recorded_actions.clear()
         self._last_typing_text = ""
         
         # Start typing monitor task
@@ -380,7 +389,7 @@ class PlaywrightController:
     
     def get_recorded_actions(self) -> List[Dict[str, Any]]:
         """Get recorded actions"""
-        return self.recorded_actions
+        return self.recorded_actions.to_list()
     
     async def replay_actions(self, actions: List[Dict[str, Any]], fresh_browser: bool = False) -> Dict[str, Any]:
         """Replay recorded actions with optional fresh browser launch"""
@@ -397,11 +406,21 @@ class PlaywrightController:
             if not self.page:
                 return {"success": False, "error": "Browser not launched"}
             
+            readiness = PlaywrightReadiness(self.page)
+            step_timings = []
+            
             # Navigate to the test URL if available
             if self.current_url:
                 print(f"[Playwright] 🌐 Navigating to test URL: {self.current_url}")
                 await self.navigate(self.current_url)
-                await asyncio.sleep(1)  # Wait for page to stabilize
+                # Wait for the page to stabilize (bounded, returns early when idle)
+                waits = await readiness.settle(['network_idle', 'dom_quiet'], REPLAY_NAVIGATION_SETTLE)
+                step_timings.append({
+                    "step": 0,
+                    "action": "navigate",
+                    "waits": waits,
+                    "wait_time": sum(w['elapsed'] for w in waits)
+                })
             else:
                 print("[Playwright] ⚠️ No URL stored - skipping navigation")
             
@@ -420,7 +439,23 @@ class PlaywrightController:
                 
                 print(f"[Playwright] 🎬 Action {i+1}/{len(actions)}: {action_type}")
                 
+                # Recorded Playwright actions use 'type' for text entry
+                policies = resolve_step_policies({
+                    'type': 'input' if action_type == 'type' else action_type,
+                    'wait': action.get('wait')
+                })
+                css_selector = selector if selector and not selector.startswith('coordinate:') else None
+                timing = {"step": i + 1, "action": action_type, "waits": []}
+                step_start = asyncio.get_event_loop().time()
+                
                 try:
+                    if css_selector and policies['before']:
+                        timing["waits"] += await readiness.settle(
+                            policies['before'], REPLAY_STEP_SETTLE, selector=css_selector
+                        )
+                    
+                    previous_url = self.page.url
+                    
                     if action_type == 'click':
                         if selector and selector.startswith('coordinate:'):
                             # Extract coordinates
@@ -447,18 +482,29 @@ class PlaywrightController:
                     
                     executed_count += 1
                     
-                    # Wait between actions for stability
-                    await asyncio.sleep(0.8)
+                    # Wait for the page to settle (0.8s is an upper bound, not a floor)
+                    if policies['after']:
+                        timing["waits"] += await readiness.settle(
+                            policies['after'], REPLAY_STEP_SETTLE, previous_url=previous_url
+                        )
                     
                 except Exception as action_error:
                     print(f"[Playwright] ⚠️ Action {i+1} failed: {action_error}")
+                    timing["error"] = str(action_error)
                     # Continue with next action instead of failing completely
+                
+                timing["wait_time"] = sum(w['elapsed'] for w in timing["waits"])
+                timing["duration"] = asyncio.get_event_loop().time() - step_start
+                step_timings.append(timing)
             
             print(f"[Playwright] ✅ Replay completed - {executed_count}/{len(actions)} actions executed")
             return {
                 "success": True, 
                 "actions_executed": executed_count,
-                "total_actions": len(actions)
+                "total_actions": len(actions),
+                "step_timings": step_timings,
+                "wait_summary": summarize_waits(step_timings),
+                "total_wait_time": sum(t["wait_time"] for t in step_timings)
             }
             
         except Exception as e:
@@ -484,7 +530,7 @@ class PlaywrightController:
                 self._playwright_context = None
             
             self.is_recording = False
-            self.recorded_actions = []
+            self.recorded_actions.clear()
             
             print("[Playwright] ✅ Browser closed")
             return {"success": True}
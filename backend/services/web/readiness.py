@@ -0,0 +1,265 @@
+"""
+Phase 5: Page Readiness Engine
+Condition-based waits for web playback (replaces fixed sleeps)
+
+Policies:
+- network_idle: document loaded and no fetch/XHR in flight for a quiet window
+- dom_quiet: no DOM mutations for a quiet window
+- actionable: element present, visible, enabled, not moving and not covered
+- url_change: URL differs from the URL before the step
+"""
+
+from typing import Dict, List
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+POLICIES = ('network_idle', 'dom_quiet', 'actionable', 'url_change')
+
+# Default policies per action type, split into waits before and after the action
+DEFAULT_STEP_POLICIES = {
+    'navigate': {'before': [], 'after': ['network_idle', 'dom_quiet']},
+    'click': {'before': ['actionable'], 'after': ['dom_quiet']},
+    'input': {'before': ['actionable'], 'after': []},
+    'select': {'before': ['actionable'], 'after': ['dom_quiet']},
+    'scroll': {'before': [], 'after': ['dom_quiet']},
+}
+
+# Policies that block the step when unsatisfied; the rest are best-effort settles
+HARD_POLICIES = ('actionable', 'url_change')
+
+POLL_INTERVAL = 0.05
+NETWORK_IDLE_MS = 500
+DOM_QUIET_MS = 300
+
+
+# Installs fetch/XHR and MutationObserver tracking once per document and
+# returns the current readiness state in the same round-trip. The IIFE must
+# start on the `return` line: a newline after `return` returns undefined.
+_PROBE_SCRIPT = """return (function () {
+    var w = window;
+    if (!w.__gqaReady) {
+        var state = w.__gqaReady = {
+            pending: 0,
+            lastNetwork: Date.now(),
+            lastMutation: Date.now()
+        };
+        var done = function () {
+            state.pending = Math.max(0, state.pending - 1);
+            state.lastNetwork = Date.now();
+        };
+        if (w.fetch) {
+            var origFetch = w.fetch;
+            w.fetch = function () {
+                state.pending++;
+                state.lastNetwork = Date.now();
+                return origFetch.apply(this, arguments).then(
+                    function (r) { done(); return r; },
+                    function (e) { done(); throw e; }
+                );
+            };
+        }
+        var origSend = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function () {
+            state.pending++;
+            state.lastNetwork = Date.now();
+            this.addEventListener('loadend', done);
+            return origSend.apply(this, arguments);
+        };
+        new MutationObserver(function () {
+            state.lastMutation = Date.now();
+        }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    }
+    var s = w.__gqaReady;
+    var now = Date.now();
+    return {
+        readyState: document.readyState,
+        pending: s.pending,
+        networkIdleMs: now - s.lastNetwork,
+        domQuietMs: now - s.lastMutation,
+        url: location.href
+    };
+})();
+"""
+
+_ACTIONABLE_SCRIPT = """
+var el = arguments[0];
+var r = el.getBoundingClientRect();
+if (r.width === 0 || r.height === 0) return {ok: false, rect: null, reason: 'zero-size'};
+var style = getComputedStyle(el);
+if (style.visibility === 'hidden' || style.display === 'none') return {ok: false, rect: null, reason: 'hidden'};
+if (el.disabled) return {ok: false, rect: null, reason: 'disabled'};
+var cx = r.left + r.width / 2, cy = r.top + r.height / 2;
+var rect = [r.left, r.top, r.width, r.height];
+if (cx >= 0 && cy >= 0 && cx <= window.innerWidth && cy <= window.innerHeight) {
+    var top = document.elementFromPoint(cx, cy);
+    if (top && top !== el && !el.contains(top) && !top.contains(el)) return {ok: false, rect: rect, reason: 'covered'};
+}
+return {ok: true, rect: rect, reason: null};
+"""
+
+# Resolves once the DOM has been quiet for quietMs, or after timeoutMs
+_PLAYWRIGHT_DOM_QUIET = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    const start = Date.now();
+    let last = Date.now();
+    const observer = new MutationObserver(() => { last = Date.now(); });
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    const tick = () => {
+        const now = Date.now();
+        if (now - last >= quietMs || now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve(now - last >= quietMs);
+        } else {
+            setTimeout(tick, 25);
+        }
+    };
+    tick();
+})
+"""
+
+
+def resolve_step_policies(action: dict) -> Dict[str, List[str]]:
+    """
+    Get the before/after wait policies for a step
+
+    A step may override the defaults with action['wait'] as either a list
+    (applied after the action) or {'before': [...], 'after': [...]}.
+    """
+    defaults = DEFAULT_STEP_POLICIES.get(action.get('type'), {'before': [], 'after': []})
+    override = action.get('wait')
+
+    if override is None:
+        return {'before': list(defaults['before']), 'after': list(defaults['after'])}
+    if isinstance(override, list):
+        return {'before': list(defaults['before']), 'after': [p for p in override if p in POLICIES]}
+    return {
+        'before': [p for p in override.get('before', defaults['before']) if p in POLICIES],
+        'after': [p for p in override.get('after', defaults['after']) if p in POLICIES],
+    }
+
+
+def summarize_waits(step_results: List[dict]) -> Dict[str, dict]:
+    """Aggregate recorded waits per policy across a run"""
+    summary: Dict[str, dict] = {}
+    for step in step_results:
+        for wait in step.get('waits', []):
+            entry = summary.setdefault(wait['policy'], {'count': 0, 'total_time': 0.0, 'timeouts': 0})
+            entry['count'] += 1
+            entry['total_time'] += wait['elapsed']
+            if not wait['satisfied']:
+                entry['timeouts'] += 1
+    return summary
+
+
+class SeleniumReadiness:
+    """Polls page readiness conditions on a Selenium driver (blocking; run in a worker thread)"""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def probe(self) -> dict:
+        """Install tracking (once per document) and read the current state"""
+        return self.driver.execute_script(_PROBE_SCRIPT) or {}
+
+    def wait_for(
+        self,
+        policy: str,
+        timeout: float,
+        locator: tuple = None,
+        previous_url: str = None
+    ) -> dict:
+        """
+        Wait until a policy is satisfied or the timeout (an upper bound) expires
+
+        Returns:
+            {policy, elapsed, satisfied}
+        """
+        start = time.time()
+        deadline = start + max(0.0, timeout)
+        last_rect = None
+        satisfied = False
+
+        while True:
+            try:
+                if policy == 'network_idle':
+                    state = self.probe()
+                    satisfied = (
+                        state.get('readyState') == 'complete'
+                        and state.get('pending', 0) == 0
+                        and state.get('networkIdleMs', 0) >= NETWORK_IDLE_MS
+                    )
+                elif policy == 'dom_quiet':
+                    satisfied = self.probe().get('domQuietMs', 0) >= DOM_QUIET_MS
+                elif policy == 'url_change':
+                    satisfied = self.driver.current_url != previous_url
+                elif policy == 'actionable':
+                    elements = self.driver.find_elements(*locator) if locator else []
+                    if elements:
+                        check = self.driver.execute_script(_ACTIONABLE_SCRIPT, elements[0]) or {}
+                        rect = check.get('rect')
+                        # Require the same box on two consecutive polls (not animating)
+                        satisfied = bool(check.get('ok')) and rect == last_rect
+                        last_rect = rect
+                else:
+                    satisfied = True
+            except Exception as e:
+                logger.debug(f"[Readiness] {policy} probe failed: {e}")
+                satisfied = False
+
+            if satisfied or time.time() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+
+        return {'policy': policy, 'elapsed': time.time() - start, 'satisfied': satisfied}
+
+
+class PlaywrightReadiness:
+    """Async readiness waits for the Playwright controller"""
+
+    def __init__(self, page):
+        self.page = page
+
+    async def wait_for(
+        self,
+        policy: str,
+        timeout: float,
+        selector: str = None,
+        previous_url: str = None
+    ) -> dict:
+        """Wait until a policy is satisfied or the timeout (an upper bound) expires"""
+        start = time.time()
+        timeout_ms = max(0, int(timeout * 1000))
+        satisfied = False
+
+        try:
+            if policy == 'network_idle':
+                await self.page.wait_for_load_state('networkidle', timeout=timeout_ms)
+                satisfied = True
+            elif policy == 'dom_quiet':
+                satisfied = await self.page.evaluate(_PLAYWRIGHT_DOM_QUIET, [DOM_QUIET_MS, timeout_ms])
+            elif policy == 'url_change':
+                await self.page.wait_for_url(lambda url: url != previous_url, timeout=timeout_ms)
+                satisfied = True
+            elif policy == 'actionable':
+                if selector:
+                    await self.page.locator(selector).first.wait_for(state='visible', timeout=timeout_ms)
+                satisfied = True
+            else:
+                satisfied = True
+        except Exception as e:
+            logger.debug(f"[Readiness] {policy} wait ended: {e}")
+            satisfied = False
+
+        return {'policy': policy, 'elapsed': time.time() - start, 'satisfied': satisfied}
+
+    async def settle(self, policies: List[str], timeout: float, **context) -> List[dict]:
+        """Run several waits within one shared time budget"""
+        waits = []
+        deadline = time.time() + timeout
+        for policy in policies:
+            remaining = max(0.0, deadline - time.time())
+            waits.append(await self.wait_for(policy, remaining, **context))
+        return waits
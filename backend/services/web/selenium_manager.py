@@ -18,6 +18,16 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Locator strategy names accepted by the API, mapped to Selenium's By values
+LOCATOR_STRATEGIES = {
+    'xpath': By.XPATH,
+    'css': By.CSS_SELECTOR,
+    'id': By.ID,
+    'name': By.NAME,
+    'tag': By.TAG_NAME,
+    'class': By.CLASS_NAME
+}
+
 
 class SeleniumManager:
     """Manages Selenium WebDriver instances and browser sessions"""
@@ -233,23 +243,11 @@ class SeleniumManager:
             wait_timeout: Maximum wait time in seconds
         """
         driver = self._get_driver(session_id)
-        
-        # Map locator strategies
-        by_map = {
-            'xpath': By.XPATH,
-            'css': By.CSS_SELECTOR,
-            'id': By.ID,
-            'name': By.NAME,
-            'tag': By.TAG_NAME,
-            'class': By.CLASS_NAME
-        }
-        
-        if by not in by_map:
-            raise ValueError(f"Invalid locator strategy: {by}")
+        locator = (self.get_locator_strategy(by), value)
         
         try:
             element = WebDriverWait(driver, wait_timeout).until(
-                EC.presence_of_element_located((by_map[by], value))
+                EC.presence_of_element_located(locator)
             )
             return element
         except Exception as e:
@@ -298,6 +296,16 @@ class SeleniumManager:
             }
         }
     
+    def get_locator_strategy(self, by: str) -> str:
+        """Map an API locator name ('css', 'xpath', ...) to a Selenium By value"""
+        if by not in LOCATOR_STRATEGIES:
+            raise ValueError(f"Invalid locator strategy: {by}")
+        return LOCATOR_STRATEGIES[by]
+    
+    def get_driver(self, session_id: str) -> webdriver.Remote:
+        """Get the WebDriver for a session (for readiness probes and scripts)"""
+        return self._get_driver(session_id)
+    
     def _get_driver(self, session_id: str) -> webdriver.Remote:
         """Get driver instance, raise if not found"""
         if session_id not in self.sessions:
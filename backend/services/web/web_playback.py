@@ -3,28 +3,47 @@ Phase 5: Web Playback Engine
 Executes recorded web tests with intelligent waits and error handling
 """
 
-from typing import Dict, List, Optional
+from typing import List, Optional
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import asyncio
 import time
+import uuid
 import logging
 
+from services.web.readiness import (
+    HARD_POLICIES,
+    SeleniumReadiness,
+    resolve_step_policies,
+    summarize_waits,
+)
+from services.playback.selector_cache import get_selector_cache
+from utils.bounded_store import BoundedStore
+
 logger = logging.getLogger(__name__)
 
+# Playback results kept in memory; older or idle ones are spilled to disk
+MAX_RESULTS_IN_MEMORY = 50
+RESULTS_IDLE_SECONDS = 60 * 60
+
 
 class WebPlaybackEngine:
     """Executes recorded web test actions"""
     
     def __init__(self, selenium_manager):
         self.selenium_manager = selenium_manager
-        self.playback_results: Dict[str, dict] = {}
+        self.playback_results = BoundedStore(
+            "web_playback_results", MAX_RESULTS_IN_MEMORY, ttl=RESULTS_IDLE_SECONDS, spill=True
+        )  # {playback_id: results}
+        self.selector_cache = get_selector_cache()
     
     async def execute_test(
         self,
         session_id: str,
         actions: List[dict],
-        settings: dict = None
+        settings: dict = None,
+        test_id: str = None
     ) -> dict:
         """
         Execute a recorded web test
@@ -33,6 +52,9 @@ class WebPlaybackEngine:
             session_id: Active browser session
             actions: List of recorded actions
             settings: Execution settings (wait_timeout, retry_count, etc.)
+                step_delay and retry_delay are upper bounds for the
+                condition-based settle waits, not fixed sleeps
+            test_id: Stable test id; enables the selector resolution cache
         
         Returns:
             Execution results with status and details
@@ -42,10 +64,13 @@ class WebPlaybackEngine:
                 'wait_timeout': 10,
                 'retry_per_step': 1,
                 'failure_behaviour': 'stop',
-                'capture_screenshots': True
+                'capture_screenshots': True,
+                'step_delay': 0.5,
+                'retry_delay': 1.0
             }
         
         results = {
+            'playback_id': str(uuid.uuid4()),
             'total_steps': len(actions),
             'successful_steps': 0,
             'failed_steps': 0,
@@ -63,7 +88,8 @@ class WebPlaybackEngine:
                 session_id,
                 action,
                 step_num,
-                settings
+                settings,
+                test_id
             )
             
             results['step_results'].append(step_result)
@@ -92,13 +118,15 @@ class WebPlaybackEngine:
                     continue
             elif step_result['status'] == 'skip':
                 results['skipped_steps'] += 1
-            
-            # Small delay between steps
-            time.sleep(0.5)
         
         # Calculate overall status
         results['end_time'] = time.time()
         results['duration'] = results['end_time'] - results['start_time']
+        results['wait_summary'] = summarize_waits(results['step_results'])
+        results['total_wait_time'] = sum(
+            step.get('wait_time', 0) for step in results['step_results']
+        )
+        await asyncio.to_thread(self.selector_cache.flush)
         
         if results['failed_steps'] == 0:
             results['overall_status'] = 'pass'
@@ -108,6 +136,7 @@ class WebPlaybackEngine:
             results['overall_status'] = 'fail'
         
         logger.info(f"[WebPlayback] Test complete: {results['overall_status']}")
+        self.playback_results[results['playback_id']] = results
         return results
     
     async def _execute_step(
@@ -115,7 +144,8 @@ class WebPlaybackEngine:
         session_id: str,
         action: dict,
         step_num: int,
-        settings: dict
+        settings: dict,
+        test_id: str = None
     ) -> dict:
         """Execute a single test step with retry logic"""
         action_type = action['type']
@@ -127,26 +157,51 @@ class WebPlaybackEngine:
             'status': 'fail',
             'attempts': 0,
             'errors': [],
-            'duration': 0
+            'duration': 0,
+            'waits': [],
+            'wait_time': 0,
+            'selector_attempts': []
         }
         
         start_time = time.time()
+        policies = resolve_step_policies(action)
+        readiness = SeleniumReadiness(self.selenium_manager.get_driver(session_id))
+        wait_timeout = settings.get('wait_timeout', 10)
+        step_key = f"{step_num}:{action_type}"
         
         for attempt in range(retry_count):
             step_result['attempts'] = attempt + 1
             
             try:
+                previous_url = None
+                if 'url_change' in policies['after']:
+                    previous_url = await asyncio.to_thread(
+                        self.selenium_manager.get_current_url, session_id
+                    )
+                
+                locator = None
+                if action_type in ('click', 'input', 'select'):
+                    locator = await self._resolve_cached_locator(
+                        session_id, action, test_id, step_key, step_result
+                    )
+                
+                # Wait until the target is ready instead of sleeping
+                await self._wait_policies(
+                    readiness, policies['before'], wait_timeout, action, step_result,
+                    locator=locator
+                )
+                
                 if action_type == 'navigate':
                     await self._execute_navigate(session_id, action, settings)
                 
                 elif action_type == 'click':
-                    await self._execute_click(session_id, action, settings)
+                    await self._execute_click(session_id, action, settings, locator)
                 
                 elif action_type == 'input':
-                    await self._execute_input(session_id, action, settings)
+                    await self._execute_input(session_id, action, settings, locator)
                 
                 elif action_type == 'select':
-                    await self._execute_select(session_id, action, settings)
+                    await self._execute_select(session_id, action, settings, locator)
                 
                 elif action_type == 'scroll':
                     await self._execute_scroll(session_id, action, settings)
@@ -154,15 +209,24 @@ class WebPlaybackEngine:
                 else:
                     raise Exception(f"Unsupported action type: {action_type}")
                 
+                # Settle after the action; the old fixed inter-step delay is now
+                # only an upper bound (navigation may use the full wait timeout)
+                settle_budget = wait_timeout if action_type == 'navigate' else settings.get('step_delay', 0.5)
+                await self._wait_policies(
+                    readiness, policies['after'], settle_budget, action, step_result,
+                    previous_url=previous_url
+                )
+                
                 # Success!
                 step_result['status'] = 'pass' if attempt == 0 else 'flaky'
                 step_result['duration'] = time.time() - start_time
                 
                 # Capture screenshot if enabled
                 if settings.get('capture_screenshots'):
-                    screenshot_path = self.selenium_manager.take_screenshot(
+                    screenshot_path = await asyncio.to_thread(
+                        self.selenium_manager.take_screenshot,
                         session_id,
-                        f"/tmp/step_{step_num}_success.png"
+                        f"/tmp/step_{session_id}_{step_num}_success.png"
                     )
                     step_result['screenshot'] = screenshot_path
                 
@@ -182,51 +246,171 @@ class WebPlaybackEngine:
                     # Capture failure screenshot
                     if settings.get('capture_screenshots'):
                         try:
-                            screenshot_path = self.selenium_manager.take_screenshot(
+                            screenshot_path = await asyncio.to_thread(
+                                self.selenium_manager.take_screenshot,
                                 session_id,
-                                f"/tmp/step_{step_num}_failure.png"
+                                f"/tmp/step_{session_id}_{step_num}_failure.png"
                             )
                             step_result['screenshot'] = screenshot_path
                         except:
                             pass
                 else:
-                    # Wait before retry
-                    time.sleep(1)
+                    # Wait for the page to settle before retrying (bounded, not fixed)
+                    await self._wait_policies(
+                        readiness, ['dom_quiet'], settings.get('retry_delay', 1.0), action, step_result
+                    )
         
+        step_result['wait_time'] = sum(w['elapsed'] for w in step_result['waits'])
         return step_result
     
+    async def _wait_policies(
+        self,
+        readiness: SeleniumReadiness,
+        policies: List[str],
+        budget: float,
+        action: dict,
+        step_result: dict,
+        previous_url: str = None,
+        locator: tuple = None
+    ):
+        """
+        Run a sequence of readiness waits within a shared time budget
+        
+        Waits are recorded on the step result. Raises when a hard policy
+        (actionable, url_change) is not met within the budget.
+        """
+        deadline = time.time() + budget
+        by_locator = None
+        
+        for policy in policies:
+            if policy == 'actionable':
+                try:
+                    by, value = locator or self._resolve_locator(action)
+                except Exception:
+                    continue
+                by_locator = (self.selenium_manager.get_locator_strategy(by), value)
+            
+            wait = await asyncio.to_thread(
+                readiness.wait_for,
+                policy,
+                max(0.0, deadline - time.time()),
+                locator=by_locator,
+                previous_url=previous_url
+            )
+            step_result['waits'].append(wait)
+            
+            if not wait['satisfied'] and policy in HARD_POLICIES:
+                raise Exception(f"Step not ready: {policy} not met after {wait['elapsed']:.2f}s")
+    
+    def _resolve_locator(self, action: dict) -> tuple:
+        """Pick the (by, value) locator for an element action"""
+        selector = action.get('selector', {})
+        
+        # Try best selector first
+        if 'best' in selector:
+            return selector.get('best_type', 'css'), selector['best']
+        # Fallback to first available
+        if 'id_locator' in selector:
+            return 'id', selector['id_locator']
+        if 'css' in selector:
+            return 'css', selector['css']
+        if 'xpath' in selector:
+            return 'xpath', selector['xpath']
+        raise Exception("No valid selector found")
+    
+    def _selector_candidates(self, action: dict) -> List[dict]:
+        """All distinct (by, value) locators recorded for an action, in static order"""
+        selector = action.get('selector', {})
+        ordered = []
+        
+        if 'best' in selector:
+            ordered.append((selector.get('best_type', 'css'), selector['best']))
+        for by, field in (('id', 'id_locator'), ('name', 'name_locator'), ('css', 'css'), ('xpath', 'xpath')):
+            if selector.get(field):
+                ordered.append((by, selector[field]))
+        
+        candidates = []
+        seen = set()
+        for by, value in ordered:
+            if (by, value) in seen:
+                continue
+            seen.add((by, value))
+            candidates.append({'key': f"{by}={value}", 'by': by, 'value': value})
+        return candidates
+    
+    async def _resolve_cached_locator(
+        self,
+        session_id: str,
+        action: dict,
+        test_id: Optional[str],
+        step_key: str,
+        step_result: dict
+    ) -> tuple:
+        """
+        Pick the locator for an element action using learned selector outcomes
+        
+        Candidates are probed once each (no implicit wait) in the order the
+        selector cache suggests; the first one that matches wins. When none
+        match yet (page still rendering) the outcome is inconclusive, nothing
+        is recorded and the top-ranked candidate is handed to the readiness wait.
+        """
+        candidates = self.selector_cache.order(
+            test_id, step_key, self._selector_candidates(action)
+        )
+        if not candidates:
+            return self._resolve_locator(action)
+        if not test_id or len(candidates) == 1:
+            return candidates[0]['by'], candidates[0]['value']
+        
+        driver = self.selenium_manager.get_driver(session_id)
+        attempts = []
+        winner = None
+        
+        for candidate in candidates:
+            start = time.time()
+            try:
+                found = await asyncio.to_thread(
+                    driver.find_elements,
+                    self.selenium_manager.get_locator_strategy(candidate['by']),
+                    candidate['value']
+                )
+            except Exception:
+                found = []
+            attempts.append({
+                'key': candidate['key'],
+                'matched': bool(found),
+                'ms': (time.time() - start) * 1000
+            })
+            if found:
+                winner = candidate
+                break
+        
+        step_result['selector_attempts'].extend(attempts)
+        
+        if winner is None:
+            return candidates[0]['by'], candidates[0]['value']
+        
+        for attempt in attempts:
+            self.selector_cache.record(
+                test_id, step_key, attempt['key'], attempt['matched'], attempt['ms']
+            )
+        return winner['by'], winner['value']
+    
     async def _execute_navigate(self, session_id: str, action: dict, settings: dict):
         """Execute navigation action"""
         url = action.get('url')
         if not url:
             raise Exception("No URL provided for navigate action")
         
-        self.selenium_manager.navigate(session_id, url)
+        await asyncio.to_thread(self.selenium_manager.navigate, session_id, url)
         logger.info(f"[WebPlayback] Navigated to: {url}")
     
-    async def _execute_click(self, session_id: str, action: dict, settings: dict):
+    async def _execute_click(self, session_id: str, action: dict, settings: dict, locator: tuple = None):
         """Execute click action"""
-        selector = action.get('selector', {})
-        
-        # Try best selector first
-        if 'best' in selector:
-            by = selector.get('best_type', 'css')
-            value = selector['best']
-        else:
-            # Fallback to first available
-            if 'id_locator' in selector:
-                by = 'id'
-                value = selector['id_locator']
-            elif 'css' in selector:
-                by = 'css'
-                value = selector['css']
-            elif 'xpath' in selector:
-                by = 'xpath'
-                value = selector['xpath']
-            else:
-                raise Exception("No valid selector found")
+        by, value = locator or self._resolve_locator(action)
         
-        self.selenium_manager.click_element(
+        await asyncio.to_thread(
+            self.selenium_manager.click_element,
             session_id,
             by,
             value,
@@ -234,25 +418,13 @@ class WebPlaybackEngine:
         )
         logger.info(f"[WebPlayback] Clicked: {by}={value}")
     
-    async def _execute_input(self, session_id: str, action: dict, settings: dict):
+    async def _execute_input(self, session_id: str, action: dict, settings: dict, locator: tuple = None):
         """Execute input action"""
-        selector = action.get('selector', {})
         value = action.get('value', '')
+        by, locator = locator or self._resolve_locator(action)
         
-        # Get selector
-        if 'best' in selector:
-            by = selector.get('best_type', 'css')
-            locator = selector['best']
-        elif 'id_locator' in selector:
-            by = 'id'
-            locator = selector['id_locator']
-        elif 'css' in selector:
-            by = 'css'
-            locator = selector['css']
-        else:
-            raise Exception("No valid selector found")
-        
-        self.selenium_manager.send_keys(
+        await asyncio.to_thread(
+            self.selenium_manager.send_keys,
             session_id,
             by,
             locator,
@@ -261,17 +433,17 @@ class WebPlaybackEngine:
         )
         logger.info(f"[WebPlayback] Input: {by}={locator}, value={value}")
     
-    async def _execute_select(self, session_id: str, action: dict, settings: dict):
+    async def _execute_select(self, session_id: str, action: dict, settings: dict, locator: tuple = None):
         """Execute select dropdown action"""
         # Similar to click but for dropdowns
-        await self._execute_click(session_id, action, settings)
+        await self._execute_click(session_id, action, settings, locator)
     
     async def _execute_scroll(self, session_id: str, action: dict, settings: dict):
         """Execute scroll action"""
         scroll_amount = action.get('value', '0')
         
         script = f"window.scrollBy(0, {scroll_amount});"
-        self.selenium_manager.execute_script(session_id, script)
+        await asyncio.to_thread(self.selenium_manager.execute_script, session_id, script)
         logger.info(f"[WebPlayback] Scrolled by: {scroll_amount}px")
     
     def get_results(self, playback_id: str) -> Optional[dict]:
@@ -3,20 +3,105 @@ Phase 5: Web Recorder Service
 Captures web interactions and generates smart selectors
 """
 
-from typing import Dict, List, Optional
+from typing import List, Optional
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.by import By
 import uuid
 import logging
 
+from utils.bounded_store import BoundedStore
+
 logger = logging.getLogger(__name__)
 
+# Recordings kept in memory; older or idle ones are spilled to disk
+MAX_RECORDINGS_IN_MEMORY = 20
+RECORDING_IDLE_SECONDS = 30 * 60
+
+
+# Runs in the browser: builds every selector candidate, counts how many
+# elements each one matches and reads element info, returning one payload.
+ELEMENT_PAYLOAD_SCRIPT = """
+var el = arguments[0];
+
+function getXPath(element) {
+    if (element.id !== '')
+        return "//*[@id='" + element.id + "']";
+    if (element === document.body)
+        return element.tagName.toLowerCase();
+    
+    var ix = 0;
+    var siblings = element.parentNode.childNodes;
+    for (var i = 0; i < siblings.length; i++) {
+        var sibling = siblings[i];
+        if (sibling === element)
+            return getXPath(element.parentNode) + '/' + element.tagName.toLowerCase() + '[' + (ix + 1) + ']';
+        if (sibling.nodeType === 1 && sibling.tagName === element.tagName)
+            ix++;
+    }
+}
+
+function countCss(selector) {
+    try { return document.querySelectorAll(selector).length; } catch (e) { return null; }
+}
+
+function countXPath(xpath) {
+    try {
+        return document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+    } catch (e) { return null; }
+}
+
+var tag = el.tagName.toLowerCase();
+var id = el.getAttribute('id');
+var name = el.getAttribute('name');
+var cls = el.getAttribute('class');
+
+var css = tag;
+if (id) {
+    css = tag + '#' + id;
+} else if (cls && cls.trim()) {
+    css = tag + '.' + cls.trim().split(/\\s+/).join('.');
+}
+
+var xpath = null;
+try { xpath = getXPath(el); } catch (e) {}
+
+var counts = {css: countCss(css)};
+if (id) counts.id = countCss('#' + CSS.escape(id));
+if (name) counts.name = countCss('[name="' + name.replace(/"/g, '\\\\"') + '"]');
+if (xpath) counts.xpath = countXPath(xpath);
+
+var rect = el.getBoundingClientRect();
+var style = window.getComputedStyle(el);
+var visible = rect.width > 0 && rect.height > 0 &&
+    style.visibility !== 'hidden' && style.display !== 'none' && style.opacity !== '0';
+
+return {
+    candidates: {id: id, name: name, css: css, xpath: xpath},
+    counts: counts,
+    info: {
+        tag: tag,
+        text: (el.innerText || '').trim(),
+        id: id,
+        name: name,
+        'class': cls,
+        type: el.getAttribute('type'),
+        value: el.value !== undefined ? el.value : el.getAttribute('value'),
+        href: el.href !== undefined ? el.href : el.getAttribute('href'),
+        visible: visible,
+        enabled: !el.disabled,
+        selected: (tag === 'option' || tag === 'input') ? !!(el.selected || el.checked) : null
+    }
+};
+"""
+
 
 class WebRecorder:
     """Records web interactions and generates intelligent selectors"""
     
     def __init__(self):
-        self.recordings: Dict[str, List[dict]] = {}
+        self.recordings = BoundedStore(
+            "web_recordings", MAX_RECORDINGS_IN_MEMORY, ttl=RECORDING_IDLE_SECONDS, spill=True
+        )  # {recording_id: [action, ...]}
     
     def start_recording(self, session_id: str) -> str:
         """Start a new recording session"""
@@ -61,11 +146,11 @@ class WebRecorder:
             'timestamp': uuid.uuid1().time
         }
         
-        # Generate selectors if element provided
+        # Generate selectors and element info in one browser round-trip
         if element:
-            selectors = self.generate_selectors(element)
-            action['selector'] = selectors
-            action['element_info'] = self.get_element_info(element)
+            payload = self._collect_element_payload(element)
+            action['selector'] = self._build_selectors(payload)
+            action['element_info'] = payload.get('info', {})
         
         # Add value for input actions
         if value:
@@ -89,128 +174,71 @@ class WebRecorder:
         - name: Name-based selector (if available)
         - css: CSS selector
         - xpath: XPath selector
-        - best: Recommended selector (priority: ID > Name > CSS > XPath)
+        - matches: How many elements each selector matches on the page
+        - best: Recommended selector (priority: ID > Name > CSS > XPath,
+          preferring selectors that match exactly one element)
         """
-        selectors = {}
-        
-        try:
-            # ID selector (highest priority)
-            element_id = element.get_attribute('id')
-            if element_id:
-                selectors['id'] = f"#{element_id}"
-                selectors['id_locator'] = element_id
-            
-            # Name selector
-            element_name = element.get_attribute('name')
-            if element_name:
-                selectors['name'] = f"[name='{element_name}']"
-                selectors['name_locator'] = element_name
-            
-            # CSS selector (optimized)
-            css_selector = self._generate_css_selector(element)
-            if css_selector:
-                selectors['css'] = css_selector
-            
-            # XPath selector (fallback)
-            xpath_selector = self._generate_xpath_selector(element)
-            if xpath_selector:
-                selectors['xpath'] = xpath_selector
-            
-            # Determine best selector (priority: ID > Name > CSS > XPath)
-            if 'id' in selectors:
-                selectors['best'] = selectors['id']
-                selectors['best_type'] = 'css'
-            elif 'name' in selectors:
-                selectors['best'] = selectors['name']
-                selectors['best_type'] = 'css'
-            elif 'css' in selectors:
-                selectors['best'] = selectors['css']
-                selectors['best_type'] = 'css'
-            elif 'xpath' in selectors:
-                selectors['best'] = selectors['xpath']
-                selectors['best_type'] = 'xpath'
-            
-        except Exception as e:
-            logger.error(f"[WebRecorder] Selector generation failed: {str(e)}")
-        
-        return selectors
-    
-    def _generate_css_selector(self, element: WebElement) -> str:
-        """Generate optimized CSS selector"""
-        try:
-            tag = element.tag_name
-            element_id = element.get_attribute('id')
-            classes = element.get_attribute('class')
-            
-            # If ID exists, use it
-            if element_id:
-                return f"{tag}#{element_id}"
-            
-            # If classes exist, use them
-            if classes:
-                class_list = classes.strip().split()
-                if class_list:
-                    class_str = '.'.join(class_list)
-                    return f"{tag}.{class_str}"
-            
-            # Fallback to tag + nth-child
-            return tag
-        
-        except Exception as e:
-            logger.error(f"[WebRecorder] CSS selector failed: {str(e)}")
-            return None
-    
-    def _generate_xpath_selector(self, element: WebElement) -> str:
-        """Generate XPath selector"""
-        try:
-            # Use JavaScript to generate XPath
-            driver = element.parent
-            script = """
-            function getXPath(element) {
-                if (element.id !== '')
-                    return "//*[@id='" + element.id + "']";
-                if (element === document.body)
-                    return element.tagName.toLowerCase();
-                
-                var ix = 0;
-                var siblings = element.parentNode.childNodes;
-                for (var i = 0; i < siblings.length; i++) {
-                    var sibling = siblings[i];
-                    if (sibling === element)
-                        return getXPath(element.parentNode) + '/' + element.tagName.toLowerCase() + '[' + (ix + 1) + ']';
-                    if (sibling.nodeType === 1 && sibling.tagName === element.tagName)
-                        ix++;
-                }
-            }
-            return getXPath(arguments[0]);
-            """
-            xpath = driver.execute_script(script, element)
-            return xpath
-        
-        except Exception as e:
-            logger.error(f"[WebRecorder] XPath generation failed: {str(e)}")
-            return None
+        return self._build_selectors(self._collect_element_payload(element))
     
     def get_element_info(self, element: WebElement) -> dict:
         """Get detailed information about an element"""
+        return self._collect_element_payload(element).get('info', {})
+    
+    def _collect_element_payload(self, element: WebElement) -> dict:
+        """
+        Compute selector candidates, uniqueness counts and element info in
+        the browser with a single execute_script round-trip
+        """
         try:
-            return {
-                'tag': element.tag_name,
-                'text': element.text,
-                'id': element.get_attribute('id'),
-                'name': element.get_attribute('name'),
-                'class': element.get_attribute('class'),
-                'type': element.get_attribute('type'),
-                'value': element.get_attribute('value'),
-                'href': element.get_attribute('href'),
-                'visible': element.is_displayed(),
-                'enabled': element.is_enabled(),
-                'selected': element.is_selected() if element.tag_name.lower() in ['option', 'input'] else None
-            }
+            return element.parent.execute_script(ELEMENT_PAYLOAD_SCRIPT, element) or {}
         except Exception as e:
-            logger.error(f"[WebRecorder] Element info extraction failed: {str(e)}")
+            logger.error(f"[WebRecorder] Element payload extraction failed: {str(e)}")
             return {}
     
+    def _build_selectors(self, payload: dict) -> dict:
+        """Turn the in-browser payload into the recorded selector dict"""
+        selectors = {}
+        candidates = payload.get('candidates', {})
+        counts = payload.get('counts', {})
+        
+        # ID selector (highest priority)
+        if candidates.get('id'):
+            selectors['id'] = f"#{candidates['id']}"
+            selectors['id_locator'] = candidates['id']
+        
+        # Name selector
+        if candidates.get('name'):
+            selectors['name'] = f"[name='{candidates['name']}']"
+            selectors['name_locator'] = candidates['name']
+        
+        # CSS selector (optimized)
+        if candidates.get('css'):
+            selectors['css'] = candidates['css']
+        
+        # XPath selector (fallback)
+        if candidates.get('xpath'):
+            selectors['xpath'] = candidates['xpath']
+        
+        selectors['matches'] = {
+            key: counts[key] for key in ('id', 'name', 'css', 'xpath')
+            if key in selectors and key in counts
+        }
+        
+        # Determine best selector (priority: ID > Name > CSS > XPath), taking the
+        # first one that is unique on the page, or the first available otherwise
+        ranked = [
+            (key, 'xpath' if key == 'xpath' else 'css')
+            for key in ('id', 'name', 'css', 'xpath')
+            if key in selectors
+        ]
+        unique = [item for item in ranked if selectors['matches'].get(item[0]) == 1]
+        chosen = (unique or ranked or [None])[0]
+        if chosen:
+            selectors['best'] = selectors[chosen[0]]
+            selectors['best_type'] = chosen[1]
+        
+        return selectors
+    
     def get_recording(self, recording_id: str) -> List[dict]:
         """Get all actions from a recording"""
         return self.recordings.get(recording_id, [])
@@ -0,0 +1,22 @@
+"""
+Shared test setup
+
+Settings are read when config is first imported, so the environment is
+pointed at a scratch data directory (and log/trace files are turned off)
+before any test module imports backend code.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+_data_dir = Path(tempfile.mkdtemp(prefix="gravityqa-tests-"))
+os.environ["DATA_DIR"] = str(_data_dir)
+os.environ["PROJECTS_DIR"] = str(_data_dir / "projects")
+os.environ["LOG_TO_FILE"] = "false"
+os.environ["TRACE_EXPORT"] = "none"
+os.environ["TRACING_ENABLED"] = "true"
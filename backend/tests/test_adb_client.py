@@ -0,0 +1,183 @@
+"""Adb client against the fake adb server: transports, shell v2, sync and discovery"""
+
+import asyncio
+
+import pytest
+
+from benchmarks import fake_adb_server
+from benchmarks.fake_adb_server import start_fake_adb_server
+from services.mobile import adb_scheduler, device_bridge
+from services.mobile.adb_client import AdbClient, AdbError
+from services.mobile.adb_scheduler import AdbScheduler
+from services.mobile.device_bridge import DeviceBridge
+
+SERIALS = ["emulator-5554", "emulator-5556"]
+
+
+def run(scenario, serials=SERIALS):
+    """Run scenario(client, fake) against a fresh fake server on a free port"""
+    async def main():
+        server, fake = await start_fake_adb_server(0, serials)
+        client = AdbClient(port=server.sockets[0].getsockname()[1])
+        try:
+            return await scenario(client, fake)
+        finally:
+            for serial in list(client.known_serials()):
+                client.forget(serial)
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(main())
+
+
+def test_host_services():
+    async def scenario(client, fake):
+        assert await client.version() == 0x29
+        devices = await client.devices()
+        assert [device["serial"] for device in devices] == SERIALS
+        assert devices[0]["state"] == "device"
+        assert devices[1]["properties"]["transport_id"] == "2"
+        assert "shell_v2" in await client.features("emulator-5554")
+
+    run(scenario)
+
+
+def test_transport_id_is_remembered():
+    async def scenario(client, fake):
+        await client.shell("emulator-5556", "true")
+        assert client._transport_ids == {"emulator-5556": 2}
+
+        # Reconnected under a new transport id: the stale one fails and tport looks it up again
+        fake.devices["emulator-5556"].transport_id = 7
+        assert await client.shell("emulator-5556", "echo back") == (0, "back\n", "")
+        assert client._transport_ids == {"emulator-5556": 7}
+
+    run(scenario)
+
+
+def test_unknown_device():
+    async def scenario(client, fake):
+        with pytest.raises(AdbError, match="not found"):
+            await client.shell("emulator-9999", "true")
+
+    run(scenario)
+
+
+def test_shell_v2_separates_streams_and_exit_code():
+    async def scenario(client, fake):
+        assert await client.shell("emulator-5554", "getprop ro.build.version.sdk") == (0, "34\n", "")
+        assert await client.shell("emulator-5554", "false") == (1, "", "")
+
+        returncode, stdout, stderr = await client.shell("emulator-5554", "echo one; bogus; echo $?")
+        assert returncode == 127
+        assert stdout == "one\n127\n"
+        assert stderr == "/system/bin/sh: bogus: inaccessible or not found\n"
+
+    run(scenario)
+
+
+def test_legacy_shell_exit_code(monkeypatch):
+    monkeypatch.setattr(fake_adb_server, "FEATURES", "cmd")
+
+    async def scenario(client, fake):
+        assert await client.shell("emulator-5554", "echo hi") == (0, "hi\n", "")
+        returncode, stdout, _ = await client.shell("emulator-5554", "false")
+        assert returncode == 1
+        assert stdout == ""
+
+    run(scenario)
+
+
+def test_sync_push_stat_pull(tmp_path):
+    local = tmp_path / "build.apk"
+    data = bytes(range(256)) * 1000  # Several DATA packets each way
+    local.write_bytes(data)
+
+    async def scenario(client, fake):
+        assert await client.push("emulator-5554", str(local), "/data/local/tmp/build.apk") == len(data)
+        assert fake.devices["emulator-5554"].files["/data/local/tmp/build.apk"] == data
+
+        stat = await client.stat("emulator-5554", "/data/local/tmp/build.apk")
+        assert stat["size"] == len(data)
+        assert stat["mode"] & 0o170000 == 0o100000
+        assert (await client.stat("emulator-5554", "/missing"))["mode"] == 0
+
+        pulled = tmp_path / "pulled.apk"
+        assert await client.pull("emulator-5554", "/data/local/tmp/build.apk", str(pulled)) == len(data)
+        assert pulled.read_bytes() == data
+
+        # One warm sync connection served all of it
+        assert list(client._sync) == ["emulator-5554"]
+
+    run(scenario)
+
+
+def test_pull_error_status(tmp_path):
+    async def scenario(client, fake):
+        with pytest.raises(AdbError, match="No such file"):
+            await client.pull("emulator-5554", "/sdcard/missing.png", str(tmp_path / "missing.png"))
+        assert not (tmp_path / "missing.png").exists()
+        assert not (tmp_path / "missing.png.partial").exists()
+
+        # The failed connection is dropped, and the next request opens a fresh one
+        assert client._sync == {}
+        assert (await client.stat("emulator-5554", "/sdcard/missing.png"))["mode"] == 0
+
+    run(scenario)
+
+
+def test_install_streams_the_apk(tmp_path):
+    local = tmp_path / "build.apk"
+    local.write_bytes(b"PK" * 50000)
+
+    async def scenario(client, fake):
+        assert await client.install("emulator-5554", str(local)) == (True, "Success")
+        assert len(fake.devices["emulator-5554"].packages) == 4
+
+    run(scenario)
+
+
+def test_forget_drops_warm_state(tmp_path):
+    local = tmp_path / "a.txt"
+    local.write_bytes(b"a")
+
+    async def scenario(client, fake):
+        await client.push("emulator-5554", str(local), "/sdcard/a.txt")
+        assert client.known_serials() == {"emulator-5554"}
+
+        client.forget("emulator-5554")
+        assert client.known_serials() == set()
+
+    run(scenario)
+
+
+class FakeFleet:
+    def __init__(self):
+        self.unassigned = []
+
+    async def unassign(self, device_id):
+        self.unassigned.append(device_id)
+
+
+def test_discovery_forgets_unplugged_devices(monkeypatch):
+    async def scenario(client, fake):
+        monkeypatch.setattr(device_bridge, "get_adb_client", lambda: client)
+        monkeypatch.setattr(adb_scheduler, "get_adb_client", lambda: client)
+        scheduler = AdbScheduler()
+        monkeypatch.setattr(device_bridge, "get_adb_scheduler", lambda: scheduler)
+        fleet = FakeFleet()
+        monkeypatch.setattr(device_bridge, "get_appium_fleet", lambda: fleet)
+        monkeypatch.setattr(device_bridge, "_android_serials", set())
+        bridge = DeviceBridge()
+
+        devices = await bridge._get_android_devices()
+        assert [device["name"] for device in devices] == ["GravityQA Fake Pixel"] * 2
+        assert client.known_serials() == set(SERIALS)
+
+        del fake.devices["emulator-5556"]
+        assert [device["device_id"] for device in await bridge._get_android_devices()] == ["emulator-5554"]
+        assert client.known_serials() == {"emulator-5554"}
+        assert scheduler.known_devices() == {"emulator-5554"}
+        assert fleet.unassigned == ["emulator-5556"]
+
+    run(scenario)
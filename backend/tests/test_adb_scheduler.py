@@ -0,0 +1,166 @@
+"""adb scheduler: lane priority, the background cap and sharing of read-only queries"""
+
+import asyncio
+
+import pytest
+
+from services.mobile import adb_scheduler
+from services.mobile.adb_scheduler import (
+    LANE_BACKGROUND, LANE_INTERACTIVE, LANE_PLAYBACK, AdbScheduler, DeviceQueue, command_label, is_read_only,
+)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def admit(queue: DeviceQueue, lane: int, name: str, admitted: list):
+    await queue.acquire(lane)
+    admitted.append(name)
+
+
+def test_waiters_admitted_by_lane_then_arrival():
+    async def scenario():
+        queue = DeviceQueue(concurrency=1, background_concurrency=1)
+        await queue.acquire(LANE_PLAYBACK)  # Holds the only slot
+        admitted = []
+        tasks = []
+        for lane, name in [(LANE_BACKGROUND, "bg1"), (LANE_PLAYBACK, "pb1"), (LANE_INTERACTIVE, "ui1"),
+                           (LANE_BACKGROUND, "bg2"), (LANE_INTERACTIVE, "ui2")]:
+            tasks.append(asyncio.create_task(admit(queue, lane, name, admitted)))
+            await settle()
+        assert admitted == []
+
+        lanes = {"ui1": LANE_INTERACTIVE, "ui2": LANE_INTERACTIVE, "pb1": LANE_PLAYBACK,
+                 "bg1": LANE_BACKGROUND, "bg2": LANE_BACKGROUND}
+        queue.release(LANE_PLAYBACK)
+        for _ in range(5):
+            await settle()
+            queue.release(lanes[admitted[-1]])
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["ui1", "ui2", "pb1", "bg1", "bg2"]
+
+
+def test_new_request_does_not_jump_the_queue():
+    async def scenario():
+        queue = DeviceQueue(concurrency=1, background_concurrency=1)
+        await queue.acquire(LANE_INTERACTIVE)
+        admitted = []
+        waiting = asyncio.create_task(admit(queue, LANE_PLAYBACK, "queued", admitted))
+        await settle()
+        queue.release(LANE_INTERACTIVE)
+        # A slot is free, but an equal-priority waiter was there first
+        late = asyncio.create_task(admit(queue, LANE_PLAYBACK, "late", admitted))
+        await settle()
+        assert admitted == ["queued"]
+        queue.release(LANE_PLAYBACK)
+        await asyncio.gather(waiting, late)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["queued", "late"]
+
+
+def test_background_cap_leaves_slots_for_interactive():
+    async def scenario():
+        queue = DeviceQueue(concurrency=3, background_concurrency=2)
+        admitted = []
+        background = [asyncio.create_task(admit(queue, LANE_BACKGROUND, f"bg{i}", admitted)) for i in range(3)]
+        await settle()
+        assert admitted == ["bg0", "bg1"]
+        assert queue.running_background == 2
+
+        # The third slot is free for interactive work while bg2 waits on the cap
+        await admit(queue, LANE_INTERACTIVE, "ui", admitted)
+        assert admitted == ["bg0", "bg1", "ui"]
+
+        queue.release(LANE_BACKGROUND)
+        await asyncio.gather(*background)
+        assert admitted[-1] == "bg2"
+        assert queue.running == 3
+        assert queue.running_background == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        queue = DeviceQueue(concurrency=1, background_concurrency=1)
+        await queue.acquire(LANE_INTERACTIVE)
+        admitted = []
+        cancelled = asyncio.create_task(admit(queue, LANE_INTERACTIVE, "cancelled", admitted))
+        waiting = asyncio.create_task(admit(queue, LANE_PLAYBACK, "playback", admitted))
+        await settle()
+        cancelled.cancel()
+        queue.release(LANE_INTERACTIVE)
+        await waiting
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert admitted == ["playback"]
+        assert queue.running == 1
+
+    asyncio.run(scenario())
+
+
+class FakeAdbClient:
+    def __init__(self):
+        self.calls = []
+        self.release = None
+
+    async def shell(self, serial, command, timeout=None):
+        self.calls.append(command)
+        await self.release.wait()
+        return 0, "1080x2400", ""
+
+
+def test_identical_read_only_queries_are_shared(monkeypatch):
+    client = FakeAdbClient()
+    monkeypatch.setattr(adb_scheduler, "get_adb_client", lambda: client)
+
+    async def scenario():
+        client.release = asyncio.Event()
+        scheduler = AdbScheduler()
+        calls = [asyncio.create_task(scheduler.shell("emulator-5554", "wm size", lane=LANE_INTERACTIVE))
+                 for _ in range(3)]
+        await settle()
+        client.release.set()
+        results = await asyncio.gather(*calls)
+        stats = scheduler._queue("emulator-5554").stats[LANE_INTERACTIVE]
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert client.calls == ["wm size"]
+    assert results == [(0, "1080x2400", "")] * 3
+    assert stats.deduplicated == 2
+
+
+def test_forget_drops_idle_queues_only():
+    async def scenario():
+        scheduler = AdbScheduler()
+        async with scheduler.slot("emulator-5554", LANE_INTERACTIVE):
+            async with scheduler.slot("emulator-5556", LANE_INTERACTIVE):
+                pass
+            scheduler.forget("emulator-5554")  # Still running a command
+            scheduler.forget("emulator-5556")
+            assert scheduler.known_devices() == {"emulator-5554"}
+        scheduler.forget("emulator-5554")
+        assert scheduler.known_devices() == set()
+
+    asyncio.run(scenario())
+
+
+def test_read_only_detection():
+    assert is_read_only("getprop ro.build.version.sdk")
+    assert is_read_only("  dumpsys window displays")
+    assert not is_read_only("input tap 10 20")
+    assert not is_read_only("getprop; reboot")
+    assert not is_read_only("echo 1 > /sdcard/flag")
+
+
+def test_command_label():
+    assert command_label("pm install -r /data/local/tmp/app.apk") == "pm install"
+    assert command_label("input tap 10 20") == "input tap"
+    assert command_label("getprop ro.product.model") == "getprop"
+    assert command_label("") == ""
@@ -0,0 +1,119 @@
+"""Appium cassettes: recording real traffic and replaying it offline"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.fake_appium_server import build_fake, create_app
+from services.mobile import appium_cassette
+from services.mobile.appium_cassette import (
+    BLOB_MIN_SIZE, appium_client, command_name, get_status, request_key, start_recording, start_replay,
+    stop_recording, stop_replay,
+)
+
+BASE_URL = "http://127.0.0.1:4723"
+
+
+@pytest.fixture(autouse=True)
+def cassettes(tmp_path, monkeypatch):
+    monkeypatch.setattr(appium_cassette, "CASSETTE_DIR", tmp_path / "cassettes")
+    yield tmp_path / "cassettes"
+    stop_recording()
+    stop_replay()
+
+
+@pytest.fixture
+def fake_appium(monkeypatch):
+    """Recording goes to an in-process fake Appium instead of the network"""
+    fake = build_fake(devices=1, nodes=20)
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", lambda: httpx.ASGITransport(app=create_app(fake)))
+    return fake
+
+
+async def session_walkthrough():
+    """A short inspector-like session; returns what it saw"""
+    seen = []
+    async with appium_client(base_url=BASE_URL) as client:
+        response = await client.post("/session", json={"capabilities": {"alwaysMatch": {
+            "platformName": "Android", "appium:systemPort": 8201}}})
+        session_id = response.json()["value"]["sessionId"]
+        seen.append(session_id)
+
+        for _ in range(2):
+            seen.append((await client.get(f"/session/{session_id}/source")).json()["value"])
+            element = await client.post(f"/session/{session_id}/element",
+                                        json={"using": "class name", "value": "android.widget.Button"})
+            element_id = element.json()["value"]["ELEMENT"]
+            await client.post(f"/session/{session_id}/element/{element_id}/click")
+        seen.append((await client.get(f"/session/{session_id}/screenshot")).json()["value"])
+    return seen
+
+
+def test_record_then_replay(fake_appium, cassettes):
+    start_recording("walkthrough", {"device": "fake-0001"})
+    assert get_status()["mode"] == "recording"
+    recorded = asyncio.run(session_walkthrough())
+    summary = stop_recording()
+
+    assert summary["path"] == str(cassettes / "walkthrough.zip")
+    assert summary["interactions"] == 8
+    assert summary["blobs"] >= 1  # Sources and the screenshot are stored once, outside the JSON
+    assert summary["meta"]["device"] == "fake-0001"
+    # Tapping changed the screen, so the two page sources differ
+    assert recorded[1] != recorded[2]
+
+    fake_appium.sessions.clear()  # Nothing on the "network" can answer now
+    start_replay("walkthrough")
+    replayed = asyncio.run(session_walkthrough())
+    assert replayed == recorded
+    assert stop_replay() == {"served": 8, "missed": 0}
+
+
+def test_replay_misses_unrecorded_requests(fake_appium):
+    start_recording("short")
+    asyncio.run(session_walkthrough())
+    stop_recording()
+    start_replay("short")
+
+    async def scenario():
+        async with appium_client(base_url=BASE_URL) as client:
+            with pytest.raises(httpx.ConnectError, match="Not in cassette"):
+                await client.get("/session/unknown/window/rect")
+
+    asyncio.run(scenario())
+    assert stop_replay() == {"served": 0, "missed": 1}
+
+
+def test_only_one_cassette_at_a_time(fake_appium):
+    start_recording("first")
+    with pytest.raises(RuntimeError):
+        start_recording("second")
+    with pytest.raises(RuntimeError):
+        start_replay("first")
+
+
+def test_invalid_cassette_names():
+    for name in ("../etc", ".hidden", "a/b", ""):
+        with pytest.raises(ValueError):
+            start_recording(name)
+
+
+def test_request_key():
+    body = b'{"capabilities": {"appium:systemPort": 8201}}'
+    # Per-run ports in new-session capabilities don't prevent a match, nor does the server address
+    assert request_key("POST", "http://127.0.0.1:4724/session", body) == request_key(
+        "POST", "http://localhost:4999/session", b'{"capabilities": {"appium:systemPort": 8202}}')
+    assert request_key("POST", "/session/s1/element", b'{"value": "a"}') != request_key(
+        "POST", "/session/s1/element", b'{"value": "b"}')
+    assert request_key("GET", "/session/s1/source", b"") == "GET /session/s1/source -"
+    assert BLOB_MIN_SIZE > len(body)
+
+
+def test_command_name():
+    assert command_name("POST", "/session") == "POST session"
+    assert command_name("GET", "/session/abc/source") == "GET source"
+    assert command_name("POST", "/session/abc/element/0-42/click") == "POST element/:id/click"
+    assert command_name("GET", "/session/abc/element/active") == "GET element/active"
+    assert command_name("DELETE", "/session/abc") == "DELETE session/:id"
+    assert command_name("GET", "/status") == "GET status"
@@ -0,0 +1,195 @@
+"""Appium fleet: node and port allocation, releasing devices and the health/restart backoff"""
+
+import asyncio
+
+import pytest
+
+from services.mobile import appium_fleet
+from services.mobile.appium_fleet import (
+    NODE_PORT_RANGE, SYSTEM_PORT_RANGE, UNHEALTHY_AFTER, WDA_PORT_RANGE, AppiumFleet, AppiumNode,
+)
+
+
+@pytest.fixture
+def busy_ports(monkeypatch):
+    """Ports something else on the host is listening on"""
+    busy = set()
+    monkeypatch.setattr(appium_fleet, "_port_free", lambda port: port not in busy)
+    return busy
+
+
+def test_each_device_gets_its_own_node_and_ports(busy_ports):
+    busy_ports.update({NODE_PORT_RANGE[0], SYSTEM_PORT_RANGE[0]})
+    fleet = AppiumFleet()
+
+    first = fleet._assign("emulator-5554")
+    second = fleet._assign("emulator-5556")
+    assert fleet._assign("emulator-5554") is first
+
+    assert (first.port, second.port) == (NODE_PORT_RANGE[1], NODE_PORT_RANGE[2])
+    assert fleet.capabilities_for("emulator-5554") == {
+        "appium:udid": "emulator-5554",
+        "appium:systemPort": SYSTEM_PORT_RANGE[1],
+        "appium:wdaLocalPort": WDA_PORT_RANGE[0],
+    }
+    assert fleet.capabilities_for("emulator-5556")["appium:systemPort"] == SYSTEM_PORT_RANGE[2]
+    assert fleet.capabilities_for("unknown") == {}
+
+
+def test_devices_share_a_node_up_to_the_limit(busy_ports):
+    fleet = AppiumFleet(devices_per_node=2)
+    nodes = [fleet._assign(f"emulator-{5554 + 2 * i}") for i in range(3)]
+
+    assert nodes[0] is nodes[1]
+    assert nodes[2] is not nodes[0]
+    assert len({fleet.capabilities_for(f"emulator-{5554 + 2 * i}")["appium:systemPort"] for i in range(3)}) == 3
+
+
+def test_unhealthy_node_takes_no_new_devices(busy_ports):
+    fleet = AppiumFleet(devices_per_node=2)
+    node = fleet._assign("emulator-5554")
+    node.status = "unhealthy"
+    assert fleet._assign("emulator-5556") is not node
+
+
+def test_no_free_port(busy_ports):
+    busy_ports.update(SYSTEM_PORT_RANGE)
+    with pytest.raises(RuntimeError, match="No free port"):
+        AppiumFleet()._assign("emulator-5554")
+
+
+def test_unassign_frees_ports_and_stops_an_empty_node(busy_ports):
+    fleet = AppiumFleet(devices_per_node=2)
+    stopped = []
+
+    async def terminate(node):
+        stopped.append(node.port)
+
+    fleet._terminate = terminate
+
+    async def scenario():
+        node = fleet._assign("emulator-5554")
+        fleet._assign("emulator-5556")
+        fleet.register_session("session-1", node.url)
+
+        await fleet.unassign("emulator-5554")
+        assert node.devices == ["emulator-5556"]
+        assert "emulator-5554" not in node.system_ports and "emulator-5554" not in node.wda_ports
+        assert stopped == []
+
+        await fleet.unassign("emulator-5556")
+        assert stopped == [node.port]
+        assert fleet.nodes == {}
+        assert fleet.assigned_devices() == set()
+        assert fleet.get_status()["sessions"] == {}
+
+        await fleet.unassign("emulator-5556")  # Already released
+
+        # The freed ports are handed out again
+        again = fleet._assign("emulator-5558")
+        assert again.port == node.port
+        assert fleet.capabilities_for("emulator-5558")["appium:systemPort"] == SYSTEM_PORT_RANGE[0]
+
+    asyncio.run(scenario())
+
+
+class FakeProcess:
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+        self.pid = 4242
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def supervised(monkeypatch):
+    """A ready node whose probes and restarts are scripted"""
+    clock = Clock()
+    monkeypatch.setattr(appium_fleet, "time", clock)
+    fleet = AppiumFleet()
+    node = AppiumNode(NODE_PORT_RANGE[0])
+    node.process = FakeProcess()
+    node.status = "ready"
+    fleet.nodes[node.port] = node
+
+    fleet.healthy = True
+    fleet.restarted = []
+
+    async def probe(node):
+        return fleet.healthy
+
+    async def restart_node(port):
+        fleet.restarted.append(clock.now)
+        fleet.nodes[port].restarts += 1
+
+    fleet.probe = probe
+    fleet.restart_node = restart_node
+    return fleet, node, clock
+
+
+def test_hung_node_is_restarted_after_repeated_failed_probes(supervised):
+    fleet, node, clock = supervised
+    fleet.healthy = False
+
+    async def scenario():
+        for _ in range(UNHEALTHY_AFTER - 1):
+            await fleet._check(node)
+        assert node.status == "ready"
+        assert fleet.restarted == []
+
+        await fleet._check(node)
+        assert node.status == "unhealthy"
+        assert fleet.restarted == [clock.now]
+
+    asyncio.run(scenario())
+
+
+def test_exited_node_restarts_with_backoff(supervised):
+    fleet, node, clock = supervised
+    node.process = FakeProcess(returncode=1)
+
+    async def scenario():
+        await fleet._check(node)
+        assert fleet.restarted == [1000.0]
+
+        # Still down: nothing until the backoff (1s, then 2s, 4s ...) has passed
+        clock.now += 0.5
+        await fleet._check(node)
+        assert len(fleet.restarted) == 1
+        clock.now += 0.5
+        await fleet._check(node)
+        assert fleet.restarted == [1000.0, 1001.0]
+        assert node.next_restart_at == 1001.0 + 2
+
+        # Capped however many restarts came before
+        node.restarts = 20
+        clock.now = node.next_restart_at
+        await fleet._check(node)
+        assert node.next_restart_at == clock.now + appium_fleet.MAX_RESTART_BACKOFF
+
+    asyncio.run(scenario())
+
+
+def test_recovered_node_resets_failed_probes(supervised):
+    fleet, node, clock = supervised
+
+    async def scenario():
+        fleet.healthy = False
+        await fleet._check(node)
+        assert node.failed_probes == 1
+        fleet.healthy = True
+        await fleet._check(node)
+        assert (node.failed_probes, node.status) == (0, "ready")
+
+        node.status = "starting"  # Being started elsewhere: not probed
+        fleet.healthy = False
+        await fleet._check(node)
+        assert node.failed_probes == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+"""Benchmark suite: summaries, saved results and the regression compare"""
+
+import json
+
+from benchmarks import suite
+from benchmarks.suite import _summary, compare, results_path, save
+
+
+def test_summary():
+    summary = _summary([5.0, 1.0, 3.0, 2.0, 4.0])
+    assert (summary["median"], summary["min"], summary["mean"], summary["n"]) == (3.0, 1.0, 3.0, 5)
+    assert summary["p95"] == 5.0
+
+
+def test_compare_reports_slowdowns_over_the_threshold(capsys):
+    baseline = {
+        "slower": {"median": 1.0},
+        "within": {"median": 1.0},
+        "faster": {"median": 2.0},
+        "zero": {"median": 0.0},
+    }
+    results = {
+        "slower": {"median": 1.2},
+        "within": {"median": 1.05},
+        "faster": {"median": 1.0},
+        "zero": {"median": 0.5},
+        "added": {"median": 3.0},
+    }
+
+    assert compare(baseline, results, 0.10) == ["slower"]
+    assert compare(baseline, results, 0.25) == []
+    assert compare(baseline, results, 0.0) == ["slower", "within"]
+
+    lines = capsys.readouterr().out.splitlines()
+    assert any(line.startswith("added") and line.endswith("new") for line in lines)
+    assert any(line.startswith("slower") and "+20.0%" in line and "⚠️" in line for line in lines)
+
+
+def test_saved_results_are_found_by_commit_or_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(suite, "RESULTS_DIR", tmp_path)
+    monkeypatch.setattr(suite, "_git", lambda *args: None)
+
+    path = save({"case": {"unit": "ms", "median": 1.0}}, "abc1234")
+    assert path == tmp_path / "abc1234.json"
+    assert json.loads(path.read_text())["meta"]["commit"] == "abc1234"
+    assert not list(tmp_path.glob("*.tmp"))
+
+    assert results_path("abc1234") == path
+    assert results_path(str(path)) == path
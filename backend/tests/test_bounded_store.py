@@ -0,0 +1,163 @@
+"""BoundedStore / SpillList: eviction, spill to disk, reload and idle expiry"""
+
+import threading
+import time
+
+import pytest
+
+from utils.bounded_store import STORE_DIR, BoundedStore, SpillList, get_store_stats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+def test_lru_eviction_calls_on_evict():
+    evicted = []
+    store = BoundedStore("test_lru", 2, on_evict=lambda key, value: evicted.append((key, value)))
+    store["a"] = 1
+    store["b"] = 2
+    store["a"]  # a is now the most recently used
+    store["c"] = 3
+
+    assert evicted == [("b", 2)]
+    assert sorted(store) == ["a", "c"]
+    assert store.stats["evicted"] == 1
+
+
+def test_delete_does_not_call_on_evict():
+    evicted = []
+    store = BoundedStore("test_delete", 2, on_evict=lambda key, value: evicted.append(key))
+    store["a"] = 1
+    del store["a"]
+
+    assert "a" not in store
+    assert evicted == []
+    with pytest.raises(KeyError):
+        del store["a"]
+
+
+def test_spill_and_reload():
+    store = BoundedStore("test_spill", 2, spill=True)
+    store["a"] = {"steps": [1, 2, 3]}
+    store["b"] = {"steps": []}
+    store["c"] = {"steps": [4]}
+
+    assert len(store) == 3
+    assert store.stats["spilled"] == 1
+    assert len(list((STORE_DIR / "test_spill").glob("*.json"))) == 1
+
+    # Reading a spilled entry moves it back into memory and spills the oldest one in its place
+    assert store["a"] == {"steps": [1, 2, 3]}
+    assert store.stats["reloaded"] == 1
+    assert store.stats["spilled"] == 2
+    assert store["b"] == {"steps": []}
+    assert store["c"] == {"steps": [4]}
+    assert len(store) == 3
+
+
+def test_overwriting_spilled_entry_removes_its_file():
+    store = BoundedStore("test_overwrite", 1, spill=True)
+    store["a"] = 1
+    store["b"] = 2
+    store["a"] = 10
+
+    assert store["a"] == 10
+    assert store.get_stats()["spilled_entries"] == 1  # Only b, spilled by the new a
+
+
+def test_max_spilled_drops_oldest():
+    store = BoundedStore("test_max_spilled", 1, spill=True, max_spilled=2)
+    for key in "abcd":
+        store[key] = key
+
+    assert store.stats["dropped"] == 1
+    assert "a" not in store
+    assert [store[key] for key in "bcd"] == ["b", "c", "d"]
+
+
+def test_unserializable_value_goes_to_on_evict():
+    evicted = []
+    store = BoundedStore("test_unserializable", 1, spill=True, on_evict=lambda key, value: evicted.append(key))
+    store["lock"] = threading.Lock()
+    store["b"] = 2
+
+    assert evicted == ["lock"]
+    assert "lock" not in store
+    assert store.stats["spill_errors"] == 1
+
+
+def test_ttl_expires_idle_entries(clock):
+    evicted = []
+    store = BoundedStore("test_ttl", 10, ttl=60, on_evict=lambda key, value: evicted.append(key))
+    store["idle"] = 1
+    store["busy"] = 2
+    clock.now += 40
+    store["busy"]  # Touching an entry restarts its idle time
+    clock.now += 30
+
+    assert store.expire() == 1
+    assert evicted == ["idle"]
+    assert "busy" in store
+    assert store.expire() == 0  # Counts this call's evictions, not the running total
+    clock.now += 61
+    assert store.get("busy") is None  # Expired on access too, not only by expire()
+    assert evicted == ["idle", "busy"]
+
+
+def test_ttl_expired_entries_spill(clock):
+    store = BoundedStore("test_ttl_spill", 10, ttl=60, spill=True)
+    store["a"] = [1]
+    clock.now += 61
+
+    assert store.expire() == 1  # Spilled rather than handed to on_evict, but still expired
+    assert store.stats["expired"] == 1
+    assert store.get_stats()["entries"] == 0
+    assert store["a"] == [1]
+
+
+def test_on_evict_errors_are_contained():
+    def fail(key, value):
+        raise RuntimeError("driver already gone")
+
+    store = BoundedStore("test_on_evict_error", 1, on_evict=fail)
+    store["a"] = 1
+    store["b"] = 2
+
+    assert list(store) == ["b"]
+
+
+def test_spill_list_keeps_order():
+    items = SpillList("test_spill_list", 4)
+    for i in range(11):
+        items.append({"i": i})
+
+    assert len(items) == 11
+    assert items.get_stats()["entries"] <= 4
+    assert items.get_stats()["spilled_entries"] > 0
+    assert [item["i"] for item in items] == list(range(11))
+
+    items.clear()
+    assert len(items) == 0
+    assert not items
+    assert items.to_list() == []
+
+
+def test_store_stats_lists_live_stores():
+    store = BoundedStore("test_stats", 2)
+    store["a"] = "x" * 1000
+
+    stats = {entry["name"]: entry for entry in get_store_stats()["stores"]}
+    assert stats["test_stats"]["entries"] == 1
+    assert stats["test_stats"]["memory_bytes"] >= 1000
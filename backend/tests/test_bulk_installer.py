@@ -0,0 +1,145 @@
+"""Bulk installer: reading dumpsys, the install/skip decision and downgrades"""
+
+import asyncio
+
+import pytest
+
+from services.mobile import bulk_installer
+from services.mobile.bulk_installer import BulkInstaller, TransferLimiter, adb_host, parse_package_state
+
+SIGNER = "a1b2c3d4"
+OTHER_SIGNER = "deadbeef"
+
+DUMPSYS_PIE = f"""Packages:
+  Package [com.example.shop] (4f1c2a0):
+    userId=10213
+    versionCode=241 minSdk=24 targetSdk=34
+    versionName=2.4.1
+    signatures=PackageSignatures{{9fe5a2b version:2, signatures:[{SIGNER}], past signatures:[]}}
+"""
+
+DUMPSYS_LEGACY = f"""Packages:
+  Package [com.example.shop] (4f1c2a0):
+    versionCode=12 targetSdk=23
+    signatures=PackageSignatures{{9fe5a2b [{SIGNER}, {OTHER_SIGNER}]}}
+"""
+
+
+def test_parse_package_state():
+    assert parse_package_state(DUMPSYS_PIE) == {"installed": True, "version_code": 241, "signatures": [SIGNER]}
+    assert parse_package_state(DUMPSYS_LEGACY) == {
+        "installed": True, "version_code": 12, "signatures": [SIGNER, OTHER_SIGNER]}
+    assert parse_package_state("Unable to find package: com.example.shop") == {
+        "installed": False, "version_code": None, "signatures": []}
+    assert parse_package_state("versionCode=5")["signatures"] == []
+
+
+def installed(version_code, signatures=(SIGNER,)):
+    return {"installed": True, "version_code": version_code, "signatures": list(signatures)}
+
+
+NOT_INSTALLED = {"installed": False, "version_code": None, "signatures": []}
+
+
+@pytest.mark.parametrize("state, build, force, decision", [
+    (NOT_INSTALLED, {"version_code": "241", "signature_hash": SIGNER}, False, "install"),
+    (installed(241), {"version_code": "241", "signature_hash": SIGNER}, False, "skip"),
+    (installed(300), {"version_code": "241", "signature_hash": SIGNER}, False, "skip"),
+    (installed(240), {"version_code": "241", "signature_hash": SIGNER}, False, "install"),
+    (installed(241), {"version_code": "241", "signature_hash": SIGNER}, True, "install"),
+    (installed(300), {"version_code": "241", "signature_hash": SIGNER}, True, "install"),
+    (installed(241, [OTHER_SIGNER]), {"version_code": "241", "signature_hash": SIGNER}, False, "signature_mismatch"),
+    (installed(241, [OTHER_SIGNER]), {"version_code": "241", "signature_hash": SIGNER}, True, "signature_mismatch"),
+    # Unknown on either side: the signer can't be compared, only versions
+    (installed(241, []), {"version_code": "241", "signature_hash": SIGNER}, False, "skip"),
+    (installed(241), {"version_code": "241", "signature_hash": None}, False, "skip"),
+    (installed(None), {"version_code": "241", "signature_hash": SIGNER}, False, "install"),
+    (installed(241), {"version_code": None, "signature_hash": SIGNER}, False, "install"),
+])
+def test_decide(state, build, force, decision):
+    assert BulkInstaller().decide(state, build, force) == decision
+
+
+class FakeScheduler:
+    def __init__(self, dumpsys):
+        self.dumpsys = dumpsys
+        self.shells = []
+        self.installs = []
+
+    async def shell(self, device_id, command, lane=None, timeout=None):
+        self.shells.append(command)
+        return 0, self.dumpsys if command.startswith("dumpsys") else "Success", ""
+
+    async def install(self, device_id, apk_path, lane=None, timeout=None, allow_downgrade=False):
+        self.installs.append({"device_id": device_id, "allow_downgrade": allow_downgrade})
+        return True, "Success"
+
+
+class FakeInventory:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, device_id):
+        self.invalidated.append(device_id)
+
+
+def run_install(monkeypatch, dumpsys, version_code, force):
+    scheduler = FakeScheduler(dumpsys)
+    inventory = FakeInventory()
+    monkeypatch.setattr(bulk_installer, "get_adb_scheduler", lambda: scheduler)
+    monkeypatch.setattr(bulk_installer, "get_package_inventory", lambda: inventory)
+
+    build = {"package_name": "com.example.shop", "version_code": version_code, "signature_hash": SIGNER}
+    report = asyncio.run(BulkInstaller().install("/builds/shop.apk", 1024, build, ["emulator-5554"], force=force))
+    return report, scheduler, inventory
+
+
+def test_forced_older_build_is_installed_as_downgrade(monkeypatch):
+    report, scheduler, inventory = run_install(monkeypatch, DUMPSYS_PIE, "200", force=True)
+
+    assert report["installed"] == 1
+    assert scheduler.installs == [{"device_id": "emulator-5554", "allow_downgrade": True}]
+    assert inventory.invalidated == ["emulator-5554"]
+
+
+def test_newer_build_is_installed_without_downgrade(monkeypatch):
+    report, scheduler, _ = run_install(monkeypatch, DUMPSYS_PIE, "300", force=False)
+
+    assert report["installed"] == 1
+    assert scheduler.installs == [{"device_id": "emulator-5554", "allow_downgrade": False}]
+
+
+def test_up_to_date_device_is_skipped(monkeypatch):
+    report, scheduler, _ = run_install(monkeypatch, DUMPSYS_PIE, "241", force=False)
+
+    assert report["skipped"] == 1
+    assert scheduler.installs == []
+
+
+def test_forced_different_signer_is_uninstalled_first(monkeypatch):
+    report, scheduler, _ = run_install(monkeypatch, DUMPSYS_PIE.replace(SIGNER, OTHER_SIGNER), "241", force=True)
+
+    assert report["installed"] == 1
+    assert scheduler.shells[-1] == "pm uninstall com.example.shop"
+
+
+def test_transfer_limiter_budget():
+    async def scenario():
+        limiter = TransferLimiter(100)
+        first = await limiter.acquire(60)
+        waiting = asyncio.ensure_future(limiter.acquire(60))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        await limiter.release(first)
+        assert await waiting == 60
+        # Larger than the whole budget: runs alone instead of waiting forever
+        await limiter.release(60)
+        assert await limiter.acquire(500) == 100
+
+    asyncio.run(scenario())
+
+
+def test_adb_host():
+    assert adb_host("192.168.1.20:5555") == "192.168.1.20"
+    assert adb_host("emulator-5554") == "usb"
@@ -0,0 +1,134 @@
+"""Fake Appium server: latency and failure specs, sessions, element lookups and navigation"""
+
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from benchmarks.fake_appium_server import W3C_ELEMENT_KEY, FailurePlan, LatencyModel, build_fake, create_app
+
+
+def test_latency_models():
+    assert LatencyModel("fixed:20").sample() == 20
+    assert LatencyModel().sample() == 0
+    samples = [LatencyModel("uniform:10,60", random.Random(1)).sample() for _ in range(50)]
+    assert all(10 <= sample <= 60 for sample in samples)
+    assert LatencyModel("normal:-100,1").sample() == 0  # Never negative
+    with pytest.raises(ValueError, match="Unknown latency distribution"):
+        LatencyModel("pareto:1")
+
+
+def test_failure_plan():
+    plan = FailurePlan.parse(["source:error=1", "*:session_lost=0"])
+    assert plan.rates == {"source": {"error": 1.0}, "*": {"session_lost": 0.0}}
+    assert plan.pick("source") == "error"
+    assert plan.pick("screenshot") is None
+    assert plan.injected == {"error": 1, "timeout": 0, "session_lost": 0}
+    with pytest.raises(ValueError, match="Unknown failure kind"):
+        FailurePlan.parse(["source:explode=0.1"])
+
+
+def run(fake, scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=create_app(fake))
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake-appium") as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+async def new_session(client, udid=None):
+    capabilities = {"platformName": "Android", **({"appium:udid": udid} if udid else {})}
+    response = await client.post("/session", json={"capabilities": {"alwaysMatch": capabilities}})
+    assert response.status_code == 200
+    return response.json()["value"]["sessionId"]
+
+
+def test_sessions_per_device():
+    fake = build_fake(devices=2)
+
+    async def scenario(client):
+        first = await new_session(client, "fake-0002")
+        second = await new_session(client)  # Next device without a session
+        listed = (await client.get("/appium/sessions")).json()["value"]
+        assert {session["capabilities"]["udid"] for session in listed} == {"fake-0001", "fake-0002"}
+
+        # A new session on a device ends the old one
+        third = await new_session(client, "fake-0002")
+        assert (await client.get(f"/session/{first}/source")).status_code == 404
+        assert (await client.get(f"/session/{third}/source")).status_code == 200
+
+        assert (await client.delete(f"/session/{second}")).status_code == 200
+        response = await client.post("/session", json={"capabilities": {"alwaysMatch": {}}})
+        assert response.status_code == 200
+        response = await client.post("/session", json={"capabilities": {"alwaysMatch": {}}})
+        assert response.json()["value"]["error"] == "session not created"
+
+    run(fake, scenario)
+
+
+def test_find_click_and_stale_elements():
+    fake = build_fake(devices=1, nodes=20)
+
+    async def scenario(client):
+        session_id = await new_session(client)
+        device = fake.sessions[session_id]
+        clickable = next(node for node in device.root().iter() if node.get("clickable") == "true")
+        resource_id = clickable.get("resource-id")
+
+        for using, value in [("id", resource_id), ("xpath", f"//*[@resource-id='{resource_id}']"),
+                             ("-android uiautomator", f'new UiSelector().resourceId("{resource_id}")')]:
+            response = await client.post(f"/session/{session_id}/element", json={"using": using, "value": value})
+            assert response.status_code == 200, using
+        element_id = response.json()["value"][W3C_ELEMENT_KEY]
+
+        missing = await client.post(f"/session/{session_id}/element", json={"using": "id", "value": "nope"})
+        assert missing.json()["value"]["error"] == "no such element"
+
+        source = (await client.get(f"/session/{session_id}/source")).json()["value"]
+        assert (await client.post(f"/session/{session_id}/element/{element_id}/click")).status_code == 200
+        assert device.screen == 1
+        assert (await client.get(f"/session/{session_id}/source")).json()["value"] != source
+
+        stale = await client.get(f"/session/{session_id}/element/{element_id}/rect")
+        assert stale.json()["value"]["error"] == "stale element reference"
+
+    run(fake, scenario)
+
+
+def test_app_extensions():
+    fake = build_fake(devices=1)
+
+    async def scenario(client):
+        session_id = await new_session(client)
+
+        async def execute(script, **args):
+            return await client.post(f"/session/{session_id}/execute/sync", json={"script": script, "args": [args]})
+
+        await execute("mobile: terminateApp", appId="com.example.app")
+        package = await client.get(f"/session/{session_id}/appium/device/current_package")
+        assert package.json()["value"] == "com.android.launcher3"
+
+        await execute("mobile: activateApp", appId="com.example.shop")
+        package = await client.get(f"/session/{session_id}/appium/device/current_package")
+        assert package.json()["value"] == "com.example.shop"
+        assert (await execute("mobile: reboot")).status_code == 404
+
+    run(fake, scenario)
+
+
+def test_injected_failures():
+    fake = build_fake(devices=1, fail_specs=["source:error=1", "screenshot:session_lost=1"])
+
+    async def scenario(client):
+        session_id = await new_session(client)
+        assert (await client.get(f"/session/{session_id}/source")).status_code == 500
+        assert (await client.get(f"/session/{session_id}/screenshot")).status_code == 404
+        # The session is really gone afterwards
+        assert (await client.get(f"/session/{session_id}/window/rect")).status_code == 404
+        assert (await client.get("/status")).status_code == 200
+        return (await client.get("/fake/stats")).json()
+
+    stats = run(fake, scenario)
+    assert stats["injected_failures"] == {"error": 1, "timeout": 0, "session_lost": 1}
@@ -0,0 +1,65 @@
+"""Hierarchy cache: entries never outlive an action on their screen"""
+
+import time
+
+from services.mobile.selector_compiler import HierarchyCache
+
+SOURCE = '<hierarchy><node resource-id="com.app:id/login" text="Log in"/></hierarchy>'
+
+
+def test_fresh_entry_is_served():
+    cache = HierarchyCache(ttl=5)
+    root = cache.put("session-1", SOURCE)
+
+    assert root is not None
+    assert cache.get_source("session-1") == SOURCE
+    assert cache.get_root("session-1") is root
+
+
+def test_entry_expires_after_ttl():
+    cache = HierarchyCache(ttl=5)
+    cache.put("session-1", SOURCE, fetched_at=time.time() - 6)
+
+    assert cache.get_source("session-1") is None
+    assert cache.get_source("session-1", max_age=10) == SOURCE
+
+
+def test_action_invalidates_entry():
+    cache = HierarchyCache(ttl=5)
+    cache.put("session-1", SOURCE)
+    cache.put("session-2", SOURCE)
+    cache.invalidate("session-1")
+
+    assert cache.get_source("session-1") is None
+    assert cache.get_source("session-2") == SOURCE
+
+
+def test_fetch_started_before_an_action_is_not_cached():
+    cache = HierarchyCache(ttl=5)
+    fetched_at = time.time()
+    time.sleep(0.01)
+    cache.invalidate("session-1")  # A tap landed while the page source was in flight
+
+    assert cache.put("session-1", SOURCE, fetched_at=fetched_at) is not None
+    assert cache.get_source("session-1") is None
+    cache.put("session-1", SOURCE)
+    assert cache.get_source("session-1") == SOURCE
+
+
+def test_invalidate_all_and_forget():
+    cache = HierarchyCache(ttl=5)
+    cache.put("session-1", SOURCE)
+    cache.put("session-2", SOURCE)
+    cache.invalidate()
+
+    assert cache.get_source("session-1") is None
+    assert cache.get_source("session-2") is None
+    cache.put("session-1", SOURCE)
+    cache.forget("session-1")
+    assert cache.get_source("session-1") is None
+
+
+def test_unparseable_source_is_not_cached():
+    cache = HierarchyCache(ttl=5)
+    assert cache.put("session-1", "<hierarchy>") is None
+    assert cache.get_source("session-1") is None
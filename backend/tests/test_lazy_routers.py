@@ -0,0 +1,81 @@
+"""Lazy routers: imported once, on the first request under their prefix or for the schema"""
+
+import asyncio
+import sys
+
+import pytest
+
+from utils.lazy_routers import LazyRouters
+
+
+class FakeApp:
+    def __init__(self):
+        self.included = []
+        self.openapi_schema = {"stale": True}
+
+    def include_router(self, router, **kwargs):
+        self.included.append((router, kwargs))
+
+
+@pytest.fixture
+def api_modules(tmp_path, monkeypatch):
+    for name in ("lazy_devices", "lazy_web"):
+        (tmp_path / f"{name}.py").write_text(f"router = {name!r}\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ("lazy_devices", "lazy_web"):
+        sys.modules.pop(name, None)
+
+
+def make_routers(app):
+    routers = LazyRouters(app)
+    routers.add("/api/devices", "lazy_devices", prefix="/api/devices", tags=["devices"])
+    routers.add("/api/web/", "lazy_web", prefix="/api/web")
+    return routers
+
+
+def test_loads_only_the_matching_router(api_modules):
+    app = FakeApp()
+    routers = make_routers(app)
+    asyncio.run(routers.ensure_loaded("/api/devices/emulator-5554/screenshot"))
+
+    assert app.included == [("lazy_devices", {"prefix": "/api/devices", "tags": ["devices"]})]
+    assert app.openapi_schema is None
+    assert routers.pending
+    assert [router["loaded"] for router in routers.get_stats()] == [True, False]
+
+
+def test_prefix_must_match_a_whole_segment(api_modules):
+    app = FakeApp()
+    asyncio.run(make_routers(app).ensure_loaded("/api/devices-legacy"))
+    assert app.included == []
+
+
+def test_concurrent_requests_include_once(api_modules):
+    app = FakeApp()
+    routers = make_routers(app)
+
+    async def scenario():
+        await asyncio.gather(*(routers.ensure_loaded("/api/web/run") for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert app.included == [("lazy_web", {"prefix": "/api/web"})]
+
+
+def test_schema_loads_everything(api_modules):
+    app = FakeApp()
+    routers = make_routers(app)
+    asyncio.run(routers.ensure_loaded("/openapi.json"))
+
+    assert [router for router, _ in app.included] == ["lazy_devices", "lazy_web"]
+    assert not routers.pending
+
+
+def test_load_all(api_modules):
+    app = FakeApp()
+    routers = make_routers(app)
+    routers.load_all()
+    routers.load_all()
+
+    assert len(app.included) == 2
+    assert not routers.pending
@@ -0,0 +1,62 @@
+"""Log pipeline: per-call-site rate limiting of chatty events"""
+
+import logging
+
+import pytest
+
+from services.diagnostics import logs
+from services.diagnostics.logs import EventRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logs.time, "monotonic", lambda: now[0])
+    return now
+
+
+def record(level=logging.INFO, lineno=10, msg="[Touch] 👆 Tap at %s,%s"):
+    return logging.LogRecord("gravityqa.touch", level, "/backend/services/touch.py", lineno, msg, (1, 2), None)
+
+
+def test_burst_is_suppressed_and_counted(clock):
+    limiter = EventRateLimiter(rate=5)
+
+    passed = [limiter.filter(record()) for _ in range(12)]
+    assert passed == [True] * 5 + [False] * 7
+    assert limiter.suppressed == 7
+
+    # Once tokens refill, the next record from the site says how many were dropped
+    clock[0] += 1
+    resumed = record()
+    assert limiter.filter(resumed)
+    assert resumed.suppressed == 7
+    assert resumed.getMessage() == "[Touch] 👆 Tap at 1,2 (+7 similar suppressed)"
+
+    following = record()
+    assert limiter.filter(following)
+    assert not hasattr(following, "suppressed")
+
+
+def test_call_sites_have_separate_budgets(clock):
+    limiter = EventRateLimiter(rate=2)
+
+    assert [limiter.filter(record(lineno=10)) for _ in range(3)] == [True, True, False]
+    assert [limiter.filter(record(lineno=20)) for _ in range(3)] == [True, True, False]
+    assert limiter.suppressed == 2
+
+
+def test_warnings_always_pass(clock):
+    limiter = EventRateLimiter(rate=1)
+
+    assert limiter.filter(record())
+    assert not limiter.filter(record())
+    for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+        assert all(limiter.filter(record(level)) for _ in range(50))
+    assert limiter.suppressed == 1
+
+
+def test_zero_rate_disables_limiting(clock):
+    limiter = EventRateLimiter(rate=0)
+    assert all(limiter.filter(record()) for _ in range(100))
+    assert limiter.suppressed == 0
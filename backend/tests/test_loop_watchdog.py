@@ -0,0 +1,72 @@
+"""Loop watchdog: lag measurement and attributing stalls to the blocking call site"""
+
+import asyncio
+import inspect
+import threading
+import time
+import traceback
+
+from services.diagnostics.loop_watchdog import LoopWatchdog
+
+STALL = 0.3
+
+
+def block_with_sleep():
+    time.sleep(STALL)  # The blocking call the watchdog should point at
+
+
+def block_in_the_stdlib():
+    threading.Event().wait(STALL)
+
+
+def watch(block):
+    watchdog = LoopWatchdog(threshold_ms=50)
+
+    async def scenario():
+        watchdog.start()
+        await asyncio.sleep(0.15)  # A few healthy heartbeats first
+        block()
+        await asyncio.sleep(0.15)  # Let the heartbeat resume and the stall be recorded
+        watchdog.stop()
+
+    asyncio.run(scenario())
+    return watchdog.get_stats()
+
+
+def line_of(fn, text):
+    lines, start = inspect.getsourcelines(fn)
+    return start + next(index for index, line in enumerate(lines) if text in line)
+
+
+def test_sleep_on_the_loop_is_caught_at_its_line():
+    stats = watch(block_with_sleep)
+
+    assert stats["stalls"] == 1
+    assert stats["stall_time_ms"] >= STALL * 1000 * 0.8
+    assert stats["lag_ms"]["max"] >= STALL * 1000 * 0.8
+    site = stats["sites"][0]
+    # time.sleep has no Python frame, so the innermost backend frame is the call site itself
+    assert site["site"] == f"tests/test_loop_watchdog.py:{line_of(block_with_sleep, 'time.sleep')} in block_with_sleep"
+    assert site["count"] == 1
+    assert stats["recent"][0]["site"] == site["site"]
+
+
+def test_stall_inside_the_stdlib_names_both_frames():
+    stats = watch(block_in_the_stdlib)
+
+    ours, _, blocked_in = stats["sites"][0]["site"].partition(" → ")
+    assert ours == f"tests/test_loop_watchdog.py:{line_of(block_in_the_stdlib, 'Event()')} in block_in_the_stdlib"
+    assert blocked_in.startswith("threading.py:")
+
+
+def test_no_stalls_on_a_healthy_loop():
+    stats = watch(lambda: None)
+
+    assert stats["stalls"] == 0
+    assert stats["sites"] == []
+    assert stats["lag_ms"]["samples"] > 0
+
+
+def test_call_site_without_backend_frames():
+    stack = traceback.StackSummary.from_list([("/usr/lib/python3/asyncio/base_events.py", 10, "run_once", None)])
+    assert LoopWatchdog.call_site(stack) == "base_events.py:10 in run_once"
@@ -0,0 +1,220 @@
+"""Manifest parser: binary XML, resources.arsc, the APK signing block and corrupt input"""
+
+import io
+import plistlib
+import struct
+import zipfile
+
+import pytest
+
+from services.apk.manifest_parser import (
+    APK_SIG_BLOCK_MAGIC, ManifestParseError, apk_signature_hash, java_signature_hash, parse_apk, parse_axml,
+    parse_ipa, resolve_resource_string,
+)
+
+LABEL_ID = 0x7F010000
+CERTIFICATE = bytes(range(200)) + b"\xff\x80\x7f"
+
+# ---- synthetic archives ----
+
+ATTRIBUTE_IDS = [0x0101021B, 0x0101021C, 0x01010001, 0x01010003]  # versionCode, versionName, label, name
+STRINGS = ["versionCode", "versionName", "label", "name", "package", "manifest", "application", "activity",
+           "intent-filter", "action", "category", "com.example.shop", "2.4.1", ".MainActivity",
+           "android.intent.action.MAIN", "android.intent.category.LAUNCHER", "uses-sdk"]
+S = {value: index for index, value in enumerate(STRINGS)}
+NO_ENTRY = 0xFFFFFFFF
+
+
+def chunk(chunk_type, header, body=b""):
+    header_size = 8 + len(header)
+    return struct.pack("<HHI", chunk_type, header_size, header_size + len(body)) + header + body
+
+
+def string_pool(strings):
+    data = b""
+    offsets = []
+    for string in strings:
+        offsets.append(len(data))
+        data += struct.pack("<H", len(string)) + string.encode("utf-16-le") + b"\x00\x00"
+    data += b"\x00" * (-len(data) % 4)
+    header = struct.pack("<IIIII", len(strings), 0, 0, 28 + 4 * len(strings), 0)
+    return chunk(0x0001, header, struct.pack(f"<{len(strings)}I", *offsets) + data)
+
+
+def attribute(name, data_type, data, raw=NO_ENTRY):
+    return struct.pack("<IIIHBBI", NO_ENTRY, S[name], raw, 8, 0, data_type, data)
+
+
+def string_attribute(name, value):
+    return attribute(name, 0x03, S[value], raw=S[value])
+
+
+def start(tag, *attributes):
+    ext = struct.pack("<IIHHHHHH", NO_ENTRY, S[tag], 20, 20, len(attributes), 0, 0, 0)
+    return chunk(0x0102, struct.pack("<II", 1, NO_ENTRY), ext + b"".join(attributes))
+
+
+def end(tag):
+    return chunk(0x0103, struct.pack("<II", 1, NO_ENTRY), struct.pack("<II", NO_ENTRY, S[tag]))
+
+
+def build_axml(strings=STRINGS):
+    body = (
+        string_pool(strings)
+        + chunk(0x0180, b"", struct.pack(f"<{len(ATTRIBUTE_IDS)}I", *ATTRIBUTE_IDS))
+        + start("manifest", string_attribute("package", "com.example.shop"), attribute("versionCode", 0x10, 241),
+                string_attribute("versionName", "2.4.1"))
+        + start("uses-sdk") + end("uses-sdk")
+        + start("application", attribute("label", 0x01, LABEL_ID))
+        + start("activity", string_attribute("name", ".MainActivity"))
+        + start("intent-filter")
+        + start("action", string_attribute("name", "android.intent.action.MAIN")) + end("action")
+        + start("category", string_attribute("name", "android.intent.category.LAUNCHER")) + end("category")
+        + end("intent-filter") + end("activity") + end("application") + end("manifest")
+    )
+    return chunk(0x0003, b"", body)
+
+
+def type_chunk(language, value_index):
+    config = struct.pack("<I", 64) + b"\x00" * 4 + language.ljust(4, b"\x00") + b"\x00" * 52
+    header = struct.pack("<BBHII", 1, 0, 0, 1, 20 + len(config) + 4) + config
+    entry = struct.pack("<HHI", 8, 0, 0) + struct.pack("<HBBI", 8, 0, 0x03, value_index)
+    return chunk(0x0201, header, struct.pack("<I", 0) + entry)
+
+
+def build_arsc():
+    package_header = struct.pack("<I", 0x7F) + "com.example.shop".encode("utf-16-le").ljust(256, b"\x00")
+    package_header += struct.pack("<IIIII", 0, 0, 0, 0, 0)
+    # The French label comes first, so only the default-config preference picks "Shop"
+    package = chunk(0x0200, package_header, type_chunk(b"fr", 1) + type_chunk(b"", 0))
+    return chunk(0x0002, struct.pack("<I", 1), string_pool(["Shop", "Boutique"]) + package)
+
+
+def v2_signer(certificate):
+    def sequence(*items):
+        data = b"".join(struct.pack("<I", len(item)) + item for item in items)
+        return data
+
+    digests = sequence(struct.pack("<I", 0x0103) + sequence(b"\x00" * 32))
+    signed_data = struct.pack("<I", len(digests)) + digests + struct.pack("<I", len(certificate) + 4) \
+        + struct.pack("<I", len(certificate)) + certificate
+    signer = struct.pack("<I", len(signed_data)) + signed_data
+    return struct.pack("<I", len(signer) + 4) + struct.pack("<I", len(signer)) + signer
+
+
+def add_signing_block(apk, value, scheme_id=0x7109871A):
+    eocd = apk.rfind(b"PK\x05\x06")
+    cd_offset = struct.unpack_from("<I", apk, eocd + 16)[0]
+    pair = struct.pack("<QI", len(value) + 4, scheme_id) + value
+    size = len(pair) + 8 + 16
+    block = struct.pack("<Q", size) + pair + struct.pack("<Q", size) + APK_SIG_BLOCK_MAGIC
+    apk = apk[:cd_offset] + block + apk[cd_offset:]
+    eocd += len(block)
+    return apk[:eocd + 16] + struct.pack("<I", cd_offset + len(block)) + apk[eocd + 20:]
+
+
+def build_apk(path, manifest=None, arsc=None, certificate=CERTIFICATE):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("AndroidManifest.xml", build_axml() if manifest is None else manifest)
+        archive.writestr("resources.arsc", build_arsc() if arsc is None else arsc)
+        archive.writestr("classes.dex", b"dex\n035\x00")
+    data = buffer.getvalue()
+    if certificate is not None:
+        data = add_signing_block(data, v2_signer(certificate))
+    path.write_bytes(data)
+    return str(path)
+
+
+# ---- tests ----
+
+def test_parse_axml_elements():
+    elements = parse_axml(build_axml())
+
+    assert [(depth, tag) for depth, tag, _ in elements][:4] == [
+        (0, "manifest"), (1, "uses-sdk"), (1, "application"), (2, "activity")]
+    assert elements[0][2] == {"package": "com.example.shop", "versionCode": 241, "versionName": "2.4.1"}
+    assert elements[2][2] == {"label": f"@0x{LABEL_ID:08x}"}
+
+
+def test_resolve_label_prefers_default_config():
+    assert resolve_resource_string(build_arsc(), LABEL_ID) == "Shop"
+    assert resolve_resource_string(build_arsc(), LABEL_ID + 1) is None
+    assert resolve_resource_string(build_arsc(), 0x7F020000) is None
+
+
+def test_parse_apk(tmp_path):
+    info = parse_apk(build_apk(tmp_path / "shop.apk"))
+
+    assert info["package_name"] == "com.example.shop"
+    assert info["version_code"] == "241"
+    assert info["version_name"] == "2.4.1"
+    assert info["app_name"] == "Shop"
+    assert info["main_activity"] == "com.example.shop.MainActivity"
+    assert info["signature_hash"] == java_signature_hash(CERTIFICATE)
+
+
+def test_signer_digest_matches_java_hash_code():
+    # Arrays.hashCode(new byte[]{1, 2, 3}) == 30817, and bytes are signed
+    assert java_signature_hash(b"\x01\x02\x03") == format(30817, "x")
+    assert java_signature_hash(b"\xff") == format(31 - 1, "x")
+
+
+def test_unsigned_apk_has_no_signature(tmp_path):
+    assert apk_signature_hash(build_apk(tmp_path / "unsigned.apk", certificate=None)) is None
+
+
+def test_oversized_signing_block_is_ignored(tmp_path):
+    path = tmp_path / "bad-block.apk"
+    data = bytearray(open(build_apk(tmp_path / "shop.apk"), "rb").read())
+    magic = data.find(APK_SIG_BLOCK_MAGIC)
+    data[magic - 8:magic] = struct.pack("<Q", 2 ** 62)
+    path.write_bytes(bytes(data))
+
+    assert apk_signature_hash(str(path)) is None
+
+
+@pytest.mark.parametrize("cut", [12, 40, 200, -30])
+def test_truncated_manifest_raises_parse_error(tmp_path, cut):
+    manifest = build_axml()[:cut]
+    with pytest.raises(ManifestParseError):
+        parse_apk(build_apk(tmp_path / "truncated.apk", manifest=manifest))
+
+
+def test_corrupt_inputs_raise_parse_error(tmp_path):
+    with pytest.raises(ManifestParseError):
+        parse_axml(b"<manifest package='x'/>")
+
+    not_zip = tmp_path / "not-a.apk"
+    not_zip.write_bytes(b"MZ" + b"\x00" * 100)
+    with pytest.raises(ManifestParseError):
+        parse_apk(str(not_zip))
+
+    with pytest.raises(ManifestParseError):
+        parse_ipa(str(not_zip))
+
+
+def test_corrupt_resource_table_leaves_label_empty(tmp_path):
+    info = parse_apk(build_apk(tmp_path / "shop.apk", arsc=build_arsc()[:100]))
+    assert info["package_name"] == "com.example.shop"
+    assert info["app_name"] is None
+
+
+def test_parse_ipa(tmp_path):
+    path = tmp_path / "shop.ipa"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("Payload/Shop.app/Info.plist", plistlib.dumps({
+            "CFBundleIdentifier": "com.example.shop", "CFBundleName": "Shop", "CFBundleVersion": "241",
+            "CFBundleShortVersionString": "2.4.1", "MinimumOSVersion": "15.0",
+        }))
+
+    info = parse_ipa(str(path))
+    assert (info["package_name"], info["app_name"], info["version_code"], info["version_name"]) == (
+        "com.example.shop", "Shop", "241", "2.4.1")
+
+
+def test_blank_attribute_names_fall_back_to_resource_ids():
+    # Obfuscators blank attribute names; the resource id still identifies android: attributes
+    strings = ["" if index < len(ATTRIBUTE_IDS) else string for index, string in enumerate(STRINGS)]
+    manifest = parse_axml(build_axml(strings))[0][2]
+    assert (manifest["versionCode"], manifest["versionName"]) == (241, "2.4.1")
@@ -0,0 +1,84 @@
+"""App metadata cache: content-hash lookups, parser namespaces and the entry cap"""
+
+import json
+
+import pytest
+
+from services.apk.metadata_cache import AppMetadataCache, hash_file
+
+
+@pytest.fixture
+def build(tmp_path):
+    path = tmp_path / "app.apk"
+    path.write_bytes(b"PK\x03\x04 build one")
+    return str(path)
+
+
+def test_parses_once_per_content(tmp_path, build):
+    cache = AppMetadataCache(str(tmp_path / "cache.json"))
+    calls = []
+
+    def parser(path):
+        calls.append(path)
+        return {"package_name": "com.example.shop"}
+
+    assert cache.get_or_parse("apk", build, parser) == {"package_name": "com.example.shop"}
+    assert cache.get_or_parse("apk", build, parser) == {"package_name": "com.example.shop"}
+    assert calls == [build]
+
+    # Another parser's fields are cached separately for the same content
+    cache.get_or_parse("manifest", build, parser)
+    assert len(calls) == 2
+
+
+def test_failed_parse_is_not_cached(tmp_path, build):
+    cache = AppMetadataCache(str(tmp_path / "cache.json"))
+    cache.get_or_parse("apk", build, lambda path: {"error": "bad"})
+    assert cache.entries == {}
+
+
+def test_content_hash_follows_file_changes(tmp_path, build):
+    cache = AppMetadataCache(str(tmp_path / "cache.json"))
+    first = cache.content_hash(build)
+    assert first == hash_file(build)
+
+    with open(build, "ab") as f:
+        f.write(b" and a patch")
+    assert cache.content_hash(build) != first
+
+
+def test_reload_skips_unnamespaced_entries(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = AppMetadataCache(str(path))
+    cache.put("apk", "abc", {"package_name": "com.example.shop"})
+
+    data = json.loads(path.read_text())
+    data["def"] = {"package_name": "com.example.legacy"}
+    path.write_text(json.dumps(data))
+
+    reloaded = AppMetadataCache(str(path))
+    assert reloaded.get("apk", "abc") == {"package_name": "com.example.shop"}
+    assert list(reloaded.entries) == ["apk:abc"]
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = AppMetadataCache(str(path), max_entries=2)
+    cache.put("apk", "a", {"package_name": "a"})
+    cache.put("apk", "b", {"package_name": "b"})
+    cache.get("apk", "a")  # Used again, so "b" is the oldest
+    cache.put("apk", "c", {"package_name": "c"})
+
+    assert cache.get("apk", "b") is None
+    assert set(json.loads(path.read_text())) == {"apk:a", "apk:c"}
+    assert len(AppMetadataCache(str(path), max_entries=1).entries) == 1
+
+
+def test_remembered_hashes_are_capped(tmp_path):
+    cache = AppMetadataCache(str(tmp_path / "cache.json"), max_entries=2)
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.apk"
+        path.write_bytes(name.encode())
+        cache.remember_hash(str(path), name)
+
+    assert list(cache._stat_hashes) == [str(tmp_path / "b.apk"), str(tmp_path / "c.apk")]
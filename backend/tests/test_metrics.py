@@ -0,0 +1,104 @@
+"""Metrics: per-thread shards must add up exactly, and render in the Prometheus text format"""
+
+import threading
+
+from services.diagnostics import metrics
+from services.diagnostics.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+THREADS = 8
+PER_THREAD = 20_000
+
+
+def run_threads(target):
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        barrier.wait()
+        target()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_exact_under_threads():
+    counter = Counter("test_counter_total", "test", ["lane"])
+
+    def work():
+        child = counter.labels("interactive")
+        for _ in range(PER_THREAD):
+            child.inc()
+            counter.labels("background").inc(2)
+
+    run_threads(work)
+
+    assert counter.labels("interactive").value() == THREADS * PER_THREAD
+    assert counter.labels("background").value() == THREADS * PER_THREAD * 2
+
+
+def test_histogram_exact_under_threads():
+    histogram = Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+
+    def work():
+        for i in range(PER_THREAD):
+            histogram.observe(0.0625 if i % 2 else 0.5)  # Exact in binary, so the sum is too
+
+    run_threads(work)
+
+    cumulative, total, count = histogram.labels().value()
+    assert count == THREADS * PER_THREAD
+    assert cumulative == [THREADS * PER_THREAD / 2, THREADS * PER_THREAD, THREADS * PER_THREAD]
+    assert total == THREADS * PER_THREAD / 2 * 0.5625
+
+
+def test_gauge_inc_dec_and_set_under_threads():
+    gauge = Gauge("test_pending", "test")
+
+    def work():
+        for _ in range(PER_THREAD):
+            gauge.inc()
+            gauge.dec()
+        gauge.inc(3)
+
+    run_threads(work)
+    assert gauge.labels().value() == THREADS * 3
+
+    gauge.set(5)
+    assert gauge.labels().value() == 5
+    gauge.inc()
+    assert gauge.labels().value() == 6
+
+
+def test_gauge_function():
+    gauge = Gauge("test_depth", "test", ["device"])
+    gauge.labels("emulator-5554").set_function(lambda: 7)
+    assert gauge.labels("emulator-5554").value() == 7
+
+
+def test_label_overflow(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_CHILDREN", 3)
+    counter = Counter("test_overflow_total", "test", ["device"])
+    for device in ("a", "b", "c", "d", "e"):
+        counter.labels(device).inc()
+
+    children = dict(counter.children())
+    assert len(children) == 4
+    assert children[(metrics.OVERFLOW_LABEL,)].value() == 2
+
+
+def test_render():
+    registry = MetricsRegistry()
+    registry.counter("test_requests_total", "Requests", ["path"]).labels('/a"b').inc(3)
+    registry.histogram("test_latency_seconds", "Latency", buckets=(0.5,)).observe(0.25)
+    registry.gauge("test_clients", "Clients").set(2)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{path="/a\\"b"} 3' in lines
+    assert 'test_latency_seconds_bucket{le="0.5"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert "test_latency_seconds_sum 0.25" in lines
+    assert "test_latency_seconds_count 1" in lines
+    assert "test_clients 2" in lines
@@ -0,0 +1,140 @@
+"""Package inventory: parsing the one-shot listing, shared queries and external changes"""
+
+import asyncio
+
+import pytest
+
+from services.mobile import package_inventory
+from services.mobile.package_inventory import (
+    INVENTORY_SCRIPT, PACKAGES_SCRIPT, PackageInventory, package_fingerprint, parse_inventory,
+)
+
+PACKAGES = """package:com.example.shop versionCode:241
+package:com.example.notes versionCode:7
+package:com.example.widget
+"""
+
+OUTPUT = PACKAGES + """===GRAVITYQA_LAUNCHERS===
+priority=0 preferredOrder=0 match=0x108000 specificIndex=-1 isDefault=true
+com.example.shop/com.example.shop.MainActivity
+com.example.shop/com.example.shop.SecondLauncher
+com.example.notes/org.notes.ui.Home
+===GRAVITYQA_VERSIONS===
+  Package [com.example.shop] (4f1c2a0):
+    versionName=2.4.1
+  Package [com.example.notes] (1b2c3d4):
+    versionName=0.7-beta
+"""
+
+
+def test_parse_inventory():
+    assert parse_inventory(OUTPUT) == [
+        {"package_name": "com.example.notes", "app_name": "notes", "activity": "org.notes.ui.Home",
+         "version": "0.7-beta", "version_code": "7", "launchable": True},
+        {"package_name": "com.example.shop", "app_name": "shop", "activity": ".MainActivity",
+         "version": "2.4.1", "version_code": "241", "launchable": True},
+        {"package_name": "com.example.widget", "app_name": "widget", "activity": ".MainActivity",
+         "version": "1.0", "version_code": None, "launchable": False},
+    ]
+
+
+def test_package_listing_has_the_same_fingerprint():
+    assert package_fingerprint(parse_inventory(PACKAGES)) == package_fingerprint(parse_inventory(OUTPUT))
+    assert package_fingerprint(parse_inventory(PACKAGES.replace("241", "242"))) != \
+        package_fingerprint(parse_inventory(OUTPUT))
+
+
+class FakeScheduler:
+    """Answers the inventory queries, slowly, and counts them"""
+
+    def __init__(self, output=OUTPUT):
+        self.output = output
+        self.commands = []
+
+    async def shell(self, device_id, command, lane=None, read_only=False, timeout=None):
+        self.commands.append(command)
+        await asyncio.sleep(0.01)
+        if command == PACKAGES_SCRIPT:
+            return 0, self.output.split("===")[0], ""
+        return 0, self.output, ""
+
+    def count(self, command):
+        return self.commands.count(command)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(package_inventory, "get_adb_scheduler", lambda: scheduler)
+    return scheduler
+
+
+def test_concurrent_callers_share_one_query(scheduler):
+    inventory = PackageInventory()
+
+    async def scenario():
+        results = await asyncio.gather(*[inventory.get_apps("emulator-5554") for _ in range(5)])
+        assert all(len(result["apps"]) == 3 and not result["cached"] for result in results)
+        assert (await inventory.get_apps("emulator-5554"))["cached"]
+
+    asyncio.run(scenario())
+    assert scheduler.count(INVENTORY_SCRIPT) == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_query(scheduler):
+    inventory = PackageInventory()
+
+    async def scenario():
+        leaving = asyncio.ensure_future(inventory.get_apps("emulator-5554"))
+        staying = asyncio.ensure_future(inventory.get_apps("emulator-5554"))
+        await asyncio.sleep(0)
+        leaving.cancel()
+
+        assert len((await staying)["apps"]) == 3
+        assert (await inventory.get_apps("emulator-5554"))["cached"]
+
+    asyncio.run(scenario())
+    assert scheduler.count(INVENTORY_SCRIPT) == 1
+
+
+def test_external_install_is_noticed(scheduler):
+    inventory = PackageInventory(verify_interval=0)
+
+    async def scenario():
+        await inventory.get_apps("emulator-5554")
+        assert (await inventory.get_apps("emulator-5554"))["cached"]
+
+        # Installed from the Play Store, say
+        scheduler.output = "package:com.example.maps versionCode:3\n" + OUTPUT
+        result = await inventory.get_apps("emulator-5554")
+        assert not result["cached"]
+        assert "com.example.maps" in [app["package_name"] for app in result["apps"]]
+
+    asyncio.run(scenario())
+    assert scheduler.count(INVENTORY_SCRIPT) == 2
+    assert scheduler.count(PACKAGES_SCRIPT) == 2
+
+
+def test_recently_verified_list_is_served_without_adb(scheduler):
+    inventory = PackageInventory(verify_interval=60)
+
+    async def scenario():
+        await inventory.get_apps("emulator-5554")
+        for _ in range(3):
+            assert (await inventory.get_apps("emulator-5554"))["cached"]
+
+    asyncio.run(scenario())
+    assert scheduler.commands == [INVENTORY_SCRIPT]
+
+
+def test_invalidate_and_refresh(scheduler):
+    inventory = PackageInventory()
+
+    async def scenario():
+        await inventory.get_apps("emulator-5554")
+        inventory.invalidate("emulator-5554")
+        assert not (await inventory.get_apps("emulator-5554"))["cached"]
+        assert not (await inventory.get_apps("emulator-5554", refresh=True))["cached"]
+
+    asyncio.run(scenario())
+    assert scheduler.count(INVENTORY_SCRIPT) == 3
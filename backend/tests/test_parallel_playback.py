@@ -0,0 +1,94 @@
+"""Parallel web playback: LPT sharding, worker clamping and duration history keys"""
+
+import asyncio
+
+from config import settings
+from services.web import parallel_playback
+from services.web.parallel_playback import ParallelWebPlayback
+
+
+def make_test(test_id, seconds, actions=None):
+    return {"id": test_id, "name": test_id, "start_url": "https://example.com", "actions": actions or [],
+            "seconds": seconds}
+
+
+def make_playback(monkeypatch):
+    playback = ParallelWebPlayback(selenium_manager=None)
+    monkeypatch.setattr(playback, "estimate_duration", lambda test: test["seconds"])
+    return playback
+
+
+def test_lpt_balances_known_durations(monkeypatch):
+    playback = make_playback(monkeypatch)
+    tests = [make_test(name, seconds) for name, seconds in
+             [("a", 7), ("b", 5), ("c", 4), ("d", 4), ("e", 3), ("f", 3), ("g", 2)]]
+
+    shards = playback.shard_tests(tests, 3)
+
+    loads = sorted(sum(test["seconds"] for test in shard) for shard in shards)
+    assert loads == [8, 10, 10]
+    assert sorted(test["id"] for shard in shards for test in shard) == list("abcdefg")
+
+
+def test_never_more_shards_than_tests(monkeypatch):
+    playback = make_playback(monkeypatch)
+    shards = playback.shard_tests([make_test("a", 1), make_test("b", 1)], 8)
+    assert len(shards) == 2
+    assert len(playback.shard_tests([make_test("a", 1)], 0)) == 1
+
+
+def test_workers_clamped_to_configured_max(monkeypatch):
+    assert parallel_playback.MAX_WORKERS == settings.WEB_PLAYBACK_MAX_WORKERS
+    monkeypatch.setattr(parallel_playback, "MAX_WORKERS", 3)
+
+    class FakePool:
+        def __init__(self, selenium_manager, size, browser, headless):
+            self.size = size
+
+        async def start(self):
+            return []
+
+        async def close(self):
+            pass
+
+    async def run_shard(pool, shard_idx, shard, settings):
+        return {"shard": shard_idx, "estimated_time": 0, "wall_time": 0,
+                "tests": [{"test_id": test["id"], "wall_time": 0, "overall_status": "pass"} for test in shard]}
+
+    playback = make_playback(monkeypatch)
+    monkeypatch.setattr(parallel_playback, "WebSessionPool", FakePool)
+    monkeypatch.setattr(playback, "_run_shard", run_shard)
+    tests = [make_test(str(i), 1) for i in range(10)]
+
+    report = asyncio.run(playback.run_batch(tests, workers=50))
+    assert report["workers"] == 3
+    assert report["passed"] == 10
+
+    report = asyncio.run(playback.run_batch(tests, workers=0))
+    assert report["workers"] == 1
+
+
+def test_history_key_follows_test_content():
+    test = make_test("login", 0, [{"type": "click", "selector": "#submit"}])
+    key = ParallelWebPlayback.history_key(test)
+
+    assert key == ParallelWebPlayback.history_key(dict(test))
+    assert key != ParallelWebPlayback.history_key({**test, "actions": [{"type": "click", "selector": "#cancel"}]})
+    assert key != ParallelWebPlayback.history_key({**test, "start_url": "https://example.com/login"})
+    assert key != ParallelWebPlayback.history_key({**test, "id": "signup"})
+
+
+def test_no_history_for_generated_ids():
+    assert ParallelWebPlayback.history_key({"actions": []}) is None
+    assert ParallelWebPlayback.history_key({"id": "1", "generated_id": True, "actions": []}) is None
+
+
+def test_estimate_uses_recorded_duration():
+    playback = ParallelWebPlayback(selenium_manager=None)
+    test = make_test("checkout", 0, [{"type": "navigate"}, {"type": "click"}])
+    estimate = playback.estimate_duration(test)
+    assert estimate > 0
+
+    playback.duration_history[ParallelWebPlayback.history_key(test)] = 42.0
+    assert playback.estimate_duration(test) == 42.0
+    assert playback.estimate_duration({**test, "generated_id": True}) == estimate
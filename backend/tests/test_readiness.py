@@ -0,0 +1,95 @@
+"""Readiness waits: the probe script, policy resolution and wait results"""
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from services.web.readiness import (
+    DOM_QUIET_MS, NETWORK_IDLE_MS, SeleniumReadiness, resolve_step_policies, summarize_waits,
+)
+
+# Just enough of a browser for the probe script; Selenium runs scripts as a function body
+_NODE_HARNESS = """
+var window = globalThis;
+var document = {readyState: 'complete'};
+var location = {href: 'https://example.com/'};
+function XMLHttpRequest() {}
+XMLHttpRequest.prototype.send = function () {};
+function MutationObserver(callback) {}
+MutationObserver.prototype.observe = function () {};
+var result = (function () {
+%s
+})();
+process.stdout.write(JSON.stringify(result === undefined ? null : result));
+"""
+
+
+class NodeDriver:
+    """Runs execute_script in node, the way a browser would evaluate it"""
+
+    def execute_script(self, script, *args):
+        output = subprocess.run(["node", "-"], input=_NODE_HARNESS % script, capture_output=True,
+                                text=True, check=True, timeout=30).stdout
+        return json.loads(output)
+
+
+class StateDriver:
+    """Returns a fixed readiness state for every probe"""
+
+    def __init__(self, state):
+        self.state = state
+        self.probes = 0
+
+    def execute_script(self, script, *args):
+        self.probes += 1
+        return dict(self.state)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node to evaluate the probe script")
+def test_probe_returns_readiness_state():
+    state = SeleniumReadiness(NodeDriver()).probe()
+
+    assert set(state) == {"readyState", "pending", "networkIdleMs", "domQuietMs", "url"}
+    assert state["readyState"] == "complete"
+    assert state["pending"] == 0
+    assert state["url"] == "https://example.com/"
+
+
+def test_settled_page_satisfies_waits_without_timing_out():
+    driver = StateDriver({"readyState": "complete", "pending": 0, "networkIdleMs": NETWORK_IDLE_MS,
+                          "domQuietMs": DOM_QUIET_MS, "url": "https://example.com/"})
+    readiness = SeleniumReadiness(driver)
+
+    for policy in ("network_idle", "dom_quiet"):
+        wait = readiness.wait_for(policy, timeout=5)
+        assert wait["satisfied"]
+        assert wait["elapsed"] < 1
+    assert driver.probes == 2
+
+
+def test_busy_network_times_out():
+    driver = StateDriver({"readyState": "complete", "pending": 1, "networkIdleMs": 0, "domQuietMs": 0})
+    wait = SeleniumReadiness(driver).wait_for("network_idle", timeout=0.1)
+
+    assert not wait["satisfied"]
+    assert driver.probes >= 2
+
+
+def test_step_policies():
+    assert resolve_step_policies({"type": "click"}) == {"before": ["actionable"], "after": ["dom_quiet"]}
+    assert resolve_step_policies({"type": "click", "wait": ["url_change", "bogus"]}) == {
+        "before": ["actionable"], "after": ["url_change"]}
+    assert resolve_step_policies({"type": "navigate", "wait": {"after": ["dom_quiet"]}}) == {
+        "before": [], "after": ["dom_quiet"]}
+    assert resolve_step_policies({"type": "hover"}) == {"before": [], "after": []}
+
+
+def test_summarize_waits():
+    steps = [
+        {"waits": [{"policy": "dom_quiet", "elapsed": 0.5, "satisfied": True}]},
+        {"waits": [{"policy": "dom_quiet", "elapsed": 1.5, "satisfied": False}]},
+        {},
+    ]
+    assert summarize_waits(steps) == {"dom_quiet": {"count": 2, "total_time": 2.0, "timeouts": 1}}
@@ -0,0 +1,71 @@
+"""Sampling profiler: collapsed-stack output and the continuous ring window"""
+
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from services.diagnostics import sampling_profiler
+from services.diagnostics.sampling_profiler import SamplingProfiler
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_collapsed_stack_format():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy;worker")
+    worker.start()
+    profiler = SamplingProfiler("wall", interval=0.005)
+    profiler.start()
+    try:
+        time.sleep(0.2)
+    finally:
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    assert lines == sorted(lines)
+    for line in lines:
+        _, weight = line.rsplit(" ", 1)
+        assert int(weight) > 0
+    # Thread name first (";" can't appear inside a frame), then outer to inner frames
+    worker_stacks = [line.rsplit(" ", 1)[0].split(";") for line in lines if line.startswith("busy:worker;")]
+    assert worker_stacks
+    assert any(frames[-1] == "busy_worker (tests/test_sampling_profiler.py)" for frames in worker_stacks)
+    assert all(frames[1].startswith("_bootstrap (threading.py)") for frames in worker_stacks)
+    assert not any(line.startswith("sampling-profiler;") for line in lines)
+    assert profiler.get_stats()["samples"] > 0
+
+
+def test_ring_window_selects_recent_seconds(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sampling_profiler.time, "time", lambda: now[0])
+    profiler = SamplingProfiler("wall", ring_seconds=3)
+
+    for second, stack in [(1000, "old"), (1001, "middle"), (1002, "recent"), (1003, "recent")]:
+        now[0] = second + 0.5
+        with profiler._lock:
+            profiler._bucket()[stack] += 1
+
+    # The ring only holds the last 3 seconds
+    assert [second for second, _ in profiler.buckets] == [1001, 1002, 1003]
+    assert profiler.collapsed() == "middle 1\nrecent 2\n"
+    assert profiler.collapsed(seconds=2) == "recent 2\n"
+    assert profiler.collapsed(seconds=1) == "recent 1\n"
+
+
+def test_fixed_length_profile_counts_everything():
+    profiler = SamplingProfiler("wall")
+    profiler.counts.update(Counter({"main;b": 2, "main;a": 3}))
+    assert profiler.collapsed() == "main;a 3\nmain;b 2\n"
+    assert profiler.collapsed(seconds=1) == profiler.collapsed()
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown profiler mode"):
+        SamplingProfiler("gpu")
@@ -0,0 +1,70 @@
+"""Selector resolution cache: learned candidate order, persistence and the step cap"""
+
+import pytest
+
+from services.playback.selector_cache import SelectorResolutionCache
+
+CANDIDATES = [{"key": "id"}, {"key": "accessibility_id"}, {"key": "xpath"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SelectorResolutionCache(str(tmp_path / "selector_cache.json"))
+
+
+def keys(candidates):
+    return [candidate["key"] for candidate in candidates]
+
+
+def test_static_order_until_something_is_learned(cache):
+    assert keys(cache.order("flow-1", "step-1", CANDIDATES)) == ["id", "accessibility_id", "xpath"]
+    assert keys(cache.order(None, "step-1", CANDIDATES)) == ["id", "accessibility_id", "xpath"]
+
+
+def test_hit_moves_candidate_first(cache):
+    cache.record("flow-1", "step-1", "id", matched=False, elapsed_ms=900)
+    cache.record("flow-1", "step-1", "xpath", matched=True, elapsed_ms=40)
+
+    # Reliable hit first, untried next, the failing candidate last
+    assert keys(cache.order("flow-1", "step-1", CANDIDATES)) == ["xpath", "accessibility_id", "id"]
+    assert keys(cache.order("flow-2", "step-1", CANDIDATES)) == ["id", "accessibility_id", "xpath"]
+
+
+def test_fastest_reliable_candidate_first(cache):
+    for _ in range(3):
+        cache.record("flow-1", "step-1", "id", matched=True, elapsed_ms=300)
+        cache.record("flow-1", "step-1", "accessibility_id", matched=True, elapsed_ms=20)
+
+    assert keys(cache.order("flow-1", "step-1", CANDIDATES))[:2] == ["accessibility_id", "id"]
+
+
+def test_flush_and_reload(cache):
+    cache.record("flow-1", "step-1", "xpath", matched=True, elapsed_ms=40)
+    cache.flush()
+
+    reloaded = SelectorResolutionCache(cache.path)
+    assert reloaded.get_stats("flow-1", "step-1")["xpath"]["hits"] == 1
+    assert keys(reloaded.order("flow-1", "step-1", CANDIDATES))[0] == "xpath"
+
+
+def test_forget_flow(cache):
+    cache.record("flow-1", "step-1", "xpath", matched=True, elapsed_ms=40)
+    cache.record("flow-2", "step-1", "xpath", matched=True, elapsed_ms=40)
+    cache.forget_flow("flow-1")
+
+    assert cache.get_stats("flow-1", "step-1") == {}
+    assert cache.get_stats("flow-2", "step-1") != {}
+
+
+def test_least_recently_used_steps_are_dropped(tmp_path):
+    cache = SelectorResolutionCache(str(tmp_path / "selector_cache.json"), max_steps=2)
+    cache.record("flow-1", "step-1", "id", matched=True, elapsed_ms=10)
+    cache.record("flow-1", "step-2", "id", matched=True, elapsed_ms=10)
+    cache.order("flow-1", "step-1", CANDIDATES)  # Used again, so step-2 is the oldest
+    cache.record("flow-1", "step-3", "id", matched=True, elapsed_ms=10)
+
+    assert cache.get_stats("flow-1", "step-2") == {}
+    assert cache.get_stats("flow-1", "step-1") != {}
+    cache.flush()
+    assert len(SelectorResolutionCache(cache.path, max_steps=2).entries) == 2
+    assert len(SelectorResolutionCache(cache.path, max_steps=1).entries) == 1
@@ -0,0 +1,106 @@
+"""Selector compiler: XPath parsing, rewriting to cheaper lookups and local evaluation"""
+
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from services.mobile.element_inspector import ElementInspector
+from services.mobile.selector_compiler import (
+    STRATEGY_ACCESSIBILITY_ID, STRATEGY_ID, STRATEGY_UIAUTOMATOR, STRATEGY_XPATH,
+    compile_selector, compile_xpath, find_local, parse_xpath,
+)
+
+HIERARCHY = """<hierarchy rotation="0">
+  <android.widget.FrameLayout class="android.widget.FrameLayout" bounds="[0,0][1080,2400]">
+    <android.widget.EditText class="android.widget.EditText" resource-id="com.app:id/email" text=""
+        bounds="[40,400][1040,520]" clickable="true" enabled="true"/>
+    <android.widget.Button class="android.widget.Button" resource-id="com.app:id/login" text="Log in"
+        content-desc="Log in" bounds="[40,600][1040,720]" clickable="true" enabled="true"/>
+    <android.widget.Button class="android.widget.Button" text="Log in with Google"
+        bounds="[40,760][1040,880]" clickable="true" enabled="true"/>
+  </android.widget.FrameLayout>
+</hierarchy>"""
+
+
+@pytest.mark.parametrize("xpath, parsed", [
+    ("//android.widget.Button[@resource-id='com.app:id/login']",
+     ("android.widget.Button", (("resource-id", "=", "com.app:id/login"),))),
+    ('//*[@content-desc="Log in"]', ("*", (("content-desc", "=", "Log in"),))),
+    ("//*[contains(@text, 'Google') and @clickable='true']",
+     ("*", (("text", "contains", "Google"), ("clickable", "=", "true")))),
+    ("//android.widget.TextView[starts-with(@text,'Log')][@enabled='true']",
+     ("android.widget.TextView", (("text", "starts-with", "Log"), ("enabled", "=", "true")))),
+])
+def test_parse_supported_xpaths(xpath, parsed):
+    assert parse_xpath(xpath) == parsed
+
+
+@pytest.mark.parametrize("xpath", [
+    "//android.widget.Button[2]",
+    "//*[@text='a' or @text='b']",
+    "//android.widget.FrameLayout/android.widget.Button",
+    "/hierarchy/android.widget.Button",
+    "//*[following-sibling::android.widget.Button]",
+    "//*[@text!='x']",
+])
+def test_unsupported_xpaths_do_not_parse(xpath):
+    assert parse_xpath(xpath) is None
+    assert compile_xpath(xpath) == {"strategy": STRATEGY_XPATH, "value": xpath, "xpath": xpath}
+
+
+@pytest.mark.parametrize("xpath, strategy, value", [
+    ("//*[@resource-id='com.app:id/login']", STRATEGY_ID, "com.app:id/login"),
+    ("//*[@content-desc='Log in']", STRATEGY_ACCESSIBILITY_ID, "Log in"),
+    ("//android.widget.Button[@resource-id='com.app:id/login']", STRATEGY_UIAUTOMATOR,
+     'new UiSelector().className("android.widget.Button").resourceId("com.app:id/login")'),
+    ("//*[contains(@text,'Google') and @clickable='true']", STRATEGY_UIAUTOMATOR,
+     'new UiSelector().textContains("Google").clickable(true)'),
+    ('//*[@text=\'Say "hi"\']', STRATEGY_UIAUTOMATOR, 'new UiSelector().text("Say \\"hi\\"")'),
+])
+def test_compile_to_cheaper_strategy(xpath, strategy, value):
+    compiled = compile_xpath(xpath)
+    assert (compiled["strategy"], compiled["value"], compiled["xpath"]) == (strategy, value, xpath)
+
+
+@pytest.mark.parametrize("xpath", [
+    "//*",
+    "//*[contains(@resource-id, 'login')]",  # UiSelector has no resourceIdContains
+    "//*[@bounds='[0,0][10,10]']",
+    "//*[@clickable='yes']",
+])
+def test_parsed_but_not_compilable_stays_xpath(xpath):
+    assert compile_xpath(xpath)["strategy"] == STRATEGY_XPATH
+
+
+def test_compile_recorded_selectors():
+    assert compile_selector("id", "com.app:id/login")["strategy"] == STRATEGY_ID
+    assert compile_selector("contentDesc", "Log in")["strategy"] == STRATEGY_ACCESSIBILITY_ID
+    assert compile_selector("text", "Log in")["value"] == 'new UiSelector().text("Log in")'
+    assert compile_selector("class name", "android.widget.Button") == {
+        "strategy": "class name", "value": "android.widget.Button", "xpath": None}
+
+
+def test_find_local():
+    root = ET.fromstring(HIERARCHY)
+
+    buttons = find_local(root, "//android.widget.Button")
+    assert [node.get("text") for node in buttons] == ["Log in", "Log in with Google"]
+    assert len(find_local(root, "//*[starts-with(@text, 'Log in')]")) == 2
+    assert len(find_local(root, "//*[@resource-id='com.app:id/login' and @clickable='true']")) == 1
+    assert find_local(root, "//*[@resource-id='com.app:id/missing']") == []
+    assert find_local(root, "//android.widget.Button[1]") is None
+
+
+class SourceDriver:
+    session_id = None
+    page_source = HIERARCHY
+
+
+def test_inspector_counts_xpath_matches():
+    inspector = ElementInspector(SourceDriver(), "android")
+    element = inspector.get_element_at_position(500, 800)
+
+    [xpath] = [selector for selector in element["selectors"] if selector["type"] == "xpath"]
+    assert xpath["value"] == "//android.widget.Button[@text='Log in with Google']"
+    assert xpath["matches"] == 1
+    assert xpath["compiled"]["strategy"] == STRATEGY_UIAUTOMATOR
@@ -0,0 +1,168 @@
+"""Session pool: per-device leases, dead session replacement, adoption and profile switches"""
+
+import asyncio
+
+import pytest
+
+from services.mobile.session_pool import SessionPool
+from services.mobile.session_profiles import PROFILE_FAITHFUL, PROFILE_FAST, SessionProfile
+from services.mobile.session_registry import SessionRegistry
+
+
+class FakeAppiumService:
+    """Sessions that live until deleted or killed"""
+
+    def __init__(self):
+        self.registry = SessionRegistry()
+        self.alive = set()
+        self.created = []
+        self.deleted = []
+        self.settings_updates = []
+
+        async def discover():
+            pass
+
+        self.registry.discover = discover
+
+    async def create_session(self, device_id, platform, app_package, app_activity, extra_capabilities, profile):
+        session_id = f"session-{len(self.created) + 1}"
+        self.created.append((device_id, profile.name))
+        self.alive.add(session_id)
+        self.registry.register(session_id, {"appium:udid": device_id}, profile=profile.name)
+        return session_id
+
+    async def delete_session(self, session_id):
+        self.deleted.append(session_id)
+        self.alive.discard(session_id)
+        self.registry.remove(session_id)
+
+    async def is_session_alive(self, session_id):
+        return session_id in self.alive
+
+    async def update_settings(self, session_id, settings):
+        self.settings_updates.append((session_id, settings))
+
+
+@pytest.fixture
+def service():
+    return FakeAppiumService()
+
+
+@pytest.fixture
+def pool(service):
+    return SessionPool(service)
+
+
+def test_reused_across_leases(service, pool):
+    async def scenario():
+        first = await pool.acquire("emulator-5554")
+        pool.release(first)
+        second = await pool.acquire("emulator-5554")
+        pool.release(second)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert second.leases == 2
+    assert service.created == [("emulator-5554", PROFILE_FAITHFUL)]
+    assert (pool.stats["created"], pool.stats["hits"]) == (1, 1)
+
+
+def test_leases_on_one_device_are_serialized(pool):
+    events = []
+
+    async def playback(name, device_id):
+        pooled = await pool.acquire(device_id)
+        events.append(f"{name} start")
+        await asyncio.sleep(0.01)
+        events.append(f"{name} end")
+        pool.release(pooled)
+
+    async def scenario():
+        await asyncio.gather(playback("a", "emulator-5554"), playback("b", "emulator-5554"))
+        assert events == ["a start", "a end", "b start", "b end"]
+
+        # Different devices don't wait on each other
+        events.clear()
+        await asyncio.gather(playback("c", "emulator-5554"), playback("d", "emulator-5556"))
+        assert events[:2] == ["c start", "d start"]
+
+    asyncio.run(scenario())
+
+
+def test_dead_session_is_replaced(service, pool):
+    async def scenario():
+        first = await pool.acquire("emulator-5554")
+        pool.release(first)
+        service.alive.discard(first.session_id)  # Appium restarted, say
+
+        second = await pool.acquire("emulator-5554")
+        pool.release(second)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second.session_id != first.session_id
+    assert pool.stats["replaced_dead"] == 1
+    assert first.session_id not in service.registry
+
+
+def test_discarded_session_is_not_handed_out_again(service, pool):
+    async def scenario():
+        first = await pool.acquire("emulator-5554")
+        pool.release(first, discard=True)
+        second = await pool.acquire("emulator-5554")
+        pool.release(second)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    # Still alive and registered for the device, so it is adopted rather than duplicated
+    assert second is not first
+    assert second.adopted
+    assert second.session_id == first.session_id
+    assert len(service.created) == 1
+
+
+def test_profile_switch_recreates_the_session(service, pool):
+    async def scenario():
+        first = await pool.acquire("emulator-5554", SessionProfile(PROFILE_FAITHFUL))
+        pool.release(first)
+        second = await pool.acquire("emulator-5554", SessionProfile(PROFILE_FAST))
+        pool.release(second)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert service.deleted == [first.session_id]
+    assert service.created == [("emulator-5554", PROFILE_FAITHFUL), ("emulator-5554", PROFILE_FAST)]
+    assert second.profile.name == PROFILE_FAST
+
+
+def test_settings_only_change_keeps_the_session(service, pool):
+    async def scenario():
+        first = await pool.acquire("emulator-5554")
+        pool.release(first)
+        patched = SessionProfile(PROFILE_FAITHFUL, settings={"waitForIdleTimeout": 500})
+        second = await pool.acquire("emulator-5554", patched)
+        pool.release(second)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second is first
+    assert service.settings_updates[-1] == (first.session_id, second.profile.settings)
+    assert service.deleted == []
+
+
+def test_failed_creation_releases_the_device(service, pool):
+    async def no_session(*args, **kwargs):
+        return None
+
+    async def scenario():
+        create = service.create_session
+        service.create_session = no_session
+        with pytest.raises(RuntimeError):
+            await pool.acquire("emulator-5554")
+
+        service.create_session = create
+        pooled = await asyncio.wait_for(pool.acquire("emulator-5554"), 1)
+        pool.release(pooled)
+
+    asyncio.run(scenario())
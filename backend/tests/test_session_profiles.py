@@ -0,0 +1,85 @@
+"""Session profiles: project overrides and the capabilities for warm devices"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models  # noqa: F401 - registers every mapper the profile model relates to
+from models.project import ProjectSessionProfile
+from services.mobile.session_profiles import (
+    DEFAULT_PROFILE, PROFILE_FAITHFUL, PROFILE_FAST, SessionProfile, forget_device, list_profiles,
+    mark_device_initialized, profile_for_project,
+)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    ProjectSessionProfile.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(ProjectSessionProfile(
+        project_id=1, profile=PROFILE_FAST,
+        capabilities={"appium:disableWindowAnimation": False}, settings={"waitForIdleTimeout": 100},
+    ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_stored_profile_with_overrides(db):
+    profile = profile_for_project(db, 1)
+
+    assert profile.name == PROFILE_FAST
+    assert profile.capabilities["appium:disableWindowAnimation"] is False
+    assert profile.capabilities["appium:ignoreHiddenApiPolicyError"] is True
+    assert profile.settings["waitForIdleTimeout"] == 100
+    assert profile.settings["ignoreUnimportantViews"] is True
+
+
+def test_override_naming_the_stored_profile_keeps_its_overrides(db):
+    assert profile_for_project(db, 1, override=PROFILE_FAST).settings["waitForIdleTimeout"] == 100
+
+
+def test_override_naming_another_profile_drops_the_overrides(db):
+    profile = profile_for_project(db, 1, override=PROFILE_FAITHFUL)
+
+    assert profile.name == PROFILE_FAITHFUL
+    assert profile.settings == SessionProfile(PROFILE_FAITHFUL).settings
+
+
+def test_projects_without_a_profile_get_the_default(db):
+    assert profile_for_project(db, 2).name == DEFAULT_PROFILE
+    assert profile_for_project(db, None).name == DEFAULT_PROFILE
+    assert profile_for_project(db, 2, override=PROFILE_FAST).name == PROFILE_FAST
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match="Unknown session profile"):
+        SessionProfile("turbo")
+
+
+def test_warm_device_skips_server_installation():
+    profile = SessionProfile(PROFILE_FAST, capabilities={"appium:skipDeviceInitialization": False})
+    try:
+        assert "appium:skipServerInstallation" not in profile.capabilities_for("emulator-5554")
+
+        mark_device_initialized("emulator-5554")
+        capabilities = profile.capabilities_for("emulator-5554")
+        assert capabilities["appium:skipServerInstallation"] is True
+        assert capabilities["appium:disableWindowAnimation"] is True
+        # The project's own capabilities still win
+        assert capabilities["appium:skipDeviceInitialization"] is False
+
+        assert "appium:skipServerInstallation" not in profile.capabilities_for("emulator-5556")
+        # Faithful sessions always check the server
+        assert SessionProfile(PROFILE_FAITHFUL).capabilities_for("emulator-5554") == {}
+    finally:
+        forget_device("emulator-5554")
+
+    assert "appium:skipServerInstallation" not in profile.capabilities_for("emulator-5554")
+
+
+def test_list_profiles():
+    profiles = list_profiles()
+    assert set(profiles) == {PROFILE_FAST, PROFILE_FAITHFUL}
+    assert profiles[PROFILE_FAST]["settings"]["waitForIdleTimeout"] == 0
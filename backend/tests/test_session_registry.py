@@ -0,0 +1,128 @@
+"""Session registry: sessions by device, discovery of running sessions and reaping dead ones"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from services.mobile import session_registry
+from services.mobile.session_registry import UNREACHABLE_AFTER, SessionRegistry, device_of
+
+
+def test_device_of():
+    assert device_of({"appium:udid": "emulator-5554", "deviceName": "Pixel"}) == "emulator-5554"
+    assert device_of({"udid": "00008030-001A"}) == "00008030-001A"
+    assert device_of({"appium:deviceName": "emulator-5556"}) == "emulator-5556"
+    assert device_of({"platformName": "Android"}) is None
+
+
+def test_register_and_look_up_by_device():
+    registry = SessionRegistry()
+    registry.register("session-1", {"appium:udid": "emulator-5554"}, profile="fast")
+    registry.register("session-2", {"appium:udid": "emulator-5556"})
+    registry.register("session-3", {"platformName": "Android"}, device_id="emulator-5554")
+
+    assert registry.session_for_device("emulator-5554") == "session-3"
+    assert registry.session_for_device("emulator-5556") == "session-2"
+    assert registry.session_for_device("emulator-5558") is None
+    assert registry.latest() == "session-3"
+    assert list(registry) == ["session-1", "session-2", "session-3"]
+    assert registry.get("session-1").profile == "fast"
+
+
+def test_remove_falls_back_to_an_older_session_on_the_device():
+    registry = SessionRegistry()
+    registry.register("session-1", {"appium:udid": "emulator-5554"})
+    registry.register("session-2", {"appium:udid": "emulator-5554"})
+    registry.screenshot_dimensions["session-2"] = {"width": 1080, "height": 2400}
+
+    registry.remove("session-2")
+    assert registry.session_for_device("emulator-5554") == "session-1"
+    assert "session-2" not in registry
+    assert "session-2" not in registry.screenshot_dimensions
+
+    registry.remove("session-1")
+    registry.remove("session-1")  # Already gone
+    assert registry.session_for_device("emulator-5554") is None
+    assert len(registry) == 0
+
+
+class FakeServers:
+    """What the Appium servers answer to session list requests"""
+
+    def __init__(self):
+        self.sessions = []
+        self.reachable = True
+        self.can_list = True
+        self.requests = 0
+
+    def handle(self, request):
+        self.requests += 1
+        if not self.reachable:
+            raise httpx.ConnectError("Connection refused", request=request)
+        if request.url.path == "/appium/sessions" and self.can_list:
+            return httpx.Response(200, json={"value": self.sessions})
+        return httpx.Response(404, json={"value": {"error": "unknown command"}})
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    servers = FakeServers()
+    monkeypatch.setattr(session_registry, "appium_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(servers.handle)))
+    return servers
+
+
+def test_discovery_runs_once(servers):
+    servers.sessions = [{"id": "running-1", "capabilities": {"appium:udid": "emulator-5554"}}]
+    registry = SessionRegistry()
+
+    async def scenario():
+        await asyncio.gather(registry.discover(), registry.discover())
+        await registry.discover()
+        return await registry.resolve("emulator-5554")
+
+    assert asyncio.run(scenario()) == "running-1"
+    assert registry.get("running-1").discovered
+    assert servers.requests == 1
+    assert registry.stats["discovered"] == 1
+
+
+def test_reap_drops_sessions_the_server_no_longer_lists(servers):
+    registry = SessionRegistry()
+
+    async def scenario():
+        registry.register("alive", {"appium:udid": "emulator-5554"})
+        registry.register("gone", {"appium:udid": "emulator-5556"})
+        servers.sessions = [{"id": "alive"}]
+        assert await registry.reap() == 1
+
+    asyncio.run(scenario())
+    assert list(registry) == ["alive"]
+    assert registry.session_for_device("emulator-5556") is None
+
+
+def test_unreachable_server_needs_repeated_failures(servers):
+    registry = SessionRegistry()
+
+    async def scenario():
+        registry.register("session-1", {"appium:udid": "emulator-5554"})
+        servers.reachable = False
+        for _ in range(UNREACHABLE_AFTER - 1):
+            assert await registry.reap() == 0
+        assert await registry.reap() == 1
+
+    asyncio.run(scenario())
+    assert len(registry) == 0
+
+
+def test_server_without_a_session_list_keeps_its_sessions(servers):
+    servers.can_list = False
+    registry = SessionRegistry()
+
+    async def scenario():
+        registry.register("session-1", {"appium:udid": "emulator-5554"})
+        assert await registry.reap() == 0
+
+    asyncio.run(scenario())
+    assert "session-1" in registry
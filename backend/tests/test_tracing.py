@@ -0,0 +1,80 @@
+"""Tracing: span nesting, context across threads and tasks, and the Chrome trace export"""
+
+import asyncio
+import threading
+
+import pytest
+
+from services.diagnostics.tracing import (
+    NOOP_SPAN, current_trace_id, get_tracer, propagate, span, to_chrome_trace,
+)
+
+
+def test_no_spans_outside_a_trace():
+    with span("adb getprop", "adb") as current:
+        assert current is NOOP_SPAN
+        assert current_trace_id() is None
+
+
+def test_children_share_the_root_trace():
+    with span("POST /api/playback", "http", root=True) as root:
+        with span("adb tap", "adb", device="emulator-5554") as child:
+            assert child.trace_id == root.trace_id
+            assert child.parent_id == root.span_id
+            assert current_trace_id() == root.trace_id
+    assert current_trace_id() is None
+
+    spans = get_tracer().get_trace(root.trace_id)
+    assert [s["name"] for s in spans] == ["adb tap", "POST /api/playback"]
+    assert spans[0]["attributes"] == {"device": "emulator-5554"}
+    assert all(s["duration"] is not None for s in spans)
+
+
+def test_failed_span_records_the_error():
+    with pytest.raises(ValueError):
+        with span("xml parse", "xml", root=True) as root:
+            raise ValueError("bad page source")
+
+    [recorded] = get_tracer().get_trace(root.trace_id)
+    assert recorded["status"] == "error"
+    assert recorded["error"] == "ValueError: bad page source"
+
+
+def test_context_follows_to_thread_and_tasks():
+    async def trace_id_in_task():
+        await asyncio.sleep(0)
+        return current_trace_id()
+
+    async def scenario():
+        with span("request", root=True) as root:
+            in_thread = await asyncio.to_thread(current_trace_id)
+            in_task = await asyncio.create_task(trace_id_in_task())
+            return root.trace_id, in_thread, in_task
+
+    trace_id, in_thread, in_task = asyncio.run(scenario())
+    assert in_thread == trace_id
+    assert in_task == trace_id
+
+
+def test_plain_threads_need_propagate():
+    seen = {}
+    with span("request", root=True) as root:
+        plain = threading.Thread(target=lambda: seen.setdefault("plain", current_trace_id()))
+        wrapped = threading.Thread(target=propagate(lambda: seen.setdefault("wrapped", current_trace_id())))
+        for thread in (plain, wrapped):
+            thread.start()
+            thread.join()
+
+    assert seen == {"plain": None, "wrapped": root.trace_id}
+
+
+def test_chrome_trace_export():
+    with span("request", "http", root=True) as root:
+        with span("adb tap", "adb"):
+            pass
+
+    trace = to_chrome_trace(get_tracer().get_trace(root.trace_id))
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in events] == ["request", "adb tap"]
+    assert events[1]["args"]["parent_id"] == root.span_id
+    assert any(event["ph"] == "M" for event in trace["traceEvents"])
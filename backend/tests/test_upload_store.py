@@ -0,0 +1,123 @@
+"""Upload store: content-addressed saves, re-upload dedupe, leases and pruning"""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from services.apk import upload_store
+from services.apk.upload_store import UploadStore
+
+BUILD = b"PK\x03\x04" + bytes(range(256)) * 10
+BUILD_SHA256 = hashlib.sha256(BUILD).hexdigest()
+
+
+class FakeUpload:
+    """Just enough of FastAPI's UploadFile, handing out small chunks"""
+
+    def __init__(self, data, filename="Shop.APK"):
+        self.data = data
+        self.filename = filename
+        self.reads = 0
+
+    async def read(self, size):
+        self.reads += 1
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "UPLOAD_CHUNK_SIZE", 100)
+    return UploadStore(str(tmp_path / "uploads"))
+
+
+def stored_files(store):
+    return sorted(os.listdir(store.root))
+
+
+def test_upload_is_stored_by_content_hash(store):
+    upload = FakeUpload(BUILD)
+    saved = asyncio.run(store.save_upload(upload))
+
+    assert saved["sha256"] == BUILD_SHA256
+    assert saved["size"] == len(BUILD)
+    assert not saved["reused"]
+    assert saved["path"] == os.path.join(store.root, f"{BUILD_SHA256}.apk")
+    assert upload.reads > len(BUILD) // 100  # Streamed, not read whole
+    with open(saved["path"], "rb") as f:
+        assert f.read() == BUILD
+    assert store.find(BUILD_SHA256.upper()) == saved["path"]
+    assert store.find("not-a-hash") is None
+
+
+def test_reupload_reuses_stored_build(store):
+    first = asyncio.run(store.save_upload(FakeUpload(BUILD)))
+    second = asyncio.run(store.save_upload(FakeUpload(BUILD, filename="copy.apk")))
+
+    assert second["reused"]
+    assert second["path"] == first["path"]
+    assert stored_files(store) == [f"{BUILD_SHA256}.apk"]
+
+
+def test_known_hash_skips_the_upload(store):
+    asyncio.run(store.save_upload(FakeUpload(BUILD)))
+    upload = FakeUpload(BUILD)
+    received = asyncio.run(store.receive(upload, sha256=BUILD_SHA256))
+
+    assert received["reused"]
+    assert upload.reads == 0
+    with pytest.raises(LookupError):
+        asyncio.run(store.receive(None, sha256="0" * 64))
+
+
+def test_hash_mismatch_discards_the_upload(store):
+    with pytest.raises(ValueError):
+        asyncio.run(store.save_upload(FakeUpload(BUILD), expected_sha256="0" * 64))
+    assert stored_files(store) == []
+
+
+def write_build(store, name, size, atime):
+    path = os.path.join(store.root, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (atime, atime))
+    return path
+
+
+def test_prune_drops_least_recently_used(store):
+    store.max_bytes = 250
+    write_build(store, "old.apk", 100, 1000)
+    write_build(store, "middle.apk", 100, 2000)
+    write_build(store, "new.apk", 100, 3000)
+    store.prune()
+
+    assert stored_files(store) == ["middle.apk", "new.apk"]
+
+
+def test_leased_build_survives_prune(store):
+    store.max_bytes = 150
+    leased = write_build(store, "leased.apk", 100, 1000)
+    write_build(store, "idle.apk", 100, 2000)
+
+    with store.lease(leased):
+        store.prune()
+        assert stored_files(store) == ["leased.apk"]
+
+    # Still over the cap once released, so it goes on the next prune
+    write_build(store, "idle.apk", 100, 2000)
+    store.prune()
+    assert stored_files(store) == ["idle.apk"]
+
+
+def test_saved_upload_is_leased_until_released(store):
+    store.max_bytes = 1
+    saved = asyncio.run(store.save_upload(FakeUpload(BUILD)))  # Prunes right after saving
+    assert stored_files(store) == [f"{BUILD_SHA256}.apk"]
+
+    store.release(saved["path"])
+    store.prune()
+    assert stored_files(store) == []
+    with pytest.raises(FileNotFoundError):
+        store.acquire(saved["path"])
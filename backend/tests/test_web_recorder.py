@@ -0,0 +1,65 @@
+"""Web recorder: picking the recorded selector from the in-browser payload"""
+
+import pytest
+
+from services.web.web_recorder import WebRecorder
+
+
+@pytest.fixture
+def recorder():
+    return WebRecorder()
+
+
+def payload(counts, **candidates):
+    return {"candidates": candidates, "counts": counts}
+
+
+def test_id_wins_when_unique(recorder):
+    selectors = recorder._build_selectors(payload(
+        {"id": 1, "name": 1, "css": 1, "xpath": 1},
+        id="email", name="email", css="form > input", xpath="//form/input[1]",
+    ))
+
+    assert selectors["best"] == "#email"
+    assert selectors["best_type"] == "css"
+    assert selectors["id_locator"] == "email"
+    assert selectors["name"] == "[name='email']"
+
+
+def test_unique_selector_beats_higher_priority_duplicate(recorder):
+    # Duplicate ids and names happen on real pages; the first unique selector is preferred
+    selectors = recorder._build_selectors(payload(
+        {"id": 2, "name": 3, "css": 1, "xpath": 1},
+        id="submit", name="submit", css="#checkout button.primary", xpath="//button[2]",
+    ))
+
+    assert selectors["best"] == "#checkout button.primary"
+    assert selectors["best_type"] == "css"
+    assert selectors["matches"] == {"id": 2, "name": 3, "css": 1, "xpath": 1}
+
+
+def test_xpath_when_only_it_is_unique(recorder):
+    selectors = recorder._build_selectors(payload(
+        {"css": 4, "xpath": 1}, css="li.item", xpath="//ul/li[3]",
+    ))
+
+    assert selectors["best"] == "//ul/li[3]"
+    assert selectors["best_type"] == "xpath"
+
+
+def test_falls_back_to_priority_when_nothing_is_unique(recorder):
+    selectors = recorder._build_selectors(payload(
+        {"name": 2, "css": 2}, name="q", css="input.search",
+    ))
+
+    assert selectors["best"] == "[name='q']"
+
+
+def test_counts_missing(recorder):
+    selectors = recorder._build_selectors(payload({}, css="button", xpath="//button"))
+    assert selectors["best"] == "button"
+    assert selectors["matches"] == {}
+
+
+def test_empty_payload(recorder):
+    assert recorder._build_selectors({}) == {"matches": {}}
@@ -1,13 +1,22 @@
 """Appium Driver Manager - Simple driver storage and retrieval"""
 
+from utils.bounded_store import BoundedStore
+
+# Drivers kept per device; idle or least recently used ones past the limit are quit
+MAX_DRIVERS = 16
+DRIVER_IDLE_SECONDS = 30 * 60
+
+
+def _quit_driver(device_id: str, driver):
+    driver.quit()
+
+
 # Global driver storage (device_id -> driver instance)
-_drivers = {}
+_drivers = BoundedStore("appium_drivers", MAX_DRIVERS, ttl=DRIVER_IDLE_SECONDS, on_evict=_quit_driver)
 
 def get_driver(device_id: str):
     """Get the driver instance for a specific device"""
-    if device_id not in _drivers:
-        return None
-    return _drivers[device_id]
+    return _drivers.get(device_id)
 
 def set_driver(device_id: str, driver):
     """Store a driver instance for a device"""
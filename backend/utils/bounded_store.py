@@ -0,0 +1,345 @@
+"""
+Bounded Store - In-memory state with a size limit, idle expiry and disk spill
+
+Recordings, playback reports, live monitors and drivers used to sit in
+plain dicts and lists for the life of the process. These now live in:
+
+- BoundedStore: a dict that keeps at most max_entries in memory, least
+  recently used first out. Entries not touched for `ttl` seconds go out
+  too. With spill=True an evicted entry is written to
+  DATA_DIR/stores/<name>/ as JSON and read back (and moved back into
+  memory) the next time it is asked for. Without spill, on_evict(key, value)
+  gets the entry, so live objects (monitors, drivers) can be stopped
+  rather than leaked.
+- SpillList: an append-only list that keeps its newest max_in_memory items
+  in memory and appends older ones to a JSONL file, for action logs that
+  grow while recording.
+
+Spilled data is scratch space for this process: a store clears its
+directory when it is created. Every store registers itself by name, and
+get_store_stats() (GET /api/admin/stores) reports entry counts, eviction
+and spill counters, and an estimate of the memory each one holds.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import settings
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("stores")
+
+STORE_DIR = settings.DATA_DIR / "stores"
+
+# Objects visited per memory estimate; past this the size is a lower bound
+SIZEOF_MAX_OBJECTS = 200_000
+
+_stores: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+
+def _spill_dir(name: str) -> Path:
+    path = STORE_DIR / name
+    shutil.rmtree(path, ignore_errors=True)  # Left over from an earlier run
+    return path
+
+
+def _write_json(path: Path, data: Any):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def deep_sizeof(obj: Any) -> Dict:
+    """Approximate bytes held by obj and what it references (containers and instance dicts)"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        if len(seen) >= SIZEOF_MAX_OBJECTS:
+            return {"bytes": total, "approximate": True}
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item, 0)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            # One level into plain objects: their attributes, not what those reference
+            total += sum(sys.getsizeof(value, 0) for value in vars(item).values())
+    return {"bytes": total, "approximate": False}
+
+
+class BoundedStore(MutableMapping):
+    """Dict with LRU and idle-time eviction, optionally spilling evicted entries to disk"""
+
+    def __init__(self, name: str, max_entries: int, ttl: Optional[float] = None, spill: bool = False,
+                 max_spilled: Optional[int] = None, on_evict: Optional[Callable[[Any, Any], None]] = None):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.spill = spill
+        self.max_spilled = max_spilled if max_spilled is not None else self.max_entries * 10
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Any, list]" = OrderedDict()  # {key: [value, last touched]}, LRU first
+        self._spilled: "OrderedDict[Any, Path]" = OrderedDict()  # {key: file}, oldest first
+        self._dir = _spill_dir(name) if spill else None
+        self._lock = threading.RLock()
+        self.stats = {"evicted": 0, "expired": 0, "spilled": 0, "reloaded": 0, "spill_errors": 0, "dropped": 0}
+        _stores[name] = self
+
+    # ---- mapping ----
+
+    def __getitem__(self, key):
+        evicted = []
+        try:
+            with self._lock:
+                evicted += self._expire()
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1] = time.monotonic()
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                if key not in self._spilled:
+                    raise KeyError(key)
+                value = self._reload(key)
+                evicted += self._put(key, value)
+                return value
+        finally:
+            self._evicted(evicted)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            evicted = self._expire()
+            path = self._spilled.pop(key, None)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            evicted += self._put(key, value)
+        self._evicted(evicted)
+
+    def __delitem__(self, key):
+        """Remove an entry (from memory or disk) without calling on_evict"""
+        with self._lock:
+            path = self._spilled.pop(key, None)
+            if path is not None:
+                path.unlink(missing_ok=True)
+            if self._entries.pop(key, None) is None and path is None:
+                raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries or key in self._spilled
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            keys = list(self._entries) + list(self._spilled)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries) + len(self._spilled)
+
+    # ---- eviction ----
+
+    def _put(self, key, value) -> List[tuple]:
+        self._entries[key] = [value, time.monotonic()]
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            old_key, (old_value, _) = self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+            evicted += self._evict(old_key, old_value)
+        return evicted
+
+    def _expire(self) -> List[tuple]:
+        if not self.ttl:
+            return []
+        cutoff = time.monotonic() - self.ttl
+        evicted = []
+        while self._entries:
+            key, (value, touched) = next(iter(self._entries.items()))
+            if touched > cutoff:
+                break
+            del self._entries[key]
+            self.stats["expired"] += 1
+            evicted += self._evict(key, value)
+        return evicted
+
+    def _evict(self, key, value) -> List[tuple]:
+        """Spill an entry that left memory, or hand it back for on_evict"""
+        if not self.spill:
+            return [(key, value)]
+        path = self._dir / (hashlib.sha1(str(key).encode()).hexdigest()[:24] + ".json")
+        try:
+            _write_json(path, {"key": key, "value": value})
+        except (TypeError, ValueError, OSError) as e:
+            self.stats["spill_errors"] += 1
+            logger.warning("[Store] ⚠️ %s: could not spill %s, dropping it: %s", self.name, key, e)
+            return [(key, value)]
+        self._spilled[key] = path
+        self.stats["spilled"] += 1
+        while len(self._spilled) > self.max_spilled:
+            _, old_path = self._spilled.popitem(last=False)
+            old_path.unlink(missing_ok=True)
+            self.stats["dropped"] += 1
+        return []
+
+    def _reload(self, key):
+        path = self._spilled.pop(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)["value"]
+        except (OSError, ValueError, KeyError) as e:
+            self.stats["spill_errors"] += 1
+            logger.warning("[Store] ⚠️ %s: spilled entry %s is unreadable: %s", self.name, key, e)
+            raise KeyError(key) from e
+        finally:
+            path.unlink(missing_ok=True)
+        self.stats["reloaded"] += 1
+        return value
+
+    def _evicted(self, evicted: List[tuple]):
+        """on_evict for entries that were dropped, outside the lock (it may stop threads or quit drivers)"""
+        for key, value in evicted:
+            if self.on_evict is None:
+                continue
+            try:
+                self.on_evict(key, value)
+            except Exception as e:
+                logger.warning("[Store] ⚠️ %s: on_evict failed for %s: %s", self.name, key, e)
+
+    def expire(self) -> int:
+        """Evict entries idle for longer than ttl now, instead of on the next access; returns how many"""
+        with self._lock:
+            before = self.stats["expired"]
+            evicted = self._expire()
+            expired = self.stats["expired"] - before
+        self._evicted(evicted)
+        return expired
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            values = [entry[0] for entry in self._entries.values()]
+            spilled_bytes = 0
+            for path in self._spilled.values():
+                try:
+                    spilled_bytes += path.stat().st_size
+                except OSError:
+                    pass
+            stats = {
+                "name": self.name,
+                "type": "store",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "spilled_entries": len(self._spilled),
+                "spilled_bytes": spilled_bytes,
+                **self.stats,
+            }
+        memory = deep_sizeof(values)
+        stats["memory_bytes"] = memory["bytes"]
+        stats["memory_approximate"] = memory["approximate"]
+        return stats
+
+
+class SpillList:
+    """Append-only list; items past the newest max_in_memory go to a JSONL file"""
+
+    def __init__(self, name: str, max_in_memory: int):
+        self.name = name
+        self.max_in_memory = max(2, max_in_memory)
+        self._items: List[Any] = []
+        self._spilled = 0
+        self._file = _spill_dir(name) / "items.jsonl"
+        self._lock = threading.Lock()
+        _stores[name] = self
+
+    def append(self, item: Any):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) > self.max_in_memory:
+                self._spill(len(self._items) // 2)
+
+    def _spill(self, count: int):
+        """Move the oldest `count` in-memory items to the file (kept in memory if that fails)"""
+        lines = "".join(json.dumps(item) + "\n" for item in self._items[:count])
+        try:
+            self._file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._file, "a") as f:
+                f.write(lines)
+        except (TypeError, ValueError, OSError) as e:
+            logger.warning("[Store] ⚠️ %s: could not spill %d items: %s", self.name, count, e)
+            return
+        del self._items[:count]
+        self._spilled += count
+
+    def clear(self):
+        with self._lock:
+            self._items = []
+            self._spilled = 0
+            self._file.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._items)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator:
+        return iter(self.to_list())
+
+    def to_list(self) -> List[Any]:
+        """Every item, spilled ones first"""
+        with self._lock:
+            items = list(self._items)
+            spilled = self._spilled
+            if not spilled:
+                return items
+            with open(self._file) as f:
+                return [json.loads(line) for line in f] + items
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            items = list(self._items)
+            try:
+                spilled_bytes = self._file.stat().st_size if self._spilled else 0
+            except OSError:
+                spilled_bytes = 0
+            stats = {
+                "name": self.name,
+                "type": "list",
+                "entries": len(items),
+                "max_entries": self.max_in_memory,
+                "spilled_entries": self._spilled,
+                "spilled_bytes": spilled_bytes,
+            }
+        memory = deep_sizeof(items)
+        stats["memory_bytes"] = memory["bytes"]
+        stats["memory_approximate"] = memory["approximate"]
+        return stats
+
+
+def get_store_stats() -> Dict:
+    """Size, eviction and spill stats for every live store (only subsystems already imported)"""
+    stores = sorted(_stores.values(), key=lambda store: store.name)
+    stats = [store.get_stats() for store in stores]
+    return {
+        "stores": stats,
+        "memory_bytes": sum(store["memory_bytes"] for store in stats),
+        "spilled_bytes": sum(store["spilled_bytes"] for store in stats),
+    }
@@ -0,0 +1,106 @@
+"""
+Lazy Routers - Import API modules on the first request that needs them
+
+Importing every router at startup pulls in Selenium, Playwright, the
+Appium client, the AI agents and everything behind them before the
+backend can answer /health. Routers registered here are imported and
+included the first time a request arrives under their prefix (or when
+the OpenAPI schema is asked for), so startup only pays for what the UI
+hits right away.
+
+The import runs in a worker thread, so the event loop keeps serving other
+requests while a heavy subsystem loads.
+"""
+
+import asyncio
+import importlib
+import time
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI
+
+from services.diagnostics.logs import get_logger
+
+logger = get_logger("startup")
+
+# Requests that need every route to exist
+SCHEMA_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+class LazyRouter:
+    def __init__(self, prefix: str, module: str, include_kwargs: Dict):
+        self.prefix = prefix.rstrip("/")
+        self.module = module
+        self.include_kwargs = include_kwargs
+        self.loaded = False
+        self.load_ms: Optional[float] = None
+        self.lock = asyncio.Lock()
+
+    def matches(self, path: str) -> bool:
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+
+class LazyRouters:
+    """API modules to include on first use, by URL prefix"""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.routers: List[LazyRouter] = []
+
+    def add(self, path_prefix: str, module: str, **include_kwargs):
+        """Include `module`.router (with include_kwargs) once a request under `path_prefix` arrives"""
+        self.routers.append(LazyRouter(path_prefix, module, include_kwargs))
+
+    @property
+    def pending(self) -> bool:
+        return any(not router.loaded for router in self.routers)
+
+    async def ensure_loaded(self, path: str):
+        """Load the routers a request path needs (all of them for the schema/docs)"""
+        everything = path in SCHEMA_PATHS
+        for router in self.routers:
+            if not router.loaded and (everything or router.matches(path)):
+                await self._load(router)
+
+    async def _load(self, router: LazyRouter):
+        async with router.lock:
+            if router.loaded:
+                return
+            started = time.perf_counter()
+            module = await asyncio.to_thread(importlib.import_module, router.module)
+            self.app.include_router(module.router, **router.include_kwargs)
+            self.app.openapi_schema = None  # Rebuilt with the new routes
+            router.loaded = True
+            router.load_ms = (time.perf_counter() - started) * 1000
+            logger.info("[Startup] 📦 Loaded %s on first use (%.0fms)", router.module, router.load_ms)
+
+    def load_all(self):
+        """Import and include everything now (LAZY_ROUTERS=false, tools that need the full app)"""
+        for router in self.routers:
+            if not router.loaded:
+                started = time.perf_counter()
+                module = importlib.import_module(router.module)
+                self.app.include_router(module.router, **router.include_kwargs)
+                router.loaded = True
+                router.load_ms = (time.perf_counter() - started) * 1000
+        self.app.openapi_schema = None
+
+    def get_stats(self) -> List[Dict]:
+        return [
+            {"prefix": router.prefix, "module": router.module, "loaded": router.loaded,
+             "load_ms": round(router.load_ms, 1) if router.load_ms is not None else None}
+            for router in self.routers
+        ]
+
+
+class LazyRouterMiddleware:
+    """ASGI middleware that loads lazy routers before the request is routed"""
+
+    def __init__(self, app, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and self.routers.pending:
+            await self.routers.ensure_loaded(scope["path"])
+        await self.app(scope, receive, send)